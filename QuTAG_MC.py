@@ -33,9 +33,16 @@
 # modified versions may be distributed without limitation.
 ##
 
+import asyncio
+import collections
 import ctypes
+import itertools
 import os
+import shutil
 import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
 try:
     import numpy as np
@@ -64,49 +71,51 @@ class QuTAG:
             ("values", ctypes.c_double),
         ]
 
-    def __init__(self):
+    def __init__(self, backend="dll", **simParams):
         """Initializing the quTAG MC \n\n
         Checking the bit version of Python to load the corresponding DLL \n
         Loading 32 or 64 bit DLL: make sure the wrapper finds the matching DLL in the same folder  \n
         Declary API  \n
         Connect the device by the function QuTAG.Initialize()  \n
-        Set some parameters
+        Set some parameters \n
+        backend: "dll" for the library and a device, "sim" for a SimulatedTDC
+        built from the keyword arguments `simParams` (no library or hardware
+        needed; the simulator is available as `self.qutools_dll`)
         """
-        file_path = Path(__file__).resolve().parent
-        if sys.maxsize > 2**32:
-          lib_dir = file_path / "DLL_64bit"
+        if backend == "sim":
+            self.qutools_dll = SimulatedTDC(**simParams)
+        elif backend != "dll":
+            raise ValueError('QuTAG: backend must be "dll" or "sim"')
+        elif simParams:
+            raise TypeError("QuTAG: simulator parameters need backend=\"sim\"")
         else:
-          lib_dir = file_path / "DLL_32bit"
-
-        if os.name == "nt":
-            lib_name = "tdcbase.dll"
-            path_sep = ";"
-        else:
-            lib_dir = ""
-            lib_name = "libtdcbase.so"
-            path_sep = ":"
-        
-        dll_path = os.path.join(lib_dir, lib_name)
-        current_path = os.environ.get("PATH", "")
-        entry = str(lib_dir)
-        entries = current_path.split(path_sep) if current_path else []
-        if entry not in entries:
-            os.environ["PATH"] = current_path + (path_sep if current_path else "") + entry
-        self.qutools_dll = ctypes.cdll.LoadLibrary(str(dll_path))
+            self.qutools_dll = self.__loadDLL()
 
         self.__declareAPI()
         self.dev_nr = -1
+        self.__forgetDevice()
 
         # Find and connect to quTAG device
         print(
             "Initialize and Start with quTAG device: ", self.err_dict[self.Initialize()]
         )
 
+        # Ring of preallocated (timestamps, channels) buffers handed to
+        # TDC_getLastTimestamps; reallocated only when the buffer size changes.
+        self._timestampRingSlots = 3
+        self._timestampRing = []
+        self._timestampRingIndex = 0
+
         self._bufferSize = 1000000
-        self.setBufferSize(self._bufferSize)
+        if self.setBufferSize(self._bufferSize) != 0:
+            # Size the views by whatever buffer the device kept.
+            self._bufferSize = self.getBufferSize() or self._bufferSize
+            self.__allocTimestampRing()
 
-        self._deviceType = self.getDeviceType()
-        self._timebase = self.getTimebase()
+        # Read-only properties, cached until another device is addressed.
+        self.getDeviceType()
+        self.getTimebase()
+        self.getChannelCount()
 
         self._StartStopBinCount = 100000
 
@@ -116,6 +125,30 @@ class QuTAG:
         self._HBTBufferSize = 256
         self._LFTBufferSize = 256
 
+    def __loadDLL(self):
+        """Load tdcbase for the running Python's bit version."""
+        file_path = Path(__file__).resolve().parent
+        if sys.maxsize > 2**32:
+          lib_dir = file_path / "DLL_64bit"
+        else:
+          lib_dir = file_path / "DLL_32bit"
+
+        if os.name == "nt":
+            lib_name = "tdcbase.dll"
+            path_sep = ";"
+        else:
+            lib_dir = ""
+            lib_name = "libtdcbase.so"
+            path_sep = ":"
+        
+        dll_path = os.path.join(lib_dir, lib_name)
+        current_path = os.environ.get("PATH", "")
+        entry = str(lib_dir)
+        entries = current_path.split(path_sep) if current_path else []
+        if entry not in entries:
+            os.environ["PATH"] = current_path + (path_sep if current_path else "") + entry
+        return ctypes.cdll.LoadLibrary(str(dll_path))
+
     def __declareAPI(self):
         """Declare the API of the DLL. Should not be executed from the user."""
         # ------- tdcbase.h --------------------------------------------------------
@@ -357,7 +390,7 @@ class QuTAG:
         self.qutools_dll.TDC_setHistogramParams.restype = ctypes.c_int32
         self.qutools_dll.TDC_getHistogramParams.argtypes = [
             ctypes.POINTER(ctypes.c_int32),
-            ctypes.c_int32,
+            ctypes.POINTER(ctypes.c_int32),
         ]
         self.qutools_dll.TDC_getHistogramParams.restype = ctypes.c_int32
         self.qutools_dll.TDC_clearAllHistograms.argtypes = None
@@ -578,8 +611,17 @@ class QuTAG:
         self.qutools_dll.TDC_fitLftHistogram.restype = ctypes.c_int32
 
     # Init --------------------------------------------------------------
+    def __forgetDevice(self):
+        """Drop what is cached about the addressed device: read-only
+        properties and the state apply_config diffs against."""
+        self._deviceType = None
+        self._timebase = None
+        self._channelCount = None
+        self._appliedConfig = {}
+
     def Initialize(self):
         ans = self.qutools_dll.TDC_init(self.dev_nr)
+        self.__forgetDevice()
 
         if ans != 0:
             print("Error in TDC_init: " + self.err_dict[ans])
@@ -587,6 +629,7 @@ class QuTAG:
 
     def deInitialize(self):
         ans = self.qutools_dll.TDC_deInit()
+        self.__forgetDevice()
 
         if ans != 0:  # from the documentation: "never fails"
             print("Error in TDC_deInit: " + self.err_dict[ans])
@@ -612,15 +655,19 @@ class QuTAG:
         return self.qutools_dll.TDC_getVersion()
 
     def getTimebase(self):
-        timebase = ctypes.c_double()
-        ans = self.qutools_dll.TDC_getTimebase(ctypes.byref(timebase))
-        if ans != 0:
-            print("Error in TDC_getTimebase: " + self.err_dict[ans])
-        return timebase.value
+        if self._timebase is None:
+            timebase = ctypes.c_double()
+            ans = self.qutools_dll.TDC_getTimebase(ctypes.byref(timebase))
+            if ans != 0:
+                print("Error in TDC_getTimebase: " + self.err_dict[ans])
+                return timebase.value
+            self._timebase = timebase.value
+        return self._timebase
 
     def getDeviceType(self):
-        ans = self.qutools_dll.TDC_getDevType()
-        return ans
+        if self._deviceType is None:
+            self._deviceType = self.qutools_dll.TDC_getDevType()
+        return self._deviceType
 
     def checkFeatureHBT(self):
         ans = self.qutools_dll.TDC_checkFeatureHbt()
@@ -631,8 +678,10 @@ class QuTAG:
         return ans == 1
 
     def getChannelCount(self):
-        ans = self.qutools_dll.TDC_getChannelCount()
-        return ans
+        if self._channelCount is None:
+            self._channelCount = self.qutools_dll.TDC_getChannelCount()
+            self.TDC_QUTAG_CHANNELS = self._channelCount
+        return self._channelCount
 
     def checkFeatureFiveChan(self):
         ans = self.qutools_dll.TDC_checkFeatureFiveChan()
@@ -677,12 +726,14 @@ class QuTAG:
     # multiple devices ---------------------------------
     def addressDevice(self, deviceNumber):
         ans = self.qutools_dll.TDC_addressDevice(deviceNumber)
+        self.__forgetDevice()
         if ans != 0:
             print("Error in TDC_addressDevice: " + self.err_dict[ans])
         return ans
 
     def connect(self, deviceNumber):
         ans = self.qutools_dll.TDC_connect(deviceNumber)
+        self.__forgetDevice()
         if ans != 0:
             print("Error in TDC_connect: " + self.err_dict[ans])
         return ans
@@ -778,7 +829,7 @@ class QuTAG:
         return ans
 
     def enableChannels(self, enStart, channels=False):
-        self.TDC_QUTAG_CHANNELS = self.qutools_dll.TDC_getChannelCount()
+        self.TDC_QUTAG_CHANNELS = self.getChannelCount()
         enStartBit = 0
         if enStart:
             enStartBit = 1
@@ -797,7 +848,7 @@ class QuTAG:
         return ans
 
     def getChannelsEnabled(self):
-        self.TDC_QUTAG_CHANNELS = self.qutools_dll.TDC_getChannelCount()
+        self.TDC_QUTAG_CHANNELS = self.getChannelCount()
         channelStart = ctypes.c_int32()
         channelMask = ctypes.c_int32()
         ans = self.qutools_dll.TDC_getChannelsEnabled(
@@ -897,12 +948,28 @@ class QuTAG:
         return sz.value
 
     def setBufferSize(self, size):
-        self._bufferSize = size
         ans = self.qutools_dll.TDC_setTimestampBufferSize(size)
         if ans != 0:
             print("Error in TDC_setTimestampBufferSize: " + self.err_dict[ans])
+            return ans
+        # Only a size the device accepted may size the timestamp views.
+        self._bufferSize = size
+        self.__allocTimestampRing()
         return ans
 
+    def __allocTimestampRing(self):
+        """(Re)allocate the timestamp buffer ring for the current buffer size.
+        Arrays are left uninitialised: the DLL overwrites the first `valid`
+        entries and only those are ever exposed to the caller."""
+        size = int(self._bufferSize)
+        if self._timestampRing and len(self._timestampRing[0][0]) == size:
+            return
+        self._timestampRing = [
+            (np.empty(size, dtype=np.int64), np.empty(size, dtype=np.int8))
+            for _ in range(self._timestampRingSlots)
+        ]
+        self._timestampRingIndex = 0
+
     def getDataLost(self):
         lost = ctypes.c_int32()
         ans = self.qutools_dll.TDC_getDataLost(ctypes.byref(lost))
@@ -921,9 +988,37 @@ class QuTAG:
 
         return ans
 
-    def getLastTimestamps(self, reset):
-        timestamps = np.zeros(int(self._bufferSize), dtype=np.int64)
-        channels = np.zeros(int(self._bufferSize), dtype=np.int8)
+    def getLastTimestamps(self, reset, out=None):
+        """Read the timestamps collected since the last reset \n\n
+        Returns (timestamps, channels, valid) where both arrays are views of
+        length `valid`. Without `out` the views point into a small ring of
+        preallocated buffers, so they stay valid for the next
+        `self._timestampRingSlots - 1` calls; copy them to keep them longer. \n
+        out: optional (timestamps, channels) pair of C-contiguous int64 / int8
+        arrays with at least getBufferSize() elements to read into instead.
+        """
+        if out is None:
+            timestamps, channels = self._timestampRing[self._timestampRingIndex]
+            self._timestampRingIndex = (
+                self._timestampRingIndex + 1
+            ) % self._timestampRingSlots
+        else:
+            timestamps, channels = out
+            for arr, dtype in ((timestamps, np.int64), (channels, np.int8)):
+                if (
+                    arr.dtype != dtype
+                    or not arr.flags["C_CONTIGUOUS"]
+                    or not arr.flags["WRITEABLE"]
+                ):
+                    raise ValueError(
+                        "getLastTimestamps: out arrays must be writeable, "
+                        "C-contiguous int64 (timestamps) and int8 (channels)"
+                    )
+                if arr.size < int(self._bufferSize):
+                    raise ValueError(
+                        "getLastTimestamps: out arrays need at least %d elements"
+                        % int(self._bufferSize)
+                    )
         valid = ctypes.c_int32()
 
         ans = self.qutools_dll.TDC_getLastTimestamps(
@@ -935,7 +1030,21 @@ class QuTAG:
         if ans != 0:  # "never fails"
             print("Error in TDC_getLastTimestamps: " + self.err_dict[ans])
 
-        return (timestamps, channels, valid.value)
+        n = valid.value
+        return (timestamps[:n], channels[:n], n)
+
+    def stream(self, interval=0.1, queueSize=64, policy="block", spillDir=None):
+        """Start a TimestampStream polling this device in a background thread \n\n
+        See TimestampStream for the meaning of the arguments. The device must
+        not be polled with getLastTimestamps from elsewhere while it runs.
+        """
+        return TimestampStream(
+            self,
+            interval=interval,
+            queueSize=queueSize,
+            policy=policy,
+            spillDir=spillDir,
+        ).start()
 
     # File IO -------------------------------------------
     def writeTimestamps(self, filename, fileformat):
@@ -1053,6 +1162,224 @@ class QuTAG:
             expTime.value,
         )
 
+    # Bulk configuration -------------------------------------------------
+    # Order in which apply_config sends parameters: buffer and inputs first,
+    # histograms last (addHistogram needs the final bin parameters).
+    _CONFIG_ORDER = (
+        "bufferSize",
+        "channelsEnabled",
+        "signalConditioning",
+        "channelDelay",
+        "coincidenceWindow",
+        "exposureTime",
+        "histogramParams",
+        "histograms",
+    )
+    _CONFIG_KEYS = (
+        "bufferSize",
+        "enableStart",
+        "enabledChannels",
+        "channels",
+        "coincidenceWindow",
+        "exposureTime",
+        "histogramParams",
+        "histograms",
+    )
+
+    def apply_config(self, config, force=False):
+        """Apply a device configuration in one call \n\n
+        config: dict with any of the keys below; keys left out keep their
+        setting. Only parameters that differ from the last applied (or read
+        back) state reach the DLL, so re-applying a scan step's configuration
+        costs nothing for the unchanged part. \n
+          "bufferSize": timestamp buffer size \n
+          "enableStart": bool, "enabledChannels": iterable of channel numbers \n
+          "channels": {channel: {"conditioning": SCOND_*, "edge": bool (True:
+          rising), "threshold": volts, "delay": channel delay}}, any subset \n
+          "coincidenceWindow": bins, "exposureTime": ms \n
+          "histogramParams": (binWidth, binCount) \n
+          "histograms": iterable of (startChannel, stopChannel); start-stop
+          histograms not listed are removed \n
+        force: send every given parameter even if unchanged. Changes made
+        through the individual setters are not tracked: call snapshot_config()
+        or pass force=True after using them. Signal conditioning whose preset
+        is unknown ("conditioning" None) is never sent. \n
+        Returns {parameter: error code} for the parameters that were sent.
+        """
+        unknown = set(config) - set(self._CONFIG_KEYS)
+        if unknown:
+            raise ValueError("apply_config: unknown keys %s" % sorted(unknown))
+        if "channelsEnabled" not in self._appliedConfig:
+            # First call, or the channel mask failed to apply: start from
+            # what the device reports.
+            self.snapshot_config()
+
+        requested = self.__flattenConfig(config)
+        sent = {}
+        for key in sorted(requested, key=self.__configOrder):
+            value = requested[key]
+            if not force and self._appliedConfig.get(key) == value:
+                continue
+            if key[0] == "signalConditioning" and value[0] is None:
+                # Preset never applied and unreadable: nothing to resend.
+                continue
+            ans = self.__applySetting(key, value)
+            sent[key] = ans
+            if ans == 0:
+                self._appliedConfig[key] = value
+            else:
+                # Device state unknown: resend on the next apply.
+                self._appliedConfig.pop(key, None)
+        return sent
+
+    def snapshot_config(self):
+        """Read the device configuration back in one call \n\n
+        Returns a dict in the format apply_config takes and makes it the
+        state apply_config diffs against. The signal conditioning preset and
+        the set of start-stop histograms cannot be read from the device and
+        are reported as last applied ("conditioning" None if never applied).
+        """
+        count = self.getChannelCount()
+        enStart = ctypes.c_int32()
+        channelMask = ctypes.c_int32()
+        ans = self.qutools_dll.TDC_getChannelsEnabled(
+            ctypes.byref(enStart), ctypes.byref(channelMask)
+        )
+        if ans != 0:
+            print("Error in TDC_getChannelsEnabled: " + self.err_dict[ans])
+        _, coincWin, expTime = self.getDeviceParams()
+
+        state = {
+            "bufferSize": self.getBufferSize(),
+            "channelsEnabled": (
+                enStart.value == 1,
+                frozenset(
+                    channel
+                    for channel in range(1, count + 1)
+                    if channelMask.value >> (channel - 1) & 1
+                ),
+            ),
+            "coincidenceWindow": coincWin,
+            "exposureTime": expTime,
+            "histogramParams": self.getHistogramParams(),
+            "histograms": self._appliedConfig.get("histograms", frozenset()),
+        }
+        for channel in range(1, count + 1):
+            edge, threshold = self.getSignalConditioning(channel)
+            applied = self._appliedConfig.get(("signalConditioning", channel))
+            conditioning = applied[0] if applied else None
+            state[("signalConditioning", channel)] = (conditioning, edge, threshold)
+            state[("channelDelay", channel)] = self.getChannelDelay(channel)
+        self._appliedConfig = state
+
+        enStart, enabled = state["channelsEnabled"]
+        return {
+            "bufferSize": state["bufferSize"],
+            "enableStart": enStart,
+            "enabledChannels": sorted(enabled),
+            "channels": {
+                channel: {
+                    "conditioning": state[("signalConditioning", channel)][0],
+                    "edge": state[("signalConditioning", channel)][1],
+                    "threshold": state[("signalConditioning", channel)][2],
+                    "delay": state[("channelDelay", channel)],
+                }
+                for channel in range(1, count + 1)
+            },
+            "coincidenceWindow": state["coincidenceWindow"],
+            "exposureTime": state["exposureTime"],
+            "histogramParams": state["histogramParams"],
+            "histograms": sorted(state["histograms"]),
+        }
+
+    def __configOrder(self, key):
+        kind = key if isinstance(key, str) else key[0]
+        return (self._CONFIG_ORDER.index(kind), 0 if isinstance(key, str) else key[1])
+
+    def __flattenConfig(self, config):
+        """One entry per DLL setter call, e.g. ("channelDelay", 3): 120.
+        Settings sent together (edge and threshold, start and channel mask)
+        are completed from the applied state."""
+        applied = self._appliedConfig
+        flat = {}
+        for key in ("bufferSize", "coincidenceWindow", "exposureTime"):
+            if key in config:
+                flat[key] = int(config[key])
+        if "enableStart" in config or "enabledChannels" in config:
+            enStart, enabled = applied["channelsEnabled"]
+            if "enableStart" in config:
+                enStart = bool(config["enableStart"])
+            if "enabledChannels" in config:
+                enabled = frozenset(int(ch) for ch in config["enabledChannels"])
+            flat["channelsEnabled"] = (enStart, enabled)
+        for channel, settings in config.get("channels", {}).items():
+            channel = int(channel)
+            unknown = set(settings) - {"conditioning", "edge", "threshold", "delay"}
+            if unknown:
+                raise ValueError(
+                    "apply_config: unknown channel settings %s" % sorted(unknown)
+                )
+            if {"conditioning", "edge", "threshold"} & set(settings):
+                key = ("signalConditioning", channel)
+                previous = applied.get(key) or (
+                    (None,) + self.getSignalConditioning(channel)
+                )
+                # A None conditioning (as reported by snapshot_config for an
+                # unknown preset) keeps the previous one.
+                conditioning = settings.get("conditioning")
+                if conditioning is None:
+                    conditioning = previous[0]
+                value = (
+                    None if conditioning is None else int(conditioning),
+                    bool(settings.get("edge", previous[1])),
+                    float(settings.get("threshold", previous[2])),
+                )
+                if value[0] is None and value != previous:
+                    # Preset still unknown but edge or threshold change:
+                    # SCOND_MISC is the one that uses them.
+                    value = (self.SCOND_MISC,) + value[1:]
+                flat[key] = value
+            if "delay" in settings:
+                flat[("channelDelay", channel)] = int(settings["delay"])
+        if "histogramParams" in config:
+            binWidth, binCount = config["histogramParams"]
+            flat["histogramParams"] = (int(binWidth), int(binCount))
+        if "histograms" in config:
+            flat["histograms"] = frozenset(
+                (int(start), int(stop)) for start, stop in config["histograms"]
+            )
+        return flat
+
+    def __applySetting(self, key, value):
+        kind = key if isinstance(key, str) else key[0]
+        if kind == "bufferSize":
+            return self.setBufferSize(value)
+        if kind == "channelsEnabled":
+            enStart, enabled = value
+            bitstring = "".join(
+                "1" if channel in enabled else "0"
+                for channel in range(self.getChannelCount(), 0, -1)
+            )
+            return self.enableChannels(enStart, bitstring)
+        if kind == "signalConditioning":
+            return self.setSignalConditioning(key[1], *value)
+        if kind == "channelDelay":
+            return self.setChannelDelay(key[1], value)
+        if kind == "coincidenceWindow":
+            return self.setCoincidenceWindow(value)
+        if kind == "exposureTime":
+            return self.setExposureTime(value)
+        if kind == "histogramParams":
+            return self.setHistogramParams(*value)
+        # histograms: add the new pairs, remove the dropped ones
+        current = self._appliedConfig.get("histograms", frozenset())
+        ans = 0
+        for start, stop in sorted(value - current):
+            ans = self.addHistogram(start, stop, True) or ans
+        for start, stop in sorted(current - value):
+            ans = self.addHistogram(start, stop, False) or ans
+        return ans
+
     # Lifetime ----------------------------------------------------------
     def enableLFT(self, enable):
         if enable:
@@ -1387,3 +1714,840 @@ class QuTAG:
         )
 
         return (capacity.value, size.value, binWidth.value, iOffset.value, values)
+
+
+class _SimCall:
+    """One TDC_* entry point of a SimulatedTDC. Like a ctypes function it
+    takes the argtypes / restype declarations of QuTAG.__declareAPI, and
+    arguments go through the same argtypes conversion, so the simulator
+    rejects what the DLL would (ctypes.ArgumentError) and sees numbers as C
+    does; calls are serialised on the simulator's lock."""
+
+    # ctypes type codes of plain numbers, passed on as converted values;
+    # pointers, strings and byref() arguments are passed through as given.
+    _NUMBER_CODES = "bBhHiIlLqQfdg?"
+
+    def __init__(self, sim, func):
+        self._sim = sim
+        self._func = func
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        if self.argtypes is not None:
+            args = self.__convert(args)
+        with self._sim._lock:
+            return self._func(*args)
+
+    def __convert(self, args):
+        if len(args) != len(self.argtypes):
+            raise TypeError(
+                "this function takes %d arguments (%d given)"
+                % (len(self.argtypes), len(args))
+            )
+        converted = []
+        for index, (argtype, arg) in enumerate(zip(self.argtypes, args), 1):
+            try:
+                argtype.from_param(arg)
+            except Exception as err:
+                raise ctypes.ArgumentError(
+                    "argument %d: %s: %s" % (index, type(err).__name__, err)
+                ) from None
+            if getattr(argtype, "_type_", None) in tuple(self._NUMBER_CODES):
+                arg = (arg if isinstance(arg, argtype) else argtype(arg)).value
+            converted.append(arg)
+        return converted
+
+
+class _SimHistogram:
+    """Start stop histogram of SimulatedTDC, accumulated like tdcstartstop.h:
+    every start contributes the time to the first following stop, unless
+    another start comes first."""
+
+    def __init__(self, binWidth, binCount):
+        self.binWidth = binWidth
+        self.binCount = binCount
+        self.pendingStart = None  # last start still waiting for its stop
+        self.lastEvent = None  # channel independent histogram only
+        self.clear()
+
+    def clear(self):
+        self.data = np.zeros(self.binCount, dtype=np.int64)
+        self.count = 0
+        self.tooLarge = 0
+        self.starts = 0
+        self.stops = 0
+        self.first = None
+        self.last = None
+
+    def addStartStop(self, starts, stops):
+        self.starts += starts.size
+        self.stops += stops.size
+        if self.pendingStart is not None:
+            starts = np.concatenate(([self.pendingStart], starts))
+        if starts.size == 0:
+            return
+        nextStop = np.searchsorted(stops, starts, side="right")
+        self.pendingStart = starts[-1] if nextStop[-1] == stops.size else None
+        nextStart = np.append(starts[1:], np.iinfo(np.int64).max)
+        has = nextStop < stops.size
+        stopTimes = stops[nextStop[has]]
+        first = stopTimes < nextStart[has]
+        self.__addDiffs(starts[has][first], stopTimes[first])
+
+    def addConsecutive(self, ts):
+        if self.lastEvent is not None:
+            ts = np.concatenate(([self.lastEvent], ts))
+        if ts.size == 0:
+            return
+        self.lastEvent = ts[-1]
+        self.starts += ts.size - 1
+        self.stops += ts.size - 1
+        self.__addDiffs(ts[:-1], ts[1:])
+
+    def __addDiffs(self, startTimes, stopTimes):
+        if startTimes.size == 0:
+            return
+        bins = (stopTimes - startTimes) // self.binWidth
+        inRange = bins < self.binCount
+        self.tooLarge += int(bins.size - np.count_nonzero(inRange))
+        self.data += np.bincount(bins[inRange], minlength=self.binCount)
+        self.count += int(np.count_nonzero(inRange))
+        if self.first is None:
+            self.first = int(startTimes[0])
+        self.last = int(stopTimes[-1])
+
+
+class SimulatedTDC:
+    """Software stand-in for tdcbase, used by QuTAG(backend="sim") \n\n
+    Implements the TDC_* functions the wrapper calls with the library's
+    conventions (error code returned, results written through the ctypes
+    pointers), so every QuTAG method works unchanged without a device.
+    Functions it does not simulate return 14 (feature not available). \n
+    Events come from a synthetic photon-pair source: pairs are emitted at
+    `pairRate` per second (Poisson), each pair goes to one channel pair of
+    `pairs` and each photon is detected with probability `efficiency`
+    (heralding efficiency). Every channel adds `darkRate` dark counts per
+    second. Detection times get Gaussian `jitter` (RMS in ps, clipped at 5
+    sigma), the source's path `delays` (ps) and the delays set with
+    setChannelDelay. efficiency, jitter, darkRate and delays take a number
+    for all channels or a {channel: value} dict for single channels. \n
+    Like the device, the timestamp buffer keeps the last getBufferSize()
+    events; events overwritten before getLastTimestamps returned them set
+    getDataLost() and are counted in `eventsLost`. Coincidence counters are
+    computed per exposure and start stop histograms accumulate as in
+    tdcstartstop.h. \n
+    realtime: device time follows time.monotonic(); with False it only moves
+    with advance(), which together with `seed` makes runs reproducible.
+    """
+
+    DEFAULT_PAIRS = ((1, 5), (2, 6), (3, 7), (4, 8))
+
+    # Coincidence counters of TDC_getCoincCounters after the 33 singles:
+    # channel masks of 1/2, 1/3, 2/3, 1/4, ..., 1/2/3/4/5, see tdcbase.h.
+    COINC_MASKS = [
+        sum(1 << (ch - 1) for ch in combo)
+        for size in range(2, 6)
+        for combo in sorted(
+            itertools.combinations(range(1, 6), size), key=lambda c: c[::-1]
+        )
+    ]
+
+    def __init__(
+        self,
+        pairRate=100000.0,
+        pairs=DEFAULT_PAIRS,
+        efficiency=0.1,
+        jitter=50.0,
+        delays=0,
+        darkRate=500.0,
+        channels=8,
+        seed=None,
+        realtime=True,
+    ):
+        if not 1 <= channels <= 32:
+            raise ValueError("SimulatedTDC: channels must be 1 ... 32")
+        self._channels = int(channels)
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        if pairs.size and (pairs.min() < 1 or pairs.max() > self._channels):
+            raise ValueError("SimulatedTDC: pair channels must be 1 ... %d" % channels)
+        self._pairs = pairs
+        self._pairRate = float(pairRate) if pairs.size else 0.0
+        # Per-channel parameters, indexed by channel number (index 0 unused).
+        self._efficiency = self.__perChannel(efficiency, float)
+        self._jitter = self.__perChannel(jitter, float)
+        self._sourceDelay = self.__perChannel(delays, np.int64)
+        self._darkRate = self.__perChannel(darkRate, float)
+        self._rng = np.random.default_rng(seed)
+        self._realtime = realtime
+        self._lock = threading.RLock()
+
+        # Device settings, defaults as documented in tdcbase.h.
+        self._channelDelay = np.zeros(self._channels + 1, dtype=np.int64)
+        self._channelEnabled = np.ones(self._channels + 1, dtype=bool)
+        self._startEnabled = True
+        self._inputEnabled = True
+        self._conditioning = {}
+        self._coincWindow = 1000
+        self._expPs = 100 * 10**9
+        self._frozen = False
+        self._startStop = False
+        self._binWidth = 1
+        self._binCount = 10000
+        self._histograms = {}
+
+        # Device time in ps: wall clock since construction plus advance().
+        self._t0 = time.monotonic()
+        self._offset = 0
+        self._emitted = 0  # the source has run up to here
+        self._released = 0  # events before this time left the detectors
+        self._pendingTs = np.empty(0, dtype=np.int64)
+        self._pendingCodes = np.empty(0, dtype=np.int8)
+
+        self._expStart = 0
+        self._expSingles = np.zeros(33, dtype=np.int64)
+        self._expCoinc = []
+        self._counters = np.zeros(59, dtype=np.int32)
+        self._updates = 0
+
+        self._bufTs = np.empty(0, dtype=np.int64)
+        self._bufCodes = np.empty(0, dtype=np.int8)
+        self._bufStart = 0
+        self._bufCount = 0
+        self._unread = 0  # newest buffered events not yet returned
+        self._dataLost = False
+        self.eventsGenerated = 0
+        self.eventsLost = 0
+
+        # Expose the TDC_* methods as _SimCall objects for __declareAPI.
+        for name in dir(type(self)):
+            if name.startswith("TDC_"):
+                setattr(self, name, _SimCall(self, getattr(self, name)))
+
+    def __getattr__(self, name):
+        if not name.startswith("TDC_"):
+            raise AttributeError(name)
+        call = _SimCall(self, lambda *args: 14)
+        setattr(self, name, call)
+        return call
+
+    def __perChannel(self, value, dtype):
+        values = np.zeros(self._channels + 1, dtype=dtype)
+        if isinstance(value, dict):
+            for channel, v in value.items():
+                if not 1 <= channel <= self._channels:
+                    raise ValueError("SimulatedTDC: no channel %d" % channel)
+                values[channel] = v
+        else:
+            values[1:] = value
+        return values
+
+    def advance(self, seconds):
+        """Move device time forward by `seconds` (on top of the wall clock
+        when realtime)."""
+        with self._lock:
+            self._offset += int(round(seconds * 1e12))
+
+    # Event generation ----------------------------------------------------
+    def __now(self):
+        now = self._offset
+        if self._realtime:
+            now += int((time.monotonic() - self._t0) * 1e12)
+        return now
+
+    def __update(self):
+        """Run the source up to the current device time."""
+        until = self.__now()
+        rate = self._pairRate * 2 * self._efficiency.max() + self._darkRate.sum()
+        # Slices of about a million events keep the arrays bounded when the
+        # device is polled rarely.
+        slicePs = int(1e12 * min(1.0, 2**20 / rate)) if rate > 0 else until
+        while self._emitted < until:
+            end = min(until, self._emitted + max(slicePs, 1))
+            ts, codes = self.__emit(self._emitted, end)
+            self._emitted = end
+            ts = np.concatenate((self._pendingTs, ts))
+            codes = np.concatenate((self._pendingCodes, codes))
+            order = np.argsort(ts, kind="stable")
+            ts, codes = ts[order], codes[order]
+            # Later emissions are detected no earlier than end + minShift, so
+            # everything before that is final and can leave in time order.
+            minShift = (self._sourceDelay + self._channelDelay - 5 * self._jitter)[1:]
+            horizon = max(self._released, end + int(np.floor(minShift.min())))
+            k = np.searchsorted(ts, horizon)
+            self._pendingTs, self._pendingCodes = ts[k:], codes[k:]
+            self._released = horizon
+            self.__ingest(ts[:k], codes[:k])
+
+    def __emit(self, t0, t1):
+        """Detection events of the photons emitted in [t0, t1), unsorted."""
+        span = t1 - t0
+        seconds = span * 1e-12
+        rng = self._rng
+        nPairs = rng.poisson(self._pairRate * seconds)
+        emitted = t0 + rng.integers(0, span, nPairs)
+        route = rng.integers(0, len(self._pairs), nPairs)
+        times = []
+        chans = []
+        for arm in (0, 1):
+            ch = self._pairs[route, arm]
+            hit = rng.random(nPairs) < self._efficiency[ch]
+            times.append(emitted[hit])
+            chans.append(ch[hit])
+        dark = rng.poisson(self._darkRate[1:] * seconds)
+        chans.append(np.repeat(np.arange(1, self._channels + 1), dark))
+        times.append(t0 + rng.integers(0, span, int(dark.sum())))
+        ts = np.concatenate(times)
+        ch = np.concatenate(chans)
+        keep = self._channelEnabled[ch] & self._inputEnabled
+        ts, ch = ts[keep], ch[keep]
+        sigma = self._jitter[ch]
+        jitter = np.clip(rng.standard_normal(ts.size) * sigma, -5 * sigma, 5 * sigma)
+        ts = ts + self._sourceDelay[ch] + self._channelDelay[ch]
+        ts += np.rint(jitter).astype(np.int64)
+        self.eventsGenerated += ts.size
+        return ts, (ch - 1).astype(np.int8)
+
+    def __ingest(self, ts, codes):
+        self.__count(ts, codes)
+        if self._frozen:
+            return
+        if self._startStop:
+            for key, hist in self._histograms.items():
+                if key is None:
+                    hist.addConsecutive(ts)
+                else:
+                    hist.addStartStop(ts[codes == key[0] - 1], ts[codes == key[1] - 1])
+        self.__store(ts, codes)
+
+    # Coincidence counters --------------------------------------------------
+    def __count(self, ts, codes):
+        if self._expPs <= 0:
+            return
+        while True:
+            end = self._expStart + self._expPs
+            k = np.searchsorted(ts, end)
+            self._expSingles += np.bincount(codes[:k] + 1, minlength=33)[:33]
+            first5 = codes[:k] < 5
+            self._expCoinc.append((ts[:k][first5], codes[:k][first5]))
+            if end > self._released:
+                return
+            self.__finishExposure()
+            self._expStart = end
+            ts, codes = ts[k:], codes[k:]
+
+    def __finishExposure(self):
+        counters = np.zeros(59, dtype=np.int32)
+        counters[:33] = self._expSingles
+        ts = np.concatenate([t for t, _ in self._expCoinc])
+        codes = np.concatenate([c for _, c in self._expCoinc])
+        if ts.size > 1:
+            # Events closer than the window to their predecessor join its group.
+            newGroup = np.ones(ts.size, dtype=bool)
+            newGroup[1:] = np.diff(ts) > self._coincWindow
+            masks = np.bitwise_or.reduceat(
+                np.left_shift(1, codes.astype(np.int32)), np.flatnonzero(newGroup)
+            )
+            masks = masks[(masks & (masks - 1)) != 0]
+            for i, combo in enumerate(self.COINC_MASKS):
+                counters[33 + i] = np.count_nonzero((masks & combo) == combo)
+        self._counters = counters
+        self._updates += 1
+        self.__resetExposure()
+
+    def __resetExposure(self):
+        self._expSingles[:] = 0
+        self._expCoinc = []
+
+    # Timestamp buffer --------------------------------------------------------
+    def __store(self, ts, codes):
+        capacity = self._bufTs.size
+        if capacity == 0 or ts.size == 0:
+            return
+        overflow = self._bufCount + ts.size - capacity
+        if overflow > 0:
+            lost = overflow - (self._bufCount - self._unread)
+            if lost > 0:
+                self._dataLost = True
+                self.eventsLost += lost
+        if ts.size >= capacity:
+            self._bufTs[:] = ts[-capacity:]
+            self._bufCodes[:] = codes[-capacity:]
+            self._bufStart = 0
+            self._bufCount = capacity
+        else:
+            pos = (self._bufStart + self._bufCount) % capacity
+            head = min(ts.size, capacity - pos)
+            self._bufTs[pos : pos + head] = ts[:head]
+            self._bufCodes[pos : pos + head] = codes[:head]
+            self._bufTs[: ts.size - head] = ts[head:]
+            self._bufCodes[: ts.size - head] = codes[head:]
+            if overflow > 0:
+                self._bufStart = (self._bufStart + overflow) % capacity
+            self._bufCount = min(self._bufCount + ts.size, capacity)
+        self._unread = min(self._unread + ts.size, capacity)
+
+    @staticmethod
+    def __setOut(ref, value):
+        if ref is not None:
+            ref._obj.value = value
+
+    # tdcbase.h -----------------------------------------------------------------
+    def TDC_init(self, deviceId):
+        return 0
+
+    def TDC_deInit(self):
+        return 0
+
+    def TDC_getVersion(self):
+        return 0.0
+
+    def TDC_getTimebase(self, timebase):
+        self.__setOut(timebase, 1e-12)
+        return 0
+
+    def TDC_getDevType(self):
+        return 1  # DEVTYPE_NONE: simulated device
+
+    def TDC_getChannelCount(self):
+        return self._channels
+
+    def TDC_startCalibration(self):
+        return 0
+
+    def TDC_getCalibrationState(self, active):
+        self.__setOut(active, 0)
+        return 0
+
+    def TDC_enableChannels(self, enStart, channelMask):
+        self.__update()
+        self._startEnabled = bool(enStart)
+        for channel in range(1, self._channels + 1):
+            self._channelEnabled[channel] = bool(channelMask >> (channel - 1) & 1)
+        return 0
+
+    def TDC_getChannelsEnabled(self, enStart, channelMask):
+        mask = 0
+        for channel in range(1, self._channels + 1):
+            if self._channelEnabled[channel]:
+                mask |= 1 << (channel - 1)
+        self.__setOut(enStart, int(self._startEnabled))
+        self.__setOut(channelMask, mask)
+        return 0
+
+    def TDC_configureSignalConditioning(self, channel, conditioning, edge, threshold):
+        if not 0 <= channel <= self._channels or not -2.0 <= threshold <= 3.0:
+            return 10
+        self._conditioning[channel] = (edge, threshold)
+        return 0
+
+    def TDC_getSignalConditioning(self, channel, edge, threshold):
+        if not 0 <= channel <= self._channels:
+            return 10
+        edgeValue, thresholdValue = self._conditioning.get(channel, (1, 1.0))
+        self.__setOut(edge, edgeValue)
+        self.__setOut(threshold, thresholdValue)
+        return 0
+
+    def TDC_setChannelDelay(self, channel, delay):
+        if not 1 <= channel <= self._channels or not -50000 <= delay <= 50000:
+            return 10
+        self.__update()
+        self._channelDelay[channel] = delay
+        return 0
+
+    def TDC_getChannelDelay(self, channel, delay):
+        if not 1 <= channel <= self._channels:
+            return 10
+        self.__setOut(delay, int(self._channelDelay[channel]))
+        return 0
+
+    def TDC_setCoincidenceWindow(self, coincWin):
+        if not 0 <= coincWin <= 2000000000:
+            return 10
+        self.__update()
+        self._coincWindow = coincWin
+        return 0
+
+    def TDC_setExposureTime(self, expTime):
+        if not 0 <= expTime <= 65535:
+            return 10
+        self.__update()
+        # A new exposure starts with the new setting.
+        self._expPs = expTime * 10**9
+        self._expStart = self._released
+        self.__resetExposure()
+        return 0
+
+    def TDC_getDeviceParams(self, coincWin, expTime):
+        self.__setOut(coincWin, self._coincWindow)
+        self.__setOut(expTime, self._expPs // 10**9)
+        return 0
+
+    def TDC_getDataLost(self, lost):
+        self.__update()
+        self.__setOut(lost, int(self._dataLost))
+        self._dataLost = False
+        return 0
+
+    def TDC_setTimestampBufferSize(self, size):
+        if not 1 <= size <= 1000000:
+            return 10
+        self.__update()
+        self._bufTs = np.empty(size, dtype=np.int64)
+        self._bufCodes = np.empty(size, dtype=np.int8)
+        self._bufStart = self._bufCount = self._unread = 0
+        return 0
+
+    def TDC_getTimestampBufferSize(self, size):
+        self.__setOut(size, self._bufTs.size)
+        return 0
+
+    def TDC_enableTdcInput(self, enable):
+        self.__update()
+        self._inputEnabled = bool(enable)
+        return 0
+
+    def TDC_freezeBuffers(self, freeze):
+        self.__update()
+        self._frozen = bool(freeze)
+        return 0
+
+    def TDC_getCoincCounters(self, data, updates):
+        self.__update()
+        if data:
+            np.ctypeslib.as_array(data, shape=(59,))[:] = self._counters
+        self.__setOut(updates, self._updates)
+        self._updates = 0
+        return 0
+
+    def TDC_getLastTimestamps(self, reset, timestamps, channels, valid):
+        self.__update()
+        n = self._bufCount
+        if n:
+            head = min(n, self._bufTs.size - self._bufStart)
+            for ptr, buf in ((timestamps, self._bufTs), (channels, self._bufCodes)):
+                if ptr:
+                    out = np.ctypeslib.as_array(ptr, shape=(n,))
+                    out[:head] = buf[self._bufStart : self._bufStart + head]
+                    out[head:] = buf[: n - head]
+        self._unread = 0
+        if reset:
+            self._bufStart = self._bufCount = 0
+        self.__setOut(valid, n)
+        return 0
+
+    # tdcstartstop.h ------------------------------------------------------------
+    def TDC_enableStartStop(self, enable):
+        self.__update()
+        self._startStop = bool(enable)
+        if self._startStop:
+            self._histograms.setdefault(None, None)
+        self.__resetHistograms()
+        return 0
+
+    def TDC_addHistogram(self, startCh, stopCh, add):
+        if not self._startStop:
+            return 13
+        if not (1 <= startCh <= self._channels and 1 <= stopCh <= self._channels):
+            return 10
+        self.__update()
+        key = (startCh, stopCh)
+        if add:
+            self._histograms.setdefault(
+                key, _SimHistogram(self._binWidth, self._binCount)
+            )
+        else:
+            self._histograms.pop(key, None)
+        return 0
+
+    def TDC_setHistogramParams(self, binWidth, binCount):
+        if not (1 <= binWidth <= 1000000 and 2 <= binCount <= 1000000):
+            return 10
+        self.__update()
+        self._binWidth = binWidth
+        self._binCount = binCount
+        self.__resetHistograms()
+        return 0
+
+    def TDC_getHistogramParams(self, binWidth, binCount):
+        self.__setOut(binWidth, self._binWidth)
+        self.__setOut(binCount, self._binCount)
+        return 0
+
+    def TDC_clearAllHistograms(self):
+        self.__update()
+        for hist in self._histograms.values():
+            hist.clear()
+        return 0
+
+    def TDC_getHistogram(
+        self, chStart, chStop, reset, data, count, tooSmall, tooLarge, starts, stops, expTime
+    ):
+        if not self._startStop:
+            return 13
+        key = None if chStart < 0 or chStop <= 0 else (chStart, chStop)
+        hist = self._histograms.get(key)
+        if hist is None:
+            return 10
+        self.__update()
+        if data:
+            np.ctypeslib.as_array(data, shape=(hist.binCount,))[:] = np.minimum(
+                hist.data, np.iinfo(np.int32).max
+            )
+        self.__setOut(count, hist.count)
+        self.__setOut(tooSmall, 0)  # time differences are never negative
+        self.__setOut(tooLarge, hist.tooLarge)
+        self.__setOut(starts, hist.starts)
+        self.__setOut(stops, hist.stops)
+        self.__setOut(expTime, 0 if hist.first is None else hist.last - hist.first)
+        if reset:
+            hist.clear()
+        return 0
+
+    def __resetHistograms(self):
+        """Recreate every histogram empty with the current parameters."""
+        for key in self._histograms:
+            self._histograms[key] = _SimHistogram(self._binWidth, self._binCount)
+
+
+# One chunk delivered by TimestampStream: copies of the timestamps/channels read
+# by one poll, whether TDC_getDataLost reported loss for it, and the
+# time.monotonic() at which it was read.
+TimestampChunk = collections.namedtuple(
+    "TimestampChunk", ["timestamps", "channels", "dataLost", "pollTime"]
+)
+
+
+class TimestampStream:
+    """Background acquisition: polls QuTAG.getLastTimestamps(reset=True) in a
+    dedicated thread (the ctypes call releases the GIL) and queues the chunks,
+    so pauses in the consumer do not let the device buffer saturate. \n\n
+    Iterate over the stream (``for chunk in stream``) or asynchronously
+    (``async for chunk in stream``) to receive TimestampChunk tuples; iteration
+    ends once the stream is stopped and drained. \n
+    interval: seconds between polls \n
+    queueSize: number of chunks held in memory \n
+    policy: what to do when the queue is full \n
+      "block"       - wait for the consumer (the device buffer absorbs the delay) \n
+      "drop-oldest" - discard the oldest queued chunk (counted in `dropped`) \n
+      "spill"       - write chunks to .npz files in `spillDir` and read them
+                      back in order once the consumer catches up; a temporary
+                      directory (no `spillDir`) is removed once its chunks
+                      are delivered or discarded by stop(discard=True) \n
+    """
+
+    POLICIES = ("block", "drop-oldest", "spill")
+
+    def __init__(self, qutag, interval=0.1, queueSize=64, policy="block", spillDir=None):
+        if policy not in self.POLICIES:
+            raise ValueError(
+                "TimestampStream: policy must be one of " + ", ".join(self.POLICIES)
+            )
+        if queueSize < 1:
+            raise ValueError("TimestampStream: queueSize must be at least 1")
+        self._qutag = qutag
+        self._interval = float(interval)
+        self._queueSize = int(queueSize)
+        self._policy = policy
+        self._spillDir = spillDir
+        self._ownsSpillDir = False  # created by start(), removed when empty
+        self._queue = collections.deque()
+        self._spilled = collections.deque()  # spill file paths, oldest first
+        self._saving = False  # a chunk is being written to its spill file
+        self._loading = 0  # spill files being read back by consumers
+        self._spillCount = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._error = None
+        self.dropped = 0
+        self.chunksLost = 0  # chunks for which TDC_getDataLost was set
+
+    # Lifecycle -----------------------------------------------------------
+    def start(self):
+        if self._thread is not None:
+            return self
+        if self._policy == "spill" and self._spillDir is None:
+            self._spillDir = tempfile.mkdtemp(prefix="qutag_spill_")
+            self._ownsSpillDir = True
+        self._running = True
+        self._thread = threading.Thread(
+            target=self.__run, name="QuTAG-TimestampStream", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, discard=False):
+        """Stop polling. Chunks already queued or spilled are still delivered
+        to the consumer, unless `discard` is set."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._cond:
+            if discard:
+                self._queue.clear()
+                for path in self._spilled:
+                    os.remove(path)
+                self._spilled.clear()
+            self.__removeSpillDir()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def spillDir(self):
+        """Directory holding spilled chunks; None for a temporary directory
+        that has already been removed."""
+        return self._spillDir
+
+    # Producer ------------------------------------------------------------
+    def __run(self):
+        nextPoll = time.monotonic()
+        try:
+            while self._running:
+                timestamps, channels, valid = self._qutag.getLastTimestamps(True)
+                lost = self._qutag.getDataLost() != 0
+                pollTime = time.monotonic()
+                if lost:
+                    self.chunksLost += 1
+                if valid > 0 or lost:
+                    self.__push(
+                        TimestampChunk(
+                            timestamps.copy(), channels.copy(), lost, pollTime
+                        )
+                    )
+                nextPoll += self._interval
+                delay = nextPoll - time.monotonic()
+                if delay > 0:
+                    with self._cond:
+                        self._cond.wait_for(lambda: not self._running, delay)
+                else:
+                    nextPoll = time.monotonic()
+        except Exception as err:  # surfaced to the consumer
+            self._error = err
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def __push(self, chunk):
+        spillPath = None
+        with self._cond:
+            if self._policy == "block":
+                self._cond.wait_for(
+                    lambda: len(self._queue) < self._queueSize or not self._running
+                )
+                if not self._running:
+                    return
+            elif len(self._queue) >= self._queueSize or self._spilled:
+                if self._policy == "drop-oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    # Once spilling started, keep spilling until the backlog is
+                    # consumed so chunks are delivered in acquisition order.
+                    spillPath = os.path.join(
+                        self._spillDir, "chunk_%08d.npz" % self._spillCount
+                    )
+                    self._spillCount += 1
+                    self._saving = True
+            if spillPath is None:
+                self._queue.append(chunk)
+                self._cond.notify_all()
+                return
+        # Disk I/O without the lock, so the consumer keeps draining the queue.
+        # Only this thread pushes, so the chunk is still registered before any
+        # later one.
+        saved = False
+        try:
+            np.savez(
+                spillPath,
+                timestamps=chunk.timestamps,
+                channels=chunk.channels,
+                dataLost=chunk.dataLost,
+                pollTime=chunk.pollTime,
+            )
+            saved = True
+        finally:
+            with self._cond:
+                if saved:
+                    self._spilled.append(spillPath)
+                self._saving = False
+                self._cond.notify_all()
+
+    def __removeSpillDir(self):
+        # Called with the lock held, once the stream has stopped.
+        if (
+            self._ownsSpillDir
+            and not self._spilled
+            and not self._loading
+            and not self._saving
+            and not self._running
+        ):
+            shutil.rmtree(self._spillDir, ignore_errors=True)
+            self._spillDir = None
+            self._ownsSpillDir = False
+
+    # Consumer ------------------------------------------------------------
+    def get(self, timeout=None):
+        """Return the next TimestampChunk; None on timeout or once the stream
+        has stopped and every queued chunk was delivered."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._queue
+                or self._spilled
+                or not (self._running or self._saving),
+                timeout,
+            )
+            if self._queue:
+                chunk = self._queue.popleft()
+                self._cond.notify_all()
+                return chunk
+            if not self._spilled:
+                if self._error is not None:
+                    err, self._error = self._error, None
+                    raise err
+                return None
+            path = self._spilled.popleft()
+            self._loading += 1
+        with np.load(path) as data:
+            chunk = TimestampChunk(
+                data["timestamps"],
+                data["channels"],
+                bool(data["dataLost"]),
+                float(data["pollTime"]),
+            )
+        os.remove(path)
+        with self._cond:
+            self._loading -= 1
+            self.__removeSpillDir()
+        return chunk
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self.get()
+        if chunk is None:
+            raise StopIteration
+        return chunk
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        chunk = await loop.run_in_executor(None, self.get)
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
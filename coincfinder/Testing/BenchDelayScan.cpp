@@ -0,0 +1,103 @@
+#include <algorithm>
+#include <chrono>
+#include <iostream>
+#include <random>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "Coincidences.h"
+#include "CrossCorrelation.h"
+
+// Delay calibration of the eight default CLI pairs with each engine. Channels
+// 1-4 are Poisson streams; channel 4 + k carries a delayed, jittered copy of
+// a fraction of channel k plus its own background, so every pair has one true
+// peak (the anti-correlated pairs only see accidentals and the peak of the
+// background-free sweep is arbitrary; they are timed but not compared).
+//
+// The FFT engine wins on wide scans: at 2 Mcps, `1 2e6 50000000 10 200`
+// (±50 µs) took 1.8 s against 128 s for the sweep on one core, while at the
+// default ±200 ns the sweep is the cheaper one and Auto keeps it.
+
+namespace {
+
+using Channels = std::vector<std::vector<long long>>;
+
+Channels makeChannels(double seconds, double rate, double heraldFraction) {
+    std::mt19937_64 rng(2024);
+    std::exponential_distribution<double> gap(rate * 1e-12);
+    std::normal_distribution<double> jitter(0.0, 60.0);
+    std::bernoulli_distribution herald(heraldFraction);
+    const double endPs = seconds * 1e12;
+
+    Channels channels(8);
+    for (int k = 0; k < 4; ++k) {
+        const long long delayPs = 1'500 + 2'700 * k;
+        for (double t = gap(rng); t < endPs; t += gap(rng)) {
+            const auto ts = static_cast<long long>(t);
+            channels[k].push_back(ts);
+            if (herald(rng))
+                channels[4 + k].push_back(ts - delayPs + static_cast<long long>(jitter(rng)));
+        }
+        for (double t = gap(rng); t < endPs; t += gap(rng) / (1.0 - heraldFraction))
+            channels[4 + k].push_back(static_cast<long long>(t));
+        std::sort(channels[4 + k].begin(), channels[4 + k].end());
+    }
+    return channels;
+}
+
+std::pair<double, std::vector<long long>>
+calibrate(const Channels &channels, DelayScanMethod method, long long windowPs,
+          long long startPs, long long endPs, long long stepPs) {
+    static const std::pair<int, int> pairs[] = {{1, 5}, {2, 6}, {3, 7}, {4, 8},
+                                                {1, 6}, {2, 5}, {3, 8}, {4, 7}};
+    std::vector<long long> delays;
+    const auto start = std::chrono::steady_clock::now();
+    for (const auto &[a, b] : pairs)
+        delays.push_back(findBestDelayPicoseconds(channels[a - 1], channels[b - 1],
+                                                  windowPs, startPs, endPs, stepPs,
+                                                  nullptr, method));
+    const auto stop = std::chrono::steady_clock::now();
+    return {std::chrono::duration<double>(stop - start).count(), delays};
+}
+
+} // namespace
+
+int main(int argc, char **argv) {
+    const double seconds = argc > 1 ? std::stod(argv[1]) : 1.0;
+    const double rate = argc > 2 ? std::stod(argv[2]) : 2'000'000.0;
+    const long long rangePs = argc > 3 ? std::stoll(argv[3]) : 200'000;
+    const long long stepPs = argc > 4 ? std::stoll(argv[4]) : 10;
+    const long long windowPs = argc > 5 ? std::stoll(argv[5]) : 200;
+
+    const Channels channels = makeChannels(seconds, rate, 0.3);
+    std::cout << seconds << " s at " << rate << " /s/channel, scan +/-" << rangePs
+              << " ps in " << stepPs << " ps steps, window " << windowPs << " ps\n";
+    std::cout << "  Auto picks: "
+              << (planFftPeakSearch(channels[0], channels[4], windowPs, -rangePs,
+                                    rangePs, stepPs)
+                          .beatsSweep
+                      ? "fft"
+                      : "sweep")
+              << "\n";
+
+    const auto sweep = calibrate(channels, DelayScanMethod::Sweep, windowPs, -rangePs,
+                                 rangePs, stepPs);
+    const auto fft = calibrate(channels, DelayScanMethod::Fft, windowPs, -rangePs,
+                               rangePs, stepPs);
+    const auto automatic = calibrate(channels, DelayScanMethod::Auto, windowPs, -rangePs,
+                                     rangePs, stepPs);
+    const auto hierarchical = calibrate(channels, DelayScanMethod::Hierarchical, windowPs,
+                                        -rangePs, rangePs, stepPs);
+    std::cout << "  sweep:        " << sweep.first << " s\n  fft:          " << fft.first
+              << " s\n  auto:         " << automatic.first
+              << " s\n  hierarchical: " << hierarchical.first << " s\n";
+
+    bool agree = true;
+    for (size_t p = 0; p < 4; ++p)
+        agree = agree && sweep.second[p] == fft.second[p] &&
+                sweep.second[p] == automatic.second[p] &&
+                sweep.second[p] == hierarchical.second[p];
+    std::cout << "  Correlated-pair delays agree: " << (agree ? "yes" : "NO") << std::endl;
+    return agree ? 0 : 1;
+}
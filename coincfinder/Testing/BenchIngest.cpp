@@ -0,0 +1,116 @@
+#include <algorithm>
+#include <chrono>
+#include <cstdint>
+#include <cstdio>
+#include <fstream>
+#include <iostream>
+#include <map>
+#include <random>
+#include <string>
+#include <vector>
+
+#include "BinFile.h"
+#include "ReadCSV.h"
+
+// Ingest throughput on a synthetic 8-channel BIN recording. Each channel is a
+// Poisson stream with its own cable/detector delay, and records are written in
+// arrival order before the delay is applied, so timestamps are only
+// approximately sorted across channels, like a real quTAG export. A second run
+// adds a random readout latency per event, which also reorders events within
+// a channel (the case that makes sorted insertion quadratic).
+
+namespace {
+
+struct SyntheticEvent {
+    std::uint64_t writeOrderPs; // arrival at the TDC plus readout latency
+    std::uint64_t timestampPs;
+    std::uint16_t code;
+};
+
+void writeSyntheticBin(const std::string &path, double seconds, double ratePerChannel,
+                       long long maxSkewPs, long long readoutLatencyPs) {
+    std::mt19937_64 rng(12345);
+    std::exponential_distribution<double> gap(ratePerChannel * 1e-12);
+    std::uniform_int_distribution<long long> skew(-maxSkewPs, maxSkewPs);
+    std::normal_distribution<double> jitter(0.0, 50.0);
+    std::uniform_int_distribution<long long> latency(0, std::max(0LL, readoutLatencyPs));
+
+    const auto endPs = static_cast<std::uint64_t>(seconds * 1e12);
+    std::vector<SyntheticEvent> events;
+    for (std::uint16_t code = 0; code < 8; ++code) {
+        const long long channelDelay = skew(rng);
+        double t = 1e6;
+        while (true) {
+            t += gap(rng);
+            if (t >= static_cast<double>(endPs))
+                break;
+            const auto arrival = static_cast<std::uint64_t>(t);
+            const auto stamped = static_cast<std::uint64_t>(
+                static_cast<double>(arrival) + static_cast<double>(channelDelay) + jitter(rng));
+            events.push_back({arrival + static_cast<std::uint64_t>(latency(rng)), stamped, code});
+        }
+    }
+    std::sort(events.begin(), events.end(),
+              [](const SyntheticEvent &a, const SyntheticEvent &b) {
+                  return a.writeOrderPs < b.writeOrderPs;
+              });
+
+    std::ofstream out(path, std::ios::binary);
+    const std::string header(kBinHeaderBytes, '\0');
+    out.write(header.data(), static_cast<std::streamsize>(header.size()));
+    for (const auto &e : events) {
+        out.write(reinterpret_cast<const char *>(&e.timestampPs), sizeof(e.timestampPs));
+        out.write(reinterpret_cast<const char *>(&e.code), sizeof(e.code));
+    }
+}
+
+double timeRead(const std::string &path, IngestMode mode, std::map<int, Singles> &result) {
+    setIngestMode(mode);
+    double duration = 0.0;
+    const auto start = std::chrono::steady_clock::now();
+    result = readBINtoSingles(path, duration);
+    const auto stop = std::chrono::steady_clock::now();
+    return std::chrono::duration<double>(stop - start).count();
+}
+
+bool runScenario(const std::string &path, double seconds, double rate, long long skewPs,
+                 long long latencyPs) {
+    writeSyntheticBin(path, seconds, rate, skewPs, latencyPs);
+    const double events = static_cast<double>(BinFile(path).recordCount());
+    std::cout << events << " events, 8 channels, " << rate << " /s/channel, skew +/-"
+              << skewPs << " ps, readout latency 0.." << latencyPs << " ps\n";
+
+    std::map<int, Singles> sortedInsert;
+    std::map<int, Singles> appendSort;
+    const double tInsert = timeRead(path, IngestMode::SortedInsert, sortedInsert);
+    const double tAppend = timeRead(path, IngestMode::AppendThenSort, appendSort);
+
+    std::cout << "  SortedInsert:   " << tInsert << " s (" << events / tInsert / 1e6
+              << " Mevents/s)\n";
+    std::cout << "  AppendThenSort: " << tAppend << " s (" << events / tAppend / 1e6
+              << " Mevents/s)\n";
+
+    bool identical = sortedInsert.size() == appendSort.size();
+    for (const auto &[ch, singles] : sortedInsert) {
+        identical = identical && appendSort.count(ch) &&
+                    appendSort.at(ch).baseSecond == singles.baseSecond &&
+                    appendSort.at(ch).eventsPerSecond == singles.eventsPerSecond;
+    }
+    std::cout << "  Buckets identical: " << (identical ? "yes" : "NO") << std::endl;
+    std::remove(path.c_str());
+    return identical;
+}
+
+} // namespace
+
+int main(int argc, char **argv) {
+    const double seconds = argc > 1 ? std::stod(argv[1]) : 10.0;
+    const double rate = argc > 2 ? std::stod(argv[2]) : 200'000.0;
+    const long long skewPs = argc > 3 ? std::stoll(argv[3]) : 20'000;
+    const long long latencyPs = argc > 4 ? std::stoll(argv[4]) : 1'000'000'000;
+    const std::string path = "bench_ingest.bin";
+
+    bool ok = runScenario(path, seconds, rate, skewPs, 0);
+    ok = runScenario(path, seconds, rate, skewPs, latencyPs) && ok;
+    return ok ? 0 : 1;
+}
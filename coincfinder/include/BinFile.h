@@ -0,0 +1,93 @@
+#pragma once
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <mutex>
+#include <span>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "MappedFile.h"
+#include "Singles.h"
+
+/// @file
+/// Zero-copy access to quTAG uncompressed BIN recordings (TDC FORMAT_BINARY):
+/// a 40-byte header followed by packed 10-byte little-endian records of
+/// uint64 timestamp (ps) and uint16 raw channel code. The file is memory
+/// mapped, so recordings larger than RAM can be sliced by time without being
+/// loaded.
+
+/// Size of the header written by TDC_writeTimestamps.
+constexpr std::size_t kBinHeaderBytes = 40;
+/// Size of one packed (timestamp, channel) record.
+constexpr std::size_t kBinRecordBytes = 10;
+
+/// Decodes the timestamp of the record starting at `record`.
+inline Timestamp binRecordTimestamp(const unsigned char *record) {
+    std::uint64_t raw = 0;
+    std::memcpy(&raw, record, sizeof(raw));
+    return static_cast<Timestamp>(raw);
+}
+
+/// Decodes the raw (0-based) channel code of the record starting at `record`.
+inline std::uint16_t binRecordChannel(const unsigned char *record) {
+    std::uint16_t raw = 0;
+    std::memcpy(&raw, record + sizeof(std::uint64_t), sizeof(raw));
+    return raw;
+}
+
+/// Read-only view of a BIN recording backed by a memory mapping.
+class BinFile {
+public:
+    /// Maps `path`. `indexStride` is the number of records summarised by one
+    /// entry of the sparse time index. The header layout is not documented,
+    /// so it is skipped rather than validated; the only sanity checks are its
+    /// presence and a first record with a one-byte channel code. Throws
+    /// std::runtime_error for files that are too short or fail that check.
+    explicit BinFile(const std::string &path, std::size_t indexStride = 8192);
+
+    BinFile(const BinFile &) = delete;
+    BinFile &operator=(const BinFile &) = delete;
+
+    const std::string &path() const { return file_.path(); }
+    std::span<const unsigned char> header() const {
+        return {file_.data(), kBinHeaderBytes};
+    }
+    /// Number of complete records after the header.
+    std::size_t recordCount() const { return recordCount_; }
+    /// Bytes of an incomplete final record (e.g. a file still being written).
+    std::size_t trailingBytes() const { return trailingBytes_; }
+    std::size_t indexStride() const { return indexStride_; }
+
+    /// Pointer to the first record; record i starts at i * kBinRecordBytes.
+    const unsigned char *recordData() const { return file_.data() + kBinHeaderBytes; }
+    Timestamp timestamp(std::size_t i) const {
+        return binRecordTimestamp(recordData() + i * kBinRecordBytes);
+    }
+    std::uint16_t channelCode(std::size_t i) const {
+        return binRecordChannel(recordData() + i * kBinRecordBytes);
+    }
+
+    /// Returns [first, stop) record indices holding every record whose
+    /// timestamp lies in [startPs, endPs). Records outside the range never
+    /// precede `first` or follow `stop - 1`; for time-sorted files the range
+    /// is exact. The sparse index (per-block min/max) is built on first use
+    /// with one pass over the file.
+    std::pair<std::size_t, std::size_t> recordRange(Timestamp startPs,
+                                                     Timestamp endPs) const;
+
+private:
+    void ensureIndex() const;
+
+    MappedFile file_;
+    std::size_t recordCount_ = 0;
+    std::size_t trailingBytes_ = 0;
+    std::size_t indexStride_ = 0;
+
+    mutable std::once_flag indexOnce_;
+    // Running max of block maxima / running min (from the back) of block
+    // minima, both monotonic so range bounds are binary searches.
+    mutable std::vector<Timestamp> prefixMax_;
+    mutable std::vector<Timestamp> suffixMin_;
+};
@@ -0,0 +1,47 @@
+#pragma once
+#include <cstddef>
+#include <span>
+#include <vector>
+
+/// @file
+/// Interchangeable implementations of the one-to-one matching behind
+/// countCoincidencesWithDelay. Every kernel walks the same greedy two-pointer
+/// recurrence and returns identical counts; they differ only in how the runs
+/// of unmatched events between coincidences are skipped. The vector kernels
+/// are compiled for x86-64 only and chosen at runtime from the CPU features,
+/// so one binary runs everywhere.
+
+enum class CoincidenceKernel {
+    Auto,       ///< Picked per call by selectCoincidenceKernel.
+    Scalar,     ///< Reference branchy two-pointer loop.
+    Branchless, ///< Same recurrence with the pointer steps computed as flags.
+    Avx2,       ///< Skips unmatched runs four timestamps per compare.
+    Avx512,     ///< Skips unmatched runs eight timestamps per compare.
+};
+
+/// Whether `kernel` can run on this CPU (Auto, Scalar and Branchless always
+/// can).
+bool coincidenceKernelAvailable(CoincidenceKernel kernel);
+
+/// Kernels usable on this CPU, Scalar first and Auto excluded.
+std::vector<CoincidenceKernel> availableCoincidenceKernels();
+
+/// Widest vector kernel this CPU supports (detected once per process), or
+/// Branchless without one.
+CoincidenceKernel defaultCoincidenceKernel();
+
+/// Kernel Auto resolves to for channels of these sizes. Runs of unmatched
+/// events are short when the rates are similar, and there the branchless loop
+/// wins; from a size ratio of kVectorKernelMinRatio the vector skips do.
+CoincidenceKernel selectCoincidenceKernel(size_t size1, size_t size2);
+inline constexpr size_t kVectorKernelMinRatio = 4;
+
+/// Lower-case kernel name ("auto", "scalar", "branchless", "avx2", "avx512").
+const char *coincidenceKernelName(CoincidenceKernel kernel);
+
+/// countCoincidencesWithDelay with an explicit kernel. Throws
+/// std::invalid_argument when the kernel is not available on this CPU.
+long long countCoincidencesWithKernel(std::span<const long long> ch1,
+                                      std::span<const long long> ch2,
+                                      long long coincWindowPs, long long delayPs,
+                                      CoincidenceKernel kernel);
@@ -10,12 +10,67 @@
 /// Python bindings. All timestamp/delay values are expressed in picoseconds and
 /// passed around as lightweight spans to avoid redundant copies.
 
-/// Counts coincidences (picoseconds) for a given delay between two channels.
+/// Counts coincidences (picoseconds) for a given delay between two channels:
+/// a greedy one-to-one matching of `ch1[i] - delayPs` against `ch2[j]` within
+/// ±`coincWindowPs`. Dispatches to the fastest kernel in CoincidenceKernels.h.
 int countCoincidencesWithDelay(std::span<const long long> ch1,
                                std::span<const long long> ch2,
                                long long coincWindowPs,
                                long long delayPs);
 
+/// One (channel A, channel B, delay) combination evaluated by
+/// countCoincidencesBatch.
+struct CoincidenceQuery {
+    std::span<const long long> channelA;
+    std::span<const long long> channelB;
+    long long delayPs = 0;
+};
+
+/// Evaluates countCoincidencesWithDelay for every query and stores the result
+/// in `counts[i]`. Queries are spread over up to `threads` OpenMP threads
+/// (0 = OpenMP default); builds without OpenMP run them sequentially.
+void countCoincidencesBatch(std::span<const CoincidenceQuery> queries,
+                            long long coincWindowPs,
+                            std::span<long long> counts, int threads = 0);
+
+/// A coincidence count with the background under it.
+struct CoincidenceBackground {
+    /// Coincidences at the requested delay (as countCoincidencesWithDelay).
+    long long counts = 0;
+    /// Accidentals expected from the singles: n1 * n2 * (2w + 1) / T.
+    double accidentals = 0.0;
+    /// Mean count of the side windows; `accidentals` when there are none.
+    double background = 0.0;
+    /// Standard error of `background` (Poisson on the side-window total, or
+    /// the singles' counting error on `accidentals`).
+    double backgroundError = 0.0;
+    /// Number of side windows measured.
+    size_t sideWindows = 0;
+
+    double net() const { return static_cast<double>(counts) - background; }
+};
+
+/// countCoincidencesWithDelay plus its background, in one pass over `ch1`:
+/// every side window (the same matching at `delayPs + sideOffsetsPs[k]`,
+/// offsets chosen well outside the correlation peak) advances its own
+/// cursor through `ch2` alongside the main one. The accidentals use
+/// `durationPs` as T, or the time spanned by both channels when it is 0.
+CoincidenceBackground
+countCoincidencesWithBackground(std::span<const long long> ch1,
+                                std::span<const long long> ch2,
+                                long long coincWindowPs, long long delayPs,
+                                std::span<const long long> sideOffsetsPs = {},
+                                long long durationPs = 0);
+
+/// countCoincidencesWithBackground for every query (`results[i]` for
+/// `queries[i]`), threaded like countCoincidencesBatch.
+void countCoincidencesWithBackgroundBatch(std::span<const CoincidenceQuery> queries,
+                                          long long coincWindowPs,
+                                          std::span<const long long> sideOffsetsPs,
+                                          long long durationPs,
+                                          std::span<CoincidenceBackground> results,
+                                          int threads = 0);
+
 /// Scans a delay range and fills `results` with (delay_ns, coincidence_count)
 /// using a histogram/difference-array approach (single pass over the data).
 void computeCoincidencesForRange(std::span<const long long> channel1,
@@ -25,6 +80,37 @@ void computeCoincidencesForRange(std::span<const long long> channel1,
                                  long long delayStepPs,
                                  std::vector<std::pair<float, int>> &results);
 
+/// Number of delay steps covered by a `[delayStartPs, delayEndPs]` scan (0 when
+/// the range is empty). Throws std::invalid_argument for a non-positive step.
+size_t delayScanSteps(long long delayStartPs, long long delayEndPs,
+                      long long delayStepPs);
+
+/// Difference-array kernel of the delay scan: for every (channel1, channel2)
+/// pair within reach it adds +1 at the first and -1 after the last delay bin
+/// the pair falls into. `diff` must hold `delayScanSteps(...) + 1` elements; a
+/// prefix sum over the first `steps` entries yields the counts. Accumulates
+/// into `diff` without clearing it, so callers can merge several calls.
+void accumulateDelayDifferences(std::span<const long long> channel1,
+                                std::span<const long long> channel2,
+                                long long coincWindowPs,
+                                long long delayStartPs, long long delayEndPs,
+                                long long delayStepPs,
+                                std::span<long long> diff);
+
+/// Histogram core of computeCoincidencesForRange: writes the coincidence count
+/// for delay `delayStartPs + i * delayStepPs` into `counts[i]`. `counts` must
+/// hold exactly `delayScanSteps(...)` elements.
+void computeCoincidenceCountsForRange(std::span<const long long> channel1,
+                                      std::span<const long long> channel2,
+                                      long long coincWindowPs,
+                                      long long delayStartPs,
+                                      long long delayEndPs,
+                                      long long delayStepPs,
+                                      std::span<long long> counts);
+
+/// Deprecated: identical to computeCoincidencesForRange, kept for existing
+/// callers.
+[[deprecated("use computeCoincidencesForRange")]]
 inline void computeCoincidencesForRangeHistogram(
     std::span<const long long> channel1, std::span<const long long> channel2,
     long long coincWindowPs, long long delayStartPs, long long delayEndPs,
@@ -35,15 +121,61 @@ inline void computeCoincidencesForRangeHistogram(
 }
 
 /// Counts N-fold coincidences in a zero-delay window. When `channels.size()==2`
-/// this simply calls `countCoincidencesWithDelay` with zero delay.
+/// this simply calls `countCoincidencesWithDelay` with zero delay. The sorted
+/// channels are merged on the fly (k-way heap), without copying them.
 int countNFoldCoincidences(const std::vector<std::span<const long long>> &channels,
                            long long coincWindowPs,
                            std::span<const long long> offsetsPs = {});
 
+/// countNFoldCoincidences for several channel subsets in one merged pass:
+/// `subsets[s]` lists indices into `channels` (at least two, no repeats) and
+/// `result[s]` equals countNFoldCoincidences over those channels (and their
+/// entries of `offsetsPs`). Each event is dispatched to the subsets that
+/// contain its channel, so the union is traversed once however many
+/// combinations are requested.
+std::vector<long long> countNFoldCoincidencesForSubsets(
+    const std::vector<std::span<const long long>> &channels,
+    const std::vector<std::vector<size_t>> &subsets, long long coincWindowPs,
+    std::span<const long long> offsetsPs = {});
+
+/// Largest channel count accepted by countCoincidencePatterns (2^16 masks).
+inline constexpr size_t kMaxPatternChannels = 16;
+
+/// Software counterpart of the TDC's coincidence counters. The merged stream
+/// (each channel shifted by its entry of `offsetsPs`) is cut into windows the
+/// way the hardware does: the first event opens a window of `coincWindowPs`
+/// and every event up to that time joins it; the next event after it opens
+/// the following window. Bit `i` of a window's pattern is set when
+/// `channels[i]` fired in it. Returns 2^n counts indexed by pattern: with
+/// `exact` the number of windows with exactly that pattern, otherwise (the
+/// counter semantics) the number of windows whose pattern contains it; index
+/// 0 then holds the total number of windows. Throws std::invalid_argument
+/// for more than kMaxPatternChannels channels or a mismatched `offsetsPs`.
+std::vector<long long> countCoincidencePatterns(
+    const std::vector<std::span<const long long>> &channels, long long coincWindowPs,
+    std::span<const long long> offsetsPs = {}, bool exact = false);
+
+/// Engine used for a delay scan.
+enum class DelayScanMethod {
+    Sweep, ///< Exact pair sweep (computeCoincidenceCountsForRange).
+    Fft,   ///< Binned FFT cross-correlation (see CrossCorrelation.h).
+    Auto,  ///< Whichever chooseDelayScanMethod estimates to be cheaper.
+    /// Coarse-to-fine search (findDelayPeak, DelaySearch.h); only meaningful
+    /// for findBestDelayPicoseconds, which then leaves `scratchResults` empty.
+    Hierarchical,
+};
+
 /// Finds the delay (picoseconds) within `[delayStartPs, delayEndPs]` that yields
 /// the maximum coincidence count between `reference` and `target`.
-/// Returns the best delay in picoseconds and writes the histogram into
-/// `scratchResults` when provided.
+/// Returns the best delay in picoseconds (the first one on a plateau of equal
+/// counts) and writes the histogram into `scratchResults` when provided.
+///
+/// The exact sweep is the default; the FFT engine (and Auto, which may pick
+/// it) is opt-in. With the FFT engine the peak is first located on a
+/// window-sized grid; when `refine` is set the exact sweep then re-scans ±2
+/// grid bins around it at full step resolution (and overwrites that part of
+/// `scratchResults`), so the result matches the sweep whenever the coarse
+/// peak is in the right place.
 long long findBestDelayPicoseconds(
     std::span<const long long> reference,
     std::span<const long long> target,
@@ -51,7 +183,8 @@ long long findBestDelayPicoseconds(
     long long delayStartPs,
     long long delayEndPs,
     long long delayStepPs,
-    std::vector<std::pair<float, int>> *scratchResults = nullptr);
+    std::vector<std::pair<float, int>> *scratchResults = nullptr,
+    DelayScanMethod method = DelayScanMethod::Sweep, bool refine = true);
 
 /// Writes coincidence scan results to `filename` as CSV.
 void writeResultsToFile(const std::vector<std::pair<float, int>> &results,
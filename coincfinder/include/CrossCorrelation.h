@@ -0,0 +1,65 @@
+#pragma once
+#include <cstddef>
+#include <span>
+#include <vector>
+
+#include "Coincidences.h"
+
+/// @file
+/// FFT delay-scan engine. Both channels are binned onto a common time grid and
+/// their cross-correlation is computed blockwise (overlap-save, one inverse
+/// FFT for the whole recording), so the cost grows with recording length and
+/// scan width in bins instead of with the number of event pairs in reach. The
+/// counts are estimates at grid resolution; findBestDelayPicoseconds refines
+/// the peak with the exact sweep. The work grows with the recording's span in
+/// bins, so the engine only wins on grids much coarser than the mean gap
+/// between events (wide scans of dense data); Testing/BenchDelayScan.cpp
+/// compares both engines.
+
+/// Binned cross-correlation: `out[k]` is the number of (channel1, channel2)
+/// pairs with `floor(t1 / binPs) - floor(t2 / binPs) == lagMinBins + k`, for
+/// `k` in `[0, out.size())`. Values are rounded FFT results.
+void crossCorrelateBinned(std::span<const long long> channel1,
+                          std::span<const long long> channel2, long long binPs,
+                          long long lagMinBins, std::span<double> out);
+
+/// Grid used by computeCoincidenceCountsFft when `binPs` is 0: the delay step,
+/// coarsened (in whole steps) until the scan fits a bounded FFT size.
+long long defaultCorrelationBinPs(long long coincWindowPs, long long delayStartPs,
+                                  long long delayEndPs, long long delayStepPs);
+
+/// FFT estimate of computeCoincidenceCountsForRange. Each correlation bin is
+/// spread over ±1 bin (triangular kernel, the distribution of the true delay
+/// given the binned one) before integrating it over every `[d - w, d + w]`
+/// window, so counts agree with the sweep up to grid effects. `counts` must
+/// hold `delayScanSteps(...)` elements; `binPs` 0 = defaultCorrelationBinPs.
+void computeCoincidenceCountsFft(std::span<const long long> channel1,
+                                 std::span<const long long> channel2,
+                                 long long coincWindowPs, long long delayStartPs,
+                                 long long delayEndPs, long long delayStepPs,
+                                 std::span<long long> counts, long long binPs = 0);
+
+/// Engine DelayScanMethod::Auto resolves to: compares the expected number of
+/// pairs the sweep visits with the FFT work for the same scan on a `binPs`
+/// grid (0 = defaultCorrelationBinPs).
+DelayScanMethod chooseDelayScanMethod(std::span<const long long> channel1,
+                                      std::span<const long long> channel2,
+                                      long long coincWindowPs,
+                                      long long delayStartPs, long long delayEndPs,
+                                      long long delayStepPs, long long binPs = 0);
+
+/// Grid findBestDelayPicoseconds locates the peak on with the FFT engine
+/// before re-scanning ±2 bins around it with the sweep.
+struct FftPeakSearchPlan {
+    /// Whole delay steps, at least one coincidence window; the grid with the
+    /// lowest estimated correlation plus re-scan cost.
+    long long binPs = 0;
+    /// Whether that search is estimated to be cheaper than the plain sweep
+    /// (what DelayScanMethod::Auto follows).
+    bool beatsSweep = false;
+};
+
+FftPeakSearchPlan planFftPeakSearch(std::span<const long long> channel1,
+                                    std::span<const long long> channel2,
+                                    long long coincWindowPs, long long delayStartPs,
+                                    long long delayEndPs, long long delayStepPs);
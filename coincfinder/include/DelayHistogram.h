@@ -0,0 +1,89 @@
+#pragma once
+#include <cstddef>
+#include <deque>
+#include <span>
+#include <vector>
+
+/// @file
+/// Stateful delay histogram for live cross-correlation displays. Chunks of
+/// both channels are folded into a difference array as they arrive, so an
+/// update costs O(new events) and a readout O(bins), instead of rescanning
+/// the whole accumulation window with computeCoincidencesForRange.
+
+class DelayHistogram {
+public:
+    /// Same binning as computeCoincidencesForRange: bin i is the delay
+    /// `delayStartPs + i * delayStepPs`; all arguments in picoseconds.
+    DelayHistogram(long long coincWindowPs, long long delayStartPs,
+                   long long delayEndPs, long long delayStepPs);
+
+    /// Keep every pair forever (default).
+    void setCumulative();
+    /// Weight pairs by exp(-age / timeConstant), age in data time.
+    void setExponentialDecay(double timeConstantSeconds);
+    /// Keep only pairs from chunks that ended within the last `seconds` of
+    /// data time.
+    void setSlidingWindow(double seconds);
+
+    /// Adds the next chunk of both (sorted) channels. Pairs between the new
+    /// events and the tail of earlier chunks are counted once, so a stream
+    /// split into chunks gives the same histogram as one full scan. A chunk
+    /// in which a channel starts well before its previous events (e.g.
+    /// per-batch timestamps that restart at zero) is treated as a new segment
+    /// without boundary pairs.
+    /// Each channel's tail is kept back to the newest event of the other
+    /// channel, so the channels need not be cut at the same time; while one
+    /// channel delivers nothing, the other's tail keeps growing.
+    void addChunk(std::span<const long long> channel1,
+                  std::span<const long long> channel2);
+
+    /// Current histogram, one value per delay bin (O(bins)).
+    std::vector<double> counts() const;
+    void counts(std::span<double> out) const;
+
+    /// Delay of every bin (picoseconds).
+    std::vector<long long> delaysPs() const;
+
+    std::size_t bins() const { return steps_; }
+    /// Data time covered so far (seconds), used for decay and the window.
+    double elapsedSeconds() const { return clockPs_ * 1e-12; }
+
+    /// Drops all accumulated pairs and tails; keeps binning and mode.
+    void reset();
+
+private:
+    enum class Mode { Cumulative, Exponential, Sliding };
+
+    struct ChunkContribution {
+        long long endClockPs;
+        std::vector<long long> diff;
+    };
+
+    void trimTails();
+
+    long long windowPs_;
+    long long startPs_;
+    long long endPs_;
+    long long stepPs_;
+    std::size_t steps_;
+    long long reachPs_;
+
+    Mode mode_ = Mode::Cumulative;
+    double timeConstantPs_ = 0.0;
+    long long slidingPs_ = 0;
+
+    std::vector<long long> diff_;          // cumulative / sliding totals
+    std::vector<double> decayedDiff_;      // exponential mode
+    std::deque<ChunkContribution> chunks_; // sliding mode
+
+    std::vector<long long> tail1_;
+    std::vector<long long> tail2_;
+    bool haveData_ = false;
+    long long latestPs_ = 0;  // newest event of either channel
+    long long latest1Ps_ = 0; // newest event per channel
+    long long latest2Ps_ = 0;
+    long long clockPs_ = 0;
+
+    std::vector<long long> scratch_;
+    std::vector<long long> chunkDiff_;
+};
@@ -0,0 +1,68 @@
+#pragma once
+#include <cstddef>
+#include <fstream>
+#include <functional>
+#include <span>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "Singles.h"
+
+/// @file
+/// Per-second delay scans of many pairs as one (pair x second x delay) cube.
+/// Jobs (one pair, one second) run in parallel over a bounded block of
+/// seconds, and finished rows are handed to a sink in order, so a run of
+/// hours is written as a single NPY file without holding it in memory.
+
+/// Channels of one scanned pair; a null channel gives rows of zeros.
+struct SecondScanPair {
+    const Singles *reference = nullptr;
+    const Singles *target = nullptr;
+};
+
+/// Receives the counts of `pairs[pair]` at `second`, one call at a time.
+using SecondScanSink =
+    std::function<void(std::size_t pair, long long second, std::span<const long long> counts)>;
+
+/// Runs computeCoincidenceCountsForRange for every pair and every second in
+/// `[firstSecond, lastSecond]`, with the first event of the next second
+/// appended to the target bucket as the CLI does. Seconds are processed in
+/// blocks of `blockSeconds` (pairs x block jobs spread over `threads` OpenMP
+/// threads, 0 = default); at most pairs x blockSeconds rows are held at once.
+void scanDelaysPerSecond(std::span<const SecondScanPair> pairs, long long firstSecond,
+                         long long lastSecond, long long coincWindowPs,
+                         long long delayStartPs, long long delayEndPs,
+                         long long delayStepPs, const SecondScanSink &sink,
+                         std::size_t blockSeconds = 64, int threads = 0);
+
+/// Writes a C-ordered little-endian int32 NPY array of shape
+/// (pairs, seconds, delays). The file is sized up front and rows can be
+/// written in any order; rows never written read as zero.
+class NpyCubeWriter {
+public:
+    /// Throws std::runtime_error if the file cannot be created.
+    NpyCubeWriter(const std::string &path, std::size_t pairs, std::size_t seconds,
+                  std::size_t delays);
+
+    /// Stores one row; counts above the int32 range are clamped.
+    void writeRow(std::size_t pair, std::size_t second, std::span<const long long> counts);
+
+    /// Flushes and closes the file (also done by the destructor).
+    void close();
+
+private:
+    std::ofstream out_;
+    std::size_t seconds_;
+    std::size_t delays_;
+    std::size_t dataOffset_ = 0;
+    std::vector<int> row_;
+};
+
+/// Writes the axes of a cube as a small JSON file (pairs, first second,
+/// delay grid and window), the companion of an NPY written by NpyCubeWriter.
+void writeDelayScanAxes(const std::string &path,
+                        const std::vector<std::pair<int, int>> &pairs,
+                        long long firstSecond, std::size_t seconds,
+                        long long coincWindowPs, long long delayStartPs,
+                        long long delayStepPs, std::size_t delays);
@@ -0,0 +1,53 @@
+#pragma once
+#include <cstddef>
+#include <span>
+
+#include "Coincidences.h"
+
+/// @file
+/// Coarse-to-fine delay search. The first level scans the whole range with a
+/// coarse step and a window widened by half that step (so no peak falls
+/// between grid points); each further level re-scans only around the best
+/// few peaks of the previous one with a finer step, down to the requested
+/// step and window. Memory and the per-level histograms stay small, so a
+/// full-range calibration is cheap enough to repeat continuously.
+
+/// Result of findDelayPeak.
+struct DelayPeak {
+    /// Best delay on the `delayStartPs + i * delayStepPs` grid (picoseconds).
+    long long delayPs = 0;
+    /// Sub-step estimate: centre of a flat top, otherwise a Gaussian (or,
+    /// for non-positive counts above background, parabolic) fit through the
+    /// peak and its two neighbours.
+    double refinedDelayPs = 0.0;
+    /// Coincidences at `delayPs` with the requested window (exact).
+    long long count = 0;
+    /// Accidental level per window: median of the first-level scan, scaled
+    /// from the widened window to the requested one.
+    double background = 0.0;
+    /// (count - background) / sqrt(background), background floored at 1.
+    double snr = 0.0;
+};
+
+/// Tuning of findDelayPeak; the defaults suit ns-scale calibration scans.
+struct DelaySearchOptions {
+    /// Step ratio between consecutive levels (>= 2).
+    long long refineFactor = 8;
+    /// The first level uses the finest step that keeps at most this many
+    /// delays; ranges that already fit are scanned in a single level.
+    std::size_t maxCoarsePoints = 512;
+    /// Peaks (at least one step of the level apart) refined at every level.
+    std::size_t topK = 3;
+    /// Engine for the first level; later levels always use the sweep.
+    DelayScanMethod coarseMethod = DelayScanMethod::Auto;
+};
+
+/// Searches `[delayStartPs, delayEndPs]` for the delay with the most
+/// coincidences between `reference` and `target` (same conventions as
+/// findBestDelayPicoseconds). Throws std::invalid_argument for a
+/// non-positive step, a refine factor below 2 or `topK == 0`.
+DelayPeak findDelayPeak(std::span<const long long> reference,
+                        std::span<const long long> target,
+                        long long coincWindowPs, long long delayStartPs,
+                        long long delayEndPs, long long delayStepPs,
+                        const DelaySearchOptions &options = {});
@@ -0,0 +1,41 @@
+#pragma once
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <map>
+#include <span>
+#include <vector>
+
+#include "Singles.h"
+
+/// @file
+/// Channel demultiplexing of interleaved timestamp buffers such as the
+/// (timestamps, channels) pair filled by TDC_getLastTimestamps. Splitting is a
+/// two-pass counting sort: count events per channel code, then scatter every
+/// timestamp straight into its final, exactly sized per-channel array.
+
+/// Number of distinct raw channel codes (one byte per event).
+constexpr int kDemuxChannelCodes = 256;
+
+/// Event count per raw channel code (code c is detector channel c + 1).
+using DemuxCounts = std::array<std::size_t, kDemuxChannelCodes>;
+
+/// First pass: counts the events carrying each raw channel code.
+DemuxCounts countChannelCodes(std::span<const std::uint8_t> channels);
+
+/// Second pass: copies every timestamp into `outputs[code]`, which must point to
+/// at least `counts[code]` elements (null entries are skipped). `delaysPs` is
+/// indexed by raw channel code and added to each timestamp of that code;
+/// codes beyond its size get no offset. Relative order within a channel is
+/// preserved, so sorted input yields sorted per-channel output.
+void scatterByChannel(std::span<const long long> timestamps,
+                      std::span<const std::uint8_t> channels,
+                      std::span<const long long> delaysPs,
+                      const std::array<long long *, kDemuxChannelCodes> &outputs);
+
+/// Runs both passes into owning vectors keyed by 1-based detector channel
+/// (raw code + 1, as in readBINtoSingles). Only channels with events appear.
+std::map<int, std::vector<Timestamp>>
+demultiplexTimestamps(std::span<const long long> timestamps,
+                      std::span<const std::uint8_t> channels,
+                      std::span<const long long> delaysPs = {});
@@ -0,0 +1,90 @@
+#pragma once
+#include <cstddef>
+#include <span>
+#include <vector>
+
+/// @file
+/// Follows slow drifts of a calibrated pair delay (fibre temperature, clock
+/// wander) from live chunks. Only a narrow histogram around the current delay
+/// is kept, so an update costs the pairs within `halfSpanPs` of it instead of
+/// a full-range findBestDelayPicoseconds scan.
+
+/// Outcome of one DelayDriftTracker::addChunk call.
+struct DriftUpdate {
+    /// Tracked delay after this chunk (picoseconds).
+    double delayPs = 0.0;
+    /// Change applied by this chunk (0 when not updated).
+    double shiftPs = 0.0;
+    /// Centroid of the peak above background, relative to the histogram
+    /// centre, and its statistical standard error.
+    double centroidPs = 0.0;
+    double uncertaintyPs = 0.0;
+    /// Signal over the peak region and the background level per bin.
+    double signal = 0.0;
+    double background = 0.0;
+    /// SNR / (SNR + 5): 0.5 at SNR 5, approaching 1 for clear peaks.
+    double confidence = 0.0;
+    /// Whether the delay moved (confidence reached the threshold).
+    bool updated = false;
+};
+
+class DelayDriftTracker {
+public:
+    /// Tracks the peak of `t1 - t2` (the delay convention of the scans)
+    /// starting at `initialDelayPs`. The local histogram spans
+    /// ±`halfSpanPs` in `stepPs` bins; its outer half is used as the
+    /// background, so `halfSpanPs` should be at least twice the window plus
+    /// the drift expected between updates. Throws std::invalid_argument for
+    /// a non-positive step or a half span not larger than the window.
+    DelayDriftTracker(long long coincWindowPs, double initialDelayPs,
+                      long long halfSpanPs, long long stepPs);
+
+    /// Time constant (data seconds) with which old counts fade (default 5).
+    void setMemorySeconds(double seconds);
+    /// Fraction of the measured offset applied per update (default 0.5).
+    void setGain(double gain);
+    /// Minimum confidence for an update to move the delay (default 0.5).
+    void setMinConfidence(double confidence);
+
+    /// Folds one chunk of both (sorted) channels into the local histogram
+    /// and re-estimates the delay. Pairs across chunk edges are ignored.
+    DriftUpdate addChunk(std::span<const long long> channel1,
+                         std::span<const long long> channel2);
+
+    double delayPs() const { return delayPs_; }
+    /// Delay of the histogram centre (the delay rounded to the step grid the
+    /// histogram was last re-centred on).
+    long long centerPs() const { return centerPs_; }
+    const DriftUpdate &lastUpdate() const { return last_; }
+
+    /// Decayed counts per bin and their offsets from centerPs().
+    const std::vector<double> &histogram() const { return histogram_; }
+    std::vector<long long> offsetsPs() const;
+
+    /// Drops the histogram and restarts from `delayPs`.
+    void reset(double delayPs);
+
+    long long coincWindowPs() const { return windowPs_; }
+    long long halfSpanPs() const { return halfSpanPs_; }
+    long long stepPs() const { return stepPs_; }
+
+private:
+    void recenter(double fill);
+
+    long long windowPs_;
+    long long halfSpanPs_;
+    long long stepPs_;
+    std::size_t halfBins_;
+
+    double memoryPs_ = 5e12;
+    double gain_ = 0.5;
+    double minConfidence_ = 0.5;
+
+    double delayPs_;
+    long long centerPs_ = 0;
+    std::vector<double> histogram_;
+    std::vector<long long> chunkCounts_;
+    bool haveData_ = false;
+    long long latestPs_ = 0;
+    DriftUpdate last_;
+};
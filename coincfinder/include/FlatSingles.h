@@ -0,0 +1,68 @@
+#pragma once
+#include <cstddef>
+#include <map>
+#include <span>
+#include <vector>
+
+#include "Singles.h"
+
+/// @file
+/// Columnar alternative to `Singles`: one contiguous timestamp array per
+/// channel plus bucket offsets. Lookups are O(1) spans into that array, long
+/// runs need two allocations instead of one per second, and changing the
+/// bucket duration only recomputes the offsets.
+
+/// Per-channel singles stored as a single sorted array.
+struct FlatSingles {
+    /// Detector channel identifier (1-based).
+    int channel = 0;
+    /// Absolute bucket index of the first bucket.
+    long long baseSecond = 0;
+    /// Bucket width the offsets were computed for (picoseconds).
+    long long bucketWidthPs = 0;
+    /// All timestamps, bucket after bucket; ascending overall.
+    std::vector<Timestamp> timestamps;
+    /// Bucket i spans timestamps[offsets[i], offsets[i + 1]); size is
+    /// bucketCount() + 1 (empty when there are no buckets).
+    std::vector<std::size_t> offsets;
+};
+
+/// Number of buckets described by `offsets`.
+inline std::size_t bucketCount(const FlatSingles &singles) {
+    return singles.offsets.empty() ? 0 : singles.offsets.size() - 1;
+}
+
+/// Returns the events of `second`, or an empty span when out of range.
+inline std::span<const Timestamp> eventsForSecond(const FlatSingles &singles,
+                                                  long long second) {
+    if (second < singles.baseSecond)
+        return {};
+    const auto idx = static_cast<std::size_t>(second - singles.baseSecond);
+    if (idx >= bucketCount(singles))
+        return {};
+    return std::span<const Timestamp>(singles.timestamps)
+        .subspan(singles.offsets[idx], singles.offsets[idx + 1] - singles.offsets[idx]);
+}
+
+/// Events of `second` followed by the first event of `second + 1` (if any),
+/// i.e. what appendNextFirstEvent builds, but as a view because adjacent
+/// buckets are adjacent in memory.
+std::span<const Timestamp> eventsForSecondWithNext(const FlatSingles &singles,
+                                                   long long second);
+
+/// Concatenates the buckets of `singles`. `bucketWidthPs` records the width
+/// the buckets were built with (0 = current bucketDurationSeconds()).
+FlatSingles flattenSingles(const Singles &singles, long long bucketWidthPs = 0);
+
+/// Flattens every channel of a reader result, releasing each nested bucket
+/// as soon as it has been copied.
+std::map<int, FlatSingles> flattenSinglesMap(std::map<int, Singles> &&channels,
+                                             long long bucketWidthPs = 0);
+
+/// Rebuilds nested buckets (e.g. for RollingSingles::appendChunk).
+Singles expandSingles(const FlatSingles &singles);
+
+/// Recomputes the offsets for a new bucket width without touching the
+/// timestamps (O(buckets log n)). Timestamps are relative to the recording
+/// start, as produced by the readers, so bucket = timestamp / width.
+void rebucket(FlatSingles &singles, long long bucketWidthPs);
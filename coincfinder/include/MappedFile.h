@@ -0,0 +1,40 @@
+#pragma once
+#include <cstddef>
+#include <string>
+
+/// @file
+/// Read-only memory mapping of a whole file (POSIX mmap / Win32 file mapping).
+/// Pages are loaded on demand by the OS, so files larger than RAM can be
+/// scanned without reading them into heap buffers first.
+
+class MappedFile {
+public:
+    /// Maps `path` read-only. Throws std::runtime_error when the file cannot be
+    /// opened or mapped. Empty files map to a null, zero-length view.
+    explicit MappedFile(const std::string &path);
+    ~MappedFile();
+
+    MappedFile(const MappedFile &) = delete;
+    MappedFile &operator=(const MappedFile &) = delete;
+    MappedFile(MappedFile &&other) noexcept;
+    MappedFile &operator=(MappedFile &&other) noexcept;
+
+    const unsigned char *data() const { return data_; }
+    std::size_t size() const { return size_; }
+    const std::string &path() const { return path_; }
+
+    /// Hints that the mapping will be read front to back (no-op where the
+    /// platform has no equivalent).
+    void adviseSequential() const;
+
+private:
+    void release() noexcept;
+
+    std::string path_;
+    const unsigned char *data_ = nullptr;
+    std::size_t size_ = 0;
+#if defined(_WIN32)
+    void *fileHandle_ = nullptr;
+    void *mappingHandle_ = nullptr;
+#endif
+};
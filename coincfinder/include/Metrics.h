@@ -0,0 +1,40 @@
+#pragma once
+#include <array>
+#include <cstddef>
+#include <span>
+#include <utility>
+
+/// @file
+/// Entanglement figures of merit from the eight default pairs of the CLI
+/// (channels 1-4 = H, V, D, A on one side, 5-8 the same on the other). Every
+/// function takes many rows at once (one row of eight counts per second) so
+/// overnight runs are evaluated in a single call. Counts are net of their
+/// background; uncertainties are propagated from the per-pair variances
+/// (Poisson on the raw count plus the background's variance).
+
+/// Column of each default pair in a metrics row.
+enum DefaultPair : std::size_t { HH, VV, DD, AA, HV, VH, DA, AD, kDefaultPairCount };
+
+/// Channels of each column, in DefaultPair order.
+inline constexpr std::array<std::pair<int, int>, kDefaultPairCount> kDefaultPairs = {{
+    {1, 5}, {2, 6}, {3, 7}, {4, 8}, {1, 6}, {2, 5}, {3, 8}, {4, 7}}};
+
+enum class PairMetric {
+    QberHV,       ///< (HV + VH) / (HH + VV + HV + VH).
+    QberDA,       ///< (DA + AD) / (DD + AA + DA + AD).
+    Qber,         ///< Wrong-outcome fraction over both bases.
+    VisibilityHV, ///< (HH + VV - HV - VH) / (HH + VV + HV + VH).
+    VisibilityDA, ///< (DD + AA - DA - AD) / (DD + AA + DA + AD).
+};
+
+struct MetricEstimate {
+    double value = 0.0;
+    double sigma = 0.0;
+};
+
+/// Evaluates `metric` for every row. `net` and `variance` hold rows of
+/// kDefaultPairCount values (row-major, same size); `out` gets one estimate
+/// per row, NaN for rows without counts in the bases involved. Throws
+/// std::invalid_argument on mismatched sizes.
+void computePairMetric(PairMetric metric, std::span<const double> net,
+                       std::span<const double> variance, std::span<MetricEstimate> out);
@@ -0,0 +1,75 @@
+#pragma once
+#include <array>
+#include <cstdint>
+#include <vector>
+
+/// @file
+/// Synthetic detections of a polarisation-entangled (Phi+) pair source on the
+/// eight-channel layout of Metrics.h: channels 1-4 = H, V, D, A on side A and
+/// 5-8 the same on side B, each side choosing its basis with a passive 50/50
+/// splitter. Used to benchmark and validate the coincidence engines at
+/// realistic rates. Emission times come from exponential inter-arrival gaps,
+/// so every channel is produced in time order without sorting: jitter only
+/// swaps near neighbours (an insertion step repairs that) and the
+/// uncorrelated background is one more Poisson process in the same loop.
+
+inline constexpr int kPairSourceChannels = 8;
+
+struct PairSourceConfig {
+    /// Pairs per second reaching the two analysers.
+    double pairRate = 1e6;
+    /// Probability that the side-A / side-B photon of a pair is detected
+    /// (heralding efficiency: coupling, optics and detector).
+    double efficiencyA = 0.25;
+    double efficiencyB = 0.25;
+    /// Same-basis visibility: the outcomes agree with probability (1 + V) / 2.
+    double visibility = 0.97;
+    /// Uncorrelated counts per second on every channel (dark counts, stray
+    /// light); their coincidences are the accidentals.
+    double accidentalRate = 1'000.0;
+    /// Delay added to every detection on channel c + 1 (picoseconds).
+    std::array<long long, kPairSourceChannels> delaysPs{};
+    /// RMS Gaussian timing jitter of channel c + 1 (picoseconds), clipped at
+    /// five sigma.
+    std::array<double, kPairSourceChannels> jitterPs{50.0, 50.0, 50.0, 50.0,
+                                                     50.0, 50.0, 50.0, 50.0};
+    std::uint64_t seed = 1;
+};
+
+class PairSource {
+public:
+    /// Throws std::invalid_argument for negative rates or jitter, or an
+    /// efficiency or visibility outside [0, 1].
+    explicit PairSource(const PairSourceConfig &config);
+
+    /// Runs the source for another `durationPs` and replaces the contents of
+    /// `channels` (resized to kPairSourceChannels, index c = channel c + 1,
+    /// capacity reused) with the detections that became final, each channel
+    /// sorted. Consecutive calls continue the same streams: detections that
+    /// jitter could still reorder with later ones are held back until the
+    /// next call.
+    void generate(long long durationPs, std::vector<std::vector<long long>> &channels);
+
+    /// Emission time reached so far (picoseconds since the source started).
+    long long nowPs() const { return nowPs_; }
+    std::uint64_t pairsEmitted() const { return pairsEmitted_; }
+    const PairSourceConfig &config() const { return config_; }
+
+private:
+    PairSourceConfig config_;
+    std::array<std::uint64_t, 4> state_{};
+
+    // Probabilities as thresholds on bit fields of the per-pair draw.
+    std::uint64_t thresholdA_ = 0;
+    std::uint64_t thresholdB_ = 0;
+    std::uint64_t thresholdAgree_ = 0; // (1 + V) / 2
+    std::array<long long, kPairSourceChannels> clipPs_{};
+
+    long long nowPs_ = 0;
+    long long nextEmissionPs_ = 0;
+    std::uint64_t pairsEmitted_ = 0;
+    // Per channel: detections held back for the next call.
+    std::array<std::vector<long long>, kPairSourceChannels> pending_;
+    // Emission time of the next background count (all channels).
+    double nextAccidentalPs_ = 0.0;
+};
@@ -7,6 +7,7 @@
 #include <algorithm>
 #include <stdexcept>
 #include <climits>
+#include <memory>
 
 #include "Singles.h"
 
@@ -19,11 +20,29 @@
 void setBucketDurationSeconds(double seconds);
 double bucketDurationSeconds();
 
+/// How the whole-file readers keep buckets sorted.
+enum class IngestMode {
+  /// Insert each out-of-order event at its sorted position (upper_bound +
+  /// insert); quadratic per bucket when events arrive heavily interleaved.
+  SortedInsert,
+  /// Append in-order events directly; park out-of-order ones in a per-bucket
+  /// side list that is sorted and merged in once the file is read. Produces
+  /// identical buckets in O(n + k log k) for k out-of-order events.
+  AppendThenSort,
+};
+
+/// Select the ingest mode used by readCSVtoSingles/readBINtoSingles
+/// (default AppendThenSort).
+void setIngestMode(IngestMode mode);
+IngestMode ingestMode();
+
 /// Dispatches to the appropriate reader based on filename suffix.
 /// @param filename Path to CSV or BIN file.
 /// @param duration_sec Populated with measurement duration in seconds.
+/// @param threads CSV parser threads (see readCSVtoSingles); ignored for BIN.
 std::map<int, Singles> readFileAuto(const std::string &filename, double &duration_sec,
-                                    double exposure_seconds = -1.0);
+                                    double exposure_seconds = -1.0,
+                                    unsigned threads = 1);
 
 /// Returns true if `str` ends with the requested suffix.
 bool hasEnding(const std::string& str, const std::string& ending);
@@ -31,7 +50,50 @@ bool hasEnding(const std::string& str, const std::string& ending);
 /// Parses a CSV file into per-channel singles (1-second buckets).
 /// @param filename Path to CSV file (timestamp,channel,...).
 /// @param duration Filled with measurement duration (seconds).
-std::map<int, Singles> readCSVtoSingles(const std::string &filename, double &duration);
+/// @param threads 1 parses line by line on the calling thread; any other value
+///        maps the file, parses newline-aligned byte ranges on that many
+///        threads (0 = hardware concurrency) and k-way merges the per-range
+///        channel arrays. Both modes produce identical buckets.
+std::map<int, Singles> readCSVtoSingles(const std::string &filename, double &duration,
+                                        unsigned threads = 1);
 
 /// Parses a Qutools BIN file into per-channel singles.
 std::map<int, Singles> readBINtoSingles(const std::string &filename, double &duration);
+
+/// Incremental reader that walks a CSV or BIN file once and returns it as
+/// consecutive chunks of buckets, so memory stays bounded by the chunk size
+/// instead of the file size. Bucket indices and timestamps are relative to the
+/// first event, exactly as in readFileAuto, so feeding every chunk to
+/// RollingSingles::appendChunk rebuilds the same timeline.
+///
+/// One chunk of lookahead is kept: a chunk is returned once an event two
+/// chunks later is read. Events that arrive after their chunk was returned
+/// are dropped and counted in lateEvents().
+class SinglesFileStream {
+public:
+  /// @param chunkSeconds Span of each returned chunk; rounded to a whole
+  ///        number (at least one) of buckets of bucketDurationSeconds().
+  explicit SinglesFileStream(const std::string &filename,
+                             double chunkSeconds = 1.0);
+  ~SinglesFileStream();
+
+  SinglesFileStream(const SinglesFileStream &) = delete;
+  SinglesFileStream &operator=(const SinglesFileStream &) = delete;
+
+  /// Fills `chunk` with the next non-empty chunk; returns false at the end.
+  bool next(std::map<int, Singles> &chunk);
+
+  /// Per channel, the first event of the bucket following the last returned
+  /// chunk (the value appendNextFirstEvent would append), when already read.
+  const std::map<int, Timestamp> &nextFirstEvents() const;
+
+  /// Events dropped because their chunk had already been returned.
+  std::size_t lateEvents() const;
+
+  /// Measurement duration covered by the events read so far.
+  double durationSeconds() const;
+
+private:
+  struct Impl;
+  std::unique_ptr<Impl> impl_;
+};
@@ -1,8 +1,11 @@
 #pragma once
 
 #include <map>
+#include <memory>
+#include <utility>
 #include <vector>
 
+#include "DriftTracker.h"
 #include "Singles.h"
 
 /// Maintains per-channel Singles buckets for the last N seconds.
@@ -30,8 +33,24 @@ public:
 
   const std::map<int, Singles> &allChannels() const { return channels_; }
 
+  /// Feed every appended chunk of (channelA, channelB) to `tracker`, which
+  /// replaces any tracker already registered for that pair. The returned
+  /// handle stays valid after untrackPair; the tracker then stops updating.
+  std::shared_ptr<DelayDriftTracker> trackPair(int channelA, int channelB,
+                                               DelayDriftTracker tracker);
+  void untrackPair(int channelA, int channelB);
+  /// Tracker of a pair, or nullptr when the pair is not tracked.
+  DelayDriftTracker *driftTracker(int channelA, int channelB);
+  const std::map<std::pair<int, int>, std::shared_ptr<DelayDriftTracker>> &
+  driftTrackers() const {
+    return trackers_;
+  }
+
 private:
+  void updateTrackers(const std::map<int, Singles> &chunk);
+
   std::map<int, Singles> channels_;
+  std::map<std::pair<int, int>, std::shared_ptr<DelayDriftTracker>> trackers_;
   std::map<int, std::vector<std::vector<Timestamp>>> latestChunks_;
   long long windowSeconds_;
   long long latestSecond_;
@@ -0,0 +1,147 @@
+#pragma once
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <utility>
+#include <vector>
+
+/// @file
+/// Lock-free single-producer/single-consumer ring of preallocated slots, used
+/// to hand batches from an acquisition or reader thread to an analysis
+/// thread without a mutex on the data path. The producer fills a slot in
+/// place and publishes it; the consumer swaps a published slot with its own
+/// object, so slot storage (vectors, maps) is recycled instead of freed.
+
+/// Ring of `capacity` slots of T. Exactly one thread may call the producer
+/// functions and exactly one (possibly different) thread the consumer ones.
+template <typename T>
+class SpscRing {
+public:
+    explicit SpscRing(std::size_t capacity) : slots_(capacity > 0 ? capacity : 1) {}
+
+    SpscRing(const SpscRing &) = delete;
+    SpscRing &operator=(const SpscRing &) = delete;
+
+    std::size_t capacity() const { return slots_.size(); }
+
+    /// Published slots not yet consumed.
+    std::size_t size() const {
+        return static_cast<std::size_t>(head_.load(std::memory_order_acquire) -
+                                        tail_.load(std::memory_order_acquire));
+    }
+
+    bool full() const { return size() == capacity(); }
+
+    // --- Producer ------------------------------------------------------------
+
+    /// Slot to fill next, or nullptr when every slot is still unconsumed; a
+    /// full ring counts as one overrun (the caller drops its batch).
+    T *tryAcquire() {
+        const std::uint64_t head = head_.load(std::memory_order_relaxed);
+        if (head - tail_.load(std::memory_order_acquire) == slots_.size()) {
+            overruns_.fetch_add(1, std::memory_order_relaxed);
+            return nullptr;
+        }
+        return &slots_[head % slots_.size()];
+    }
+
+    /// Makes the slot returned by tryAcquire visible to the consumer.
+    void publish() {
+        head_.fetch_add(1, std::memory_order_release);
+        signal();
+    }
+
+    /// Blocks until a slot is free; false once the ring is closed.
+    bool waitForSpace() const {
+        for (;;) {
+            const std::uint32_t seen = signal_.load(std::memory_order_acquire);
+            if (closed())
+                return false;
+            if (!full())
+                return true;
+            signal_.wait(seen, std::memory_order_acquire);
+        }
+    }
+
+    // --- Consumer ------------------------------------------------------------
+
+    /// Swaps the oldest published slot into `out`; false when empty.
+    bool tryPop(T &out) {
+        const std::uint64_t tail = tail_.load(std::memory_order_relaxed);
+        if (head_.load(std::memory_order_acquire) == tail)
+            return false;
+        std::swap(out, slots_[tail % slots_.size()]);
+        release(tail + 1);
+        return true;
+    }
+
+    /// Swaps the newest published slot into `out` and discards the older
+    /// ones (counted in skipped()); false when nothing new was published.
+    bool takeLatest(T &out) {
+        const std::uint64_t tail = tail_.load(std::memory_order_relaxed);
+        const std::uint64_t head = head_.load(std::memory_order_acquire);
+        if (head == tail)
+            return false;
+        std::swap(out, slots_[(head - 1) % slots_.size()]);
+        skipped_.fetch_add(head - tail - 1, std::memory_order_relaxed);
+        release(head);
+        return true;
+    }
+
+    /// Blocks until a slot is published; false once the ring is closed and
+    /// drained.
+    bool waitForData() const {
+        for (;;) {
+            const std::uint32_t seen = signal_.load(std::memory_order_acquire);
+            if (size() > 0)
+                return true;
+            if (closed())
+                return false;
+            signal_.wait(seen, std::memory_order_acquire);
+        }
+    }
+
+    // --- Either side ---------------------------------------------------------
+
+    /// Ends the exchange (end of data, or the consumer went away) and wakes
+    /// a blocked waitForSpace / waitForData. Published slots stay readable.
+    void close() {
+        closed_.store(true, std::memory_order_release);
+        signal();
+    }
+
+    bool closed() const { return closed_.load(std::memory_order_acquire); }
+
+    // --- Counters (any thread) -----------------------------------------------
+
+    /// Slots published since construction.
+    std::uint64_t published() const { return head_.load(std::memory_order_acquire); }
+
+    /// Batches the producer dropped because the ring was full.
+    std::uint64_t overruns() const { return overruns_.load(std::memory_order_relaxed); }
+
+    /// Published slots takeLatest discarded in favour of a newer one.
+    std::uint64_t skipped() const { return skipped_.load(std::memory_order_relaxed); }
+
+private:
+    void release(std::uint64_t tail) {
+        tail_.store(tail, std::memory_order_release);
+        signal();
+    }
+
+    // Event count for the blocking waits: bumped after every state change, so
+    // a waiter that saw the old value cannot miss the change it waits for.
+    void signal() {
+        signal_.fetch_add(1, std::memory_order_release);
+        signal_.notify_all();
+    }
+
+    std::vector<T> slots_;
+    // Monotonic positions on separate cache lines: slot = position % capacity.
+    alignas(64) std::atomic<std::uint64_t> head_{0};
+    alignas(64) std::atomic<std::uint64_t> tail_{0};
+    alignas(64) std::atomic<std::uint64_t> overruns_{0};
+    std::atomic<std::uint64_t> skipped_{0};
+    std::atomic<std::uint32_t> signal_{0};
+    std::atomic<bool> closed_{false};
+};
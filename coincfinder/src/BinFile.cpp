@@ -0,0 +1,95 @@
+#include "BinFile.h"
+
+// Sparse time index over a mapped BIN recording. Each block of `indexStride`
+// records contributes its min and max timestamp; the prefix max / suffix min
+// of those bound where a time range can start and end, and only the two edge
+// blocks are scanned record by record.
+
+#include <algorithm>
+#include <limits>
+#include <stdexcept>
+
+namespace {
+
+// quTAG channel codes are a single byte on the device side; anything larger in
+// the first record means the file is compressed, headerless or not a BIN file.
+constexpr std::uint16_t kMaxRawChannelCode = 255;
+
+} // namespace
+
+BinFile::BinFile(const std::string &path, std::size_t indexStride)
+    : file_(path), indexStride_(std::max<std::size_t>(indexStride, 1)) {
+    if (file_.size() < kBinHeaderBytes)
+        throw std::runtime_error("BIN file shorter than its 40-byte header: " + path);
+    const std::size_t payload = file_.size() - kBinHeaderBytes;
+    recordCount_ = payload / kBinRecordBytes;
+    trailingBytes_ = payload % kBinRecordBytes;
+    if (recordCount_ > 0 && channelCode(0) > kMaxRawChannelCode)
+        throw std::runtime_error(
+            "Not an uncompressed BIN file (channel code " +
+            std::to_string(channelCode(0)) + " in first record): " + path);
+}
+
+void BinFile::ensureIndex() const {
+    std::call_once(indexOnce_, [this] {
+        const std::size_t blocks = (recordCount_ + indexStride_ - 1) / indexStride_;
+        std::vector<Timestamp> blockMin(blocks, std::numeric_limits<Timestamp>::max());
+        std::vector<Timestamp> blockMax(blocks, std::numeric_limits<Timestamp>::min());
+        file_.adviseSequential();
+        for (std::size_t b = 0; b < blocks; ++b) {
+            const std::size_t begin = b * indexStride_;
+            const std::size_t end = std::min(begin + indexStride_, recordCount_);
+            for (std::size_t i = begin; i < end; ++i) {
+                const Timestamp ts = timestamp(i);
+                if (ts == 0)
+                    continue; // empty slots carry no time information
+                blockMin[b] = std::min(blockMin[b], ts);
+                blockMax[b] = std::max(blockMax[b], ts);
+            }
+        }
+
+        prefixMax_.resize(blocks);
+        suffixMin_.resize(blocks);
+        Timestamp running = std::numeric_limits<Timestamp>::min();
+        for (std::size_t b = 0; b < blocks; ++b)
+            prefixMax_[b] = running = std::max(running, blockMax[b]);
+        running = std::numeric_limits<Timestamp>::max();
+        for (std::size_t b = blocks; b-- > 0;)
+            suffixMin_[b] = running = std::min(running, blockMin[b]);
+    });
+}
+
+std::pair<std::size_t, std::size_t> BinFile::recordRange(Timestamp startPs,
+                                                         Timestamp endPs) const {
+    ensureIndex();
+    if (startPs >= endPs || recordCount_ == 0)
+        return {recordCount_, recordCount_};
+
+    // First block that contains (or follows) a timestamp >= startPs.
+    const auto firstBlock = static_cast<std::size_t>(
+        std::lower_bound(prefixMax_.begin(), prefixMax_.end(), startPs) - prefixMax_.begin());
+    // One past the last block that still holds a timestamp < endPs.
+    const auto stopBlock = static_cast<std::size_t>(
+        std::lower_bound(suffixMin_.begin(), suffixMin_.end(), endPs) - suffixMin_.begin());
+    if (firstBlock >= stopBlock)
+        return {recordCount_, recordCount_};
+
+    auto inRange = [&](std::size_t i) {
+        const Timestamp ts = timestamp(i);
+        return ts != 0 && ts >= startPs && ts < endPs;
+    };
+
+    std::size_t first = firstBlock * indexStride_;
+    const std::size_t firstEnd = std::min(first + indexStride_, recordCount_);
+    while (first < firstEnd && !inRange(first))
+        ++first;
+
+    std::size_t stop = std::min(stopBlock * indexStride_, recordCount_);
+    const std::size_t stopBegin = (stopBlock - 1) * indexStride_;
+    while (stop > stopBegin && !inRange(stop - 1))
+        --stop;
+
+    if (first >= stop)
+        return {recordCount_, recordCount_};
+    return {first, stop};
+}
@@ -1,5 +1,7 @@
 // CoincFinder CLI driver. Reads singles from CSV/BIN, scans a delay range for
-// each detector pair, and writes per-second coincidence sweeps to disk.
+// each detector pair, and writes per-second coincidence sweeps to disk: one
+// CSV per pair and second, or with --npy a single (pair x second x delay)
+// int32 cube plus a JSON file describing its axes.
 
 #include <atomic>
 #include <cmath>
@@ -9,17 +11,19 @@
 #include <span>
 
 #include "Coincidences.h"
+#include "DelayScanCube.h"
 #include "ReadCSV.h"
 #include "Singles.h"
 
 int main(int argc, char *argv[]) {
-  if (argc < 8) {
+  if (argc != 8 && !(argc == 10 && std::string(argv[8]) == "--npy")) {
     std::cerr
         << "Usage: " << argv[0]
         << " <csv_file> <coinc_window(ps)> <delay_start(ns)> <delay_end(ns)> "
-           "<delay_step(ns)> <startSec> <stopSec>\n";
+           "<delay_step(ns)> <startSec> <stopSec> [--npy <out.npy>]\n";
     return 1;
   }
+  const std::string npyPath = argc == 10 ? argv[9] : "";
 
   std::string csvFilename = argv[1];
   long long coincWindow = std::atoll(argv[2]);
@@ -66,7 +70,8 @@ int main(int argc, char *argv[]) {
 
   std::cout << "Reading " << csvFilename << "...\n";
   double duration_sec = 0.0;
-  auto singlesMap = readFileAuto(csvFilename, duration_sec);
+  auto singlesMap = readFileAuto(csvFilename, duration_sec, -1.0,
+                                 /*threads=*/0);
   std::cout << "Measurement duration: " << duration_sec << " seconds\n";
 
   long long earliestSec = std::numeric_limits<long long>::max();
@@ -93,12 +98,14 @@ int main(int argc, char *argv[]) {
   }
 
   // Create folders
-  try {
-    std::filesystem::create_directories("Delay_Scan_Data");
-  } catch (const std::exception &ex) {
-    std::cerr << "Failed to create Delay_Scan_Data directory: " << ex.what()
-              << "\n";
-    return 1;
+  if (npyPath.empty()) {
+    try {
+      std::filesystem::create_directories("Delay_Scan_Data");
+    } catch (const std::exception &ex) {
+      std::cerr << "Failed to create Delay_Scan_Data directory: " << ex.what()
+                << "\n";
+      return 1;
+    }
   }
 
   std::vector<std::pair<int, int>> coincidencePairs = {
@@ -131,69 +138,105 @@ int main(int argc, char *argv[]) {
     return 1;
   }
 
-  // Progress bar cuzz why not
   const int totalSeconds = stopSec - startSec + 1;
-  const int totalJobs = static_cast<int>(activePairs.size()) * totalSeconds;
-  std::atomic<int> jobsDone{0};
+  if (!npyPath.empty()) {
+    // One cube for the whole run, written block by block as seconds finish.
+    const size_t delays =
+        delayScanSteps(delayStartPs, delayEndPs, delayStepPs);
+    std::vector<SecondScanPair> scanPairs;
+    for (const auto &[ch1, ch2] : activePairs)
+      scanPairs.push_back({&singlesMap.at(ch1), &singlesMap.at(ch2)});
+    try {
+      NpyCubeWriter writer(npyPath, activePairs.size(),
+                           static_cast<size_t>(totalSeconds), delays);
+      const size_t totalRows = scanPairs.size() * totalSeconds;
+      size_t rowsDone = 0;
+      scanDelaysPerSecond(
+          scanPairs, startSec, stopSec, coincWindow, delayStartPs, delayEndPs,
+          delayStepPs,
+          [&](size_t pair, long long second, std::span<const long long> row) {
+            writer.writeRow(pair, static_cast<size_t>(second - startSec), row);
+            if (++rowsDone == totalRows || rowsDone % 50 == 0)
+              std::cout << "\rProcessing " << rowsDone << " / " << totalRows
+                        << std::flush;
+          });
+      writer.close();
+      writeDelayScanAxes(npyPath + ".json", activePairs, startSec,
+                         static_cast<size_t>(totalSeconds), coincWindow,
+                         delayStartPs, delayStepPs, delays);
+    } catch (const std::exception &ex) {
+      std::cerr << "\nFailed to write " << npyPath << ": " << ex.what()
+                << "\n";
+      return 1;
+    }
+    std::cout << "\nWrote " << npyPath << " (" << activePairs.size() << " x "
+              << totalSeconds << " x " << delays << ") and " << npyPath
+              << ".json\n";
+  } else {
+    // Progress bar cuzz why not
+    const int totalJobs = static_cast<int>(activePairs.size()) * totalSeconds;
+    std::atomic<int> jobsDone{0};
 
 #pragma omp parallel for
-  for (size_t p = 0; p < activePairs.size(); ++p) {
-    const int ch1 = activePairs[p].first;
-    const int ch2 = activePairs[p].second;
-    const Singles &singles1 = singlesMap.at(ch1);
-    const Singles &singles2 = singlesMap.at(ch2);
-
-    std::vector<long long> mergedEvents;
-    std::vector<std::pair<float, int>> results;
-    size_t filesWritten = 0;
-    for (int sec = startSec; sec <= stopSec; ++sec) {
-
-      const auto &events1 = eventsForSecond(singles1, sec);
-      if (events1.empty())
-        continue;
-
-      const auto &currentSecond = eventsForSecond(singles2, sec);
-      const auto &nextSecond = eventsForSecond(singles2, sec + 1);
-      if (currentSecond.empty() && nextSecond.empty())
-        continue;
-
-      // Include the first event from the next second so cross-second
-      // coincidences survive
-      const std::span<const long long> channel2Span =
-          appendNextFirstEvent(currentSecond, nextSecond, mergedEvents);
-      if (channel2Span.empty())
-        continue;
-
-      const std::span<const long long> channel1Span(events1.data(),
-                                                    events1.size());
-
-      std::string outFile = "Delay_Scan_Data/delay_scan_" +
-                            std::to_string(ch1) + "_vs_" + std::to_string(ch2) +
-                            "_second_" + std::to_string(sec) + ".csv";
-
-      results.clear();
-      computeCoincidencesForRange(channel1Span, channel2Span, coincWindow,
-                                  delayStartPs, delayEndPs, delayStepPs,
-                                  results);
-      writeResultsToFile(results, outFile);
-      ++filesWritten;
-
-      int done = ++jobsDone;
-      if (done == totalJobs || done % 50 == 0) {
+    for (size_t p = 0; p < activePairs.size(); ++p) {
+      const int ch1 = activePairs[p].first;
+      const int ch2 = activePairs[p].second;
+      const Singles &singles1 = singlesMap.at(ch1);
+      const Singles &singles2 = singlesMap.at(ch2);
+
+      std::vector<long long> mergedEvents;
+      std::vector<std::pair<float, int>> results;
+      size_t filesWritten = 0;
+      for (int sec = startSec; sec <= stopSec; ++sec) {
+
+        const auto &events1 = eventsForSecond(singles1, sec);
+        if (events1.empty())
+          continue;
+
+        const auto &currentSecond = eventsForSecond(singles2, sec);
+        const auto &nextSecond = eventsForSecond(singles2, sec + 1);
+        if (currentSecond.empty() && nextSecond.empty())
+          continue;
+
+        // Include the first event from the next second so cross-second
+        // coincidences survive
+        const std::span<const long long> channel2Span =
+            appendNextFirstEvent(currentSecond, nextSecond, mergedEvents);
+        if (channel2Span.empty())
+          continue;
+
+        const std::span<const long long> channel1Span(events1.data(),
+                                                      events1.size());
+
+        std::string outFile = "Delay_Scan_Data/delay_scan_" +
+                              std::to_string(ch1) + "_vs_" + std::to_string(ch2) +
+                              "_second_" + std::to_string(sec) + ".csv";
+
+        results.clear();
+        computeCoincidencesForRange(channel1Span, channel2Span, coincWindow,
+                                    delayStartPs, delayEndPs, delayStepPs,
+                                    results);
+        writeResultsToFile(results, outFile);
+        ++filesWritten;
+
+        int done = ++jobsDone;
+        if (done == totalJobs || done % 50 == 0) {
 #pragma omp critical
-        std::cout << "\rProcessing " << done << " / " << totalJobs
-                  << std::flush;
+          std::cout << "\rProcessing " << done << " / " << totalJobs
+                    << std::flush;
+        }
       }
-    }
 
 #pragma omp critical
-    std::cout << "Finished ch" << ch1 << " vs ch" << ch2 << " (" << filesWritten
-              << " seconds)\n";
-  }
+      std::cout << "Finished ch" << ch1 << " vs ch" << ch2 << " (" << filesWritten
+                << " seconds)\n";
+    }
+
+    if (totalJobs > 0) {
+      std::cout << "\rProcessing " << totalJobs << " / " << totalJobs
+                << " (done)\n";
+    }
 
-  if (totalJobs > 0) {
-    std::cout << "\rProcessing " << totalJobs << " / " << totalJobs
-              << " (done)\n";
   }
 
   std::cout << "\nSingles per second:\n";
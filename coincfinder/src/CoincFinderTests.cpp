@@ -1,10 +1,29 @@
 #include <algorithm>
+#include <bit>
 #include <cassert>
 #include <cmath>
+#include <cstdio>
+#include <fstream>
 #include <iostream>
+#include <random>
+#include <stdexcept>
+#include <thread>
 #include <vector>
 
+#include "BinFile.h"
+#include "CoincidenceKernels.h"
 #include "Coincidences.h"
+#include "CrossCorrelation.h"
+#include "DelayHistogram.h"
+#include "DelayScanCube.h"
+#include "DelaySearch.h"
+#include "Demux.h"
+#include "DriftTracker.h"
+#include "FlatSingles.h"
+#include "Metrics.h"
+#include "PairSource.h"
+#include "ReadCSV.h"
+#include "SpscRing.h"
 
 using Timestamp = long long;
 
@@ -33,6 +52,41 @@ int naiveCoincidences(const std::vector<Timestamp> &ch1,
     }
     return count;
 }
+
+// Reference N-fold counter: materialise the union, sort it (ties by channel)
+// and slide the window over it.
+long long sortedNFold(const std::vector<std::vector<Timestamp>> &channels,
+                      const std::vector<size_t> &subset, Timestamp windowPs,
+                      const std::vector<Timestamp> &offsets) {
+    std::vector<std::pair<Timestamp, size_t>> merged;
+    for (size_t local = 0; local < subset.size(); ++local)
+        for (const Timestamp ts : channels[subset[local]])
+            merged.push_back({ts + offsets[subset[local]], local});
+    std::sort(merged.begin(), merged.end(), [&](const auto &a, const auto &b) {
+        return a.first != b.first ? a.first < b.first
+                                  : subset[a.second] < subset[b.second];
+    });
+    std::vector<int> freq(subset.size(), 0);
+    size_t have = 0;
+    size_t left = 0;
+    long long count = 0;
+    for (size_t right = 0; right < merged.size(); ++right) {
+        if (++freq[merged[right].second] == 1)
+            ++have;
+        while (left < right && merged[right].first - merged[left].first > windowPs) {
+            if (--freq[merged[left].second] == 0)
+                --have;
+            ++left;
+        }
+        if (have == subset.size()) {
+            ++count;
+            if (--freq[merged[left].second] == 0)
+                --have;
+            ++left;
+        }
+    }
+    return count;
+}
 } // namespace
 
 void testHistogramMatchesNaive() {
@@ -65,9 +119,13 @@ void testFindBestDelay() {
     for (size_t i = 0; i < ref.size(); ++i)
         target[i] = ref[i] + offset;
 
+    // The delay is subtracted from channel 1 (t1 - delay = t2), so a target
+    // lagging the reference by `offset` peaks at -offset. Every delay within
+    // the window of it counts all pairs; the first bin of that plateau wins.
+    const Timestamp window = 200;
     const Timestamp best = findBestDelayPicoseconds(ref, target,
-                                                    200, -3'000, 3'000, 25);
-    assert(best == offset);
+                                                    window, -3'000, 3'000, 25);
+    assert(best == -offset - window);
 }
 
 void testNFoldCounts() {
@@ -95,10 +153,655 @@ void testNFoldCounts() {
     assert(pair == static_cast<int>(base.size()));
 }
 
+void testNFoldSubsetsMatchSortedMerge() {
+    std::mt19937_64 rng(3);
+    std::uniform_int_distribution<Timestamp> gap(1, 3'000);
+    std::vector<std::vector<Timestamp>> channels(6);
+    for (auto &ch : channels)
+        for (Timestamp t = gap(rng); t < 5'000'000; t += gap(rng))
+            ch.push_back(t / 50 * 50); // coarse grid: plenty of exact ties
+    std::vector<std::span<const Timestamp>> spans(channels.begin(), channels.end());
+    const std::vector<std::vector<size_t>> subsets = {
+        {0, 1, 2}, {3, 4, 5, 0}, {0, 1, 2, 3, 4, 5}, {2, 5}, {4, 1, 3}};
+    const std::vector<Timestamp> noOffsets(channels.size(), 0);
+    const std::vector<Timestamp> offsets = {0, 40, -25, 100, 0, -60};
+
+    const auto counts = countNFoldCoincidencesForSubsets(spans, subsets, 120);
+    const auto shifted = countNFoldCoincidencesForSubsets(spans, subsets, 120, offsets);
+    for (size_t s = 0; s < subsets.size(); ++s) {
+        const long long expected =
+            subsets[s].size() == 2
+                ? countCoincidencesWithDelay(spans[subsets[s][0]], spans[subsets[s][1]], 120, 0)
+                : sortedNFold(channels, subsets[s], 120, noOffsets);
+        assert(counts[s] == expected);
+        assert(shifted[s] == sortedNFold(channels, subsets[s], 120, offsets));
+    }
+    assert(countNFoldCoincidences(spans, 120) == static_cast<int>(counts[2]));
+}
+
+void testBackgroundInSamePass() {
+    // A heralded pair on top of independent Poisson backgrounds.
+    std::mt19937_64 rng(13);
+    std::exponential_distribution<double> gap(1e-7); // 100 kHz in ps
+    std::normal_distribution<double> jitter(0.0, 50.0);
+    std::bernoulli_distribution herald(0.3);
+    std::vector<Timestamp> a;
+    std::vector<Timestamp> b;
+    for (double t = gap(rng); t < 2e11; t += gap(rng)) {
+        a.push_back(static_cast<Timestamp>(t));
+        if (herald(rng))
+            b.push_back(static_cast<Timestamp>(t) - 4'000 + static_cast<Timestamp>(jitter(rng)));
+    }
+    for (double t = gap(rng); t < 2e11; t += gap(rng))
+        b.push_back(static_cast<Timestamp>(t));
+    std::sort(b.begin(), b.end());
+
+    const std::vector<Timestamp> sides{-200'000, -100'000, 100'000, 200'000};
+    const auto result = countCoincidencesWithBackground(a, b, 500, 4'000, sides);
+    assert(result.counts == countCoincidencesWithDelay(a, b, 500, 4'000));
+    long long sideTotal = 0;
+    for (const Timestamp offset : sides)
+        sideTotal += countCoincidencesWithDelay(a, b, 500, 4'000 + offset);
+    assert(result.sideWindows == sides.size());
+    assert(std::abs(result.background - static_cast<double>(sideTotal) / 4.0) < 1e-9);
+    // Side windows and singles agree on the accidental level (~2000 here).
+    assert(std::abs(result.background - result.accidentals) <
+           5.0 * result.backgroundError + 0.05 * result.accidentals);
+    assert(result.net() > 0.25 * static_cast<double>(a.size()));
+
+    const auto singlesOnly = countCoincidencesWithBackground(a, b, 500, 4'000);
+    assert(singlesOnly.sideWindows == 0);
+    assert(singlesOnly.background == singlesOnly.accidentals);
+    assert(singlesOnly.counts == result.counts);
+
+    const std::vector<CoincidenceQuery> queries{{a, b, 4'000}, {b, a, -4'000}};
+    std::vector<CoincidenceBackground> batch(queries.size());
+    countCoincidencesWithBackgroundBatch(queries, 500, sides, 0, batch, 2);
+    assert(batch[0].counts == result.counts && batch[0].background == result.background);
+    assert(batch[1].counts == countCoincidencesWithDelay(b, a, 500, -4'000));
+}
+
+void testCoincidenceKernelsAgree() {
+    // Bursty streams on a coarse grid give ties, long one-sided runs and
+    // several candidates per window; every kernel must match the scalar loop.
+    std::mt19937_64 rng(11);
+    std::uniform_int_distribution<Timestamp> shortGap(1, 40);
+    std::uniform_int_distribution<Timestamp> longGap(1, 20'000);
+    std::vector<Timestamp> dense;
+    std::vector<Timestamp> sparse;
+    for (Timestamp t = 0; t < 3'000'000; t += shortGap(rng) * 10)
+        dense.push_back(t);
+    for (Timestamp t = 0; t < 3'000'000; t += longGap(rng) / 10 * 10)
+        sparse.push_back(t);
+
+    const std::vector<std::pair<std::span<const Timestamp>, std::span<const Timestamp>>>
+        pairs = {{dense, sparse}, {sparse, dense}, {dense, dense}, {sparse, {}},
+                 {std::span<const Timestamp>(dense).first(5), sparse}};
+    for (const auto &[a, b] : pairs)
+        for (const Timestamp window : {0LL, 10LL, 95LL, 2'000LL})
+            for (const Timestamp delay : {0LL, 30LL, -1'250LL, 400'000LL}) {
+                const long long reference =
+                    countCoincidencesWithKernel(a, b, window, delay, CoincidenceKernel::Scalar);
+                for (const auto kernel : availableCoincidenceKernels())
+                    assert(countCoincidencesWithKernel(a, b, window, delay, kernel) == reference);
+                assert(countCoincidencesWithDelay(a, b, window, delay) == reference);
+            }
+    assert(coincidenceKernelAvailable(CoincidenceKernel::Branchless));
+    assert(selectCoincidenceKernel(100, 100) == CoincidenceKernel::Branchless);
+    assert(selectCoincidenceKernel(10, 1'000) == defaultCoincidenceKernel());
+}
+
+void testCoincidencePatterns() {
+    // Windows (w = 100): {0: ch0, ch1}, {500: ch2}, {1000: ch0, ch1, ch2 at
+    // 1100}, {1101: ch1}; ch2's offset moves its 480 to 500.
+    const std::vector<Timestamp> a{0, 1'000};
+    const std::vector<Timestamp> b{60, 1'050, 1'101};
+    const std::vector<Timestamp> c{480, 1'080};
+    const std::vector<std::span<const Timestamp>> spans{a, b, c};
+    const std::vector<Timestamp> offsets{0, 0, 20};
+
+    const auto exact = countCoincidencePatterns(spans, 100, offsets, true);
+    assert(exact.size() == 8);
+    assert((exact == std::vector<long long>{0, 0, 1, 1, 1, 0, 0, 1}));
+    const auto counters = countCoincidencePatterns(spans, 100, offsets);
+    assert((counters == std::vector<long long>{4, 2, 3, 2, 2, 1, 1, 1}));
+
+    // Inclusive counts are the superset sums of the exact ones.
+    std::mt19937_64 rng(5);
+    std::uniform_int_distribution<Timestamp> gap(1, 4'000);
+    std::vector<std::vector<Timestamp>> channels(5);
+    for (auto &ch : channels)
+        for (Timestamp t = gap(rng); t < 2'000'000; t += gap(rng))
+            ch.push_back(t);
+    const std::vector<std::span<const Timestamp>> random(channels.begin(), channels.end());
+    const auto randomExact = countCoincidencePatterns(random, 150, {}, true);
+    const auto randomCounters = countCoincidencePatterns(random, 150);
+    long long events = 0;
+    for (const auto &ch : channels)
+        events += static_cast<long long>(ch.size());
+    long long windowed = 0;
+    for (size_t m = 0; m < randomExact.size(); ++m) {
+        long long expected = 0;
+        for (size_t super = 0; super < randomExact.size(); ++super)
+            if ((super & m) == m)
+                expected += randomExact[super];
+        assert(randomCounters[m] == expected);
+        windowed += randomExact[m] * std::popcount(m);
+    }
+    assert(windowed <= events); // repeats of a channel in one window merge
+    assert(randomCounters[0] > 0);
+
+    bool threw = false;
+    try {
+        countCoincidencePatterns(std::vector<std::span<const Timestamp>>(17), 100);
+    } catch (const std::invalid_argument &) {
+        threw = true;
+    }
+    assert(threw);
+}
+
+void testPairMetrics() {
+    // Row 0: HV basis 900 right / 100 wrong, DA basis 800 / 200.
+    // Row 1: no DA counts.
+    const std::vector<double> net{450, 450, 400, 400, 50, 50, 100, 100,
+                                  90,  10,  0,   0,   0,  0,  0,   0};
+    const std::vector<double> variance(net.begin(), net.end());
+    std::vector<MetricEstimate> out(2);
+
+    computePairMetric(PairMetric::QberHV, net, variance, out);
+    assert(std::abs(out[0].value - 0.1) < 1e-12);
+    // sqrt(W^2 R + R^2 W) / N^2 for R = 900, W = 100.
+    assert(std::abs(out[0].sigma - std::sqrt(100.0 * 100 * 900 + 900.0 * 900 * 100) / 1e6) <
+           1e-12);
+    assert(out[1].value == 0.0);
+
+    computePairMetric(PairMetric::Qber, net, variance, out);
+    assert(std::abs(out[0].value - 0.15) < 1e-12);
+
+    computePairMetric(PairMetric::VisibilityDA, net, variance, out);
+    assert(std::abs(out[0].value - 0.6) < 1e-12);
+    assert(std::isnan(out[1].value));
+}
+
+void testDemuxSplitsByChannel() {
+    const std::vector<Timestamp> ts{10, 20, 30, 40, 50, 60};
+    const std::vector<std::uint8_t> codes{0, 4, 0, 1, 4, 0};
+    const std::vector<Timestamp> delays{0, 0, 0, 0, 7};
+
+    const auto perChannel = demultiplexTimestamps(ts, codes, delays);
+    assert(perChannel.size() == 3);
+    assert((perChannel.at(1) == std::vector<Timestamp>{10, 30, 60}));
+    assert((perChannel.at(2) == std::vector<Timestamp>{40}));
+    assert((perChannel.at(5) == std::vector<Timestamp>{27, 57}));
+}
+
+void testBatchMatchesSingleCalls() {
+    const std::vector<Timestamp> a{0, 1'000, 2'000, 3'000, 4'000};
+    const std::vector<Timestamp> b{150, 1'120, 2'180, 3'900, 4'100};
+    const std::vector<CoincidenceQuery> queries{
+        {a, b, 0}, {a, b, -150}, {b, a, 100}, {a, a, 0}};
+    std::vector<long long> counts(queries.size(), -1);
+    countCoincidencesBatch(queries, 100, counts, 2);
+    for (size_t q = 0; q < queries.size(); ++q) {
+        assert(counts[q] == countCoincidencesWithDelay(queries[q].channelA,
+                                                       queries[q].channelB,
+                                                       100, queries[q].delayPs));
+    }
+}
+
+void testDelayScanCube() {
+    std::mt19937_64 rng(11);
+    std::uniform_int_distribution<Timestamp> offset(0, 999'999'999'999LL);
+    Singles a;
+    Singles b;
+    a.baseSecond = 3;
+    b.baseSecond = 3;
+    a.eventsPerSecond.resize(5);
+    b.eventsPerSecond.resize(5);
+    for (size_t sec = 0; sec < 5; ++sec) {
+        for (int i = 0; i < 200; ++i) {
+            const Timestamp ts = (a.baseSecond + static_cast<Timestamp>(sec)) * 1'000'000'000'000LL +
+                                 offset(rng) / 1'000 * 1'000;
+            a.eventsPerSecond[sec].push_back(ts);
+            b.eventsPerSecond[sec].push_back(ts + 2'000);
+        }
+        std::sort(a.eventsPerSecond[sec].begin(), a.eventsPerSecond[sec].end());
+        std::sort(b.eventsPerSecond[sec].begin(), b.eventsPerSecond[sec].end());
+    }
+
+    const std::vector<SecondScanPair> pairs{{&a, &b}, {&b, &a}, {&a, nullptr}};
+    const long long first = 2;
+    const long long last = 8;
+    const size_t delays = delayScanSteps(-5'000, 5'000, 1'000);
+    std::vector<long long> cube(pairs.size() * (last - first + 1) * delays, -1);
+    std::vector<std::pair<size_t, long long>> order;
+    scanDelaysPerSecond(pairs, first, last, 500, -5'000, 5'000, 1'000,
+                        [&](size_t pair, long long second, std::span<const long long> row) {
+                            order.push_back({pair, second});
+                            std::copy(row.begin(), row.end(),
+                                      cube.begin() + static_cast<long long>(
+                                          (pair * (last - first + 1) + (second - first)) * delays));
+                        },
+                        /*blockSeconds=*/3);
+    assert(order.size() == cube.size() / delays);
+    assert((order[0] == std::pair<size_t, long long>{0, 2}));
+    assert((order[3] == std::pair<size_t, long long>{1, 2}));
+
+    std::vector<long long> scratch;
+    std::vector<long long> expected(delays);
+    long long peak = 0;
+    for (size_t p = 0; p < 2; ++p)
+        for (long long sec = first; sec <= last; ++sec) {
+            const auto &events1 = eventsForSecond(*pairs[p].reference, sec);
+            std::fill(expected.begin(), expected.end(), 0);
+            if (!events1.empty())
+                computeCoincidenceCountsForRange(
+                    events1,
+                    appendNextFirstEvent(eventsForSecond(*pairs[p].target, sec),
+                                         eventsForSecond(*pairs[p].target, sec + 1), scratch),
+                    500, -5'000, 5'000, 1'000, expected);
+            const auto row = cube.begin() +
+                             static_cast<long long>((p * (last - first + 1) + (sec - first)) * delays);
+            assert(std::equal(expected.begin(), expected.end(), row));
+            peak = std::max(peak, *std::max_element(row, row + static_cast<long long>(delays)));
+        }
+    assert(peak > 0);
+    assert(std::all_of(cube.end() - static_cast<long long>((last - first + 1) * delays), cube.end(),
+                       [](long long c) { return c == 0; }));
+
+    const std::string path = "coincfinder_cube_test.npy";
+    {
+        NpyCubeWriter writer(path, 2, 3, 4);
+        writer.writeRow(1, 2, std::vector<long long>{1, 2, 3, 1LL << 40});
+        writer.close();
+    }
+    std::ifstream in(path, std::ios::binary);
+    std::string magic(8, '\0');
+    in.read(magic.data(), 8);
+    assert(magic == std::string("\x93NUMPY\x01\x00", 8));
+    unsigned char len[2];
+    in.read(reinterpret_cast<char *>(len), 2);
+    const size_t headerBytes = len[0] | (len[1] << 8);
+    std::string header(headerBytes, '\0');
+    in.read(header.data(), static_cast<std::streamsize>(headerBytes));
+    assert((10 + headerBytes) % 64 == 0 && header.back() == '\n');
+    assert(header.find("'shape': (2, 3, 4)") != std::string::npos);
+    std::vector<std::int32_t> data(24, -1);
+    in.read(reinterpret_cast<char *>(data.data()), 24 * sizeof(std::int32_t));
+    assert(in.gcount() == 24 * sizeof(std::int32_t));
+    assert(data[20] == 1 && data[22] == 3 && data[23] == 2147483647 && data[0] == 0);
+    in.close();
+    std::remove(path.c_str());
+}
+
+void testSpscRing() {
+    SpscRing<std::vector<int>> ring(3);
+    std::vector<int> out;
+    assert(!ring.tryPop(out) && !ring.takeLatest(out));
+    for (int i = 0; i < 5; ++i) {
+        if (auto *slot = ring.tryAcquire()) {
+            slot->assign(1, i);
+            ring.publish();
+        }
+    }
+    // Slots 0-2 published, 3 and 4 dropped.
+    assert(ring.published() == 3 && ring.overruns() == 2 && ring.full());
+    assert(ring.tryPop(out) && out == std::vector<int>{0});
+    assert(ring.takeLatest(out) && out == std::vector<int>{2});
+    assert(ring.skipped() == 1 && ring.size() == 0);
+
+    // Threaded FIFO hand-off: every item arrives once, in order.
+    SpscRing<long long> fifo(4);
+    constexpr long long kItems = 20'000;
+    std::thread producer([&] {
+        for (long long i = 0; i < kItems; ++i) {
+            if (!fifo.waitForSpace())
+                return;
+            *fifo.tryAcquire() = i;
+            fifo.publish();
+        }
+        fifo.close();
+    });
+    long long expected = 0;
+    long long item = -1;
+    while (fifo.waitForData()) {
+        assert(fifo.tryPop(item) && item == expected);
+        ++expected;
+    }
+    producer.join();
+    assert(expected == kItems && fifo.overruns() == 0);
+}
+
+void testPairSourceStreams() {
+    PairSourceConfig config;
+    config.pairRate = 2e5;
+    config.efficiencyA = 0.5;
+    config.efficiencyB = 0.5;
+    config.visibility = 0.9;
+    config.accidentalRate = 2'000;
+    for (int c = 4; c < kPairSourceChannels; ++c)
+        config.delaysPs[c] = 7'000; // side B
+    config.jitterPs.fill(80.0);
+
+    // Ten 50 ms calls: sorted within and across calls, same output per seed.
+    PairSource source(config);
+    PairSource twin(config);
+    std::vector<std::vector<long long>> chunk;
+    std::vector<std::vector<long long>> twinChunk;
+    std::vector<std::vector<long long>> all(kPairSourceChannels);
+    for (int call = 0; call < 10; ++call) {
+        source.generate(50'000'000'000LL, chunk);
+        twin.generate(50'000'000'000LL, twinChunk);
+        assert(chunk == twinChunk);
+        for (int c = 0; c < kPairSourceChannels; ++c) {
+            assert(std::is_sorted(chunk[c].begin(), chunk[c].end()));
+            assert(all[c].empty() || chunk[c].empty() || chunk[c].front() >= all[c].back());
+            all[c].insert(all[c].end(), chunk[c].begin(), chunk[c].end());
+        }
+    }
+    assert(source.nowPs() == 500'000'000'000LL);
+
+    // Singles: 2e5 * 0.5 / 4 pairs plus 2000 accidentals per second.
+    for (const auto &events : all)
+        assert(std::abs(static_cast<double>(events.size()) - 13'500.0) < 700.0);
+
+    // Correlations at t1 - t5 = -7 ns with the configured visibility; none
+    // beyond accidentals at zero delay.
+    const long long hh = countCoincidencesWithDelay(all[0], all[4], 500, -7'000);
+    const long long hv = countCoincidencesWithDelay(all[0], all[5], 500, -7'000);
+    const long long hd = countCoincidencesWithDelay(all[0], all[6], 500, -7'000);
+    assert(hh > 2'000 && std::abs(static_cast<double>(hh - hv) / (hh + hv) - 0.9) < 0.04);
+    assert(std::abs(hd - (hh + hv) / 2) < (hh + hv) / 10);
+    assert(countCoincidencesWithDelay(all[0], all[4], 500, 0) < 20);
+
+    config.visibility = 1.5;
+    bool threw = false;
+    try {
+        PairSource invalid(config);
+    } catch (const std::invalid_argument &) {
+        threw = true;
+    }
+    assert(threw);
+}
+
+void testBinFileRange() {
+    const std::string path = "coincfinder_test.bin";
+    {
+        std::ofstream out(path, std::ios::binary);
+        const std::string header(kBinHeaderBytes, '\0');
+        out.write(header.data(), static_cast<std::streamsize>(header.size()));
+        for (std::uint64_t i = 1; i <= 100; ++i) {
+            const std::uint64_t ts = i * 1'000;
+            const std::uint16_t code = static_cast<std::uint16_t>(i % 4);
+            out.write(reinterpret_cast<const char *>(&ts), sizeof(ts));
+            out.write(reinterpret_cast<const char *>(&code), sizeof(code));
+        }
+    }
+    {
+        const BinFile file(path, 16);
+        assert(file.recordCount() == 100);
+        assert(file.timestamp(9) == 10'000 && file.channelCode(9) == 2);
+        assert((file.recordRange(10'000, 20'500) == std::pair<size_t, size_t>{9, 20}));
+        assert((file.recordRange(0, 1'000) == std::pair<size_t, size_t>{100, 100}));
+    }
+    std::remove(path.c_str());
+}
+
+void testStreamMatchesFullRead() {
+    const std::string path = "coincfinder_stream_test.csv";
+    {
+        std::ofstream out(path);
+        for (long long i = 1; i <= 40; ++i)
+            out << i * 100'000'000'000LL << ',' << (i % 3) + 1 << '\n';
+    }
+    double duration = 0.0;
+    const auto full = readCSVtoSingles(path, duration);
+
+    std::map<int, Singles> merged;
+    SinglesFileStream stream(path, 1.0);
+    std::map<int, Singles> chunk;
+    int chunks = 0;
+    while (stream.next(chunk)) {
+        ++chunks;
+        for (const auto &[ch, singles] : chunk) {
+            for (size_t b = 0; b < singles.eventsPerSecond.size(); ++b) {
+                auto &bucket = ensureSecond(merged[ch], singles.baseSecond + static_cast<long long>(b));
+                bucket.insert(bucket.end(), singles.eventsPerSecond[b].begin(),
+                              singles.eventsPerSecond[b].end());
+            }
+        }
+    }
+    assert(chunks == 4);
+    assert(stream.lateEvents() == 0);
+    assert(std::abs(stream.durationSeconds() - duration) < 1e-12);
+    for (const auto &[ch, singles] : full)
+        assert(merged.at(ch).eventsPerSecond == singles.eventsPerSecond);
+
+    double parallelDuration = 0.0;
+    const auto parallel = readCSVtoSingles(path, parallelDuration, 3);
+    assert(parallelDuration == duration);
+    for (const auto &[ch, singles] : full)
+        assert(parallel.at(ch).eventsPerSecond == singles.eventsPerSecond);
+    std::remove(path.c_str());
+}
+
+void testFlatSinglesRebucket() {
+    Singles nested;
+    nested.channel = 3;
+    nested.eventsPerSecond = {{10, 900}, {}, {2'100, 2'500}};
+    FlatSingles flat = flattenSingles(nested, 1'000);
+    assert(bucketCount(flat) == 3);
+    assert(eventsForSecond(flat, 1).empty());
+    assert(eventsForSecond(flat, 2).size() == 2 && eventsForSecond(flat, 2)[0] == 2'100);
+    assert(eventsForSecondWithNext(flat, 0).size() == 2);
+    assert(eventsForSecondWithNext(flat, 1).size() == 1);
+
+    rebucket(flat, 500);
+    assert(flat.baseSecond == 0 && bucketCount(flat) == 6);
+    assert(eventsForSecond(flat, 1).size() == 1 && eventsForSecond(flat, 5).size() == 1);
+    assert(expandSingles(flat).eventsPerSecond[4].size() == 1);
+}
+
+void testIngestModesAgree() {
+    const std::string path = "coincfinder_ingest_test.csv";
+    {
+        std::ofstream out(path);
+        const long long ts[] = {5'000'000'000'000, 5'000'000'000'900, 5'000'000'000'100,
+                                7'500'000'000'000, 3'000'000'000'000, 5'000'000'000'050,
+                                7'400'000'000'000, 3'200'000'000'000};
+        for (const long long t : ts)
+            out << t << ",2\n";
+    }
+    double duration = 0.0;
+    setIngestMode(IngestMode::SortedInsert);
+    const auto inserted = readCSVtoSingles(path, duration);
+    setIngestMode(IngestMode::AppendThenSort);
+    const auto appended = readCSVtoSingles(path, duration);
+    assert(inserted.at(2).baseSecond == appended.at(2).baseSecond);
+    assert(inserted.at(2).eventsPerSecond == appended.at(2).eventsPerSecond);
+    for (const auto &bucket : appended.at(2).eventsPerSecond)
+        assert(std::is_sorted(bucket.begin(), bucket.end()));
+    std::remove(path.c_str());
+}
+
+void testDelayHistogramChunksMatchFullScan() {
+    std::vector<Timestamp> ch1;
+    std::vector<Timestamp> ch2;
+    for (Timestamp t = 0; t < 40'000; t += 1'000) {
+        ch1.push_back(t);
+        ch2.push_back(t + 300 + (t / 1'000) % 7);
+    }
+    std::vector<long long> full(delayScanSteps(-2'000, 2'000, 100));
+    computeCoincidenceCountsForRange(ch1, ch2, 150, -2'000, 2'000, 100, full);
+
+    DelayHistogram hist(150, -2'000, 2'000, 100);
+    const std::span<const Timestamp> a(ch1);
+    const std::span<const Timestamp> b(ch2);
+    // Chunk edges fall between ch1[i] and its partner ch2[i].
+    hist.addChunk(a.first(10), b.first(9));
+    hist.addChunk(a.subspan(10, 15), b.subspan(9, 16));
+    hist.addChunk(a.subspan(25), b.subspan(25));
+    const auto counts = hist.counts();
+    for (size_t i = 0; i < full.size(); ++i)
+        assert(counts[i] == static_cast<double>(full[i]));
+
+    // Channel 2 runs far ahead of channel 1 at the first chunk edge: its
+    // event at 650 still pairs with channel 1's 700 in the next chunk.
+    const std::vector<Timestamp> early1{400};
+    const std::vector<Timestamp> early2{650, 30'000};
+    const std::vector<Timestamp> late1{700};
+    DelayHistogram ahead(150, -2'000, 2'000, 100);
+    ahead.addChunk(early1, early2);
+    ahead.addChunk(late1, {});
+    const std::vector<Timestamp> all1{400, 700};
+    computeCoincidenceCountsForRange(all1, early2, 150, -2'000, 2'000, 100, full);
+    const auto aheadCounts = ahead.counts();
+    for (size_t i = 0; i < full.size(); ++i)
+        assert(aheadCounts[i] == static_cast<double>(full[i]));
+}
+
+void testFftDelayEngineMatchesSweep() {
+    // Poisson-like streams with 30% of channel 2 correlated at +4.3 ns.
+    std::mt19937_64 rng(7);
+    std::uniform_int_distribution<Timestamp> gap(1, 20'000);
+    std::normal_distribution<double> jitter(0.0, 40.0);
+    std::vector<Timestamp> ch1;
+    std::vector<Timestamp> ch2;
+    for (Timestamp t = 0; t < 200'000'000; t += gap(rng)) {
+        ch1.push_back(t);
+        if (rng() % 10 < 3)
+            ch2.push_back(t - 4'300 + std::llround(jitter(rng)));
+        if (rng() % 10 < 3)
+            ch2.push_back(t + gap(rng));
+    }
+    std::sort(ch2.begin(), ch2.end());
+
+    // Binned correlation against a direct count.
+    const Timestamp bin = 250;
+    const long long lagMin = -30;
+    std::vector<double> corr(60);
+    crossCorrelateBinned(ch1, ch2, bin, lagMin, corr);
+    const Timestamp origin = std::min(ch1.front(), ch2.front());
+    std::vector<double> direct(corr.size(), 0.0);
+    size_t lo = 0;
+    for (const Timestamp t1 : ch1) {
+        while (lo < ch2.size() && ch2[lo] < t1 - 40 * bin)
+            ++lo;
+        for (size_t j = lo; j < ch2.size() && ch2[j] <= t1 + 40 * bin; ++j) {
+            const long long k = (t1 - origin) / bin - (ch2[j] - origin) / bin - lagMin;
+            if (k >= 0 && k < static_cast<long long>(direct.size()))
+                direct[static_cast<size_t>(k)] += 1.0;
+        }
+    }
+    assert(corr == direct);
+
+    std::vector<long long> sweep(delayScanSteps(-8'000, 8'000, 20));
+    std::vector<long long> fft(sweep.size());
+    computeCoincidenceCountsForRange(ch1, ch2, 100, -8'000, 8'000, 20, sweep);
+    computeCoincidenceCountsFft(ch1, ch2, 100, -8'000, 8'000, 20, fft);
+    const auto peak = std::max_element(sweep.begin(), sweep.end()) - sweep.begin();
+    assert(std::max_element(fft.begin(), fft.end()) - fft.begin() - peak <= 5);
+    assert(std::abs(static_cast<double>(fft[static_cast<size_t>(peak)] - sweep[static_cast<size_t>(peak)])) <
+           0.1 * static_cast<double>(sweep[static_cast<size_t>(peak)]));
+
+    const long long expected = findBestDelayPicoseconds(
+        ch1, ch2, 100, -8'000, 8'000, 20, nullptr, DelayScanMethod::Sweep);
+    // The sweep stays the default engine.
+    assert(findBestDelayPicoseconds(ch1, ch2, 100, -8'000, 8'000, 20) == expected);
+    std::vector<std::pair<float, int>> histogram;
+    assert(findBestDelayPicoseconds(ch1, ch2, 100, -8'000, 8'000, 20, &histogram,
+                                    DelayScanMethod::Fft) == expected);
+    assert(histogram.size() == sweep.size());
+    assert(histogram[static_cast<size_t>(peak)].second == sweep[static_cast<size_t>(peak)]);
+    assert(findBestDelayPicoseconds(ch1, ch2, 100, -8'000, 8'000, 20, nullptr,
+                                    DelayScanMethod::Auto) == expected);
+}
+
+void testHierarchicalDelaySearch() {
+    std::mt19937_64 rng(11);
+    std::uniform_int_distribution<Timestamp> gap(1, 40'000);
+    std::normal_distribution<double> jitter(0.0, 30.0);
+    std::vector<Timestamp> ch1;
+    std::vector<Timestamp> ch2;
+    for (Timestamp t = 0; t < 400'000'000; t += gap(rng)) {
+        ch1.push_back(t);
+        if (rng() % 4 == 0)
+            ch2.push_back(t + 61'730 + std::llround(jitter(rng)));
+        if (rng() % 4 == 0)
+            ch2.push_back(t + gap(rng));
+    }
+    std::sort(ch2.begin(), ch2.end());
+
+    // 20'001 fine steps: three levels of 8x refinement.
+    std::vector<long long> sweep(delayScanSteps(-100'000, 100'000, 10));
+    computeCoincidenceCountsForRange(ch1, ch2, 80, -100'000, 100'000, 10, sweep);
+    const auto best = std::max_element(sweep.begin(), sweep.end()) - sweep.begin();
+
+    const DelayPeak peak = findDelayPeak(ch1, ch2, 80, -100'000, 100'000, 10);
+    assert(peak.delayPs == -100'000 + best * 10);
+    assert(peak.count == sweep[static_cast<size_t>(best)]);
+    assert(std::abs(peak.refinedDelayPs - static_cast<double>(peak.delayPs)) <= 40.0);
+    assert(peak.background >= 0.0 && peak.background < 0.1 * static_cast<double>(peak.count));
+    assert(peak.snr > 10.0);
+    assert(findBestDelayPicoseconds(ch1, ch2, 80, -100'000, 100'000, 10, nullptr,
+                                    DelayScanMethod::Hierarchical) == peak.delayPs);
+}
+
+void testDriftTrackerFollowsPeak() {
+    // The true delay walks from 500 ps to 620 ps over 12 one-second chunks.
+    std::mt19937_64 rng(5);
+    std::uniform_int_distribution<Timestamp> gap(1, 400'000);
+    std::normal_distribution<double> jitter(0.0, 30.0);
+    DelayDriftTracker tracker(100, 500.0, 1'000, 10);
+    tracker.setMemorySeconds(1.0);
+    tracker.setGain(1.0);
+    DriftUpdate update;
+    for (int second = 0; second < 12; ++second) {
+        const double truePs = 500.0 + 10.0 * second;
+        std::vector<Timestamp> ch1;
+        std::vector<Timestamp> ch2;
+        const Timestamp begin = static_cast<Timestamp>(second) * 1'000'000'000'000LL;
+        for (Timestamp t = begin; t < begin + 4'000'000'000; t += gap(rng)) {
+            ch1.push_back(t);
+            if (rng() % 2 == 0)
+                ch2.push_back(t - std::llround(truePs + jitter(rng)));
+            ch2.push_back(t + gap(rng));
+        }
+        std::sort(ch2.begin(), ch2.end());
+        update = tracker.addChunk(ch1, ch2);
+        assert(update.updated);
+    }
+    assert(update.confidence > 0.9);
+    assert(std::abs(tracker.delayPs() - 610.0) < 15.0);
+    assert(std::llabs(tracker.centerPs() - std::llround(tracker.delayPs())) <= 5);
+    // Nothing to correlate: the delay stays put.
+    const double before = tracker.delayPs();
+    const std::vector<Timestamp> empty;
+    assert(!tracker.addChunk(empty, empty).updated && tracker.delayPs() == before);
+}
+
 int main() {
     testHistogramMatchesNaive();
     testFindBestDelay();
     testNFoldCounts();
+    testNFoldSubsetsMatchSortedMerge();
+    testCoincidencePatterns();
+    testCoincidenceKernelsAgree();
+    testBackgroundInSamePass();
+    testPairMetrics();
+    testDemuxSplitsByChannel();
+    testBatchMatchesSingleCalls();
+    testDelayScanCube();
+    testSpscRing();
+    testPairSourceStreams();
+    testBinFileRange();
+    testStreamMatchesFullRead();
+    testFlatSinglesRebucket();
+    testIngestModesAgree();
+    testDelayHistogramChunksMatchFullScan();
+    testFftDelayEngineMatchesSweep();
+    testHierarchicalDelaySearch();
+    testDriftTrackerFollowsPeak();
     std::cout << "All CoincFinder tests passed" << std::endl;
     return 0;
 }
@@ -0,0 +1,266 @@
+#include "CoincidenceKernels.h"
+
+// All kernels evaluate the recurrence of the original loop: with
+// diff = ch1[i] - delay - ch2[j], advance i when diff < -w, j when diff > w,
+// and both (counting a coincidence) otherwise. A run of i steps only ends at
+// the first ch1[i] >= ch2[j] + delay - w (and a run of j steps at the first
+// ch2[j] >= ch1[i] - delay - w), so the vector kernels replace each run by a
+// blockwise search for that bound over the sorted timestamps. Matches are
+// still taken one at a time, which keeps the counts bit-for-bit identical.
+
+#include <algorithm>
+#include <bit>
+#include <stdexcept>
+#include <string>
+
+#if defined(__x86_64__) || defined(_M_X64)
+#define COINCFINDER_X86_KERNELS 1
+#include <immintrin.h>
+#if defined(_MSC_VER) && !defined(__clang__)
+#include <intrin.h>
+#define COINCFINDER_TARGET(isa)
+#else
+#define COINCFINDER_TARGET(isa) __attribute__((target(isa)))
+#endif
+#endif
+
+namespace {
+
+long long countScalar(std::span<const long long> ch1, std::span<const long long> ch2,
+                      long long coincWindowPs, long long delayPs) {
+    long long count = 0;
+    size_t i = 0;
+    size_t j = 0;
+    while (i < ch1.size() && j < ch2.size()) {
+        const long long diff = ch1[i] - delayPs - ch2[j];
+        if (diff < -coincWindowPs) {
+            ++i;
+        } else if (diff > coincWindowPs) {
+            ++j;
+        } else {
+            ++count;
+            ++i;
+            ++j;
+        }
+    }
+    return count;
+}
+
+long long countBranchless(std::span<const long long> ch1, std::span<const long long> ch2,
+                          long long coincWindowPs, long long delayPs) {
+    long long count = 0;
+    size_t i = 0;
+    size_t j = 0;
+    while (i < ch1.size() && j < ch2.size()) {
+        const long long diff = ch1[i] - delayPs - ch2[j];
+        const bool early = diff < -coincWindowPs;
+        const bool late = diff > coincWindowPs;
+        count += !(early || late);
+        i += !late;
+        j += !early;
+    }
+    return count;
+}
+
+#if defined(COINCFINDER_X86_KERNELS)
+
+// First index >= `k` whose timestamp is not below `bound`. The next element
+// is checked on its own first: most runs are a step or two long.
+COINCFINDER_TARGET("avx2")
+size_t skipBelowAvx2(const long long *x, size_t k, size_t n, long long bound) {
+    if (k == n || x[k] >= bound)
+        return k;
+    ++k;
+    const __m256i limit = _mm256_set1_epi64x(bound);
+    for (; k + 4 <= n; k += 4) {
+        const __m256i block = _mm256_loadu_si256(reinterpret_cast<const __m256i *>(x + k));
+        const auto below = static_cast<unsigned>(
+            _mm256_movemask_pd(_mm256_castsi256_pd(_mm256_cmpgt_epi64(limit, block))));
+        if (below != 0xFu)
+            return k + static_cast<size_t>(std::countr_one(below));
+    }
+    while (k < n && x[k] < bound)
+        ++k;
+    return k;
+}
+
+COINCFINDER_TARGET("avx2")
+long long countAvx2(std::span<const long long> ch1, std::span<const long long> ch2,
+                    long long coincWindowPs, long long delayPs) {
+    const long long *a = ch1.data();
+    const long long *b = ch2.data();
+    const size_t n1 = ch1.size();
+    const size_t n2 = ch2.size();
+    long long count = 0;
+    size_t i = 0;
+    size_t j = 0;
+    while (i < n1 && j < n2) {
+        const long long diff = a[i] - delayPs - b[j];
+        if (diff < -coincWindowPs) {
+            i = skipBelowAvx2(a, i + 1, n1, b[j] + delayPs - coincWindowPs);
+        } else if (diff > coincWindowPs) {
+            j = skipBelowAvx2(b, j + 1, n2, a[i] - delayPs - coincWindowPs);
+        } else {
+            ++count;
+            ++i;
+            ++j;
+        }
+    }
+    return count;
+}
+
+COINCFINDER_TARGET("avx512f")
+size_t skipBelowAvx512(const long long *x, size_t k, size_t n, long long bound) {
+    if (k == n || x[k] >= bound)
+        return k;
+    ++k;
+    const __m512i limit = _mm512_set1_epi64(bound);
+    for (; k + 8 <= n; k += 8) {
+        const __m512i block = _mm512_loadu_si512(x + k);
+        const auto below = static_cast<unsigned>(_mm512_cmplt_epi64_mask(block, limit));
+        if (below != 0xFFu)
+            return k + static_cast<size_t>(std::countr_one(below));
+    }
+    while (k < n && x[k] < bound)
+        ++k;
+    return k;
+}
+
+COINCFINDER_TARGET("avx512f")
+long long countAvx512(std::span<const long long> ch1, std::span<const long long> ch2,
+                      long long coincWindowPs, long long delayPs) {
+    const long long *a = ch1.data();
+    const long long *b = ch2.data();
+    const size_t n1 = ch1.size();
+    const size_t n2 = ch2.size();
+    long long count = 0;
+    size_t i = 0;
+    size_t j = 0;
+    while (i < n1 && j < n2) {
+        const long long diff = a[i] - delayPs - b[j];
+        if (diff < -coincWindowPs) {
+            i = skipBelowAvx512(a, i + 1, n1, b[j] + delayPs - coincWindowPs);
+        } else if (diff > coincWindowPs) {
+            j = skipBelowAvx512(b, j + 1, n2, a[i] - delayPs - coincWindowPs);
+        } else {
+            ++count;
+            ++i;
+            ++j;
+        }
+    }
+    return count;
+}
+
+struct CpuFeatures {
+    bool avx2 = false;
+    bool avx512 = false;
+};
+
+CpuFeatures detectCpuFeatures() {
+    CpuFeatures features;
+#if defined(_MSC_VER) && !defined(__clang__)
+    int regs[4] = {};
+    __cpuid(regs, 0);
+    if (regs[0] < 7)
+        return features;
+    __cpuid(regs, 1);
+    const bool osxsave = (regs[2] & (1 << 27)) != 0;
+    if (!osxsave)
+        return features;
+    // The OS must save the YMM (and for AVX-512 the opmask/ZMM) state.
+    const unsigned long long xcr0 = _xgetbv(0);
+    __cpuidex(regs, 7, 0);
+    features.avx2 = (regs[1] & (1 << 5)) != 0 && (xcr0 & 0x6) == 0x6;
+    features.avx512 = (regs[1] & (1 << 16)) != 0 && (xcr0 & 0xE6) == 0xE6;
+#else
+    __builtin_cpu_init();
+    features.avx2 = __builtin_cpu_supports("avx2");
+    features.avx512 = __builtin_cpu_supports("avx512f");
+#endif
+    return features;
+}
+
+#endif // COINCFINDER_X86_KERNELS
+
+bool cpuSupports(CoincidenceKernel kernel) {
+#if defined(COINCFINDER_X86_KERNELS)
+    static const CpuFeatures features = detectCpuFeatures();
+    if (kernel == CoincidenceKernel::Avx2)
+        return features.avx2;
+    if (kernel == CoincidenceKernel::Avx512)
+        return features.avx512;
+#else
+    if (kernel == CoincidenceKernel::Avx2 || kernel == CoincidenceKernel::Avx512)
+        return false;
+#endif
+    return true;
+}
+
+} // namespace
+
+bool coincidenceKernelAvailable(CoincidenceKernel kernel) { return cpuSupports(kernel); }
+
+std::vector<CoincidenceKernel> availableCoincidenceKernels() {
+    std::vector<CoincidenceKernel> kernels;
+    for (const auto kernel : {CoincidenceKernel::Scalar, CoincidenceKernel::Branchless,
+                              CoincidenceKernel::Avx2, CoincidenceKernel::Avx512})
+        if (cpuSupports(kernel))
+            kernels.push_back(kernel);
+    return kernels;
+}
+
+CoincidenceKernel defaultCoincidenceKernel() {
+    static const CoincidenceKernel kernel = cpuSupports(CoincidenceKernel::Avx512)
+                                                ? CoincidenceKernel::Avx512
+                                            : cpuSupports(CoincidenceKernel::Avx2)
+                                                ? CoincidenceKernel::Avx2
+                                                : CoincidenceKernel::Branchless;
+    return kernel;
+}
+
+CoincidenceKernel selectCoincidenceKernel(size_t size1, size_t size2) {
+    const size_t small = std::min(size1, size2);
+    const size_t large = std::max(size1, size2);
+    return large >= kVectorKernelMinRatio * small ? defaultCoincidenceKernel()
+                                                  : CoincidenceKernel::Branchless;
+}
+
+const char *coincidenceKernelName(CoincidenceKernel kernel) {
+    switch (kernel) {
+    case CoincidenceKernel::Auto:
+        return "auto";
+    case CoincidenceKernel::Scalar:
+        return "scalar";
+    case CoincidenceKernel::Branchless:
+        return "branchless";
+    case CoincidenceKernel::Avx2:
+        return "avx2";
+    case CoincidenceKernel::Avx512:
+        return "avx512";
+    }
+    return "unknown";
+}
+
+long long countCoincidencesWithKernel(std::span<const long long> ch1,
+                                      std::span<const long long> ch2,
+                                      long long coincWindowPs, long long delayPs,
+                                      CoincidenceKernel kernel) {
+    if (kernel == CoincidenceKernel::Auto)
+        kernel = selectCoincidenceKernel(ch1.size(), ch2.size());
+    else if (!cpuSupports(kernel))
+        throw std::invalid_argument(std::string("coincidence kernel '") +
+                                    coincidenceKernelName(kernel) +
+                                    "' is not supported on this CPU");
+    switch (kernel) {
+    case CoincidenceKernel::Branchless:
+        return countBranchless(ch1, ch2, coincWindowPs, delayPs);
+#if defined(COINCFINDER_X86_KERNELS)
+    case CoincidenceKernel::Avx2:
+        return countAvx2(ch1, ch2, coincWindowPs, delayPs);
+    case CoincidenceKernel::Avx512:
+        return countAvx512(ch1, ch2, coincWindowPs, delayPs);
+#endif
+    default:
+        return countScalar(ch1, ch2, coincWindowPs, delayPs);
+    }
+}
@@ -6,9 +6,18 @@
 
 #include <algorithm>
 #include <cmath>
+#include <deque>
 #include <iostream>
 #include <stdexcept>
 
+#include "CoincidenceKernels.h"
+#include "CrossCorrelation.h"
+#include "DelaySearch.h"
+
+#if defined(COINCFINDER_WITH_OPENMP)
+#include <omp.h>
+#endif
+
 namespace {
 constexpr long long kPicosecondsPerNanosecond = 1000LL;
 
@@ -59,123 +68,338 @@ appendNextFirstEvent(const std::vector<long long> &currentSecond,
 int countCoincidencesWithDelay(std::span<const long long> ch1,
                                std::span<const long long> ch2,
                                long long coincWindowPs, long long delayPs) {
-    // The window is symmetric around zero and expressed as a half-width to keep
-    // the math tight.
-    const long long lowerBound = -coincWindowPs;
-    const long long upperBound = coincWindowPs;
-
-    int count = 0;
-    size_t i = 0;
-    size_t j = 0;
-    const size_t size1 = ch1.size();
-    const size_t size2 = ch2.size();
-
-    while (i < size1 && j < size2) {
-        const long long shifted = ch1[i] - delayPs;
-        const long long diff = shifted - ch2[j];
-
-        // Classic two-pointer sweep over sorted timestamps.
-        if (diff < lowerBound) {
-            ++i;
-        } else if (diff > upperBound) {
-            ++j;
-        } else {
-            ++count;
-            ++i;
-            ++j;
+    // Greedy two-pointer sweep over sorted timestamps; the kernel (branchless
+    // or vectorised skips) is picked from the CPU and the channel sizes.
+    return static_cast<int>(countCoincidencesWithKernel(ch1, ch2, coincWindowPs, delayPs,
+                                                        CoincidenceKernel::Auto));
+}
+
+void countCoincidencesBatch(std::span<const CoincidenceQuery> queries,
+                            long long coincWindowPs,
+                            std::span<long long> counts, int threads) {
+    if (counts.size() != queries.size())
+        throw std::invalid_argument("counts size must match queries size");
+    const long long total = static_cast<long long>(queries.size());
+    // Only read by the OpenMP pragma, so unused in a serial build.
+#if defined(COINCFINDER_WITH_OPENMP)
+    const int defaultThreads = omp_get_max_threads();
+#else
+    const int defaultThreads = 1;
+#endif
+    [[maybe_unused]] const int threadCount = threads > 0 ? threads : defaultThreads;
+
+    // Each query is an independent two-pointer sweep, so dynamic scheduling
+    // keeps threads busy when channel rates differ a lot between pairs.
+#pragma omp parallel for schedule(dynamic) num_threads(threadCount) if (total > 1)
+    for (long long q = 0; q < total; ++q) {
+        const CoincidenceQuery &query = queries[static_cast<size_t>(q)];
+        counts[static_cast<size_t>(q)] = countCoincidencesWithDelay(
+            query.channelA, query.channelB, coincWindowPs, query.delayPs);
+    }
+}
+
+CoincidenceBackground
+countCoincidencesWithBackground(std::span<const long long> ch1,
+                                std::span<const long long> ch2,
+                                long long coincWindowPs, long long delayPs,
+                                std::span<const long long> sideOffsetsPs,
+                                long long durationPs) {
+    // Per ch1 event, each window skips the ch2 events that are too early for
+    // it and takes the next one if it is close enough: the same greedy
+    // matching as the two-pointer loop, so window 0 equals
+    // countCoincidencesWithDelay.
+    const size_t windows = 1 + sideOffsetsPs.size();
+    std::vector<long long> delays(windows, delayPs);
+    for (size_t k = 0; k < sideOffsetsPs.size(); ++k)
+        delays[k + 1] += sideOffsetsPs[k];
+    std::vector<size_t> cursor(windows, 0);
+    std::vector<long long> counts(windows, 0);
+    for (const long long t1 : ch1)
+        for (size_t k = 0; k < windows; ++k) {
+            size_t &j = cursor[k];
+            const long long shifted = t1 - delays[k];
+            while (j < ch2.size() && shifted - ch2[j] > coincWindowPs)
+                ++j;
+            if (j < ch2.size() && shifted - ch2[j] >= -coincWindowPs) {
+                ++counts[k];
+                ++j;
+            }
+        }
+
+    CoincidenceBackground result;
+    result.counts = counts[0];
+    if (!ch1.empty() && !ch2.empty()) {
+        const long long spanPs = std::max(ch1.back(), ch2.back()) -
+                                 std::min(ch1.front(), ch2.front());
+        const double T = static_cast<double>(durationPs > 0 ? durationPs : spanPs);
+        if (T > 0.0) {
+            const double n1 = static_cast<double>(ch1.size());
+            const double n2 = static_cast<double>(ch2.size());
+            result.accidentals = n1 * n2 * static_cast<double>(2 * coincWindowPs + 1) / T;
         }
     }
-    return count;
+    result.sideWindows = sideOffsetsPs.size();
+    if (result.sideWindows > 0) {
+        long long sideTotal = 0;
+        for (size_t k = 1; k < windows; ++k)
+            sideTotal += counts[k];
+        const double k = static_cast<double>(result.sideWindows);
+        result.background = static_cast<double>(sideTotal) / k;
+        result.backgroundError = std::sqrt(static_cast<double>(sideTotal)) / k;
+    } else {
+        result.background = result.accidentals;
+        result.backgroundError =
+            result.accidentals > 0.0
+                ? result.accidentals * std::sqrt(1.0 / static_cast<double>(ch1.size()) +
+                                                 1.0 / static_cast<double>(ch2.size()))
+                : 0.0;
+    }
+    return result;
 }
 
+void countCoincidencesWithBackgroundBatch(std::span<const CoincidenceQuery> queries,
+                                          long long coincWindowPs,
+                                          std::span<const long long> sideOffsetsPs,
+                                          long long durationPs,
+                                          std::span<CoincidenceBackground> results,
+                                          int threads) {
+    if (results.size() != queries.size())
+        throw std::invalid_argument("results size must match queries size");
+    const long long total = static_cast<long long>(queries.size());
+    // Only read by the OpenMP pragma, so unused in a serial build.
+#if defined(COINCFINDER_WITH_OPENMP)
+    const int defaultThreads = omp_get_max_threads();
+#else
+    const int defaultThreads = 1;
+#endif
+    [[maybe_unused]] const int threadCount = threads > 0 ? threads : defaultThreads;
+
+#pragma omp parallel for schedule(dynamic) num_threads(threadCount) if (total > 1)
+    for (long long q = 0; q < total; ++q) {
+        const CoincidenceQuery &query = queries[static_cast<size_t>(q)];
+        results[static_cast<size_t>(q)] = countCoincidencesWithBackground(
+            query.channelA, query.channelB, coincWindowPs, query.delayPs, sideOffsetsPs,
+            durationPs);
+    }
+}
+
+namespace {
+
+// Streams the union of sorted channels (each shifted by its offset) in
+// (timestamp, channel) order through a binary heap of the channel heads, so
+// nothing is copied or sorted and the cost per event is O(log k).
+class KWayMerge {
+public:
+    KWayMerge(const std::vector<std::span<const long long>> &channels,
+              std::span<const long long> offsetsPs, const std::vector<bool> &active)
+        : channels_(channels), offsets_(offsetsPs), cursor_(channels.size(), 0) {
+        heap_.reserve(channels.size());
+        for (size_t idx = 0; idx < channels.size(); ++idx)
+            if (active[idx] && !channels[idx].empty())
+                heap_.push_back({channels[idx].front() + offset(idx), idx});
+        std::make_heap(heap_.begin(), heap_.end(), later);
+    }
+
+    bool next(long long &timestamp, size_t &channelIdx) {
+        if (heap_.empty())
+            return false;
+        std::pop_heap(heap_.begin(), heap_.end(), later);
+        const Head head = heap_.back();
+        timestamp = head.timestamp;
+        channelIdx = head.channelIdx;
+        if (++cursor_[channelIdx] < channels_[channelIdx].size()) {
+            heap_.back() = {channels_[channelIdx][cursor_[channelIdx]] + offset(channelIdx),
+                            channelIdx};
+            std::push_heap(heap_.begin(), heap_.end(), later);
+        } else {
+            heap_.pop_back();
+        }
+        return true;
+    }
+
+private:
+    struct Head {
+        long long timestamp;
+        size_t channelIdx;
+    };
+
+    static bool later(const Head &a, const Head &b) {
+        return a.timestamp != b.timestamp ? a.timestamp > b.timestamp
+                                          : a.channelIdx > b.channelIdx;
+    }
+
+    long long offset(size_t idx) const { return offsets_.empty() ? 0 : offsets_[idx]; }
+
+    const std::vector<std::span<const long long>> &channels_;
+    std::span<const long long> offsets_;
+    std::vector<size_t> cursor_;
+    std::vector<Head> heap_;
+};
+
+// Sliding-window N-fold detector for one channel subset: events inside the
+// window are kept with a per-channel occupancy count; once every channel is
+// present a coincidence is counted and the oldest event is consumed.
+class NFoldWindow {
+public:
+    NFoldWindow(size_t channels, long long coincWindowPs)
+        : windowPs_(coincWindowPs), freq_(channels, 0) {}
+
+    void add(long long timestamp, size_t localIdx) {
+        window_.push_back({timestamp, localIdx});
+        if (++freq_[localIdx] == 1)
+            ++have_;
+        while (window_.size() > 1 && timestamp - window_.front().timestamp > windowPs_)
+            dropOldest();
+        if (have_ == freq_.size()) {
+            ++count_;
+            dropOldest();
+        }
+    }
+
+    long long count() const { return count_; }
+
+private:
+    struct Event {
+        long long timestamp;
+        size_t localIdx;
+    };
+
+    void dropOldest() {
+        if (--freq_[window_.front().localIdx] == 0)
+            --have_;
+        window_.pop_front();
+    }
+
+    long long windowPs_;
+    std::vector<int> freq_;
+    std::deque<Event> window_;
+    size_t have_ = 0;
+    long long count_ = 0;
+};
+
+} // namespace
+
 int countNFoldCoincidences(const std::vector<std::span<const long long>> &channels,
                            long long coincWindowPs,
                            std::span<const long long> offsetsPs) {
     if (channels.size() < 2)
         throw std::invalid_argument("At least two channels required for coincidences");
+    std::vector<std::vector<size_t>> all(1);
+    for (size_t idx = 0; idx < channels.size(); ++idx)
+        all[0].push_back(idx);
+    return static_cast<int>(
+        countNFoldCoincidencesForSubsets(channels, all, coincWindowPs, offsetsPs)[0]);
+}
+
+std::vector<long long> countNFoldCoincidencesForSubsets(
+    const std::vector<std::span<const long long>> &channels,
+    const std::vector<std::vector<size_t>> &subsets, long long coincWindowPs,
+    std::span<const long long> offsetsPs) {
     if (!offsetsPs.empty() && offsetsPs.size() != channels.size())
         throw std::invalid_argument("offsets size must match channels size");
-    if (channels.size() == 2 && offsetsPs.empty())
-        return countCoincidencesWithDelay(channels[0], channels[1], coincWindowPs, 0);
-
-    struct Tagged {
-        long long timestamp;
-        size_t channelIdx;
-    };
 
-    size_t totalEvents = 0;
-    for (auto span : channels)
-        totalEvents += span.size();
-    if (totalEvents == 0)
-        return 0;
-
-    std::vector<Tagged> merged;
-    merged.reserve(totalEvents);
-    for (size_t idx = 0; idx < channels.size(); ++idx) {
-        const long long offset = offsetsPs.empty() ? 0 : offsetsPs[idx];
-        for (long long ts : channels[idx])
-            merged.push_back({ts + offset, idx});
-    }
-    std::sort(merged.begin(), merged.end(),
-              [](const Tagged &a, const Tagged &b) { return a.timestamp < b.timestamp; });
-
-    std::vector<int> freq(channels.size(), 0);
-    size_t have = 0;
-    size_t left = 0;
-    int coincidences = 0;
-
-    for (size_t right = 0; right < merged.size(); ++right) {
-        const size_t idx = merged[right].channelIdx;
-        if (++freq[idx] == 1)
-            ++have;
-
-        while (merged[right].timestamp - merged[left].timestamp > coincWindowPs &&
-               left < right) {
-            const size_t lidx = merged[left].channelIdx;
-            if (--freq[lidx] == 0)
-                --have;
-            ++left;
+    std::vector<long long> counts(subsets.size(), 0);
+    // Per channel: (window, position within its subset) of every streamed subset.
+    std::vector<std::vector<std::pair<size_t, size_t>>> members(channels.size());
+    std::vector<NFoldWindow> windows;
+    std::vector<size_t> windowSubset;
+    std::vector<bool> active(channels.size(), false);
+    for (size_t s = 0; s < subsets.size(); ++s) {
+        const auto &subset = subsets[s];
+        if (subset.size() < 2)
+            throw std::invalid_argument("At least two channels required for coincidences");
+        std::vector<bool> seen(channels.size(), false);
+        for (const size_t idx : subset) {
+            if (idx >= channels.size())
+                throw std::out_of_range("subset channel index out of range");
+            if (seen[idx])
+                throw std::invalid_argument("subset lists a channel twice");
+            seen[idx] = true;
+        }
+        // Plain pairs keep the one-to-one matcher, as countNFoldCoincidences
+        // always has.
+        if (subset.size() == 2 && offsetsPs.empty()) {
+            counts[s] = countCoincidencesWithDelay(channels[subset[0]], channels[subset[1]],
+                                                   coincWindowPs, 0);
+            continue;
+        }
+        for (size_t local = 0; local < subset.size(); ++local) {
+            members[subset[local]].push_back({windows.size(), local});
+            active[subset[local]] = true;
         }
+        windows.emplace_back(subset.size(), coincWindowPs);
+        windowSubset.push_back(s);
+    }
+    if (windows.empty())
+        return counts;
+
+    KWayMerge merge(channels, offsetsPs, active);
+    long long timestamp = 0;
+    size_t channelIdx = 0;
+    while (merge.next(timestamp, channelIdx))
+        for (const auto &[window, local] : members[channelIdx])
+            windows[window].add(timestamp, local);
+
+    for (size_t w = 0; w < windows.size(); ++w)
+        counts[windowSubset[w]] = windows[w].count();
+    return counts;
+}
 
-        if (have == channels.size()) {
-            ++coincidences;
-            const size_t lidx = merged[left].channelIdx;
-            if (--freq[lidx] == 0)
-                --have;
-            ++left;
+std::vector<long long> countCoincidencePatterns(
+    const std::vector<std::span<const long long>> &channels, long long coincWindowPs,
+    std::span<const long long> offsetsPs, bool exact) {
+    const size_t n = channels.size();
+    if (n > kMaxPatternChannels)
+        throw std::invalid_argument("at most 16 channels per pattern count");
+    if (!offsetsPs.empty() && offsetsPs.size() != n)
+        throw std::invalid_argument("offsets size must match channels");
+
+    std::vector<long long> counts(size_t{1} << n, 0);
+    KWayMerge merge(channels, offsetsPs, std::vector<bool>(n, true));
+    long long timestamp = 0;
+    size_t channelIdx = 0;
+    long long windowEnd = 0;
+    size_t pattern = 0;
+    while (merge.next(timestamp, channelIdx)) {
+        if (pattern != 0 && timestamp > windowEnd) {
+            ++counts[pattern];
+            pattern = 0;
         }
+        if (pattern == 0)
+            windowEnd = timestamp + coincWindowPs;
+        pattern |= size_t{1} << channelIdx;
     }
+    if (pattern != 0)
+        ++counts[pattern];
+    if (exact)
+        return counts;
+
+    // Superset sums: afterwards counts[m] adds up every pattern containing m.
+    for (size_t bit = 1; bit < counts.size(); bit <<= 1)
+        for (size_t mask = 0; mask < counts.size(); ++mask)
+            if ((mask & bit) == 0)
+                counts[mask] += counts[mask | bit];
+    return counts;
+}
 
-    return coincidences;
+size_t delayScanSteps(long long delayStartPs, long long delayEndPs,
+                      long long delayStepPs) {
+    return buildConfig(delayStartPs, delayEndPs, delayStepPs).steps;
 }
 
-void computeCoincidencesForRange(std::span<const long long> channel1,
-                                 std::span<const long long> channel2,
-                                 long long coincWindowPs,
-                                 long long delayStartPs, long long delayEndPs,
-                                 long long delayStepPs,
-                                 std::vector<std::pair<float, int>> &results) {
-    results.clear();
+void accumulateDelayDifferences(std::span<const long long> channel1,
+                                std::span<const long long> channel2,
+                                long long coincWindowPs,
+                                long long delayStartPs, long long delayEndPs,
+                                long long delayStepPs,
+                                std::span<long long> diff) {
     const DelayScanConfig config =
         buildConfig(delayStartPs, delayEndPs, delayStepPs);
-    if (config.steps == 0)
+    if (diff.size() != config.steps + 1)
+        throw std::invalid_argument("diff size must be the number of delay steps + 1");
+    if (config.steps == 0 || channel1.empty() || channel2.empty())
         return;
 
-    results.resize(config.steps);
-    if (channel1.empty() || channel2.empty()) {
-        // Exit when either channel has no events.
-        for (size_t idx = 0; idx < config.steps; ++idx) {
-            const long long delayPs =
-                config.startPs + static_cast<long long>(idx) * config.stepPs;
-            results[idx] = {static_cast<float>(delayPs) /
-                                kPicosecondsPerNanosecond,
-                            0};
-        }
-        return;
-    }
-
-    // Difference array (size = steps + 1 so "end + 1" stays in-bounds).
-    std::vector<long long> diff(config.steps + 1, 0);
     size_t jLo = 0;
     size_t jHi = 0;
     const long long minNeeded = config.startPs - coincWindowPs;
@@ -217,19 +441,113 @@ void computeCoincidencesForRange(std::span<const long long> channel1,
             diff[idxEnd + 1] -= 1;
         }
     }
+}
+
+void computeCoincidenceCountsForRange(std::span<const long long> channel1,
+                                      std::span<const long long> channel2,
+                                      long long coincWindowPs,
+                                      long long delayStartPs,
+                                      long long delayEndPs,
+                                      long long delayStepPs,
+                                      std::span<long long> counts) {
+    const DelayScanConfig config =
+        buildConfig(delayStartPs, delayEndPs, delayStepPs);
+    if (counts.size() != config.steps)
+        throw std::invalid_argument("counts size must match the number of delay steps");
+    std::fill(counts.begin(), counts.end(), 0);
+    if (config.steps == 0 || channel1.empty() || channel2.empty())
+        return;
+
+    // Difference array (size = steps + 1 so "end + 1" stays in-bounds).
+    std::vector<long long> diff(config.steps + 1, 0);
+    accumulateDelayDifferences(channel1, channel2, coincWindowPs, delayStartPs,
+                               delayEndPs, delayStepPs, diff);
 
     // Prefix-sum the diff array to convert it into actual coincidence counts.
     long long running = 0;
     for (size_t idx = 0; idx < config.steps; ++idx) {
         running += diff[idx];
+        counts[idx] = running;
+    }
+}
+
+void computeCoincidencesForRange(std::span<const long long> channel1,
+                                 std::span<const long long> channel2,
+                                 long long coincWindowPs,
+                                 long long delayStartPs, long long delayEndPs,
+                                 long long delayStepPs,
+                                 std::vector<std::pair<float, int>> &results) {
+    results.clear();
+    const DelayScanConfig config =
+        buildConfig(delayStartPs, delayEndPs, delayStepPs);
+    if (config.steps == 0)
+        return;
+
+    std::vector<long long> counts(config.steps);
+    computeCoincidenceCountsForRange(channel1, channel2, coincWindowPs,
+                                     delayStartPs, delayEndPs, delayStepPs,
+                                     counts);
+    results.resize(config.steps);
+    for (size_t idx = 0; idx < config.steps; ++idx) {
         const long long delayPs =
             config.startPs + static_cast<long long>(idx) * config.stepPs;
         results[idx] = {static_cast<float>(delayPs) /
                             kPicosecondsPerNanosecond,
-                        static_cast<int>(running)};
+                        static_cast<int>(counts[idx])};
     }
 }
 
+namespace {
+
+// Index of the first maximum, matching the sweep's tie-breaking.
+size_t firstMaximum(std::span<const long long> counts) {
+    return static_cast<size_t>(std::max_element(counts.begin(), counts.end()) -
+                               counts.begin());
+}
+
+long long findBestDelayFft(std::span<const long long> reference,
+                           std::span<const long long> target,
+                           long long coincWindowPs, const DelayScanConfig &config,
+                           long long binPs, bool refine,
+                           std::vector<std::pair<float, int>> *scratchResults) {
+    // The histogram is wanted at full resolution; otherwise evaluate the
+    // correlation only on the (coarse) bin grid.
+    const long long gridPs = scratchResults ? config.stepPs : binPs;
+    std::vector<long long> counts(delayScanSteps(config.startPs, config.endPs, gridPs));
+    computeCoincidenceCountsFft(reference, target, coincWindowPs, config.startPs,
+                                config.endPs, gridPs, counts, binPs);
+    long long bestDelayPs =
+        config.startPs + static_cast<long long>(firstMaximum(counts)) * gridPs;
+
+    if (refine) {
+        const long long lo = std::max(config.startPs, bestDelayPs - 2 * binPs);
+        const long long hi = std::min(config.endPs, bestDelayPs + 2 * binPs);
+        std::vector<long long> exact(delayScanSteps(lo, hi, config.stepPs));
+        computeCoincidenceCountsForRange(reference, target, coincWindowPs, lo, hi,
+                                         config.stepPs, exact);
+        bestDelayPs = lo + static_cast<long long>(firstMaximum(exact)) * config.stepPs;
+        if (scratchResults) {
+            const auto offset = static_cast<size_t>((lo - config.startPs) / config.stepPs);
+            std::copy(exact.begin(), exact.end(),
+                      counts.begin() + static_cast<std::ptrdiff_t>(offset));
+        }
+    }
+
+    if (scratchResults) {
+        scratchResults->resize(counts.size());
+        for (size_t idx = 0; idx < counts.size(); ++idx) {
+            const long long delayPs =
+                config.startPs + static_cast<long long>(idx) * config.stepPs;
+            (*scratchResults)[idx] = {static_cast<float>(delayPs) /
+                                          kPicosecondsPerNanosecond,
+                                      static_cast<int>(counts[idx])};
+        }
+    }
+    return bestDelayPs;
+}
+
+} // namespace
+
 long long findBestDelayPicoseconds(
     std::span<const long long> reference,
     std::span<const long long> target,
@@ -237,7 +555,28 @@ long long findBestDelayPicoseconds(
     long long delayStartPs,
     long long delayEndPs,
     long long delayStepPs,
-    std::vector<std::pair<float, int>> *scratchResults) {
+    std::vector<std::pair<float, int>> *scratchResults,
+    DelayScanMethod method, bool refine) {
+    if (method == DelayScanMethod::Hierarchical) {
+        if (scratchResults)
+            scratchResults->clear();
+        return findDelayPeak(reference, target, coincWindowPs, delayStartPs,
+                             delayEndPs, delayStepPs)
+            .delayPs;
+    }
+    const DelayScanConfig config =
+        buildConfig(delayStartPs, delayEndPs, delayStepPs);
+    if (method != DelayScanMethod::Sweep && config.steps > 0) {
+        const FftPeakSearchPlan plan =
+            planFftPeakSearch(reference, target, coincWindowPs, delayStartPs,
+                              delayEndPs, delayStepPs);
+        if (method == DelayScanMethod::Auto)
+            method = plan.beatsSweep ? DelayScanMethod::Fft : DelayScanMethod::Sweep;
+        if (method == DelayScanMethod::Fft)
+            return findBestDelayFft(reference, target, coincWindowPs, config,
+                                    plan.binPs, refine, scratchResults);
+    }
+
     std::vector<std::pair<float, int>> local;
     std::vector<std::pair<float, int>> &results =
         scratchResults ? *scratchResults : local;
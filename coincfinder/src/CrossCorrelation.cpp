@@ -0,0 +1,377 @@
+#include "CrossCorrelation.h"
+
+// Overlap-save cross-correlation. For a lag range of M bins the FFT size N is
+// the next power of two >= 3M; channel 1 is cut into blocks of N - M + 1 bins
+// and each block is correlated with the N bins of channel 2 it can reach.
+// Block spectra are summed and transformed back once. Both real signals share
+// one complex FFT (channel 1 in the real part, channel 2 in the imaginary
+// part), and blocks without events in either channel are skipped, so sparse
+// recordings only pay for occupied blocks.
+//
+// The work is proportional to the number of bins the recording spans, not to
+// the number of event pairs, so the FFT only pays off on a grid much coarser
+// than the mean gap between events of one channel. A peak search therefore
+// picks its grid from the cost model below (FFT plus the exact re-scan of
+// the bins around the coarse peak) rather than from the delay step.
+
+#include <algorithm>
+#include <cmath>
+#include <complex>
+#include <limits>
+#include <stdexcept>
+
+#if defined(COINCFINDER_WITH_OPENMP)
+#include <omp.h>
+#endif
+
+namespace {
+
+using Complex = std::complex<double>;
+
+// Largest lag range handled in one FFT; longer scans use coarser bins.
+constexpr long long kMaxCorrelationLags = 1LL << 20;
+// Cost of one FFT point-stage relative to one swept pair (~4 ns vs ~20 ns in
+// Testing/BenchDelayScan.cpp); only the order of magnitude matters.
+constexpr double kFftCostPerPointStage = 0.2;
+
+long long floorDiv(long long a, long long b) {
+    const long long q = a / b;
+    return (a % b != 0 && (a < 0) != (b < 0)) ? q - 1 : q;
+}
+
+std::size_t nextPowerOfTwo(std::size_t n) {
+    std::size_t p = 1;
+    while (p < n)
+        p <<= 1;
+    return p;
+}
+
+// Blocks of at least 2M bins keep the overlap (M bins per block transformed
+// twice) at most a third of the work.
+std::size_t fftSizeForLags(std::size_t lags) {
+    return nextPowerOfTwo(std::max<std::size_t>(3 * lags, 64));
+}
+
+// Event counts and time span of a scan's inputs, for the cost model.
+struct ScanShape {
+    double n1;
+    double n2;
+    double spanPs;
+};
+
+ScanShape scanShape(std::span<const long long> channel1,
+                    std::span<const long long> channel2) {
+    return {static_cast<double>(channel1.size()), static_cast<double>(channel2.size()),
+            static_cast<double>(std::max(channel1.back(), channel2.back()) -
+                                std::min(channel1.front(), channel2.front()) + 1)};
+}
+
+// Swept pairs plus histogram steps (one unit each).
+double sweepCost(const ScanShape &shape, double reachPs, double steps) {
+    return shape.n1 + shape.n2 + steps +
+           shape.n1 * shape.n2 * std::min(1.0, reachPs / shape.spanPs);
+}
+
+// Occupied blocks times the transform and spectrum work of one block.
+double fftCost(const ScanShape &shape, double reachPs, double binPs) {
+    const double lags = reachPs / binPs + 6.0;
+    const double n = static_cast<double>(fftSizeForLags(static_cast<std::size_t>(lags)));
+    const double blockPs = (n - lags + 1.0) * binPs;
+    const double blocks = std::min(shape.n1, shape.spanPs / blockPs + 1.0);
+    return shape.n1 + shape.n2 +
+           blocks * n * (std::log2(n) * kFftCostPerPointStage + 2.0);
+}
+
+class Fft {
+public:
+    explicit Fft(std::size_t n) : n_(n) {
+        // Twiddles of every stage stored contiguously (stage `len` starts at
+        // index len / 2 - 1), so the butterfly loop reads them sequentially.
+        const double pi = std::acos(-1.0);
+        twiddles_.reserve(n > 0 ? n - 1 : 0);
+        for (std::size_t len = 2; len <= n; len <<= 1)
+            for (std::size_t k = 0; k < len / 2; ++k)
+                twiddles_.push_back(std::polar(1.0, -2.0 * pi * static_cast<double>(k) /
+                                                        static_cast<double>(len)));
+    }
+
+    std::size_t size() const { return n_; }
+
+    // In-place iterative radix-2 forward transform. Complex products are
+    // written out by hand: std::complex multiplication goes through the
+    // NaN-checking library routine unless -ffast-math is set.
+    void forward(std::vector<Complex> &a) const {
+        for (std::size_t i = 1, j = 0; i < n_; ++i) {
+            std::size_t bit = n_ >> 1;
+            for (; j & bit; bit >>= 1)
+                j ^= bit;
+            j ^= bit;
+            if (i < j)
+                std::swap(a[i], a[j]);
+        }
+        for (std::size_t len = 2; len <= n_; len <<= 1) {
+            const std::size_t half = len / 2;
+            const Complex *w = twiddles_.data() + (half - 1);
+            for (std::size_t i = 0; i < n_; i += len) {
+                Complex *lo = a.data() + i;
+                Complex *hi = lo + half;
+                for (std::size_t k = 0; k < half; ++k) {
+                    const double vr = hi[k].real() * w[k].real() - hi[k].imag() * w[k].imag();
+                    const double vi = hi[k].real() * w[k].imag() + hi[k].imag() * w[k].real();
+                    const double ur = lo[k].real();
+                    const double ui = lo[k].imag();
+                    lo[k] = Complex(ur + vr, ui + vi);
+                    hi[k] = Complex(ur - vr, ui - vi);
+                }
+            }
+        }
+    }
+
+    // Unnormalised inverse: conj(FFT(conj(a))).
+    void inverse(std::vector<Complex> &a) const {
+        for (auto &v : a)
+            v = std::conj(v);
+        forward(a);
+        for (auto &v : a)
+            v = std::conj(v);
+    }
+
+private:
+    std::size_t n_;
+    std::vector<Complex> twiddles_;
+};
+
+struct CorrelationBlock {
+    long long startBin;      // first channel-1 bin of the block
+    std::size_t begin1, end1; // channel-1 events in the block
+};
+
+// Cumulative distribution of the triangular kernel on [-1, 1].
+double triangularCdf(double x) {
+    if (x <= -1.0)
+        return 0.0;
+    if (x <= 0.0)
+        return 0.5 * (x + 1.0) * (x + 1.0);
+    if (x < 1.0)
+        return 1.0 - 0.5 * (1.0 - x) * (1.0 - x);
+    return 1.0;
+}
+
+void checkBin(long long binPs) {
+    if (binPs <= 0)
+        throw std::invalid_argument("correlation bin must be positive in ps");
+}
+
+} // namespace
+
+void crossCorrelateBinned(std::span<const long long> channel1,
+                          std::span<const long long> channel2, long long binPs,
+                          long long lagMinBins, std::span<double> out) {
+    checkBin(binPs);
+    std::fill(out.begin(), out.end(), 0.0);
+    if (out.empty() || channel1.empty() || channel2.empty())
+        return;
+
+    const auto lags = static_cast<long long>(out.size());
+    const long long lagMaxBins = lagMinBins + lags - 1;
+    const long long origin = std::min(channel1.front(), channel2.front());
+    const Fft fft(fftSizeForLags(out.size()));
+    const auto n = static_cast<long long>(fft.size());
+    const long long blockBins = n - lags + 1;
+
+    // Group channel-1 events by block; everything below is per block.
+    std::vector<CorrelationBlock> blocks;
+    for (std::size_t i = 0; i < channel1.size();) {
+        const long long startBin = (channel1[i] - origin) / binPs / blockBins * blockBins;
+        const long long endPs = origin + (startBin + blockBins) * binPs;
+        const std::size_t end = static_cast<std::size_t>(
+            std::lower_bound(channel1.begin() + static_cast<std::ptrdiff_t>(i),
+                             channel1.end(), endPs) -
+            channel1.begin());
+        blocks.push_back({startBin, i, end});
+        i = end;
+    }
+
+    std::vector<Complex> total(fft.size());
+#pragma omp parallel
+    {
+        std::vector<Complex> spectrum(fft.size());
+        std::vector<Complex> z(fft.size());
+#pragma omp for schedule(dynamic)
+        for (std::ptrdiff_t b = 0; b < static_cast<std::ptrdiff_t>(blocks.size()); ++b) {
+            const CorrelationBlock &block = blocks[static_cast<std::size_t>(b)];
+            // Channel-2 bins [lo, lo + n) pair with this block at every lag.
+            const long long lo = block.startBin - lagMaxBins;
+            const auto first2 = std::lower_bound(channel2.begin(), channel2.end(),
+                                                 origin + lo * binPs);
+            const auto last2 = std::lower_bound(first2, channel2.end(),
+                                                origin + (lo + n) * binPs);
+            if (first2 == last2)
+                continue;
+
+            std::fill(z.begin(), z.end(), Complex{});
+            for (std::size_t i = block.begin1; i < block.end1; ++i)
+                z[static_cast<std::size_t>((channel1[i] - origin) / binPs - block.startBin)] += 1.0;
+            for (auto it = first2; it != last2; ++it)
+                z[static_cast<std::size_t>(floorDiv(*it - origin, binPs) - lo)] += Complex(0.0, 1.0);
+            fft.forward(z);
+
+            // Split the packed spectrum: X = (Z[f] + conj Z[-f]) / 2 and
+            // Y = (Z[f] - conj Z[-f]) / 2i; accumulate conj(X) * Y.
+            for (std::size_t f = 0; f < fft.size(); ++f) {
+                const Complex mirrored = std::conj(z[(fft.size() - f) & (fft.size() - 1)]);
+                const double xr = 0.5 * (z[f].real() + mirrored.real());
+                const double xi = 0.5 * (z[f].imag() + mirrored.imag());
+                const double yr = 0.5 * (z[f].imag() - mirrored.imag());
+                const double yi = -0.5 * (z[f].real() - mirrored.real());
+                spectrum[f] += Complex(xr * yr + xi * yi, xr * yi - xi * yr);
+            }
+        }
+#pragma omp critical
+        for (std::size_t f = 0; f < fft.size(); ++f)
+            total[f] += spectrum[f];
+    }
+
+    // r[m] = sum_i x[i] y[i + m] belongs to lag lagMax - m.
+    fft.inverse(total);
+    const double scale = 1.0 / static_cast<double>(fft.size());
+    for (long long m = 0; m < lags; ++m)
+        out[static_cast<std::size_t>(lags - 1 - m)] =
+            std::max(0.0, std::round(total[static_cast<std::size_t>(m)].real() * scale));
+}
+
+long long defaultCorrelationBinPs(long long coincWindowPs, long long delayStartPs,
+                                  long long delayEndPs, long long delayStepPs) {
+    if (delayStepPs <= 0)
+        throw std::invalid_argument("delayStep must be positive in ps");
+    const long long reachPs =
+        std::max(0LL, delayEndPs - delayStartPs) + 2 * std::max(0LL, coincWindowPs);
+    const long long usableLags = kMaxCorrelationLags - 8;
+    const long long perBin = delayStepPs * usableLags;
+    return delayStepPs * std::max(1LL, (reachPs + perBin - 1) / perBin);
+}
+
+void computeCoincidenceCountsFft(std::span<const long long> channel1,
+                                 std::span<const long long> channel2,
+                                 long long coincWindowPs, long long delayStartPs,
+                                 long long delayEndPs, long long delayStepPs,
+                                 std::span<long long> counts, long long binPs) {
+    const size_t steps = delayScanSteps(delayStartPs, delayEndPs, delayStepPs);
+    if (counts.size() != steps)
+        throw std::invalid_argument("counts size must match the number of delay steps");
+    std::fill(counts.begin(), counts.end(), 0);
+    if (steps == 0 || channel1.empty() || channel2.empty())
+        return;
+    if (binPs == 0)
+        binPs = defaultCorrelationBinPs(coincWindowPs, delayStartPs, delayEndPs,
+                                        delayStepPs);
+    checkBin(binPs);
+
+    // Margins cover the ±1 bin kernel and the ±0.5 ps edge correction.
+    const long long lagMin = floorDiv(delayStartPs - coincWindowPs, binPs) - 2;
+    const long long lagMax = floorDiv(delayEndPs + coincWindowPs, binPs) + 3;
+    if (lagMax - lagMin + 1 > kMaxCorrelationLags)
+        throw std::invalid_argument("delay range too wide for the correlation bin");
+    std::vector<double> correlation(static_cast<size_t>(lagMax - lagMin + 1));
+    crossCorrelateBinned(channel1, channel2, binPs, lagMin, correlation);
+
+    std::vector<double> prefix(correlation.size() + 1, 0.0);
+    for (size_t k = 0; k < correlation.size(); ++k)
+        prefix[k + 1] = prefix[k] + correlation[k];
+
+    const double bin = static_cast<double>(binPs);
+    auto weighted = [&](long long k, double xa, double xb) {
+        if (k < lagMin || k > lagMax)
+            return 0.0;
+        const double kd = static_cast<double>(k);
+        return correlation[static_cast<size_t>(k - lagMin)] *
+               (triangularCdf(xb - kd) - triangularCdf(xa - kd));
+    };
+
+    for (size_t idx = 0; idx < steps; ++idx) {
+        const long long delayPs = delayStartPs + static_cast<long long>(idx) * delayStepPs;
+        // Integer delays in [d - w, d + w] cover the continuous [-0.5, +0.5] wider range.
+        const double xa = (static_cast<double>(delayPs - coincWindowPs) - 0.5) / bin;
+        const double xb = (static_cast<double>(delayPs + coincWindowPs) + 0.5) / bin;
+        const auto kLo = static_cast<long long>(std::floor(xa)) - 1;
+        const auto kHi = static_cast<long long>(std::ceil(xb)) + 1;
+        // Bins whose whole kernel lies inside the window count fully.
+        const auto fullLo = std::max(static_cast<long long>(std::ceil(xa + 1.0)), lagMin);
+        const auto fullHi = std::min(static_cast<long long>(std::floor(xb - 1.0)), lagMax);
+
+        double sum = 0.0;
+        if (fullLo <= fullHi) {
+            sum += prefix[static_cast<size_t>(fullHi - lagMin + 1)] -
+                   prefix[static_cast<size_t>(fullLo - lagMin)];
+            for (long long k = kLo; k < fullLo; ++k)
+                sum += weighted(k, xa, xb);
+            for (long long k = fullHi + 1; k <= kHi; ++k)
+                sum += weighted(k, xa, xb);
+        } else {
+            for (long long k = kLo; k <= kHi; ++k)
+                sum += weighted(k, xa, xb);
+        }
+        counts[idx] = std::llround(sum);
+    }
+}
+
+DelayScanMethod chooseDelayScanMethod(std::span<const long long> channel1,
+                                      std::span<const long long> channel2,
+                                      long long coincWindowPs,
+                                      long long delayStartPs, long long delayEndPs,
+                                      long long delayStepPs, long long binPs) {
+    if (channel1.empty() || channel2.empty() || delayEndPs < delayStartPs)
+        return DelayScanMethod::Sweep;
+    if (binPs == 0)
+        binPs = defaultCorrelationBinPs(coincWindowPs, delayStartPs, delayEndPs,
+                                        delayStepPs);
+    checkBin(binPs);
+
+    const ScanShape shape = scanShape(channel1, channel2);
+    const double reachPs =
+        static_cast<double>(delayEndPs - delayStartPs + 2 * std::max(0LL, coincWindowPs));
+    const double steps =
+        static_cast<double>(delayScanSteps(delayStartPs, delayEndPs, delayStepPs));
+    return fftCost(shape, reachPs, static_cast<double>(binPs)) + steps <
+                   sweepCost(shape, reachPs, steps)
+               ? DelayScanMethod::Fft
+               : DelayScanMethod::Sweep;
+}
+
+FftPeakSearchPlan planFftPeakSearch(std::span<const long long> channel1,
+                                    std::span<const long long> channel2,
+                                    long long coincWindowPs, long long delayStartPs,
+                                    long long delayEndPs, long long delayStepPs) {
+    // Finest grid: whole steps, at least one window wide and few enough lags.
+    FftPeakSearchPlan plan;
+    plan.binPs = std::max(
+        defaultCorrelationBinPs(coincWindowPs, delayStartPs, delayEndPs, delayStepPs),
+        delayStepPs * std::max(1LL, (coincWindowPs + delayStepPs - 1) / delayStepPs));
+    if (channel1.empty() || channel2.empty() || delayEndPs < delayStartPs)
+        return plan;
+
+    const ScanShape shape = scanShape(channel1, channel2);
+    const long long windowPs = std::max(0LL, coincWindowPs);
+    const double reachPs = static_cast<double>(delayEndPs - delayStartPs + 2 * windowPs);
+    const auto stepPs = static_cast<double>(delayStepPs);
+    const double sweep = sweepCost(shape, reachPs, reachPs / stepPs);
+
+    // Coarser grids make the correlation cheaper and the re-scan of ±2 bins
+    // around its peak dearer; keep at least 16 bins across the range so the
+    // peak still stands out of its neighbours.
+    double best = std::numeric_limits<double>::infinity();
+    for (long long binPs = plan.binPs;; binPs *= 2) {
+        const auto bin = static_cast<double>(binPs);
+        const double refineReachPs = 4.0 * bin + 2.0 * static_cast<double>(windowPs);
+        const double cost = fftCost(shape, reachPs, bin) +
+                            sweepCost(shape, refineReachPs, 4.0 * bin / stepPs);
+        if (cost < best) {
+            best = cost;
+            plan.binPs = binPs;
+        }
+        if (binPs > (delayEndPs - delayStartPs) / 32)
+            break;
+    }
+    plan.beatsSweep = best < sweep;
+    return plan;
+}
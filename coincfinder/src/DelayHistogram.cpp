@@ -0,0 +1,195 @@
+#include "DelayHistogram.h"
+
+// Each chunk produces its own difference array (new events against the
+// retained tails plus the new events of the other channel); the modes only
+// differ in how that array is merged into the running total.
+
+#include <algorithm>
+#include <cmath>
+#include <cstdlib>
+#include <limits>
+#include <stdexcept>
+
+#include "Coincidences.h"
+
+namespace {
+
+// Newest timestamp of a channel that has not delivered any event yet.
+constexpr long long kNoEvents = std::numeric_limits<long long>::min();
+
+// Appends sorted `incoming` to sorted `tail`, merging if they overlap.
+void appendSorted(std::vector<long long> &tail, std::span<const long long> incoming) {
+    const auto mid = static_cast<std::ptrdiff_t>(tail.size());
+    tail.insert(tail.end(), incoming.begin(), incoming.end());
+    if (mid > 0 && !incoming.empty() && incoming.front() < tail[static_cast<size_t>(mid) - 1])
+        std::inplace_merge(tail.begin(), tail.begin() + mid, tail.end());
+}
+
+} // namespace
+
+DelayHistogram::DelayHistogram(long long coincWindowPs, long long delayStartPs,
+                               long long delayEndPs, long long delayStepPs)
+    : windowPs_(coincWindowPs), startPs_(delayStartPs), endPs_(delayEndPs),
+      stepPs_(delayStepPs),
+      steps_(delayScanSteps(delayStartPs, delayEndPs, delayStepPs)),
+      reachPs_(std::max(std::llabs(delayStartPs - coincWindowPs),
+                        std::llabs(delayEndPs + coincWindowPs))) {
+    reset();
+}
+
+void DelayHistogram::setCumulative() {
+    mode_ = Mode::Cumulative;
+    reset();
+}
+
+void DelayHistogram::setExponentialDecay(double timeConstantSeconds) {
+    if (!(timeConstantSeconds > 0.0))
+        throw std::invalid_argument("decay time constant must be positive");
+    mode_ = Mode::Exponential;
+    timeConstantPs_ = timeConstantSeconds * 1e12;
+    reset();
+}
+
+void DelayHistogram::setSlidingWindow(double seconds) {
+    if (!(seconds > 0.0))
+        throw std::invalid_argument("sliding window must be positive");
+    mode_ = Mode::Sliding;
+    slidingPs_ = std::llround(seconds * 1e12);
+    reset();
+}
+
+void DelayHistogram::reset() {
+    diff_.assign(steps_ + 1, 0);
+    decayedDiff_.assign(mode_ == Mode::Exponential ? steps_ + 1 : 0, 0.0);
+    chunks_.clear();
+    tail1_.clear();
+    tail2_.clear();
+    haveData_ = false;
+    latestPs_ = 0;
+    latest1Ps_ = kNoEvents;
+    latest2Ps_ = kNoEvents;
+    clockPs_ = 0;
+}
+
+void DelayHistogram::addChunk(std::span<const long long> channel1,
+                              std::span<const long long> channel2) {
+    if (channel1.empty() && channel2.empty())
+        return;
+    long long earliest = channel1.empty() ? channel2.front() : channel1.front();
+    long long newest = channel1.empty() ? channel2.back() : channel1.back();
+    if (!channel2.empty()) {
+        earliest = std::min(earliest, channel2.front());
+        newest = std::max(newest, channel2.back());
+    }
+
+    // Advance the data clock; a chunk in which either channel starts far
+    // before its own previous data is a new segment, so the old tails cannot
+    // pair with it.
+    const auto restarts = [this](std::span<const long long> channel, long long newestPs) {
+        return !channel.empty() && newestPs != kNoEvents && channel.front() < newestPs - reachPs_;
+    };
+    long long advancePs = 0;
+    if (haveData_ && (restarts(channel1, latest1Ps_) || restarts(channel2, latest2Ps_))) {
+        tail1_.clear();
+        tail2_.clear();
+        latest1Ps_ = kNoEvents;
+        latest2Ps_ = kNoEvents;
+        advancePs = newest - earliest;
+    } else if (haveData_) {
+        advancePs = std::max(0LL, newest - latestPs_);
+        newest = std::max(newest, latestPs_);
+    } else {
+        advancePs = newest - earliest;
+    }
+    clockPs_ += advancePs;
+
+    chunkDiff_.assign(steps_ + 1, 0);
+    std::span<const long long> combined2 = channel2;
+    if (!tail2_.empty()) {
+        scratch_.assign(tail2_.begin(), tail2_.end());
+        appendSorted(scratch_, channel2);
+        combined2 = scratch_;
+    }
+    accumulateDelayDifferences(channel1, combined2, windowPs_, startPs_, endPs_,
+                               stepPs_, chunkDiff_);
+    if (!tail1_.empty())
+        accumulateDelayDifferences(tail1_, channel2, windowPs_, startPs_, endPs_,
+                                   stepPs_, chunkDiff_);
+
+    switch (mode_) {
+    case Mode::Cumulative:
+        for (size_t i = 0; i <= steps_; ++i)
+            diff_[i] += chunkDiff_[i];
+        break;
+    case Mode::Exponential: {
+        const double factor = std::exp(-static_cast<double>(advancePs) / timeConstantPs_);
+        for (size_t i = 0; i <= steps_; ++i)
+            decayedDiff_[i] = decayedDiff_[i] * factor + static_cast<double>(chunkDiff_[i]);
+        break;
+    }
+    case Mode::Sliding:
+        for (size_t i = 0; i <= steps_; ++i)
+            diff_[i] += chunkDiff_[i];
+        chunks_.push_back({clockPs_, chunkDiff_});
+        while (!chunks_.empty() && chunks_.front().endClockPs <= clockPs_ - slidingPs_) {
+            const auto &expired = chunks_.front().diff;
+            for (size_t i = 0; i <= steps_; ++i)
+                diff_[i] -= expired[i];
+            chunks_.pop_front();
+        }
+        break;
+    }
+
+    appendSorted(tail1_, channel1);
+    appendSorted(tail2_, channel2);
+    if (!channel1.empty())
+        latest1Ps_ = std::max(latest1Ps_, channel1.back());
+    if (!channel2.empty())
+        latest2Ps_ = std::max(latest2Ps_, channel2.back());
+    latestPs_ = newest;
+    haveData_ = true;
+    trimTails();
+}
+
+void DelayHistogram::trimTails() {
+    // Later events of a channel come no earlier than its newest one, so an
+    // event of the other channel can still pair with them only within reach
+    // of that timestamp. The channels may end a chunk at different times.
+    const auto trim = [this](std::vector<long long> &tail, long long otherNewestPs) {
+        if (otherNewestPs == kNoEvents)
+            return;
+        const auto cut = std::lower_bound(tail.begin(), tail.end(), otherNewestPs - reachPs_);
+        tail.erase(tail.begin(), cut);
+    };
+    trim(tail1_, latest2Ps_);
+    trim(tail2_, latest1Ps_);
+}
+
+void DelayHistogram::counts(std::span<double> out) const {
+    if (out.size() != steps_)
+        throw std::invalid_argument("output size must match the number of bins");
+    if (mode_ == Mode::Exponential) {
+        double running = 0.0;
+        for (size_t i = 0; i < steps_; ++i)
+            out[i] = running += decayedDiff_[i];
+        return;
+    }
+    long long running = 0;
+    for (size_t i = 0; i < steps_; ++i) {
+        running += diff_[i];
+        out[i] = static_cast<double>(running);
+    }
+}
+
+std::vector<double> DelayHistogram::counts() const {
+    std::vector<double> out(steps_);
+    counts(out);
+    return out;
+}
+
+std::vector<long long> DelayHistogram::delaysPs() const {
+    std::vector<long long> delays(steps_);
+    for (size_t i = 0; i < steps_; ++i)
+        delays[i] = startPs_ + static_cast<long long>(i) * stepPs_;
+    return delays;
+}
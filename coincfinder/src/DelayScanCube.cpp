@@ -0,0 +1,155 @@
+#include "DelayScanCube.h"
+
+// The cube is written in NPY format 1.0: magic, header length, a Python dict
+// literal padded to a 64-byte boundary, then the raw C-ordered data. Since
+// the data size is known before the scan starts, each (pair, second) row has
+// a fixed offset and the blocks can be written as soon as they finish.
+
+#include <algorithm>
+#include <cstdint>
+#include <limits>
+#include <stdexcept>
+
+#include "Coincidences.h"
+
+#if defined(COINCFINDER_WITH_OPENMP)
+#include <omp.h>
+#endif
+
+namespace {
+
+constexpr std::size_t kNpyAlignment = 64;
+
+std::string npyHeader(std::size_t pairs, std::size_t seconds, std::size_t delays) {
+    std::string dict = "{'descr': '<i4', 'fortran_order': False, 'shape': (" +
+                       std::to_string(pairs) + ", " + std::to_string(seconds) + ", " +
+                       std::to_string(delays) + "), }";
+    // magic (6) + version (2) + length (2) + dict + padding + '\n'
+    const std::size_t unpadded = 10 + dict.size() + 1;
+    dict.append((kNpyAlignment - unpadded % kNpyAlignment) % kNpyAlignment, ' ');
+    dict.push_back('\n');
+
+    std::string header("\x93NUMPY\x01\x00", 8);
+    header.push_back(static_cast<char>(dict.size() & 0xFF));
+    header.push_back(static_cast<char>((dict.size() >> 8) & 0xFF));
+    return header + dict;
+}
+
+} // namespace
+
+void scanDelaysPerSecond(std::span<const SecondScanPair> pairs, long long firstSecond,
+                         long long lastSecond, long long coincWindowPs,
+                         long long delayStartPs, long long delayEndPs,
+                         long long delayStepPs, const SecondScanSink &sink,
+                         std::size_t blockSeconds, int threads) {
+    const std::size_t delays = delayScanSteps(delayStartPs, delayEndPs, delayStepPs);
+    if (pairs.empty() || lastSecond < firstSecond)
+        return;
+    blockSeconds = std::max<std::size_t>(blockSeconds, 1);
+    // Only read by the OpenMP pragma, so unused in a serial build.
+#if defined(COINCFINDER_WITH_OPENMP)
+    const int defaultThreads = omp_get_max_threads();
+#else
+    const int defaultThreads = 1;
+#endif
+    [[maybe_unused]] const int threadCount = threads > 0 ? threads : defaultThreads;
+
+    std::vector<long long> block(pairs.size() * blockSeconds * delays);
+    for (long long blockStart = firstSecond; blockStart <= lastSecond;
+         blockStart += static_cast<long long>(blockSeconds)) {
+        const auto secondsInBlock = static_cast<std::size_t>(
+            std::min<long long>(static_cast<long long>(blockSeconds),
+                                lastSecond - blockStart + 1));
+        const auto jobs = static_cast<long long>(pairs.size() * secondsInBlock);
+        std::fill(block.begin(), block.end(), 0);
+
+        // Rates differ per pair and second, so hand out jobs dynamically.
+#pragma omp parallel num_threads(threadCount) if (jobs > 1)
+        {
+            std::vector<long long> scratch;
+#pragma omp for schedule(dynamic)
+            for (long long job = 0; job < jobs; ++job) {
+                const auto p = static_cast<std::size_t>(job) / secondsInBlock;
+                const auto s = static_cast<std::size_t>(job) % secondsInBlock;
+                const SecondScanPair &pair = pairs[p];
+                if (!pair.reference || !pair.target)
+                    continue;
+                const long long second = blockStart + static_cast<long long>(s);
+                const auto &events1 = eventsForSecond(*pair.reference, second);
+                if (events1.empty())
+                    continue;
+                const std::span<const long long> events2 =
+                    appendNextFirstEvent(eventsForSecond(*pair.target, second),
+                                         eventsForSecond(*pair.target, second + 1), scratch);
+                if (events2.empty())
+                    continue;
+                computeCoincidenceCountsForRange(
+                    events1, events2, coincWindowPs, delayStartPs, delayEndPs, delayStepPs,
+                    std::span<long long>(block.data() + (p * blockSeconds + s) * delays,
+                                         delays));
+            }
+        }
+
+        for (std::size_t p = 0; p < pairs.size(); ++p)
+            for (std::size_t s = 0; s < secondsInBlock; ++s)
+                sink(p, blockStart + static_cast<long long>(s),
+                     std::span<const long long>(block.data() + (p * blockSeconds + s) * delays,
+                                                delays));
+    }
+}
+
+NpyCubeWriter::NpyCubeWriter(const std::string &path, std::size_t pairs,
+                             std::size_t seconds, std::size_t delays)
+    : out_(path, std::ios::binary | std::ios::out | std::ios::trunc), seconds_(seconds),
+      delays_(delays), row_(delays) {
+    if (!out_)
+        throw std::runtime_error("Failed to create " + path);
+    const std::string header = npyHeader(pairs, seconds, delays);
+    out_.write(header.data(), static_cast<std::streamsize>(header.size()));
+    dataOffset_ = header.size();
+    // Size the file now; untouched rows stay zero.
+    const std::size_t dataBytes = pairs * seconds * delays * sizeof(std::int32_t);
+    if (dataBytes > 0) {
+        out_.seekp(static_cast<std::streamoff>(dataOffset_ + dataBytes - 1));
+        out_.put('\0');
+    }
+    if (!out_)
+        throw std::runtime_error("Failed to size " + path);
+}
+
+void NpyCubeWriter::writeRow(std::size_t pair, std::size_t second,
+                             std::span<const long long> counts) {
+    if (counts.size() != delays_)
+        throw std::invalid_argument("row must hold one count per delay");
+    for (std::size_t i = 0; i < delays_; ++i)
+        row_[i] = static_cast<int>(std::clamp<long long>(
+            counts[i], 0, std::numeric_limits<std::int32_t>::max()));
+    const std::size_t offset = dataOffset_ + (pair * seconds_ + second) * delays_ * sizeof(int);
+    out_.seekp(static_cast<std::streamoff>(offset));
+    out_.write(reinterpret_cast<const char *>(row_.data()),
+               static_cast<std::streamsize>(row_.size() * sizeof(int)));
+    if (!out_)
+        throw std::runtime_error("Failed to write delay scan row");
+}
+
+void NpyCubeWriter::close() {
+    if (out_.is_open())
+        out_.close();
+}
+
+void writeDelayScanAxes(const std::string &path,
+                        const std::vector<std::pair<int, int>> &pairs,
+                        long long firstSecond, std::size_t seconds,
+                        long long coincWindowPs, long long delayStartPs,
+                        long long delayStepPs, std::size_t delays) {
+    std::ofstream out(path, std::ios::out | std::ios::trunc);
+    if (!out)
+        throw std::runtime_error("Failed to create " + path);
+    out << "{\"pairs\": [";
+    for (std::size_t i = 0; i < pairs.size(); ++i)
+        out << (i ? ", " : "") << "[" << pairs[i].first << ", " << pairs[i].second << "]";
+    out << "], \"first_second\": " << firstSecond << ", \"seconds\": " << seconds
+        << ", \"coinc_window_ps\": " << coincWindowPs
+        << ", \"delay_start_ps\": " << delayStartPs
+        << ", \"delay_step_ps\": " << delayStepPs << ", \"delays\": " << delays << "}\n";
+}
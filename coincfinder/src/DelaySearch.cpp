@@ -0,0 +1,171 @@
+#include "DelaySearch.h"
+
+// Level spacings are whole multiples of the final step, and every level is
+// scanned on the same `delayStartPs + i * step` grid, so refined ranges line
+// up with the coarse points they came from and the last level reproduces the
+// plain sweep exactly around the surviving peaks.
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+#include <vector>
+
+#include "CrossCorrelation.h"
+
+namespace {
+
+struct ScanPoint {
+    long long delayPs;
+    long long count;
+};
+
+void scanInto(std::span<const long long> reference, std::span<const long long> target,
+              long long windowPs, long long loPs, long long hiPs, long long stepPs,
+              DelayScanMethod method, std::vector<ScanPoint> &points) {
+    std::vector<long long> counts(delayScanSteps(loPs, hiPs, stepPs));
+    if (method == DelayScanMethod::Auto)
+        method = chooseDelayScanMethod(reference, target, windowPs, loPs, hiPs, stepPs,
+                                       stepPs);
+    if (method == DelayScanMethod::Fft)
+        computeCoincidenceCountsFft(reference, target, windowPs, loPs, hiPs, stepPs,
+                                    counts, stepPs);
+    else
+        computeCoincidenceCountsForRange(reference, target, windowPs, loPs, hiPs,
+                                         stepPs, counts);
+    for (size_t i = 0; i < counts.size(); ++i)
+        points.push_back({loPs + static_cast<long long>(i) * stepPs, counts[i]});
+}
+
+// Highest counts first (earliest delay on ties), skipping points within
+// `spacingPs` of one already taken.
+std::vector<long long> topPeaks(std::vector<ScanPoint> points, size_t k,
+                                long long spacingPs) {
+    std::sort(points.begin(), points.end(), [](const ScanPoint &a, const ScanPoint &b) {
+        return a.count != b.count ? a.count > b.count : a.delayPs < b.delayPs;
+    });
+    std::vector<long long> chosen;
+    for (const auto &p : points) {
+        if (chosen.size() == k)
+            break;
+        const bool nearChosen = std::any_of(chosen.begin(), chosen.end(), [&](long long d) {
+            return std::llabs(d - p.delayPs) <= spacingPs;
+        });
+        if (!nearChosen)
+            chosen.push_back(p.delayPs);
+    }
+    return chosen;
+}
+
+double medianCount(const std::vector<ScanPoint> &points) {
+    std::vector<long long> counts;
+    counts.reserve(points.size());
+    for (const auto &p : points)
+        counts.push_back(p.count);
+    const auto mid = counts.begin() + static_cast<std::ptrdiff_t>(counts.size() / 2);
+    std::nth_element(counts.begin(), mid, counts.end());
+    return static_cast<double>(*mid);
+}
+
+// Sub-step position of the maximum at `points[best]` (points sorted by delay,
+// fine step `stepPs`).
+double refinePeak(const std::vector<ScanPoint> &points, size_t best, long long stepPs,
+                  double background) {
+    auto adjacent = [&](size_t a, size_t b) {
+        return points[b].delayPs - points[a].delayPs == stepPs;
+    };
+    // A window wider than the peak gives a flat top: take its centre.
+    size_t last = best;
+    while (last + 1 < points.size() && adjacent(last, last + 1) &&
+           points[last + 1].count == points[best].count)
+        ++last;
+    if (last > best)
+        return 0.5 * static_cast<double>(points[best].delayPs + points[last].delayPs);
+    if (best == 0 || best + 1 == points.size() || !adjacent(best - 1, best) ||
+        !adjacent(best, best + 1))
+        return static_cast<double>(points[best].delayPs);
+
+    double left = static_cast<double>(points[best - 1].count) - background;
+    double centre = static_cast<double>(points[best].count) - background;
+    double right = static_cast<double>(points[best + 1].count) - background;
+    if (left > 0.0 && centre > 0.0 && right > 0.0) {
+        left = std::log(left);
+        centre = std::log(centre);
+        right = std::log(right);
+    }
+    const double curvature = left - 2.0 * centre + right;
+    if (!(curvature < 0.0))
+        return static_cast<double>(points[best].delayPs);
+    const double offset = std::clamp(0.5 * (left - right) / curvature, -0.5, 0.5);
+    return static_cast<double>(points[best].delayPs) + offset * static_cast<double>(stepPs);
+}
+
+} // namespace
+
+DelayPeak findDelayPeak(std::span<const long long> reference,
+                        std::span<const long long> target,
+                        long long coincWindowPs, long long delayStartPs,
+                        long long delayEndPs, long long delayStepPs,
+                        const DelaySearchOptions &options) {
+    const size_t steps = delayScanSteps(delayStartPs, delayEndPs, delayStepPs);
+    if (options.refineFactor < 2)
+        throw std::invalid_argument("refineFactor must be at least 2");
+    if (options.topK == 0)
+        throw std::invalid_argument("topK must be positive");
+
+    DelayPeak peak;
+    peak.delayPs = delayStartPs;
+    peak.refinedDelayPs = static_cast<double>(delayStartPs);
+    if (steps == 0)
+        return peak;
+
+    // Coarsest level first; the last entry is the requested step.
+    std::vector<long long> spacings{delayStepPs};
+    const auto maxPoints = static_cast<long long>(std::max<size_t>(options.maxCoarsePoints, 1));
+    while ((delayEndPs - delayStartPs) / spacings.back() + 1 > maxPoints)
+        spacings.push_back(spacings.back() * options.refineFactor);
+    std::reverse(spacings.begin(), spacings.end());
+
+    // Widening the window by half a step makes each coarse point cover the
+    // fine delays around it; the last level uses the requested window.
+    auto levelWindow = [&](size_t level) {
+        return level + 1 == spacings.size() ? coincWindowPs
+                                            : coincWindowPs + spacings[level] / 2;
+    };
+
+    std::vector<ScanPoint> points;
+    scanInto(reference, target, levelWindow(0), delayStartPs, delayEndPs, spacings[0],
+             spacings.size() == 1 ? DelayScanMethod::Sweep : options.coarseMethod, points);
+    peak.background = medianCount(points) * static_cast<double>(2 * coincWindowPs + 1) /
+                      static_cast<double>(2 * levelWindow(0) + 1);
+
+    for (size_t level = 1; level < spacings.size(); ++level) {
+        const long long previous = spacings[level - 1];
+        const auto candidates = topPeaks(points, options.topK, previous);
+        points.clear();
+        for (const long long centre : candidates)
+            scanInto(reference, target, levelWindow(level),
+                     std::max(delayStartPs, centre - previous),
+                     std::min(delayEndPs, centre + previous), spacings[level],
+                     DelayScanMethod::Sweep, points);
+        // Neighbouring candidates can share points.
+        std::sort(points.begin(), points.end(), [](const ScanPoint &a, const ScanPoint &b) {
+            return a.delayPs < b.delayPs;
+        });
+        points.erase(std::unique(points.begin(), points.end(),
+                                 [](const ScanPoint &a, const ScanPoint &b) {
+                                     return a.delayPs == b.delayPs;
+                                 }),
+                     points.end());
+    }
+
+    size_t best = 0;
+    for (size_t i = 1; i < points.size(); ++i)
+        if (points[i].count > points[best].count)
+            best = i;
+    peak.delayPs = points[best].delayPs;
+    peak.count = points[best].count;
+    peak.refinedDelayPs = refinePeak(points, best, delayStepPs, peak.background);
+    peak.snr = (static_cast<double>(peak.count) - peak.background) /
+               std::sqrt(std::max(peak.background, 1.0));
+    return peak;
+}
@@ -0,0 +1,57 @@
+#include "Demux.h"
+
+// Counting-sort demultiplexer. Both passes are branch-light linear sweeps over
+// the raw buffers; the scatter pass writes through one cursor per channel code
+// so no intermediate containers are grown element by element.
+
+#include <algorithm>
+#include <stdexcept>
+
+DemuxCounts countChannelCodes(std::span<const std::uint8_t> channels) {
+    DemuxCounts counts{};
+    for (const std::uint8_t code : channels)
+        ++counts[code];
+    return counts;
+}
+
+void scatterByChannel(std::span<const long long> timestamps,
+                      std::span<const std::uint8_t> channels,
+                      std::span<const long long> delaysPs,
+                      const std::array<long long *, kDemuxChannelCodes> &outputs) {
+    if (timestamps.size() != channels.size())
+        throw std::invalid_argument("timestamps and channels must have the same length");
+
+    std::array<long long, kDemuxChannelCodes> offsets{};
+    std::copy_n(delaysPs.begin(),
+                std::min<std::size_t>(delaysPs.size(), kDemuxChannelCodes),
+                offsets.begin());
+
+    std::array<long long *, kDemuxChannelCodes> cursor = outputs;
+    for (std::size_t i = 0; i < timestamps.size(); ++i) {
+        const std::uint8_t code = channels[i];
+        long long *&out = cursor[code];
+        if (out)
+            *out++ = timestamps[i] + offsets[code];
+    }
+}
+
+std::map<int, std::vector<Timestamp>>
+demultiplexTimestamps(std::span<const long long> timestamps,
+                      std::span<const std::uint8_t> channels,
+                      std::span<const long long> delaysPs) {
+    if (timestamps.size() != channels.size())
+        throw std::invalid_argument("timestamps and channels must have the same length");
+
+    const DemuxCounts counts = countChannelCodes(channels);
+    std::map<int, std::vector<Timestamp>> result;
+    std::array<long long *, kDemuxChannelCodes> outputs{};
+    for (int code = 0; code < kDemuxChannelCodes; ++code) {
+        if (counts[code] == 0)
+            continue;
+        auto &vec = result[code + 1];
+        vec.resize(counts[code]);
+        outputs[code] = vec.data();
+    }
+    scatterByChannel(timestamps, channels, delaysPs, outputs);
+    return result;
+}
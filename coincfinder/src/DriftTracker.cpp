@@ -0,0 +1,182 @@
+#include "DriftTracker.h"
+
+// Per chunk: decay the local histogram by the data time elapsed, add the
+// chunk's counts around the current centre, take the background from the
+// outer half of the bins, and locate the peak by the centroid of the
+// contiguous above-noise region around the maximum. The delay moves by a
+// fraction of that centroid, and the histogram is shifted by whole bins
+// whenever the delay leaves the centre bin, so history stays aligned.
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+
+#include "Coincidences.h"
+
+namespace {
+
+// SNR at which the confidence is 0.5.
+constexpr double kHalfConfidenceSnr = 5.0;
+
+double medianOf(std::vector<double> values) {
+    if (values.empty())
+        return 0.0;
+    const auto mid = values.begin() + static_cast<std::ptrdiff_t>(values.size() / 2);
+    std::nth_element(values.begin(), mid, values.end());
+    return *mid;
+}
+
+} // namespace
+
+DelayDriftTracker::DelayDriftTracker(long long coincWindowPs, double initialDelayPs,
+                                     long long halfSpanPs, long long stepPs)
+    : windowPs_(coincWindowPs), halfSpanPs_(halfSpanPs), stepPs_(stepPs),
+      halfBins_(0), delayPs_(initialDelayPs) {
+    if (stepPs <= 0)
+        throw std::invalid_argument("delayStep must be positive in ps");
+    if (halfSpanPs <= coincWindowPs)
+        throw std::invalid_argument("half span must exceed the coincidence window");
+    halfBins_ = static_cast<std::size_t>(halfSpanPs / stepPs);
+    reset(initialDelayPs);
+}
+
+void DelayDriftTracker::setMemorySeconds(double seconds) {
+    if (!(seconds > 0.0))
+        throw std::invalid_argument("memory must be positive");
+    memoryPs_ = seconds * 1e12;
+}
+
+void DelayDriftTracker::setGain(double gain) {
+    if (!(gain > 0.0 && gain <= 1.0))
+        throw std::invalid_argument("gain must be in (0, 1]");
+    gain_ = gain;
+}
+
+void DelayDriftTracker::setMinConfidence(double confidence) {
+    minConfidence_ = std::clamp(confidence, 0.0, 1.0);
+}
+
+void DelayDriftTracker::reset(double delayPs) {
+    delayPs_ = delayPs;
+    centerPs_ = std::llround(delayPs / static_cast<double>(stepPs_)) * stepPs_;
+    histogram_.assign(2 * halfBins_ + 1, 0.0);
+    haveData_ = false;
+    latestPs_ = 0;
+    last_ = DriftUpdate{};
+    last_.delayPs = delayPs_;
+}
+
+std::vector<long long> DelayDriftTracker::offsetsPs() const {
+    std::vector<long long> offsets(histogram_.size());
+    for (std::size_t i = 0; i < offsets.size(); ++i)
+        offsets[i] = (static_cast<long long>(i) - static_cast<long long>(halfBins_)) * stepPs_;
+    return offsets;
+}
+
+DriftUpdate DelayDriftTracker::addChunk(std::span<const long long> channel1,
+                                        std::span<const long long> channel2) {
+    last_.updated = false;
+    last_.shiftPs = 0.0;
+    if (channel1.empty() || channel2.empty())
+        return last_;
+
+    // Fade by the data time since the previous chunk; timestamps that restart
+    // (per-batch clocks) fall back to the chunk's own duration.
+    const long long earliest = std::min(channel1.front(), channel2.front());
+    const long long newest = std::max(channel1.back(), channel2.back());
+    const long long advancePs =
+        !haveData_ ? 0 : (newest > latestPs_ ? newest - latestPs_ : newest - earliest);
+    const double decay = std::exp(-static_cast<double>(advancePs) / memoryPs_);
+    latestPs_ = newest;
+    haveData_ = true;
+    const long long spanPs = static_cast<long long>(halfBins_) * stepPs_;
+    chunkCounts_.resize(histogram_.size());
+    computeCoincidenceCountsForRange(channel1, channel2, windowPs_, centerPs_ - spanPs,
+                                     centerPs_ + spanPs, stepPs_, chunkCounts_);
+    for (std::size_t i = 0; i < histogram_.size(); ++i)
+        histogram_[i] = histogram_[i] * decay + static_cast<double>(chunkCounts_[i]);
+
+    // Background from the outer half; the peak should sit in the inner half.
+    std::vector<double> outer;
+    const std::size_t quarter = halfBins_ / 2;
+    for (std::size_t i = 0; i < histogram_.size(); ++i)
+        if (i < quarter || i + quarter >= histogram_.size())
+            outer.push_back(histogram_[i]);
+    const double background = medianOf(outer);
+    const double noise = std::sqrt(std::max(background, 1.0));
+
+    // Contiguous region above the noise around the maximum.
+    const auto peak = static_cast<std::size_t>(
+        std::max_element(histogram_.begin(), histogram_.end()) - histogram_.begin());
+    std::size_t lo = peak;
+    std::size_t hi = peak;
+    while (lo > 0 && histogram_[lo - 1] - background > noise)
+        --lo;
+    while (hi + 1 < histogram_.size() && histogram_[hi + 1] - background > noise)
+        ++hi;
+
+    auto offsetOf = [this](std::size_t i) {
+        return static_cast<double>((static_cast<long long>(i) -
+                                    static_cast<long long>(halfBins_)) *
+                                   stepPs_);
+    };
+    double signal = 0.0;
+    double moment = 0.0;
+    for (std::size_t i = lo; i <= hi; ++i) {
+        const double s = std::max(0.0, histogram_[i] - background);
+        signal += s;
+        moment += s * offsetOf(i);
+    }
+
+    DriftUpdate update;
+    update.background = background;
+    update.signal = signal;
+    if (signal > 0.0) {
+        update.centroidPs = moment / signal;
+        // Each pair is counted in every bin within ±window of its delay, so
+        // the peak holds signal * step / (2w + 1) pairs, and its spread is
+        // the delay spread plus the window box (variance w^2 / 3).
+        double spread = 0.0;
+        for (std::size_t i = lo; i <= hi; ++i) {
+            const double x = offsetOf(i) - update.centroidPs;
+            spread += std::max(0.0, histogram_[i] - background) * x * x;
+        }
+        const double step = static_cast<double>(stepPs_);
+        const double window = static_cast<double>(windowPs_);
+        const double pairs = std::max(1.0, signal * step / (2.0 * window + 1.0));
+        const double delayVariance =
+            std::max(spread / signal - window * window / 3.0, step * step / 12.0);
+        update.uncertaintyPs = std::sqrt(delayVariance / pairs);
+        const double regionBackground = background * static_cast<double>(hi - lo + 1);
+        const double snr = signal / std::sqrt(signal + regionBackground);
+        update.confidence = snr / (snr + kHalfConfidenceSnr);
+    }
+
+    if (update.confidence >= minConfidence_ && signal > 0.0) {
+        const double target = static_cast<double>(centerPs_) + update.centroidPs;
+        update.shiftPs = gain_ * (target - delayPs_);
+        delayPs_ += update.shiftPs;
+        update.updated = true;
+        recenter(background);
+    }
+    update.delayPs = delayPs_;
+    last_ = update;
+    return update;
+}
+
+void DelayDriftTracker::recenter(double fill) {
+    const long long shiftBins =
+        std::llround((delayPs_ - static_cast<double>(centerPs_)) / static_cast<double>(stepPs_));
+    if (shiftBins == 0)
+        return;
+    const auto bins = static_cast<long long>(histogram_.size());
+    // Bins entering at the edge have no history; assume background there.
+    std::vector<double> shifted(histogram_.size(), fill);
+    for (long long i = 0; i < bins; ++i) {
+        const long long from = i + shiftBins;
+        if (from >= 0 && from < bins)
+            shifted[static_cast<std::size_t>(i)] = histogram_[static_cast<std::size_t>(from)];
+    }
+    histogram_.swap(shifted);
+    centerPs_ += shiftBins * stepPs_;
+}
@@ -0,0 +1,112 @@
+#include "FlatSingles.h"
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+
+#include "ReadCSV.h"
+
+namespace {
+
+constexpr long long kPicosecondsPerSecond = 1'000'000'000'000LL;
+
+long long currentBucketWidthPs() {
+    return static_cast<long long>(
+        std::llround(bucketDurationSeconds() * kPicosecondsPerSecond));
+}
+
+// Same truncating division as the readers use for relative timestamps.
+long long bucketOf(Timestamp ts, long long bucketWidthPs) {
+    return ts / bucketWidthPs;
+}
+
+} // namespace
+
+std::span<const Timestamp> eventsForSecondWithNext(const FlatSingles &singles,
+                                                   long long second) {
+    const long long buckets = static_cast<long long>(bucketCount(singles));
+    const long long idx = second - singles.baseSecond;
+    if (idx < -1 || idx >= buckets)
+        return {};
+    const std::size_t begin =
+        idx < 0 ? singles.offsets.front() : singles.offsets[static_cast<std::size_t>(idx)];
+    std::size_t end = singles.offsets[static_cast<std::size_t>(idx + 1)];
+    if (idx + 1 < buckets && singles.offsets[static_cast<std::size_t>(idx + 2)] > end)
+        ++end;
+    return std::span<const Timestamp>(singles.timestamps).subspan(begin, end - begin);
+}
+
+FlatSingles flattenSingles(const Singles &singles, long long bucketWidthPs) {
+    FlatSingles flat;
+    flat.channel = singles.channel;
+    flat.baseSecond = singles.baseSecond;
+    flat.bucketWidthPs = bucketWidthPs > 0 ? bucketWidthPs : currentBucketWidthPs();
+    if (singles.eventsPerSecond.empty())
+        return flat;
+
+    std::size_t total = 0;
+    for (const auto &bucket : singles.eventsPerSecond)
+        total += bucket.size();
+    flat.timestamps.reserve(total);
+    flat.offsets.reserve(singles.eventsPerSecond.size() + 1);
+    flat.offsets.push_back(0);
+    for (const auto &bucket : singles.eventsPerSecond) {
+        flat.timestamps.insert(flat.timestamps.end(), bucket.begin(), bucket.end());
+        flat.offsets.push_back(flat.timestamps.size());
+    }
+    return flat;
+}
+
+std::map<int, FlatSingles> flattenSinglesMap(std::map<int, Singles> &&channels,
+                                             long long bucketWidthPs) {
+    if (bucketWidthPs <= 0)
+        bucketWidthPs = currentBucketWidthPs();
+    std::map<int, FlatSingles> result;
+    for (auto &[channel, singles] : channels) {
+        result.emplace(channel, flattenSingles(singles, bucketWidthPs));
+        singles.eventsPerSecond.clear();
+        singles.eventsPerSecond.shrink_to_fit();
+    }
+    channels.clear();
+    return result;
+}
+
+Singles expandSingles(const FlatSingles &singles) {
+    Singles nested;
+    nested.channel = singles.channel;
+    nested.baseSecond = singles.baseSecond;
+    const std::size_t buckets = bucketCount(singles);
+    nested.eventsPerSecond.resize(buckets);
+    for (std::size_t i = 0; i < buckets; ++i) {
+        nested.eventsPerSecond[i].assign(
+            singles.timestamps.begin() + static_cast<std::ptrdiff_t>(singles.offsets[i]),
+            singles.timestamps.begin() + static_cast<std::ptrdiff_t>(singles.offsets[i + 1]));
+    }
+    return nested;
+}
+
+void rebucket(FlatSingles &singles, long long bucketWidthPs) {
+    if (bucketWidthPs <= 0)
+        throw std::invalid_argument("bucketWidthPs must be positive");
+    singles.bucketWidthPs = bucketWidthPs;
+    singles.offsets.clear();
+    const auto &ts = singles.timestamps;
+    if (ts.empty()) {
+        singles.baseSecond = 0;
+        return;
+    }
+
+    const long long first = bucketOf(ts.front(), bucketWidthPs);
+    const long long last = bucketOf(ts.back(), bucketWidthPs);
+    singles.baseSecond = first;
+    singles.offsets.reserve(static_cast<std::size_t>(last - first) + 2);
+    singles.offsets.push_back(0);
+    auto cursor = ts.begin();
+    for (long long second = first + 1; second <= last; ++second) {
+        cursor = std::partition_point(cursor, ts.end(), [&](Timestamp value) {
+            return bucketOf(value, bucketWidthPs) < second;
+        });
+        singles.offsets.push_back(static_cast<std::size_t>(cursor - ts.begin()));
+    }
+    singles.offsets.push_back(ts.size());
+}
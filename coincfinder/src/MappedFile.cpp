@@ -0,0 +1,119 @@
+#include "MappedFile.h"
+
+#include <stdexcept>
+#include <utility>
+
+#if defined(_WIN32)
+#ifndef NOMINMAX
+#define NOMINMAX
+#endif
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+MappedFile::MappedFile(const std::string &path) : path_(path) {
+#if defined(_WIN32)
+    HANDLE file = CreateFileA(path.c_str(), GENERIC_READ, FILE_SHARE_READ | FILE_SHARE_WRITE,
+                              nullptr, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, nullptr);
+    if (file == INVALID_HANDLE_VALUE)
+        throw std::runtime_error("Cannot open file: " + path);
+    LARGE_INTEGER size{};
+    if (!GetFileSizeEx(file, &size)) {
+        CloseHandle(file);
+        throw std::runtime_error("Cannot stat file: " + path);
+    }
+    fileHandle_ = file;
+    size_ = static_cast<std::size_t>(size.QuadPart);
+    if (size_ == 0)
+        return;
+    HANDLE mapping = CreateFileMappingA(file, nullptr, PAGE_READONLY, 0, 0, nullptr);
+    if (!mapping) {
+        release();
+        throw std::runtime_error("Cannot map file: " + path);
+    }
+    mappingHandle_ = mapping;
+    data_ = static_cast<const unsigned char *>(MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0));
+    if (!data_) {
+        release();
+        throw std::runtime_error("Cannot map file: " + path);
+    }
+#else
+    const int fd = ::open(path.c_str(), O_RDONLY);
+    if (fd < 0)
+        throw std::runtime_error("Cannot open file: " + path);
+    struct stat st {};
+    if (::fstat(fd, &st) != 0) {
+        ::close(fd);
+        throw std::runtime_error("Cannot stat file: " + path);
+    }
+    size_ = static_cast<std::size_t>(st.st_size);
+    if (size_ > 0) {
+        void *addr = ::mmap(nullptr, size_, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (addr == MAP_FAILED) {
+            ::close(fd);
+            size_ = 0;
+            throw std::runtime_error("Cannot map file: " + path);
+        }
+        data_ = static_cast<const unsigned char *>(addr);
+    }
+    // The mapping keeps its own reference to the file.
+    ::close(fd);
+#endif
+}
+
+MappedFile::~MappedFile() { release(); }
+
+MappedFile::MappedFile(MappedFile &&other) noexcept
+    : path_(std::move(other.path_)),
+      data_(std::exchange(other.data_, nullptr)),
+      size_(std::exchange(other.size_, 0))
+#if defined(_WIN32)
+      ,
+      fileHandle_(std::exchange(other.fileHandle_, nullptr)),
+      mappingHandle_(std::exchange(other.mappingHandle_, nullptr))
+#endif
+{
+}
+
+MappedFile &MappedFile::operator=(MappedFile &&other) noexcept {
+    if (this != &other) {
+        release();
+        path_ = std::move(other.path_);
+        data_ = std::exchange(other.data_, nullptr);
+        size_ = std::exchange(other.size_, 0);
+#if defined(_WIN32)
+        fileHandle_ = std::exchange(other.fileHandle_, nullptr);
+        mappingHandle_ = std::exchange(other.mappingHandle_, nullptr);
+#endif
+    }
+    return *this;
+}
+
+void MappedFile::adviseSequential() const {
+#if !defined(_WIN32) && defined(MADV_SEQUENTIAL)
+    if (data_)
+        ::madvise(const_cast<unsigned char *>(data_), size_, MADV_SEQUENTIAL);
+#endif
+}
+
+void MappedFile::release() noexcept {
+#if defined(_WIN32)
+    if (data_)
+        UnmapViewOfFile(data_);
+    if (mappingHandle_)
+        CloseHandle(static_cast<HANDLE>(mappingHandle_));
+    if (fileHandle_)
+        CloseHandle(static_cast<HANDLE>(fileHandle_));
+    mappingHandle_ = nullptr;
+    fileHandle_ = nullptr;
+#else
+    if (data_)
+        ::munmap(const_cast<unsigned char *>(data_), size_);
+#endif
+    data_ = nullptr;
+    size_ = 0;
+}
@@ -0,0 +1,93 @@
+#include "Metrics.h"
+
+// Every metric is a ratio of the summed wrong-outcome counts W and
+// right-outcome counts R of one or both bases: QBER = W / (R + W) and
+// visibility = (R - W) / (R + W). With N = R + W the first-order errors are
+// sqrt(W^2 var(R) + R^2 var(W)) / N^2 and twice that, respectively.
+
+#include <cmath>
+#include <limits>
+#include <stdexcept>
+
+namespace {
+
+constexpr double kNaN = std::numeric_limits<double>::quiet_NaN();
+
+struct Outcomes {
+    double right = 0.0;
+    double wrong = 0.0;
+    double varRight = 0.0;
+    double varWrong = 0.0;
+
+    void add(const double *net, const double *variance, std::size_t r1, std::size_t r2,
+             std::size_t w1, std::size_t w2) {
+        right += net[r1] + net[r2];
+        wrong += net[w1] + net[w2];
+        varRight += variance[r1] + variance[r2];
+        varWrong += variance[w1] + variance[w2];
+    }
+
+    double total() const { return right + wrong; }
+
+    // Error of W / N.
+    double ratioSigma() const {
+        const double n = total();
+        return std::sqrt(wrong * wrong * varRight + right * right * varWrong) / (n * n);
+    }
+
+    MetricEstimate errorRate() const {
+        if (!(total() > 0.0))
+            return {kNaN, kNaN};
+        return {wrong / total(), ratioSigma()};
+    }
+
+    MetricEstimate visibility() const {
+        if (!(total() > 0.0))
+            return {kNaN, kNaN};
+        return {(right - wrong) / total(), 2.0 * ratioSigma()};
+    }
+};
+
+Outcomes hvBasis(const double *net, const double *variance) {
+    Outcomes o;
+    o.add(net, variance, HH, VV, HV, VH);
+    return o;
+}
+
+Outcomes daBasis(const double *net, const double *variance) {
+    Outcomes o;
+    o.add(net, variance, DD, AA, DA, AD);
+    return o;
+}
+
+MetricEstimate evaluate(PairMetric metric, const double *net, const double *variance) {
+    switch (metric) {
+    case PairMetric::QberHV:
+        return hvBasis(net, variance).errorRate();
+    case PairMetric::QberDA:
+        return daBasis(net, variance).errorRate();
+    case PairMetric::Qber: {
+        Outcomes both = hvBasis(net, variance);
+        both.add(net, variance, DD, AA, DA, AD);
+        return both.errorRate();
+    }
+    case PairMetric::VisibilityHV:
+        return hvBasis(net, variance).visibility();
+    case PairMetric::VisibilityDA:
+        return daBasis(net, variance).visibility();
+    }
+    return {kNaN, kNaN};
+}
+
+} // namespace
+
+void computePairMetric(PairMetric metric, std::span<const double> net,
+                       std::span<const double> variance, std::span<MetricEstimate> out) {
+    if (net.size() != variance.size())
+        throw std::invalid_argument("net and variance must have the same size");
+    if (net.size() != out.size() * kDefaultPairCount)
+        throw std::invalid_argument("expected one output per row of eight pairs");
+    for (std::size_t row = 0; row < out.size(); ++row)
+        out[row] = evaluate(metric, net.data() + row * kDefaultPairCount,
+                            variance.data() + row * kDefaultPairCount);
+}
@@ -0,0 +1,330 @@
+#include "PairSource.h"
+
+// Pairs are emitted one exponential gap after another, and the background
+// counts of all channels form one more Poisson process merged into the same
+// loop, so every channel receives its arrival times (emission plus delay) in
+// order. That loop is branch-free per pair: one 64-bit xoshiro256** draw
+// decides both detections, both bases and both outcomes, and each side's
+// arrival is written unconditionally and kept only if detected. A second,
+// per-channel pass adds the jitter and moves each event back past the few
+// earlier ones it overtook (the jitter is bounded, so this insertion step is
+// constant work per event). Detections from the channel's horizon on - the
+// earliest time a later emission can still reach - are held back for the
+// next call. Gaps and jitter use the Marsaglia-Tsang ziggurats: one draw per
+// sample, almost always without a transcendental call.
+
+#include <algorithm>
+#include <array>
+#include <cmath>
+#include <stdexcept>
+
+namespace {
+
+std::uint64_t splitMix64(std::uint64_t &x) {
+    std::uint64_t z = (x += 0x9e3779b97f4a7c15ULL);
+    z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+    return z ^ (z >> 31);
+}
+
+std::uint64_t rotl(std::uint64_t x, int k) { return (x << k) | (x >> (64 - k)); }
+
+// Bit fields of the per-pair draw: detection of A and B, bases, outcomes and
+// (same basis) agreement of the outcomes.
+constexpr int kDetectBits = 22;
+constexpr std::uint64_t kDetectMask = (1ULL << kDetectBits) - 1;
+constexpr int kAgreeShift = 48;
+
+// Probability as a threshold on `bits` random bits (2^bits for certainty).
+std::uint64_t threshold(double probability, int bits) {
+    return static_cast<std::uint64_t>(
+        std::llround(probability * static_cast<double>(1ULL << bits)));
+}
+
+// Ziggurat tables of the standard normal: 128 layers of equal area.
+struct NormalZiggurat {
+    static constexpr double kTail = 3.442619855899;
+    std::array<std::uint32_t, 128> k{};
+    std::array<double, 128> w{};
+    std::array<double, 128> f{};
+
+    NormalZiggurat() {
+        constexpr double m = 2147483648.0;
+        constexpr double area = 9.91256303526217e-3;
+        double d = kTail;
+        double t = d;
+        const double q = area / std::exp(-0.5 * d * d);
+        k[0] = static_cast<std::uint32_t>(d / q * m);
+        k[1] = 0;
+        w[0] = q / m;
+        w[127] = d / m;
+        f[0] = 1.0;
+        f[127] = std::exp(-0.5 * d * d);
+        for (int i = 126; i >= 1; --i) {
+            d = std::sqrt(-2.0 * std::log(area / d + std::exp(-0.5 * d * d)));
+            k[i + 1] = static_cast<std::uint32_t>(d / t * m);
+            t = d;
+            f[i] = std::exp(-0.5 * d * d);
+            w[i] = d / m;
+        }
+    }
+};
+
+// Ziggurat tables of the unit exponential: 256 layers of equal area.
+struct ExponentialZiggurat {
+    static constexpr double kTail = 7.697117470131487;
+    std::array<std::uint32_t, 256> k{};
+    std::array<double, 256> w{};
+    std::array<double, 256> f{};
+
+    ExponentialZiggurat() {
+        constexpr double m = 4294967296.0;
+        constexpr double area = 3.949659822581572e-3;
+        double d = kTail;
+        double t = d;
+        const double q = area / std::exp(-d);
+        k[0] = static_cast<std::uint32_t>(d / q * m);
+        k[1] = 0;
+        w[0] = q / m;
+        w[255] = d / m;
+        f[0] = 1.0;
+        f[255] = std::exp(-d);
+        for (int i = 254; i >= 1; --i) {
+            d = -std::log(area / d + std::exp(-d));
+            k[i + 1] = static_cast<std::uint32_t>(d / t * m);
+            t = d;
+            f[i] = std::exp(-d);
+            w[i] = d / m;
+        }
+    }
+};
+
+const NormalZiggurat &normalZiggurat() {
+    static const NormalZiggurat tables;
+    return tables;
+}
+
+const ExponentialZiggurat &exponentialZiggurat() {
+    static const ExponentialZiggurat tables;
+    return tables;
+}
+
+// xoshiro256** with the ziggurat samplers on top. A value type, so the
+// generation loop keeps the state in registers and writes it back once.
+struct Random {
+    std::array<std::uint64_t, 4> state;
+    const NormalZiggurat &normalTables = normalZiggurat();
+    const ExponentialZiggurat &exponentialTables = exponentialZiggurat();
+
+    std::uint64_t next() {
+        const std::uint64_t result = rotl(state[1] * 5, 7) * 9;
+        const std::uint64_t t = state[1] << 17;
+        state[2] ^= state[0];
+        state[3] ^= state[1];
+        state[1] ^= state[2];
+        state[0] ^= state[3];
+        state[2] ^= t;
+        state[3] = rotl(state[3], 45);
+        return result;
+    }
+
+    double uniform() {
+        // (0, 1], so logarithms stay finite.
+        return static_cast<double>((next() >> 11) + 1) * 0x1.0p-53;
+    }
+
+    double exponential() {
+        const ExponentialZiggurat &z = exponentialTables;
+        for (;;) {
+            // Low word: abscissa; bits 32-39: layer.
+            const std::uint64_t bits = next();
+            const auto j = static_cast<std::uint32_t>(bits);
+            const auto layer = static_cast<std::size_t>((bits >> 32) & 255);
+            if (j < z.k[layer]) [[likely]]
+                return j * z.w[layer];
+            if (layer == 0)
+                return ExponentialZiggurat::kTail - std::log(uniform());
+            const double x = j * z.w[layer];
+            if (z.f[layer] + uniform() * (z.f[layer - 1] - z.f[layer]) < std::exp(-x))
+                return x;
+        }
+    }
+
+    double normal() {
+        const NormalZiggurat &z = normalTables;
+        for (;;) {
+            // Low word: signed abscissa; bits 32-38: layer.
+            const std::uint64_t bits = next();
+            const auto h = static_cast<std::int32_t>(static_cast<std::uint32_t>(bits));
+            const auto layer = static_cast<std::size_t>((bits >> 32) & 127);
+            const double x = h * z.w[layer];
+            const std::uint32_t magnitude =
+                h < 0 ? 0u - static_cast<std::uint32_t>(h) : static_cast<std::uint32_t>(h);
+            if (magnitude < z.k[layer]) [[likely]]
+                return x;
+            if (layer == 0) {
+                // Base layer: sample the tail beyond kTail.
+                double tail;
+                double y;
+                do {
+                    tail = exponential() / NormalZiggurat::kTail;
+                    y = exponential();
+                } while (y + y < tail * tail);
+                return h > 0 ? NormalZiggurat::kTail + tail : -NormalZiggurat::kTail - tail;
+            }
+            if (z.f[layer] + uniform() * (z.f[layer - 1] - z.f[layer]) < std::exp(-0.5 * x * x))
+                return x;
+        }
+    }
+};
+
+// Output channel written through an index: there is always room for one
+// more event, so an arrival is stored unconditionally and counted only if it
+// was detected.
+struct ChannelWriter {
+    std::vector<long long> *events = nullptr;
+    long long *data = nullptr;
+    std::size_t size = 0;
+    std::size_t capacity = 0;
+
+    void write(long long value, bool keep) {
+        data[size] = value;
+        size += keep ? 1 : 0;
+        if (size == capacity) [[unlikely]] {
+            events->resize(2 * capacity);
+            data = events->data();
+            capacity = events->size();
+        }
+    }
+};
+
+// Rounds half away from zero without a libm call.
+long long roundPs(double value) {
+    return static_cast<long long>(value + (value < 0.0 ? -0.5 : 0.5));
+}
+
+} // namespace
+
+PairSource::PairSource(const PairSourceConfig &config) : config_(config) {
+    if (config.pairRate < 0.0 || config.accidentalRate < 0.0)
+        throw std::invalid_argument("rates must not be negative");
+    for (const double p : {config.efficiencyA, config.efficiencyB, config.visibility})
+        if (!(p >= 0.0 && p <= 1.0))
+            throw std::invalid_argument("efficiencies and visibility must be in [0, 1]");
+    for (const double jitter : config.jitterPs)
+        if (!(jitter >= 0.0))
+            throw std::invalid_argument("jitter must not be negative");
+
+    std::uint64_t seed = config.seed;
+    for (auto &word : state_)
+        word = splitMix64(seed);
+    thresholdA_ = threshold(config.efficiencyA, kDetectBits);
+    thresholdB_ = threshold(config.efficiencyB, kDetectBits);
+    thresholdAgree_ = threshold((1.0 + config.visibility) / 2.0, 64 - kAgreeShift);
+
+    Random random{state_};
+    if (config.pairRate > 0.0)
+        nextEmissionPs_ = std::llround(random.exponential() * 1e12 / config.pairRate);
+    if (config.accidentalRate > 0.0)
+        nextAccidentalPs_ =
+            random.exponential() * 1e12 / (kPairSourceChannels * config.accidentalRate);
+    state_ = random.state;
+    for (int c = 0; c < kPairSourceChannels; ++c)
+        clipPs_[c] = static_cast<long long>(std::ceil(5.0 * config.jitterPs[c]));
+}
+
+void PairSource::generate(long long durationPs,
+                          std::vector<std::vector<long long>> &channels) {
+    if (durationPs < 0)
+        throw std::invalid_argument("duration must not be negative");
+    const long long endPs = nowPs_ + durationPs;
+    channels.resize(kPairSourceChannels);
+
+    // Held-back detections first; new arrivals go after them.
+    std::array<ChannelWriter, kPairSourceChannels> out;
+    std::array<std::size_t, kPairSourceChannels> firstNew{};
+    for (int c = 0; c < kPairSourceChannels; ++c) {
+        auto &events = channels[c];
+        events.assign(pending_[c].begin(), pending_[c].end());
+        firstNew[c] = events.size();
+        events.resize(events.size() + 1024);
+        out[c] = {&events, events.data(), firstNew[c], events.size()};
+    }
+    const auto &delays = config_.delaysPs;
+    Random random{state_};
+
+    // Background of all channels: one process at eight times the rate, each
+    // count on a random channel.
+    const double accidentalGapPs =
+        config_.accidentalRate > 0.0
+            ? 1e12 / (kPairSourceChannels * config_.accidentalRate)
+            : 0.0;
+    const auto accidentalsUntil = [&](long long untilPs) {
+        while (accidentalGapPs > 0.0 && nextAccidentalPs_ < static_cast<double>(untilPs)) {
+            const auto channel = static_cast<int>(random.next() >> 61);
+            out[channel].write(static_cast<long long>(nextAccidentalPs_) + delays[channel],
+                               true);
+            nextAccidentalPs_ += random.exponential() * accidentalGapPs;
+        }
+    };
+
+    if (config_.pairRate > 0.0) {
+        const double meanGapPs = 1e12 / config_.pairRate;
+        long long t = nextEmissionPs_;
+        std::uint64_t pairs = 0;
+        while (t < endPs) {
+            accidentalsUntil(t);
+            // Bits 0-21 / 22-43: detection of A / B; 44-47: basis A, basis B,
+            // outcome A, outcome B when the bases differ; 48-63: agreement of
+            // the outcomes when they are the same.
+            const std::uint64_t bits = random.next();
+            const bool detectA = (bits & kDetectMask) < thresholdA_;
+            const bool detectB = ((bits >> kDetectBits) & kDetectMask) < thresholdB_;
+            const auto basisA = static_cast<int>((bits >> 44) & 1);
+            const auto basisB = static_cast<int>((bits >> 45) & 1);
+            const auto outcomeA = static_cast<int>((bits >> 46) & 1);
+            const auto flipped = static_cast<int>((bits >> kAgreeShift) >= thresholdAgree_);
+            // Correlated outcome in the same basis, the free bit otherwise;
+            // selected with a mask, as the bases match half of the time.
+            const int sameBasis = -(1 ^ basisA ^ basisB);
+            const int outcomeB = ((outcomeA ^ flipped) & sameBasis) |
+                                 (static_cast<int>((bits >> 47) & 1) & ~sameBasis);
+            const int channelA = 2 * basisA + outcomeA;
+            const int channelB = 4 + 2 * basisB + outcomeB;
+            out[channelA].write(t + delays[channelA], detectA);
+            out[channelB].write(t + delays[channelB], detectB);
+            ++pairs;
+            t += static_cast<long long>(random.exponential() * meanGapPs + 0.5);
+        }
+        nextEmissionPs_ = t;
+        pairsEmitted_ += pairs;
+    }
+    accidentalsUntil(endPs);
+    nowPs_ = endPs;
+
+    for (int c = 0; c < kPairSourceChannels; ++c) {
+        auto &events = channels[c];
+        events.resize(out[c].size);
+        const double sigma = config_.jitterPs[c];
+        if (sigma > 0.0) {
+            // Jitter within ±5 sigma (= clipPs_), then insertion into the
+            // sorted prefix.
+            for (std::size_t i = firstNew[c]; i < events.size(); ++i) {
+                const long long value =
+                    events[i] + roundPs(sigma * std::clamp(random.normal(), -5.0, 5.0));
+                std::size_t j = i;
+                while (j > 0 && events[j - 1] > value) {
+                    events[j] = events[j - 1];
+                    --j;
+                }
+                events[j] = value;
+            }
+        }
+        // Emissions from endPs on arrive no earlier than this.
+        const long long horizonPs = endPs + delays[c] - clipPs_[c];
+        const auto held = std::lower_bound(events.begin(), events.end(), horizonPs);
+        pending_[c].assign(held, events.end());
+        events.erase(held, events.end());
+    }
+    state_ = random.state;
+}
@@ -1,5 +1,7 @@
 #include "ReadCSV.h"
 
+#include "BinFile.h"
+
 // CSV/BIN ingestion helpers. They construct `Singles` objects in-place so the
 // rest of the pipeline can treat every per-second bucket as an owning vector.
 
@@ -9,8 +11,15 @@
 #include <cctype>
 #include <charconv>
 #include <cmath>
+#include <cstring>
+#include <exception>
+#include <functional>
+#include <optional>
+#include <queue>
 #include <string_view>
+#include <thread>
 #include <utility>
+#include <vector>
 
 namespace {
 
@@ -18,6 +27,7 @@ constexpr long long kPicosecondsPerSecond = 1'000'000'000'000LL;
 constexpr int kMaxChannels = 8;
 
 std::atomic<double> gBucketSeconds{1.0};
+std::atomic<IngestMode> gIngestMode{IngestMode::AppendThenSort};
 
 inline long long bucketIndex(Timestamp ts, Timestamp firstTimestamp,
                              long long bucketWidthPs) {
@@ -56,6 +66,19 @@ template <typename T> bool parseIntegral(std::string_view token, T &value) {
   return result.ec == std::errc() && result.ptr == end;
 }
 
+// Splits "timestamp,channel[,...]" into its two integer fields.
+bool parseCsvLine(std::string_view line, Timestamp &ts, int &ch) {
+  const size_t firstComma = line.find(',');
+  if (firstComma == std::string_view::npos)
+    return false;
+  size_t secondComma = line.find(',', firstComma + 1);
+  if (secondComma == std::string_view::npos)
+    secondComma = line.size();
+  return parseIntegral(line.substr(0, firstComma), ts) &&
+         parseIntegral(
+             line.substr(firstComma + 1, secondComma - firstComma - 1), ch);
+}
+
 std::map<int, Singles>
 finalizeSingles(std::array<Singles, kMaxChannels + 1> &channels) {
   std::map<int, Singles> result;
@@ -67,6 +90,246 @@ finalizeSingles(std::array<Singles, kMaxChannels + 1> &channels) {
   return result;
 }
 
+// Collects per-channel buckets for the whole-file readers in either ingest
+// mode. In AppendThenSort mode an event that is not >= the bucket's last
+// element goes to a per-bucket side list instead of being inserted; the main
+// bucket therefore stays sorted, and finish() sorts the (small) side lists
+// and merges them in once: O(n + k log k) per bucket for k stragglers.
+class SinglesBuilder {
+public:
+  SinglesBuilder() : mode_(ingestMode()) {
+    for (int ch = 1; ch <= kMaxChannels; ++ch)
+      channels_[ch].channel = ch;
+  }
+
+  // Each channel that receives an event gets buckets [0, buckets) on its
+  // first one, so growth never reallocates the outer vector; unused edges are
+  // trimmed again in finish(). Straggler lists still grow on demand.
+  void presize(long long buckets) { presizeBuckets_ = std::max(buckets, 0LL); }
+
+  void append(int ch, long long second, Timestamp ts) {
+    Singles &singles = channels_[ch];
+    if (presizeBuckets_ > 0 && singles.eventsPerSecond.empty()) {
+      singles.baseSecond = 0;
+      singles.eventsPerSecond.resize(static_cast<size_t>(presizeBuckets_));
+    }
+    if (mode_ == IngestMode::SortedInsert) {
+      appendTimestamp(singles, second, ts);
+      return;
+    }
+    const long long oldBase = singles.baseSecond;
+    const bool wasEmpty = singles.eventsPerSecond.empty();
+    auto &bucket = ensureSecond(singles, second);
+    auto &side = stragglers_[ch];
+    // Keep the side lists aligned when ensureSecond prepended buckets.
+    if (!wasEmpty && singles.baseSecond < oldBase && !side.empty())
+      side.insert(side.begin(), static_cast<size_t>(oldBase - singles.baseSecond), {});
+    if (!bucket.empty() && ts < bucket.back()) {
+      side.resize(singles.eventsPerSecond.size());
+      side[static_cast<size_t>(second - singles.baseSecond)].push_back(ts);
+      return;
+    }
+    bucket.push_back(ts);
+  }
+
+  std::map<int, Singles> finish() {
+    for (int ch = 1; ch <= kMaxChannels; ++ch) {
+      Singles &singles = channels_[ch];
+      auto &buckets = singles.eventsPerSecond;
+      auto &side = stragglers_[ch];
+      for (size_t i = 0; i < side.size() && i < buckets.size(); ++i) {
+        if (side[i].empty())
+          continue;
+        std::sort(side[i].begin(), side[i].end());
+        const auto mid = static_cast<std::ptrdiff_t>(buckets[i].size());
+        buckets[i].insert(buckets[i].end(), side[i].begin(), side[i].end());
+        std::inplace_merge(buckets[i].begin(), buckets[i].begin() + mid,
+                           buckets[i].end());
+      }
+      side.clear();
+
+      // Drop presized empty edges so each channel starts and ends at its own
+      // first and last event, as with incremental growth.
+      const auto nonEmpty = [](const std::vector<Timestamp> &b) { return !b.empty(); };
+      const auto firstIt = std::find_if(buckets.begin(), buckets.end(), nonEmpty);
+      if (firstIt == buckets.end()) {
+        buckets.clear();
+        continue;
+      }
+      const auto lastIt = std::find_if(buckets.rbegin(), buckets.rend(), nonEmpty).base();
+      buckets.erase(lastIt, buckets.end());
+      singles.baseSecond += firstIt - buckets.begin();
+      buckets.erase(buckets.begin(), firstIt);
+    }
+    return finalizeSingles(channels_);
+  }
+
+private:
+  IngestMode mode_;
+  long long presizeBuckets_ = 0;
+  std::array<Singles, kMaxChannels + 1> channels_;
+  // Out-of-order events per channel and bucket (indexed like eventsPerSecond).
+  std::array<std::vector<std::vector<Timestamp>>, kMaxChannels + 1> stragglers_;
+};
+
+// Runs fn(0) .. fn(count - 1) on up to `threads` worker threads.
+template <typename Fn> void parallelFor(size_t count, unsigned threads, Fn fn) {
+  const size_t workers = std::min<size_t>(std::max(threads, 1u), count);
+  if (workers <= 1) {
+    for (size_t i = 0; i < count; ++i)
+      fn(i);
+    return;
+  }
+  std::atomic<size_t> nextIndex{0};
+  std::vector<std::thread> pool;
+  std::vector<std::exception_ptr> errors(workers);
+  pool.reserve(workers);
+  for (size_t w = 0; w < workers; ++w) {
+    pool.emplace_back([&, w] {
+      try {
+        for (size_t i = nextIndex++; i < count; i = nextIndex++)
+          fn(i);
+      } catch (...) {
+        errors[w] = std::current_exception();
+      }
+    });
+  }
+  for (auto &worker : pool)
+    worker.join();
+  for (const auto &error : errors)
+    if (error)
+      std::rethrow_exception(error);
+}
+
+// What one thread extracts from its byte range, in file order per channel.
+struct CsvRangeResult {
+  std::array<std::vector<Timestamp>, kMaxChannels + 1> channels;
+  bool hasFirst = false;
+  Timestamp first = 0;
+  long long minTime = LLONG_MAX;
+  long long maxTime = 0;
+};
+
+void parseCsvRange(std::string_view text, CsvRangeResult &out) {
+  size_t pos = 0;
+  while (pos < text.size()) {
+    size_t end = text.find('\n', pos);
+    if (end == std::string_view::npos)
+      end = text.size();
+    const std::string_view line = text.substr(pos, end - pos);
+    pos = end + 1;
+
+    Timestamp ts = 0;
+    int ch = 0;
+    if (line.empty() || !parseCsvLine(line, ts, ch))
+      continue;
+    if (ch < 1 || ch > kMaxChannels || ts == 0)
+      continue;
+
+    if (!out.hasFirst) {
+      out.first = ts;
+      out.hasFirst = true;
+    }
+    out.channels[ch].push_back(ts);
+    out.minTime = std::min(out.minTime, ts);
+    out.maxTime = std::max(out.maxTime, ts);
+  }
+}
+
+// Merges the sorted per-range arrays of one channel and buckets them. The
+// merged stream is ascending, so every bucket is filled in sorted order.
+void mergeChannel(std::vector<std::vector<Timestamp> *> &runs, Singles &singles,
+                  Timestamp firstTimestamp, long long bucketWidthPs) {
+  using Head = std::pair<Timestamp, size_t>; // (value, run index)
+  std::priority_queue<Head, std::vector<Head>, std::greater<>> heap;
+  std::vector<size_t> cursor(runs.size(), 0);
+  for (size_t r = 0; r < runs.size(); ++r) {
+    auto &run = *runs[r];
+    if (!std::is_sorted(run.begin(), run.end()))
+      std::sort(run.begin(), run.end());
+    if (!run.empty())
+      heap.emplace(run.front(), r);
+  }
+
+  std::vector<Timestamp> *bucket = nullptr;
+  long long bucketSecond = 0;
+  while (!heap.empty()) {
+    const auto [ts, r] = heap.top();
+    heap.pop();
+    if (++cursor[r] < runs[r]->size())
+      heap.emplace((*runs[r])[cursor[r]], r);
+
+    const long long sec = bucketIndex(ts, firstTimestamp, bucketWidthPs);
+    if (!bucket || sec != bucketSecond) {
+      bucket = &ensureSecond(singles, sec);
+      bucketSecond = sec;
+    }
+    bucket->push_back(ts - firstTimestamp);
+  }
+}
+
+std::map<int, Singles> readCSVtoSinglesParallel(const std::string &filename,
+                                                double &duration_sec,
+                                                unsigned threads) {
+  std::optional<MappedFile> file;
+  try {
+    file.emplace(filename);
+  } catch (const std::runtime_error &) {
+    throw std::runtime_error("Cannot open CSV file: " + filename);
+  }
+  if (threads == 0)
+    threads = std::max(1u, std::thread::hardware_concurrency());
+
+  const std::string_view text(reinterpret_cast<const char *>(file->data()),
+                              file->size());
+  // Cut the file into roughly equal byte ranges, each moved forward to start
+  // just after a newline so no line is split between threads.
+  std::vector<size_t> cuts{0};
+  for (unsigned t = 1; t < threads; ++t) {
+    size_t cut = text.size() * t / threads;
+    cut = std::max(cut, cuts.back());
+    const size_t nl = text.find('\n', cut == 0 ? 0 : cut - 1);
+    cuts.push_back(nl == std::string_view::npos ? text.size() : nl + 1);
+  }
+  cuts.push_back(text.size());
+
+  std::vector<CsvRangeResult> ranges(cuts.size() - 1);
+  parallelFor(ranges.size(), threads, [&](size_t r) {
+    parseCsvRange(text.substr(cuts[r], cuts[r + 1] - cuts[r]), ranges[r]);
+  });
+
+  // The first valid line of the file (not the smallest value) anchors the
+  // bucket grid, as in the sequential reader.
+  Timestamp firstTimestamp = 0;
+  long long minTime = LLONG_MAX;
+  long long maxTime = 0;
+  bool haveFirst = false;
+  for (const auto &range : ranges) {
+    if (!haveFirst && range.hasFirst) {
+      firstTimestamp = range.first;
+      haveFirst = true;
+    }
+    minTime = std::min(minTime, range.minTime);
+    maxTime = std::max(maxTime, range.maxTime);
+  }
+  const long long bucketWidthPs = static_cast<long long>(
+      std::llround(bucketDurationSeconds() * kPicosecondsPerSecond));
+
+  std::array<Singles, kMaxChannels + 1> channels;
+  for (int ch = 1; ch <= kMaxChannels; ++ch)
+    channels[ch].channel = ch;
+  parallelFor(kMaxChannels, threads, [&](size_t idx) {
+    const int ch = static_cast<int>(idx) + 1;
+    std::vector<std::vector<Timestamp> *> runs;
+    for (auto &range : ranges)
+      runs.push_back(&range.channels[ch]);
+    mergeChannel(runs, channels[ch], firstTimestamp, bucketWidthPs);
+  });
+
+  duration_sec = (maxTime > minTime) ? (maxTime - minTime) * 1e-12 : 0.0;
+  return finalizeSingles(channels);
+}
+
 } // namespace
 
 bool hasEnding(const std::string &str, const std::string &ending) {
@@ -83,25 +346,33 @@ double bucketDurationSeconds() {
   return gBucketSeconds.load(std::memory_order_relaxed);
 }
 
+void setIngestMode(IngestMode mode) {
+  gIngestMode.store(mode, std::memory_order_relaxed);
+}
+
+IngestMode ingestMode() { return gIngestMode.load(std::memory_order_relaxed); }
+
 std::map<int, Singles> readFileAuto(const std::string &filename,
                                     double &duration_sec,
-                                    double exposure_seconds) {
+                                    double exposure_seconds, unsigned threads) {
   if (exposure_seconds > 1e-9)
     setBucketDurationSeconds(exposure_seconds);
   if (hasEnding(filename, ".bin"))
     return readBINtoSingles(filename, duration_sec);
-  return readCSVtoSingles(filename, duration_sec);
+  return readCSVtoSingles(filename, duration_sec, threads);
 }
 
 std::map<int, Singles> readCSVtoSingles(const std::string &filename,
-                                        double &duration_sec) {
+                                        double &duration_sec,
+                                        unsigned threads) {
+  if (threads != 1)
+    return readCSVtoSinglesParallel(filename, duration_sec, threads);
+
   std::ifstream file(filename);
   if (!file.is_open())
     throw std::runtime_error("Cannot open CSV file: " + filename);
 
-  std::array<Singles, kMaxChannels + 1> channels;
-  for (int ch = 1; ch <= kMaxChannels; ++ch)
-    channels[ch].channel = ch;
+  SinglesBuilder channels;
 
   std::string line;
   Timestamp firstTimestamp = 0;
@@ -115,24 +386,10 @@ std::map<int, Singles> readCSVtoSingles(const std::string &filename,
     if (line.empty())
       continue;
 
-    const size_t firstComma = line.find(',');
-    if (firstComma == std::string::npos)
-      continue;
-    size_t secondComma = line.find(',', firstComma + 1);
-    if (secondComma == std::string::npos)
-      secondComma = line.size();
-
-    std::string_view lineView(line);
-    std::string_view timestampToken = lineView.substr(0, firstComma);
-    std::string_view channelToken =
-        lineView.substr(firstComma + 1, secondComma - firstComma - 1);
-
     Timestamp ts = 0;
     int ch = 0;
-    if (!parseIntegral(timestampToken, ts) ||
-        !parseIntegral(channelToken, ch)) {
+    if (!parseCsvLine(line, ts, ch))
       continue;
-    }
     if (ch < 1 || ch > kMaxChannels || ts == 0)
       continue;
 
@@ -142,7 +399,7 @@ std::map<int, Singles> readCSVtoSingles(const std::string &filename,
     }
     const long long sec = bucketIndex(ts, firstTimestamp, bucketWidthPs);
 
-    appendTimestamp(channels[ch], sec, ts - firstTimestamp);
+    channels.append(ch, sec, ts - firstTimestamp);
 
     if (ts < minTime)
       minTime = ts;
@@ -151,23 +408,22 @@ std::map<int, Singles> readCSVtoSingles(const std::string &filename,
   }
 
   duration_sec = (maxTime > minTime) ? (maxTime - minTime) * 1e-12 : 0.0;
-  return finalizeSingles(channels);
+  return channels.finish();
 }
 
 std::map<int, Singles> readBINtoSingles(const std::string &filename,
                                         double &duration_sec) {
-  std::ifstream file(filename, std::ios::binary);
-  if (!file.is_open())
+  // Map the file instead of issuing two stream reads per 10-byte record.
+  std::optional<MappedFile> file;
+  try {
+    file.emplace(filename);
+  } catch (const std::runtime_error &) {
     throw std::runtime_error("Cannot open BIN file: " + filename);
+  }
+  file->adviseSequential();
 
-  file.seekg(40, std::ios::beg);
-
-  std::array<Singles, kMaxChannels + 1> channels;
-  for (int ch = 1; ch <= kMaxChannels; ++ch)
-    channels[ch].channel = ch;
+  SinglesBuilder channels;
 
-  uint64_t t_raw = 0;
-  uint16_t c_raw = 0;
   Timestamp firstTimestamp = 0;
   bool first = true;
   long long minTime = LLONG_MAX;
@@ -175,12 +431,39 @@ std::map<int, Singles> readBINtoSingles(const std::string &filename,
   const long long bucketWidthPs = static_cast<long long>(
       std::llround(bucketDurationSeconds() * kPicosecondsPerSecond));
 
-  while (file.read(reinterpret_cast<char *>(&t_raw), sizeof(t_raw))) {
-    if (!file.read(reinterpret_cast<char *>(&c_raw), sizeof(c_raw)))
-      break;
+  const size_t records = file->size() > kBinHeaderBytes
+                             ? (file->size() - kBinHeaderBytes) / kBinRecordBytes
+                             : 0;
+  const unsigned char *record =
+      records > 0 ? file->data() + kBinHeaderBytes : nullptr;
+
+  // The first and last valid records give the bucket count, so the bucket
+  // vectors can be sized once instead of grown second by second.
+  const auto validAt = [&](size_t r) {
+    const unsigned char *rec = record + r * kBinRecordBytes;
+    const int ch = static_cast<int>(binRecordChannel(rec)) + 1;
+    return ch >= 1 && ch <= kMaxChannels && binRecordTimestamp(rec) != 0;
+  };
+  size_t firstValid = 0;
+  while (firstValid < records && !validAt(firstValid))
+    ++firstValid;
+  size_t lastValid = records;
+  while (lastValid > firstValid && !validAt(lastValid - 1))
+    --lastValid;
+  if (lastValid > firstValid) {
+    const Timestamp start = binRecordTimestamp(record + firstValid * kBinRecordBytes);
+    const Timestamp end = binRecordTimestamp(record + (lastValid - 1) * kBinRecordBytes);
+    // Empty buckets cost 24 bytes each; fine buckets over a long sparse
+    // recording are left to grow on demand.
+    constexpr long long kMaxPresizedBuckets = 100'000;
+    const long long buckets = bucketIndex(end, start, bucketWidthPs) + 1;
+    if (buckets <= std::min(kMaxPresizedBuckets, static_cast<long long>(records)))
+      channels.presize(buckets);
+  }
 
-    Timestamp ts = static_cast<long long>(t_raw);
-    int ch = static_cast<int>(c_raw) + 1;
+  for (size_t r = 0; r < records; ++r, record += kBinRecordBytes) {
+    Timestamp ts = binRecordTimestamp(record);
+    int ch = static_cast<int>(binRecordChannel(record)) + 1;
     if (ch < 1 || ch > kMaxChannels || ts == 0)
       continue;
 
@@ -190,7 +473,7 @@ std::map<int, Singles> readBINtoSingles(const std::string &filename,
     }
 
     const long long sec = bucketIndex(ts, firstTimestamp, bucketWidthPs);
-    appendTimestamp(channels[ch], sec, ts - firstTimestamp);
+    channels.append(ch, sec, ts - firstTimestamp);
 
     if (ts < minTime)
       minTime = ts;
@@ -199,5 +482,184 @@ std::map<int, Singles> readBINtoSingles(const std::string &filename,
   }
 
   duration_sec = (maxTime > minTime) ? (maxTime - minTime) * 1e-12 : 0.0;
-  return finalizeSingles(channels);
+  return channels.finish();
+}
+
+struct SinglesFileStream::Impl {
+  using ChannelSet = std::array<Singles, kMaxChannels + 1>;
+
+  // An event read past the lookahead window, waiting for older chunks to be
+  // returned first.
+  struct HeldEvent {
+    long long bucket;
+    long long chunk;
+    Timestamp relative;
+    int channel;
+  };
+
+  MappedFile file;
+  bool binary = false;
+  size_t offset = 0;
+  long long bucketWidthPs = kPicosecondsPerSecond;
+  long long bucketsPerChunk = 1;
+
+  Timestamp firstTimestamp = 0;
+  bool first = true;
+  long long minTime = LLONG_MAX;
+  long long maxTime = 0;
+
+  long long current = 0;
+  std::array<ChannelSet, 2> pending; // chunks `current` and `current + 1`
+  std::optional<HeldEvent> held;
+  std::map<int, Timestamp> nextFirst;
+  size_t late = 0;
+
+  explicit Impl(const std::string &filename) : file(filename) {
+    binary = hasEnding(filename, ".bin");
+    offset = binary ? kBinHeaderBytes : 0;
+    file.adviseSequential();
+    for (auto &set : pending)
+      reset(set);
+  }
+
+  static void reset(ChannelSet &set) {
+    for (int ch = 1; ch <= kMaxChannels; ++ch) {
+      set[ch].channel = ch;
+      set[ch].baseSecond = 0;
+      set[ch].eventsPerSecond.clear();
+    }
+  }
+
+  static bool empty(const ChannelSet &set) {
+    return std::all_of(set.begin(), set.end(), [](const Singles &s) {
+      return s.eventsPerSecond.empty();
+    });
+  }
+
+  // Next valid (timestamp, channel) from the mapping; false at end of file.
+  bool readEvent(Timestamp &ts, int &ch) {
+    const size_t size = file.size();
+    const char *base = reinterpret_cast<const char *>(file.data());
+    if (binary) {
+      while (offset + kBinRecordBytes <= size) {
+        const unsigned char *record = file.data() + offset;
+        offset += kBinRecordBytes;
+        ts = binRecordTimestamp(record);
+        ch = static_cast<int>(binRecordChannel(record)) + 1;
+        if (ch >= 1 && ch <= kMaxChannels && ts != 0)
+          return true;
+      }
+      return false;
+    }
+    while (offset < size) {
+      const char *begin = base + offset;
+      const void *nl = std::memchr(begin, '\n', size - offset);
+      const size_t length = nl ? static_cast<size_t>(
+                                     static_cast<const char *>(nl) - begin)
+                               : size - offset;
+      offset += length + 1;
+      if (parseCsvLine(std::string_view(begin, length), ts, ch) && ch >= 1 &&
+          ch <= kMaxChannels && ts != 0)
+        return true;
+    }
+    return false;
+  }
+
+  void place(const HeldEvent &event) {
+    appendTimestamp(pending[static_cast<size_t>(event.chunk - current)]
+                           [event.channel],
+                    event.bucket, event.relative);
+  }
+
+  // Reads until an event lands beyond the lookahead window or the file ends.
+  void fill() {
+    Timestamp ts = 0;
+    int ch = 0;
+    while (!held && readEvent(ts, ch)) {
+      if (first) {
+        firstTimestamp = ts;
+        first = false;
+      }
+      minTime = std::min(minTime, ts);
+      maxTime = std::max(maxTime, ts);
+
+      const long long bucket = bucketIndex(ts, firstTimestamp, bucketWidthPs);
+      const long long chunk =
+          bucket >= 0 ? bucket / bucketsPerChunk
+                      : -((-bucket + bucketsPerChunk - 1) / bucketsPerChunk);
+      const HeldEvent event{bucket, chunk, ts - firstTimestamp, ch};
+      if (chunk < current)
+        ++late;
+      else if (chunk <= current + 1)
+        place(event);
+      else
+        held = event;
+    }
+  }
+};
+
+SinglesFileStream::SinglesFileStream(const std::string &filename,
+                                     double chunkSeconds) {
+  try {
+    impl_ = std::make_unique<Impl>(filename);
+  } catch (const std::runtime_error &) {
+    throw std::runtime_error("Cannot open file: " + filename);
+  }
+  impl_->bucketWidthPs = static_cast<long long>(
+      std::llround(bucketDurationSeconds() * kPicosecondsPerSecond));
+  if (impl_->bucketWidthPs <= 0)
+    impl_->bucketWidthPs = kPicosecondsPerSecond;
+  impl_->bucketsPerChunk = std::max<long long>(
+      1, std::llround(chunkSeconds / bucketDurationSeconds()));
+}
+
+SinglesFileStream::~SinglesFileStream() = default;
+
+bool SinglesFileStream::next(std::map<int, Singles> &chunk) {
+  Impl &s = *impl_;
+  while (true) {
+    if (!s.held)
+      s.fill();
+
+    if (Impl::empty(s.pending[0]) && Impl::empty(s.pending[1])) {
+      if (!s.held)
+        return false;
+      // Gap in the data: jump straight to the held event's chunk.
+      s.current = s.held->chunk;
+      s.place(*s.held);
+      s.held.reset();
+      continue;
+    }
+
+    chunk = finalizeSingles(s.pending[0]);
+    s.nextFirst.clear();
+    const long long boundary = (s.current + 1) * s.bucketsPerChunk;
+    for (int ch = 1; ch <= kMaxChannels; ++ch) {
+      const auto &bucket = eventsForSecond(s.pending[1][ch], boundary);
+      if (!bucket.empty())
+        s.nextFirst.emplace(ch, bucket.front());
+    }
+
+    std::swap(s.pending[0], s.pending[1]);
+    Impl::reset(s.pending[1]);
+    ++s.current;
+    if (s.held && s.held->chunk <= s.current + 1) {
+      s.place(*s.held);
+      s.held.reset();
+    }
+    if (!chunk.empty())
+      return true;
+  }
+}
+
+const std::map<int, Timestamp> &SinglesFileStream::nextFirstEvents() const {
+  return impl_->nextFirst;
+}
+
+size_t SinglesFileStream::lateEvents() const { return impl_->late; }
+
+double SinglesFileStream::durationSeconds() const {
+  return impl_->maxTime > impl_->minTime
+             ? (impl_->maxTime - impl_->minTime) * 1e-12
+             : 0.0;
 }
@@ -31,6 +31,43 @@ void RollingSingles::appendChunk(const std::map<int, Singles> &chunk) {
     }
 
     prune();
+    updateTrackers(chunk);
+}
+
+std::shared_ptr<DelayDriftTracker> RollingSingles::trackPair(int channelA, int channelB,
+                                                             DelayDriftTracker tracker) {
+    auto shared = std::make_shared<DelayDriftTracker>(std::move(tracker));
+    trackers_.insert_or_assign({channelA, channelB}, shared);
+    return shared;
+}
+
+void RollingSingles::untrackPair(int channelA, int channelB) {
+    trackers_.erase({channelA, channelB});
+}
+
+DelayDriftTracker *RollingSingles::driftTracker(int channelA, int channelB) {
+    auto it = trackers_.find({channelA, channelB});
+    return it != trackers_.end() ? it->second.get() : nullptr;
+}
+
+void RollingSingles::updateTrackers(const std::map<int, Singles> &chunk) {
+    // Buckets of a chunk are consecutive seconds, so concatenating them keeps
+    // each channel sorted.
+    auto flatten = [&chunk](int channel, std::vector<Timestamp> &out) {
+        out.clear();
+        auto it = chunk.find(channel);
+        if (it == chunk.end())
+            return;
+        for (const auto &bucket : it->second.eventsPerSecond)
+            out.insert(out.end(), bucket.begin(), bucket.end());
+    };
+    std::vector<Timestamp> eventsA;
+    std::vector<Timestamp> eventsB;
+    for (auto &[pair, tracker] : trackers_) {
+        flatten(pair.first, eventsA);
+        flatten(pair.second, eventsB);
+        tracker->addChunk(eventsA, eventsB);
+    }
 }
 
 const Singles &RollingSingles::channelSingles(int channel) const {
@@ -1,19 +1,596 @@
+#include <algorithm>
+#include <array>
+#include <chrono>
 #include <cmath>
+#include <condition_variable>
+#include <cstdint>
+#include <limits>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 #include <span>
+#include <string>
+#include <string_view>
+#include <thread>
 
+#include "BinFile.h"
+#include "CoincidenceKernels.h"
 #include "Coincidences.h"
+#include "CrossCorrelation.h"
+#include "DelayHistogram.h"
+#include "DelayScanCube.h"
+#include "DelaySearch.h"
+#include "DriftTracker.h"
+#include "Demux.h"
+#include "FlatSingles.h"
+#include "Metrics.h"
+#include "PairSource.h"
 #include "ReadCSV.h"
 #include "RollingSingles.h"
 #include "Singles.h"
+#include "SpscRing.h"
 
 // Pybind11 module that mirrors the C++ CLI surface area. The bindings keep the
 // docstrings short and defer to the underlying headers for deep detail, but the
 // structure here explains how we translate Python types into spans and maps.
+// Arguments are converted while holding the GIL; the C++ work itself runs with
+// the GIL released so Python threads (acquisition, GUI) keep running.
 
 namespace py = pybind11;
 
+namespace {
+
+// Buffer-protocol helpers: accept NumPy arrays (or any exporter) without
+// copying, but only when the memory layout is exactly what the C++ side reads.
+bool hasIntegerFormat(const py::buffer_info &info, std::string_view codes) {
+  std::string_view format(info.format);
+  if (format.size() == 2 && (format[0] == '@' || format[0] == '=' ||
+                             format[0] == '<'))
+    format.remove_prefix(1);
+  return format.size() == 1 && codes.find(format[0]) != std::string_view::npos;
+}
+
+void requireContiguous1D(const py::buffer_info &info, const char *name) {
+  if (info.ndim != 1)
+    throw py::value_error(std::string(name) + " must be one-dimensional");
+  if (info.shape[0] > 1 && info.strides[0] != info.itemsize)
+    throw py::value_error(std::string(name) +
+                          " must be contiguous (use numpy.ascontiguousarray)");
+}
+
+std::span<const long long> int64Span(const py::buffer_info &info,
+                                     const char *name) {
+  if (info.itemsize != 8 || !hasIntegerFormat(info, "lq"))
+    throw py::type_error(std::string(name) + " must have dtype int64, got '" +
+                         info.format + "'");
+  requireContiguous1D(info, name);
+  return {static_cast<const long long *>(info.ptr),
+          static_cast<size_t>(info.shape[0])};
+}
+
+std::span<const std::uint8_t> channelCodeSpan(const py::buffer_info &info,
+                                              const char *name) {
+  if (info.itemsize != 1 || !hasIntegerFormat(info, "bB"))
+    throw py::type_error(std::string(name) +
+                         " must have dtype int8 or uint8, got '" + info.format +
+                         "'");
+  requireContiguous1D(info, name);
+  return {static_cast<const std::uint8_t *>(info.ptr),
+          static_cast<size_t>(info.shape[0])};
+}
+
+// Keeps a timestamp argument alive while C++ reads it. Buffer exporters
+// (NumPy arrays, memoryviews) must already be contiguous int64 and are used in
+// place; plain Python sequences such as lists are converted once.
+class TimestampArg {
+public:
+  TimestampArg(const py::handle &obj, const char *name) {
+    if (PyObject_CheckBuffer(obj.ptr())) {
+      info_ = py::reinterpret_borrow<py::buffer>(obj).request();
+      span_ = int64Span(info_, name);
+    } else {
+      owned_ = obj.cast<std::vector<long long>>();
+      span_ = owned_;
+    }
+  }
+
+  std::span<const long long> span() const { return span_; }
+
+private:
+  py::buffer_info info_;
+  std::vector<long long> owned_;
+  std::span<const long long> span_;
+};
+
+long long roundPs(double ps) { return static_cast<long long>(std::llround(ps)); }
+
+DelayDriftTracker makeDriftTracker(double coinc_window_ps,
+                                   double initial_delay_ps,
+                                   double half_span_ps, double step_ps,
+                                   double memory_seconds, double gain,
+                                   double min_confidence) {
+  DelayDriftTracker tracker(roundPs(coinc_window_ps), initial_delay_ps,
+                            roundPs(half_span_ps), roundPs(step_ps));
+  tracker.setMemorySeconds(memory_seconds);
+  tracker.setGain(gain);
+  tracker.setMinConfidence(min_confidence);
+  return tracker;
+}
+
+// A number for every PairSource channel, or {channel: value} for single
+// channels (the others keep `fill`).
+std::array<double, kPairSourceChannels>
+pairSourceChannels(const py::object &value, const char *name, double fill) {
+  std::array<double, kPairSourceChannels> values;
+  values.fill(fill);
+  if (!py::isinstance<py::dict>(value)) {
+    values.fill(value.cast<double>());
+    return values;
+  }
+  for (auto item : value.cast<py::dict>()) {
+    const int channel = item.first.cast<int>();
+    if (channel < 1 || channel > kPairSourceChannels)
+      throw py::value_error(std::string(name) + " channel out of range: " +
+                            std::to_string(channel));
+    values[static_cast<size_t>(channel - 1)] = item.second.cast<double>();
+  }
+  return values;
+}
+
+PairSource makePairSource(double pair_rate, double efficiency_a,
+                          double efficiency_b, double visibility,
+                          double accidental_rate, const py::object &delays_ps,
+                          const py::object &jitter_ps, std::uint64_t seed) {
+  PairSourceConfig config;
+  config.pairRate = pair_rate;
+  config.efficiencyA = efficiency_a;
+  config.efficiencyB = efficiency_b;
+  config.visibility = visibility;
+  config.accidentalRate = accidental_rate;
+  const auto delays = pairSourceChannels(delays_ps, "delays_ps", 0.0);
+  for (size_t c = 0; c < delays.size(); ++c)
+    config.delaysPs[c] = roundPs(delays[c]);
+  config.jitterPs = pairSourceChannels(jitter_ps, "jitter_ps", 50.0);
+  config.seed = seed;
+  return PairSource(config);
+}
+
+// Runs a PairSource in real time on a background thread, one batch of
+// `period` worth of detections per period, into a ring the consumer reads
+// newest-first: a slow consumer skips stale batches instead of falling
+// behind, and a full ring drops the new batch (an overrun).
+class PairSourceFeed {
+public:
+  PairSourceFeed(const PairSource &source, double periodSeconds, size_t slots)
+      : source_(source), ring_(slots) {
+    const auto period = std::chrono::duration_cast<Clock::duration>(
+        std::chrono::duration<double>(periodSeconds));
+    period_ = std::max(period, Clock::duration(std::chrono::milliseconds(1)));
+    thread_ = std::thread([this] { run(); });
+  }
+
+  ~PairSourceFeed() { close(); }
+
+  PairSourceFeed(const PairSourceFeed &) = delete;
+  PairSourceFeed &operator=(const PairSourceFeed &) = delete;
+
+  // Stops and joins the producer; batches already published stay readable.
+  void close() {
+    if (!thread_.joinable())
+      return;
+    {
+      std::scoped_lock lk(stopMutex_);
+      stopRequested_ = true;
+    }
+    stopCv_.notify_all();
+    thread_.join();
+  }
+
+  // Swaps the newest batch into `current`, recycling the old one's storage;
+  // false when nothing new was published (consumer thread only).
+  bool takeLatest() { return ring_.takeLatest(current_); }
+  const std::vector<std::vector<long long>> &current() const { return current_; }
+
+  bool running() const { return thread_.joinable(); }
+  std::uint64_t published() const { return ring_.published(); }
+  std::uint64_t overruns() const { return ring_.overruns(); }
+  std::uint64_t skipped() const { return ring_.skipped(); }
+
+private:
+  using Clock = std::chrono::steady_clock;
+
+  void run() {
+    const long long periodPs =
+        std::chrono::duration_cast<std::chrono::duration<long long, std::pico>>(
+            period_)
+            .count();
+    std::vector<std::vector<long long>> batch;
+    auto next = Clock::now() + period_;
+    for (;;) {
+      {
+        std::unique_lock lk(stopMutex_);
+        if (stopCv_.wait_until(lk, next, [this] { return stopRequested_; }))
+          return;
+      }
+      next = std::max(next + period_, Clock::now());
+
+      // The source keeps running while the ring is full, like a device.
+      source_.generate(periodPs, batch);
+      if (auto *slot = ring_.tryAcquire()) {
+        std::swap(*slot, batch);
+        ring_.publish();
+      }
+    }
+  }
+
+  PairSource source_;
+  Clock::duration period_{};
+  SpscRing<std::vector<std::vector<long long>>> ring_;
+  std::vector<std::vector<long long>> current_;
+  std::thread thread_;
+  std::mutex stopMutex_; // only for the interruptible sleep, not the data
+  std::condition_variable stopCv_;
+  bool stopRequested_ = false;
+};
+
+// Python spelling of DelayScanMethod; "hierarchical" only where a single
+// best delay is returned.
+DelayScanMethod parseDelayScanMethod(const std::string &method,
+                                     bool allowHierarchical) {
+  if (method == "sweep")
+    return DelayScanMethod::Sweep;
+  if (method == "fft")
+    return DelayScanMethod::Fft;
+  if (method == "auto")
+    return DelayScanMethod::Auto;
+  if (allowHierarchical && method == "hierarchical")
+    return DelayScanMethod::Hierarchical;
+  throw py::value_error(
+      std::string("method must be ") +
+      (allowHierarchical ? "'sweep', 'fft', 'auto' or 'hierarchical'"
+                         : "'sweep', 'fft' or 'auto'") +
+      ", got '" + method + "'");
+}
+
+// Python spelling of CoincidenceKernel; kernels the CPU lacks are rejected
+// here, while the GIL is still held.
+CoincidenceKernel parseCoincidenceKernel(const std::string &name) {
+  for (const auto kernel :
+       {CoincidenceKernel::Auto, CoincidenceKernel::Scalar,
+        CoincidenceKernel::Branchless, CoincidenceKernel::Avx2,
+        CoincidenceKernel::Avx512}) {
+    if (name != coincidenceKernelName(kernel))
+      continue;
+    if (!coincidenceKernelAvailable(kernel))
+      throw py::value_error("kernel '" + name +
+                            "' is not supported on this CPU");
+    return kernel;
+  }
+  throw py::value_error("kernel must be 'auto', 'scalar', 'branchless', "
+                        "'avx2' or 'avx512', got '" +
+                        name + "'");
+}
+
+// Returns (delay_ps, counts) int64 arrays for a delay scan.
+py::tuple scanDelays(const py::object &ch1, const py::object &ch2,
+                     double coinc_window_ps, double delay_start_ps,
+                     double delay_end_ps, double delay_step_ps,
+                     const std::string &method) {
+  DelayScanMethod engine = parseDelayScanMethod(method, false);
+  const TimestampArg a(ch1, "ch1");
+  const TimestampArg b(ch2, "ch2");
+  const long long startPs = roundPs(delay_start_ps);
+  const long long endPs = roundPs(delay_end_ps);
+  const long long stepPs = roundPs(delay_step_ps);
+  const auto steps = static_cast<py::ssize_t>(
+      delayScanSteps(startPs, endPs, stepPs));
+
+  py::array_t<long long> delays(steps);
+  py::array_t<long long> counts(steps);
+  auto delayView = delays.mutable_unchecked<1>();
+  for (py::ssize_t i = 0; i < steps; ++i)
+    delayView(i) = startPs + static_cast<long long>(i) * stepPs;
+  const std::span<long long> out(counts.mutable_data(),
+                                 static_cast<size_t>(steps));
+  {
+    py::gil_scoped_release release;
+    const long long windowPs = roundPs(coinc_window_ps);
+    if (engine == DelayScanMethod::Auto)
+      engine = chooseDelayScanMethod(a.span(), b.span(), windowPs, startPs,
+                                     endPs, stepPs);
+    if (engine == DelayScanMethod::Fft)
+      computeCoincidenceCountsFft(a.span(), b.span(), windowPs, startPs, endPs,
+                                  stepPs, out);
+    else
+      computeCoincidenceCountsForRange(a.span(), b.span(), windowPs, startPs,
+                                       endPs, stepPs, out);
+  }
+  return py::make_tuple(std::move(delays), std::move(counts));
+}
+
+// Read-only NumPy view of `count` records starting at record `first`; `base`
+// (the owning BinFile) keeps the mapping alive for as long as the view exists.
+py::array binRecordView(const BinFile &file, const py::dtype &dtype,
+                        size_t byteOffset, size_t first, size_t count,
+                        const py::handle &base) {
+  const unsigned char *ptr =
+      count > 0 ? file.recordData() + first * kBinRecordBytes + byteOffset
+                : file.recordData();
+  py::array view(dtype, {static_cast<py::ssize_t>(count)},
+                 {static_cast<py::ssize_t>(kBinRecordBytes)}, ptr, base);
+  view.attr("setflags")(py::arg("write") = false);
+  return view;
+}
+
+// Read-only int64 view of `span`, which must live inside the object `base`.
+py::array timestampView(std::span<const Timestamp> span, const py::handle &base) {
+  static const Timestamp kEmpty = 0;
+  py::array_t<long long> view({static_cast<py::ssize_t>(span.size())},
+                              {static_cast<py::ssize_t>(sizeof(Timestamp))},
+                              span.empty() ? &kEmpty : span.data(), base);
+  view.attr("setflags")(py::arg("write") = false);
+  return view;
+}
+
+// Python-side state of iter_file: the C++ stream plus the output flavour.
+struct FileChunkIterator {
+  std::unique_ptr<SinglesFileStream> stream;
+  bool arrays = false;
+};
+
+// One CoincidenceQuery per (a, b) entry of `pairs`. Every referenced channel
+// is converted once into `args` (which must outlive the queries), even if it
+// appears in several pairs; `delays_ps` is None, a scalar or one per pair.
+std::vector<CoincidenceQuery> pairQueries(const py::dict &channels,
+                                          const py::sequence &pairs,
+                                          const py::object &delays_ps,
+                                          std::map<int, TimestampArg> &args) {
+  auto channelSpan = [&](int channel) {
+    auto it = args.find(channel);
+    if (it == args.end()) {
+      if (!channels.contains(py::int_(channel)))
+        throw py::key_error("channel " + std::to_string(channel) +
+                            " not in channels");
+      it = args.emplace(std::piecewise_construct,
+                        std::forward_as_tuple(channel),
+                        std::forward_as_tuple(channels[py::int_(channel)],
+                                              "channels[ch]"))
+               .first;
+    }
+    return it->second.span();
+  };
+  std::vector<CoincidenceQuery> queries;
+  queries.reserve(pairs.size());
+  for (size_t idx = 0; idx < pairs.size(); ++idx) {
+    const auto pair = pairs[idx].cast<std::pair<int, int>>();
+    CoincidenceQuery query;
+    query.channelA = channelSpan(pair.first);
+    query.channelB = channelSpan(pair.second);
+    queries.push_back(query);
+  }
+
+  // Any number that is not a sequence (Python or NumPy scalar) is one delay
+  // for every pair.
+  if (!delays_ps.is_none() && PyNumber_Check(delays_ps.ptr()) &&
+      !py::isinstance<py::sequence>(delays_ps)) {
+    for (auto &query : queries)
+      query.delayPs = roundPs(delays_ps.cast<double>());
+  } else if (!delays_ps.is_none()) {
+    const auto delays = delays_ps.cast<std::vector<double>>();
+    if (delays.size() != queries.size())
+      throw py::value_error("delays_ps must have one entry per pair");
+    for (size_t i = 0; i < queries.size(); ++i)
+      queries[i].delayPs = roundPs(delays[i]);
+  }
+  return queries;
+}
+
+py::dtype binRecordDtype() {
+  py::list fields;
+  fields.append(py::make_tuple("timestamp", "<u8"));
+  fields.append(py::make_tuple("channel", "<u2"));
+  return py::dtype::from_args(fields);
+}
+
+// Built-in metrics of the `metrics` submodule, by Python name.
+const std::vector<std::pair<std::string, PairMetric>> &builtinMetrics() {
+  static const std::vector<std::pair<std::string, PairMetric>> metrics = {
+      {"qber", PairMetric::Qber},
+      {"qber_hv", PairMetric::QberHV},
+      {"qber_da", PairMetric::QberDA},
+      {"visibility_hv", PairMetric::VisibilityHV},
+      {"visibility_da", PairMetric::VisibilityDA}};
+  return metrics;
+}
+
+using RowsArray = py::array_t<double, py::array::c_style | py::array::forcecast>;
+
+// `obj` as a C-contiguous (rows, 8) float64 array; a single row of eight is
+// promoted, and with `shape` given scalars and rows are broadcast to it.
+RowsArray pairRows(const py::object &obj, const char *name,
+                   const py::object &shape = py::none()) {
+  py::object source = obj;
+  if (!shape.is_none())
+    source = py::module_::import("numpy").attr("broadcast_to")(obj, shape);
+  RowsArray rows = RowsArray::ensure(source);
+  if (!rows)
+    throw py::type_error(std::string(name) + " must be numeric");
+  if (rows.ndim() == 1 &&
+      rows.shape(0) == static_cast<py::ssize_t>(kDefaultPairCount))
+    rows = rows.reshape({py::ssize_t{1}, rows.shape(0)});
+  if (rows.ndim() != 2 ||
+      rows.shape(1) != static_cast<py::ssize_t>(kDefaultPairCount))
+    throw py::value_error(std::string(name) +
+                          " must have shape (seconds, 8) in default pair order");
+  return rows;
+}
+
+void bindMetrics(py::module_ &parent) {
+  py::module_ metrics = parent.def_submodule(
+      "metrics",
+      "QBER and visibility with uncertainties from per-second counts "
+      "of the eight default pairs (columns in PAIRS order), vectorised over "
+      "all seconds, plus user-registered metrics.");
+  py::list pairs;
+  for (const auto &[a, b] : kDefaultPairs)
+    pairs.append(py::make_tuple(a, b));
+  metrics.attr("PAIRS") = pairs;
+  metrics.attr("PAIR_LABELS") = std::vector<std::string>{
+      "HH", "VV", "DD", "AA", "HV", "VH", "DA", "AD"};
+  metrics.attr("_registry") = py::dict();
+
+  metrics.def(
+      "register",
+      [metrics](const std::string &name, const py::function &func,
+                bool overwrite) {
+        for (const auto &builtin : builtinMetrics())
+          if (builtin.first == name)
+            throw py::value_error("'" + name + "' is a built-in metric");
+        py::dict registry = metrics.attr("_registry");
+        if (registry.contains(name) && !overwrite)
+          throw py::value_error("metric '" + name +
+                                "' is already registered (overwrite=True "
+                                "replaces it)");
+        registry[py::str(name)] = func;
+      },
+      py::arg("name"), py::arg("func"), py::arg("overwrite") = false,
+      "Register func(net, variance) -> (value, sigma) as metric `name`. Both "
+      "inputs are (seconds, 8) float64 arrays in PAIRS order; both outputs "
+      "must have one entry per second.");
+  metrics.def(
+      "unregister",
+      [metrics](const std::string &name) {
+        py::dict registry = metrics.attr("_registry");
+        if (!registry.contains(name))
+          throw py::key_error("metric '" + name + "' is not registered");
+        PyDict_DelItemString(registry.ptr(), name.c_str());
+      },
+      py::arg("name"), "Remove a registered metric.");
+  metrics.def(
+      "available",
+      [metrics] {
+        std::vector<std::string> names;
+        for (const auto &builtin : builtinMetrics())
+          names.push_back(builtin.first);
+        py::dict registry = metrics.attr("_registry");
+        for (const auto &item : registry)
+          names.push_back(item.first.cast<std::string>());
+        return names;
+      },
+      "Names accepted by compute(): the built-ins, then registered metrics.");
+
+  metrics.def(
+      "compute",
+      [metrics](const py::object &counts, const py::object &background,
+                const py::object &background_err, const py::object &names) {
+        const RowsArray raw = pairRows(counts, "counts");
+        const py::tuple shape = py::make_tuple(raw.shape(0), raw.shape(1));
+        const auto rows = static_cast<size_t>(raw.shape(0));
+        const size_t cells = rows * kDefaultPairCount;
+
+        RowsArray net({raw.shape(0), raw.shape(1)});
+        RowsArray variance({raw.shape(0), raw.shape(1)});
+        {
+          const double *r = raw.data();
+          double *n = net.mutable_data();
+          double *v = variance.mutable_data();
+          for (size_t i = 0; i < cells; ++i) {
+            n[i] = r[i];
+            v[i] = std::max(r[i], 0.0);
+          }
+          if (!background.is_none()) {
+            const RowsArray bg = pairRows(background, "background", shape);
+            for (size_t i = 0; i < cells; ++i)
+              n[i] -= bg.data()[i];
+          }
+          if (!background_err.is_none()) {
+            const RowsArray err = pairRows(background_err, "background_err", shape);
+            for (size_t i = 0; i < cells; ++i)
+              v[i] += err.data()[i] * err.data()[i];
+          }
+        }
+
+        std::vector<std::string> selected;
+        if (names.is_none())
+          selected = metrics.attr("available")().cast<std::vector<std::string>>();
+        else
+          selected = names.cast<std::vector<std::string>>();
+        py::dict registry = metrics.attr("_registry");
+
+        py::list fields;
+        for (const auto &name : selected) {
+          fields.append(py::make_tuple(name, "<f8"));
+          fields.append(py::make_tuple(name + "_err", "<f8"));
+        }
+        py::array out = py::module_::import("numpy").attr("zeros")(
+            static_cast<py::ssize_t>(rows), py::dtype::from_args(fields));
+
+        std::vector<MetricEstimate> estimates(rows);
+        for (const auto &name : selected) {
+          py::array_t<double> value(static_cast<py::ssize_t>(rows));
+          py::array_t<double> sigma(static_cast<py::ssize_t>(rows));
+          const auto builtin = std::find_if(
+              builtinMetrics().begin(), builtinMetrics().end(),
+              [&](const auto &entry) { return entry.first == name; });
+          if (builtin != builtinMetrics().end()) {
+            computePairMetric(builtin->second,
+                              std::span<const double>(net.data(), cells),
+                              std::span<const double>(variance.data(), cells),
+                              estimates);
+            for (size_t i = 0; i < rows; ++i) {
+              value.mutable_data()[i] = estimates[i].value;
+              sigma.mutable_data()[i] = estimates[i].sigma;
+            }
+          } else if (registry.contains(name)) {
+            const py::tuple result = registry[py::str(name)](net, variance);
+            if (result.size() != 2)
+              throw py::value_error("metric '" + name +
+                                    "' must return (value, sigma)");
+            value = py::array_t<double, py::array::forcecast>::ensure(result[0]);
+            sigma = py::array_t<double, py::array::forcecast>::ensure(result[1]);
+            if (!value || !sigma ||
+                value.size() != static_cast<py::ssize_t>(rows) ||
+                sigma.size() != static_cast<py::ssize_t>(rows))
+              throw py::value_error("metric '" + name +
+                                    "' must return one value and sigma per "
+                                    "second");
+          } else {
+            throw py::key_error("unknown metric '" + name + "'");
+          }
+          out[py::str(name)] = value;
+          out[py::str(name + "_err")] = sigma;
+        }
+        return out;
+      },
+      py::arg("counts"), py::arg("background") = py::none(),
+      py::arg("background_err") = py::none(), py::arg("names") = py::none(),
+      "Evaluate metrics for every second. counts is (seconds, 8) in PAIRS "
+      "order; background and background_err (scalar, one row or full shape) "
+      "are subtracted and added in quadrature to the Poisson variance. "
+      "Returns a structured array with a `name` and `name_err` float64 field "
+      "per metric (all available ones by default); rows without counts in a "
+      "basis give NaN.");
+}
+
+} // namespace
+
+// Row of count_pairs_with_background's structured result.
+struct PairBackgroundRecord {
+  std::int32_t ch1;
+  std::int32_t ch2;
+  std::int64_t delay_ps;
+  std::int64_t counts;
+  double accidentals;
+  double background;
+  double background_err;
+  double net;
+  std::int32_t side_windows;
+};
+
 PYBIND11_MODULE(coincfinder, m) {
   m.doc() = "Python bindings for the CoincFinder C++ library";
 
@@ -28,30 +605,112 @@ PYBIND11_MODULE(coincfinder, m) {
                ", seconds=" + std::to_string(s.eventsPerSecond.size()) + ">";
       });
 
+  // --- Bind FlatSingles.h ---
+  // timestamps/offsets/events_for_second return views into the C++ arrays
+  // (kept alive by the FlatSingles object) rather than nested lists.
+  py::class_<FlatSingles>(m, "FlatSingles")
+      .def(py::init<>())
+      .def_readwrite("channel", &FlatSingles::channel)
+      .def_readonly("base_second", &FlatSingles::baseSecond)
+      .def_readonly("bucket_width_ps", &FlatSingles::bucketWidthPs)
+      .def_property_readonly("timestamps",
+                             [](py::object self) {
+                               const auto &flat = self.cast<const FlatSingles &>();
+                               return timestampView(flat.timestamps, self);
+                             })
+      .def_property_readonly(
+          "offsets",
+          [](py::object self) {
+            const auto &flat = self.cast<const FlatSingles &>();
+            static const std::size_t kEmpty = 0;
+            py::array_t<std::size_t> view(
+                {static_cast<py::ssize_t>(flat.offsets.size())},
+                {static_cast<py::ssize_t>(sizeof(std::size_t))},
+                flat.offsets.empty() ? &kEmpty : flat.offsets.data(), self);
+            view.attr("setflags")(py::arg("write") = false);
+            return view;
+          })
+      .def("__len__", [](const FlatSingles &self) { return bucketCount(self); })
+      .def(
+          "events_for_second",
+          [](py::object self, long long second, bool with_next) {
+            const auto &flat = self.cast<const FlatSingles &>();
+            return timestampView(with_next
+                                     ? eventsForSecondWithNext(flat, second)
+                                     : eventsForSecond(flat, second),
+                                 self);
+          },
+          py::arg("second"), py::arg("with_next") = false,
+          "Zero-copy view of one bucket; with_next=True also includes the "
+          "first event of the following bucket.")
+      .def(
+          "rebucket",
+          [](FlatSingles &self, double seconds) {
+            rebucket(self, static_cast<long long>(std::llround(seconds * 1e12)));
+          },
+          py::arg("seconds"),
+          "Recompute bucket offsets for a new bucket duration (no re-read).")
+      .def("to_singles", &expandSingles)
+      .def("__repr__", [](const FlatSingles &s) {
+        return "<FlatSingles channel=" + std::to_string(s.channel) +
+               ", seconds=" + std::to_string(bucketCount(s)) +
+               ", events=" + std::to_string(s.timestamps.size()) + ">";
+      });
+
+  m.def(
+      "flatten_singles",
+      [](const py::object &singles) -> py::object {
+        if (py::isinstance<Singles>(singles))
+          return py::cast(flattenSingles(singles.cast<const Singles &>()));
+        auto channels = singles.cast<std::map<int, Singles>>();
+        return py::cast(flattenSinglesMap(std::move(channels)));
+      },
+      py::arg("singles"),
+      "Convert a Singles (or {channel: Singles}) to the flat columnar form.");
+
   // --- Bind ReadCSV.h functions ---
   // Wrap duration out-parameters so Python gets a tuple (singles_map,
   // duration).
   m.def(
       "read_file_auto",
-      [](const std::string &filename, double exposure_seconds) {
+      [](const std::string &filename, double exposure_seconds,
+         unsigned threads) {
         double duration_sec = 0.0;
-        auto singles = readFileAuto(filename, duration_sec, exposure_seconds);
+        auto singles =
+            readFileAuto(filename, duration_sec, exposure_seconds, threads);
         return std::make_pair(std::move(singles), duration_sec);
       },
       py::arg("filename"), py::arg("exposure_seconds") = -1.0,
+      py::arg("threads") = 1, py::call_guard<py::gil_scoped_release>(),
       "Automatically read CSV or BIN file into a map<int, Singles>; returns "
-      "(singles_map, measurement_duration_sec).");
+      "(singles_map, measurement_duration_sec). threads applies to CSV "
+      "parsing (0 = all cores).");
+
+  m.def(
+      "read_file_flat",
+      [](const std::string &filename, double exposure_seconds,
+         unsigned threads) {
+        double duration_sec = 0.0;
+        auto flat = flattenSinglesMap(
+            readFileAuto(filename, duration_sec, exposure_seconds, threads));
+        return std::make_pair(std::move(flat), duration_sec);
+      },
+      py::arg("filename"), py::arg("exposure_seconds") = -1.0,
+      py::arg("threads") = 1, py::call_guard<py::gil_scoped_release>(),
+      "Like read_file_auto but returns ({channel: FlatSingles}, duration).");
 
   m.def(
       "read_csv_to_singles",
-      [](const std::string &filename) {
+      [](const std::string &filename, unsigned threads) {
         double duration_sec = 0.0;
-        auto singles = readCSVtoSingles(filename, duration_sec);
+        auto singles = readCSVtoSingles(filename, duration_sec, threads);
         return std::make_pair(std::move(singles), duration_sec);
       },
-      py::arg("filename"),
+      py::arg("filename"), py::arg("threads") = 1,
+      py::call_guard<py::gil_scoped_release>(),
       "Read CSV file into map<int, Singles>; returns "
-      "(singles_map, measurement_duration_sec).");
+      "(singles_map, measurement_duration_sec). threads > 1 (or 0 = all "
+      "cores) parses newline-aligned ranges in parallel.");
 
   m.def(
       "read_bin_to_singles",
@@ -60,10 +719,200 @@ PYBIND11_MODULE(coincfinder, m) {
         auto singles = readBINtoSingles(filename, duration_sec);
         return std::make_pair(std::move(singles), duration_sec);
       },
-      py::arg("filename"),
+      py::arg("filename"), py::call_guard<py::gil_scoped_release>(),
       "Read binary file into map<int, Singles>; returns "
       "(singles_map, measurement_duration_sec).");
 
+  // Streaming counterpart of read_file_auto: one chunk of buckets per
+  // iteration. arrays=True yields {channel: int64 array} (all buckets of the
+  // chunk concatenated) instead of {channel: Singles}.
+  py::class_<FileChunkIterator>(m, "FileChunkIterator")
+      .def("__iter__", [](py::object self) { return self; })
+      .def("__next__",
+           [](FileChunkIterator &self) -> py::object {
+             std::map<int, Singles> chunk;
+             bool more = false;
+             {
+               py::gil_scoped_release release;
+               more = self.stream->next(chunk);
+             }
+             if (!more)
+               throw py::stop_iteration();
+             if (!self.arrays)
+               return py::cast(std::move(chunk));
+             py::dict result;
+             for (const auto &[channel, singles] : chunk) {
+               size_t total = 0;
+               for (const auto &bucket : singles.eventsPerSecond)
+                 total += bucket.size();
+               py::array_t<long long> arr(static_cast<py::ssize_t>(total));
+               long long *out = arr.mutable_data();
+               for (const auto &bucket : singles.eventsPerSecond)
+                 out = std::copy(bucket.begin(), bucket.end(), out);
+               result[py::int_(channel)] = std::move(arr);
+             }
+             return result;
+           })
+      .def_property_readonly(
+          "next_first_events",
+          [](const FileChunkIterator &self) {
+            return self.stream->nextFirstEvents();
+          },
+          "{channel: first timestamp of the bucket after the last yielded "
+          "chunk}, for cross-boundary coincidences.")
+      .def_property_readonly("late_events",
+                             [](const FileChunkIterator &self) {
+                               return self.stream->lateEvents();
+                             })
+      .def_property_readonly("duration_sec", [](const FileChunkIterator &self) {
+        return self.stream->durationSeconds();
+      });
+
+  m.def(
+      "iter_file",
+      [](const std::string &filename, double chunk_seconds,
+         double exposure_seconds, bool arrays) {
+        if (exposure_seconds > 1e-9)
+          setBucketDurationSeconds(exposure_seconds);
+        return FileChunkIterator{
+            std::make_unique<SinglesFileStream>(filename, chunk_seconds),
+            arrays};
+      },
+      py::arg("filename"), py::arg("chunk_seconds") = 1.0,
+      py::arg("exposure_seconds") = -1.0, py::arg("arrays") = false,
+      "Iterate over a CSV or BIN file chunk by chunk with bounded memory; "
+      "each item is {channel: Singles} for chunk_seconds worth of buckets "
+      "and can be passed to RollingSingles.append_chunk.");
+
+  // --- Bind BinFile.h ---
+  // Views alias the memory mapping directly (strided by the 10-byte record
+  // size) and hold a reference to the BinFile that owns it.
+  py::class_<BinFile>(m, "BinFile")
+      .def(py::init<const std::string &, size_t>(), py::arg("path"),
+           py::arg("index_stride") = 8192)
+      .def_property_readonly("path", &BinFile::path)
+      .def_property_readonly("header",
+                             [](const BinFile &self) {
+                               const auto header = self.header();
+                               return py::bytes(
+                                   reinterpret_cast<const char *>(header.data()),
+                                   header.size());
+                             })
+      .def_property_readonly("trailing_bytes", &BinFile::trailingBytes)
+      .def("__len__", &BinFile::recordCount)
+      .def_property_readonly(
+          "records",
+          [](py::object self) {
+            const auto &file = self.cast<const BinFile &>();
+            return binRecordView(file, binRecordDtype(), 0, 0,
+                                 file.recordCount(), self);
+          },
+          "Structured (timestamp <u8, channel <u2) view of every record.")
+      .def_property_readonly(
+          "timestamps",
+          [](py::object self) {
+            const auto &file = self.cast<const BinFile &>();
+            return binRecordView(file, py::dtype("<u8"), 0, 0,
+                                 file.recordCount(), self);
+          },
+          "Strided uint64 view of the record timestamps (ps).")
+      .def_property_readonly(
+          "channels",
+          [](py::object self) {
+            const auto &file = self.cast<const BinFile &>();
+            return binRecordView(file, py::dtype("<u2"), sizeof(std::uint64_t),
+                                 0, file.recordCount(), self);
+          },
+          "Strided uint16 view of the raw channel codes (channel = code + 1).")
+      .def(
+          "find_range",
+          [](const BinFile &self, long long start_ps, long long end_ps) {
+            return self.recordRange(start_ps, end_ps);
+          },
+          py::arg("start_ps"), py::arg("end_ps"),
+          py::call_guard<py::gil_scoped_release>(),
+          "Return (first, stop) record indices covering timestamps in "
+          "[start_ps, end_ps); exact for time-sorted files.")
+      .def(
+          "between",
+          [](py::object self, long long start_ps, long long end_ps) {
+            const auto &file = self.cast<const BinFile &>();
+            std::pair<size_t, size_t> range;
+            {
+              py::gil_scoped_release release;
+              range = file.recordRange(start_ps, end_ps);
+            }
+            return binRecordView(file, binRecordDtype(), 0, range.first,
+                                 range.second - range.first, self);
+          },
+          py::arg("start_ps"), py::arg("end_ps"),
+          "Structured view of the records between start_ps and end_ps "
+          "(see find_range).")
+      .def("__repr__", [](const BinFile &self) {
+        return "<BinFile path='" + self.path() +
+               "' records=" + std::to_string(self.recordCount()) + ">";
+      });
+
+  // --- Bind Demux.h ---
+  m.def(
+      "demux",
+      [](const py::buffer &timestamps, const py::buffer &channels,
+         py::ssize_t valid, const py::object &delays_ps) {
+        const py::buffer_info tsInfo = timestamps.request();
+        const py::buffer_info chInfo = channels.request();
+        auto tsSpan = int64Span(tsInfo, "timestamps");
+        auto chSpan = channelCodeSpan(chInfo, "channels");
+        if (valid < 0) {
+          if (tsSpan.size() != chSpan.size())
+            throw py::value_error(
+                "timestamps and channels differ in length; pass valid=");
+          valid = static_cast<py::ssize_t>(tsSpan.size());
+        }
+        if (static_cast<size_t>(valid) > tsSpan.size() ||
+            static_cast<size_t>(valid) > chSpan.size())
+          throw py::value_error("valid exceeds the buffer length");
+        tsSpan = tsSpan.first(static_cast<size_t>(valid));
+        chSpan = chSpan.first(static_cast<size_t>(valid));
+
+        std::vector<long long> offsets;
+        if (!delays_ps.is_none()) {
+          offsets.assign(kDemuxChannelCodes, 0);
+          for (auto item : delays_ps.cast<py::dict>()) {
+            const int channel = item.first.cast<int>();
+            if (channel < 1 || channel > kDemuxChannelCodes)
+              throw py::value_error("delays_ps channel out of range: " +
+                                    std::to_string(channel));
+            offsets[static_cast<size_t>(channel - 1)] =
+                static_cast<long long>(std::llround(item.second.cast<double>()));
+          }
+        }
+
+        DemuxCounts counts;
+        {
+          py::gil_scoped_release release;
+          counts = countChannelCodes(chSpan);
+        }
+        std::array<long long *, kDemuxChannelCodes> outputs{};
+        py::dict result;
+        for (int code = 0; code < kDemuxChannelCodes; ++code) {
+          if (counts[code] == 0)
+            continue;
+          py::array_t<long long> arr(static_cast<py::ssize_t>(counts[code]));
+          outputs[code] = arr.mutable_data();
+          result[py::int_(code + 1)] = std::move(arr);
+        }
+        {
+          py::gil_scoped_release release;
+          scatterByChannel(tsSpan, chSpan, offsets, outputs);
+        }
+        return result;
+      },
+      py::arg("timestamps"), py::arg("channels"), py::arg("valid") = -1,
+      py::arg("delays_ps") = py::none(),
+      "Split interleaved TDC timestamps into {channel: int64 array} with one "
+      "counting-sort pass. Raw channel code c maps to channel c + 1; "
+      "delays_ps={channel: ps} is added to that channel's timestamps.");
+
   m.def("has_ending", &hasEnding, py::arg("string"), py::arg("ending"),
         "Check if a string ends with a given suffix");
 
@@ -74,99 +923,610 @@ PYBIND11_MODULE(coincfinder, m) {
   m.def("get_bucket_duration_seconds", &bucketDurationSeconds,
         "Return the current bucket duration in seconds.");
 
+  py::enum_<IngestMode>(m, "IngestMode")
+      .value("SORTED_INSERT", IngestMode::SortedInsert)
+      .value("APPEND_THEN_SORT", IngestMode::AppendThenSort);
+  m.def("set_ingest_mode", &setIngestMode, py::arg("mode"),
+        "Select how the file readers keep buckets sorted (default "
+        "APPEND_THEN_SORT).");
+  m.def("get_ingest_mode", &ingestMode, "Return the current ingest mode.");
+
   // --- Bind Coincidences.h functions ---
+  // Timestamp arguments accept contiguous int64 buffers without copying (see
+  // TimestampArg); scans return NumPy arrays rather than lists of tuples.
   // --- Count coincidences with delay (use ps everywhere in Python)
   m.def(
       "count_coincidences_with_delay_ps",
-      [](const std::vector<long long> &ch1, const std::vector<long long> &ch2,
-         double coinc_window_ps, double delay_ps) {
-        const auto coinc_window_ll =
-            static_cast<long long>(std::llround(coinc_window_ps));
-        const auto delay_ll = static_cast<long long>(std::llround(delay_ps));
-        return countCoincidencesWithDelay(std::span<const long long>(ch1),
-                                          std::span<const long long>(ch2),
-                                          coinc_window_ll, delay_ll);
+      [](const py::object &ch1, const py::object &ch2, double coinc_window_ps,
+         double delay_ps, const std::string &kernel) {
+        const TimestampArg a(ch1, "ch1");
+        const TimestampArg b(ch2, "ch2");
+        const CoincidenceKernel selected = parseCoincidenceKernel(kernel);
+        py::gil_scoped_release release;
+        return countCoincidencesWithKernel(a.span(), b.span(),
+                                           roundPs(coinc_window_ps),
+                                           roundPs(delay_ps), selected);
       },
       py::arg("ch1"), py::arg("ch2"), py::arg("coinc_window_ps"),
-      py::arg("delay_ps"), "Count coincidences (all arguments in picoseconds)");
+      py::arg("delay_ps"), py::arg("kernel") = "auto",
+      "Count coincidences (all arguments in picoseconds). kernel selects the "
+      "matching loop ('auto', or one of coincidence_kernels()); all give the "
+      "same count.");
 
-  // --- Compute coincidences for range (accept delays in ps)
   m.def(
-      "compute_coincidences_for_range_ps",
-      [](const std::vector<long long> &ch1, const std::vector<long long> &ch2,
-         double coinc_window_ps, double delay_start_ps, double delay_end_ps,
-         double delay_step_ps) {
-        std::vector<std::pair<float, int>> results;
-        computeCoincidencesForRange(
-            std::span<const long long>(ch1), std::span<const long long>(ch2),
-            static_cast<long long>(std::llround(coinc_window_ps)),
-            static_cast<long long>(std::llround(delay_start_ps)),
-            static_cast<long long>(std::llround(delay_end_ps)),
-            static_cast<long long>(std::llround(delay_step_ps)), results);
-        return results;
+      "coincidence_kernels",
+      [] {
+        std::vector<std::string> names;
+        for (const auto kernel : availableCoincidenceKernels())
+          names.emplace_back(coincidenceKernelName(kernel));
+        return names;
       },
-      py::arg("ch1"), py::arg("ch2"), py::arg("coinc_window_ps"),
-      py::arg("delay_start_ps"), py::arg("delay_end_ps"),
-      py::arg("delay_step_ps"),
-      "Compute coincidences for delay range (all delays in picoseconds)");
+      "Names of the coincidence kernels this CPU can run.");
 
-  m.def(
-      "compute_coincidences_for_range_hist_ps",
-      [](const std::vector<long long> &ch1, const std::vector<long long> &ch2,
-         double coinc_window_ps, double delay_start_ps, double delay_end_ps,
-         double delay_step_ps) {
-        std::vector<std::pair<float, int>> results;
-        computeCoincidencesForRangeHistogram(
-            std::span<const long long>(ch1), std::span<const long long>(ch2),
-            static_cast<long long>(std::llround(coinc_window_ps)),
-            static_cast<long long>(std::llround(delay_start_ps)),
-            static_cast<long long>(std::llround(delay_end_ps)),
-            static_cast<long long>(std::llround(delay_step_ps)), results);
-        return results;
-      },
-      py::arg("ch1"), py::arg("ch2"), py::arg("coinc_window_ps"),
-      py::arg("delay_start_ps"), py::arg("delay_end_ps"),
-      py::arg("delay_step_ps"),
-      "Histogram-based coincidence scan (all delays in picoseconds)");
+  // --- Compute coincidences for range (accept delays in ps)
+  m.def("compute_coincidences_for_range_ps", &scanDelays, py::arg("ch1"),
+        py::arg("ch2"), py::arg("coinc_window_ps"), py::arg("delay_start_ps"),
+        py::arg("delay_end_ps"), py::arg("delay_step_ps"),
+        py::arg("method") = "sweep",
+        "Compute coincidences for delay range (all delays in picoseconds); "
+        "returns (delay_ps, counts) int64 arrays. method='fft' estimates the "
+        "counts from a binned FFT cross-correlation (exact only up to grid "
+        "effects); 'auto' picks whichever engine is cheaper.");
+
+  m.def("compute_coincidences_for_range_hist_ps", &scanDelays, py::arg("ch1"),
+        py::arg("ch2"), py::arg("coinc_window_ps"), py::arg("delay_start_ps"),
+        py::arg("delay_end_ps"), py::arg("delay_step_ps"),
+        py::arg("method") = "sweep",
+        "Deprecated alias of compute_coincidences_for_range_ps, kept for "
+        "existing callers; use that instead.");
 
   m.def(
       "count_nfold_coincidences",
-      [](const std::vector<std::vector<long long>> &channels,
-         double coinc_window_ps, const std::vector<long long> &offsets_ps) {
+      [](const py::sequence &channels, double coinc_window_ps,
+         const py::object &offsets_ps) {
+        std::vector<TimestampArg> args;
+        args.reserve(channels.size());
+        for (size_t idx = 0; idx < channels.size(); ++idx)
+          args.emplace_back(channels[idx], "channels[i]");
         std::vector<std::span<const long long>> spans;
-        spans.reserve(channels.size());
-        for (const auto &ch : channels)
-          spans.emplace_back(ch.data(), ch.size());
+        spans.reserve(args.size());
+        for (const auto &arg : args)
+          spans.push_back(arg.span());
+        std::optional<TimestampArg> offsets;
+        if (!offsets_ps.is_none())
+          offsets.emplace(offsets_ps, "offsets_ps");
+        py::gil_scoped_release release;
         return countNFoldCoincidences(
-            spans, static_cast<long long>(std::llround(coinc_window_ps)),
-            std::span<const long long>(offsets_ps.data(), offsets_ps.size()));
+            spans, roundPs(coinc_window_ps),
+            offsets ? offsets->span() : std::span<const long long>{});
       },
       py::arg("channels"), py::arg("coinc_window_ps"),
-      py::arg("offsets_ps") = std::vector<long long>{},
+      py::arg("offsets_ps") = py::none(),
       "Count N-fold coincidences across any number of channel traces "
       "(picoseconds)");
 
+  m.def(
+      "count_coincidence_patterns",
+      [](const py::sequence &channels, double coinc_window_ps,
+         const py::object &offsets_ps, bool exact) {
+        std::vector<TimestampArg> args;
+        args.reserve(channels.size());
+        for (size_t idx = 0; idx < channels.size(); ++idx)
+          args.emplace_back(channels[idx], "channels[i]");
+        std::vector<std::span<const long long>> spans;
+        spans.reserve(args.size());
+        for (const auto &arg : args)
+          spans.push_back(arg.span());
+        std::optional<TimestampArg> offsets;
+        if (!offsets_ps.is_none())
+          offsets.emplace(offsets_ps, "offsets_ps");
+
+        std::vector<long long> counts;
+        {
+          py::gil_scoped_release release;
+          counts = countCoincidencePatterns(
+              spans, roundPs(coinc_window_ps),
+              offsets ? offsets->span() : std::span<const long long>{}, exact);
+        }
+        return py::array_t<long long>(static_cast<py::ssize_t>(counts.size()),
+                                      counts.data());
+      },
+      py::arg("channels"), py::arg("coinc_window_ps"),
+      py::arg("offsets_ps") = py::none(), py::arg("exact") = false,
+      "Coincidence counts for every channel pattern in one pass, cut into "
+      "windows like the TDC's coincidence counters. Returns an int64 array of "
+      "2**len(channels) entries indexed by bitmask (bit i = channels[i]): "
+      "windows containing that pattern, or with exact=True windows with "
+      "exactly it. Index 0 is the number of windows (0 with exact=True). At "
+      "most 16 channels.");
+
+  m.def(
+      "count_nfold_subsets",
+      [](const py::dict &channels, const py::sequence &subsets,
+         double coinc_window_ps, const py::object &offsets_ps) {
+        // Each referenced channel is converted once and merged once, however
+        // many subsets it appears in.
+        std::map<int, size_t> indexOf;
+        std::vector<TimestampArg> args;
+        std::vector<int> channelIds;
+        std::vector<std::vector<size_t>> subsetIndices;
+        subsetIndices.reserve(subsets.size());
+        for (size_t s = 0; s < subsets.size(); ++s) {
+          std::vector<size_t> indices;
+          for (const int channel : subsets[s].cast<std::vector<int>>()) {
+            auto it = indexOf.find(channel);
+            if (it == indexOf.end()) {
+              if (!channels.contains(py::int_(channel)))
+                throw py::key_error("channel " + std::to_string(channel) +
+                                    " not in channels");
+              args.emplace_back(channels[py::int_(channel)], "channels[ch]");
+              channelIds.push_back(channel);
+              it = indexOf.emplace(channel, args.size() - 1).first;
+            }
+            indices.push_back(it->second);
+          }
+          subsetIndices.push_back(std::move(indices));
+        }
+        std::vector<std::span<const long long>> spans;
+        spans.reserve(args.size());
+        for (const auto &arg : args)
+          spans.push_back(arg.span());
+        std::vector<long long> offsets;
+        if (!offsets_ps.is_none()) {
+          const auto byChannel = offsets_ps.cast<std::map<int, double>>();
+          for (const int channel : channelIds) {
+            auto it = byChannel.find(channel);
+            offsets.push_back(it == byChannel.end() ? 0 : roundPs(it->second));
+          }
+        }
+
+        std::vector<long long> counts;
+        {
+          py::gil_scoped_release release;
+          counts = countNFoldCoincidencesForSubsets(
+              spans, subsetIndices, roundPs(coinc_window_ps), offsets);
+        }
+        return py::array_t<long long>(static_cast<py::ssize_t>(counts.size()),
+                                      counts.data());
+      },
+      py::arg("channels"), py::arg("subsets"), py::arg("coinc_window_ps"),
+      py::arg("offsets_ps") = py::none(),
+      "N-fold coincidence counts for several channel subsets in one merged "
+      "pass. channels maps channel -> int64 timestamps, subsets is a list of "
+      "channel tuples and offsets_ps an optional channel -> offset dict. "
+      "Returns an int64 array (one count per subset, as "
+      "count_nfold_coincidences would give).");
+
+  m.def(
+      "count_pairs",
+      [](const py::dict &channels, const py::sequence &pairs,
+         double coinc_window_ps, const py::object &delays_ps, int threads) {
+        std::map<int, TimestampArg> args;
+        const auto queries = pairQueries(channels, pairs, delays_ps, args);
+
+        py::array_t<long long> counts(static_cast<py::ssize_t>(queries.size()));
+        const std::span<long long> out(counts.mutable_data(), queries.size());
+        {
+          py::gil_scoped_release release;
+          countCoincidencesBatch(queries, roundPs(coinc_window_ps), out,
+                                 threads);
+        }
+        return counts;
+      },
+      py::arg("channels"), py::arg("pairs"), py::arg("coinc_window_ps"),
+      py::arg("delays_ps") = py::none(), py::arg("threads") = 0,
+      "Count coincidences for many (a, b) channel pairs in one call. channels "
+      "maps channel -> int64 timestamps; delays_ps is a scalar or one value "
+      "per pair; threads=0 uses the OpenMP default. Returns an int64 array.");
+
+  PYBIND11_NUMPY_DTYPE(PairBackgroundRecord, ch1, ch2, delay_ps, counts,
+                       accidentals, background, background_err, net,
+                       side_windows);
+  m.def(
+      "count_pairs_with_background",
+      [](const py::dict &channels, const py::sequence &pairs,
+         double coinc_window_ps, const py::object &delays_ps,
+         const py::object &side_offsets_ps, const py::object &duration_ps,
+         int threads) {
+        std::map<int, TimestampArg> args;
+        const auto queries = pairQueries(channels, pairs, delays_ps, args);
+        std::vector<long long> sideOffsets;
+        if (!side_offsets_ps.is_none())
+          for (const double offset : side_offsets_ps.cast<std::vector<double>>())
+            sideOffsets.push_back(roundPs(offset));
+        const long long durationPs =
+            duration_ps.is_none() ? 0 : roundPs(duration_ps.cast<double>());
+
+        std::vector<CoincidenceBackground> results(queries.size());
+        {
+          py::gil_scoped_release release;
+          countCoincidencesWithBackgroundBatch(queries, roundPs(coinc_window_ps),
+                                               sideOffsets, durationPs, results,
+                                               threads);
+        }
+        py::array_t<PairBackgroundRecord> out(
+            static_cast<py::ssize_t>(results.size()));
+        auto view = out.mutable_unchecked<1>();
+        for (size_t i = 0; i < results.size(); ++i) {
+          const auto pair = pairs[i].cast<std::pair<int, int>>();
+          const auto &r = results[i];
+          auto &row = view(static_cast<py::ssize_t>(i));
+          row.ch1 = pair.first;
+          row.ch2 = pair.second;
+          row.delay_ps = queries[i].delayPs;
+          row.counts = r.counts;
+          row.accidentals = r.accidentals;
+          row.background = r.background;
+          row.background_err = r.backgroundError;
+          row.net = r.net();
+          row.side_windows = static_cast<std::int32_t>(r.sideWindows);
+        }
+        return out;
+      },
+      py::arg("channels"), py::arg("pairs"), py::arg("coinc_window_ps"),
+      py::arg("delays_ps") = py::none(), py::arg("side_offsets_ps") = py::none(),
+      py::arg("duration_ps") = py::none(), py::arg("threads") = 0,
+      "count_pairs with the background of every count, from the same pass. "
+      "side_offsets_ps lists offsets (relative to each pair's delay, well "
+      "outside the peak) of side windows whose mean count is the measured "
+      "background; without them the accidentals expected from the singles "
+      "(n1 * n2 * (2w + 1) / duration_ps, the span of the data by default) "
+      "are used. Returns a structured array with fields ch1, ch2, delay_ps, "
+      "counts, accidentals, background, background_err, net, side_windows.");
+
+  m.def(
+      "scan_delays_per_second",
+      [](const py::dict &singles, double coinc_window_ps, double delay_start_ps,
+         double delay_end_ps, double delay_step_ps, const py::object &pairs,
+         const py::object &first_second, const py::object &last_second,
+         const py::object &out_path, size_t block_seconds,
+         int threads) -> py::tuple {
+        std::vector<std::pair<int, int>> channelPairs;
+        if (pairs.is_none())
+          channelPairs.assign(kDefaultPairs.begin(), kDefaultPairs.end());
+        else
+          channelPairs = pairs.cast<std::vector<std::pair<int, int>>>();
+        if (channelPairs.empty())
+          throw py::value_error("pairs must not be empty");
+
+        // Missing channels give rows of zeros, like a pair without events.
+        std::vector<SecondScanPair> scanPairs;
+        long long earliest = std::numeric_limits<long long>::max();
+        long long latest = std::numeric_limits<long long>::min();
+        const auto lookup = [&](int channel) -> const Singles * {
+          if (!singles.contains(py::int_(channel)))
+            return nullptr;
+          const Singles &s = singles[py::int_(channel)].cast<const Singles &>();
+          if (!s.eventsPerSecond.empty()) {
+            earliest = std::min(earliest, s.baseSecond);
+            latest = std::max(latest, s.baseSecond + static_cast<long long>(
+                                                         s.eventsPerSecond.size()) -
+                                          1);
+          }
+          return &s;
+        };
+        for (const auto &[a, b] : channelPairs)
+          scanPairs.push_back({lookup(a), lookup(b)});
+
+        const long long first =
+            first_second.is_none() ? earliest : first_second.cast<long long>();
+        const long long last =
+            last_second.is_none() ? latest : last_second.cast<long long>();
+        if (first > last)
+          throw py::value_error("no seconds to scan (first_second > last_second "
+                                "or no events)");
+        const long long windowPs = roundPs(coinc_window_ps);
+        const long long startPs = roundPs(delay_start_ps);
+        const long long endPs = roundPs(delay_end_ps);
+        const long long stepPs = roundPs(delay_step_ps);
+        const size_t delays = delayScanSteps(startPs, endPs, stepPs);
+        const auto seconds = static_cast<size_t>(last - first + 1);
+
+        py::array_t<long long> secondAxis(static_cast<py::ssize_t>(seconds));
+        for (size_t s = 0; s < seconds; ++s)
+          secondAxis.mutable_data()[s] = first + static_cast<long long>(s);
+        py::array_t<long long> delayAxis(static_cast<py::ssize_t>(delays));
+        for (size_t d = 0; d < delays; ++d)
+          delayAxis.mutable_data()[d] = startPs + static_cast<long long>(d) * stepPs;
+
+        if (!out_path.is_none()) {
+          const std::string path = py::str(out_path);
+          {
+            py::gil_scoped_release release;
+            NpyCubeWriter writer(path, scanPairs.size(), seconds, delays);
+            scanDelaysPerSecond(
+                scanPairs, first, last, windowPs, startPs, endPs, stepPs,
+                [&](size_t pair, long long second, std::span<const long long> row) {
+                  writer.writeRow(pair, static_cast<size_t>(second - first), row);
+                },
+                block_seconds, threads);
+            writer.close();
+            writeDelayScanAxes(path + ".json", channelPairs, first, seconds,
+                               windowPs, startPs, stepPs, delays);
+          }
+          py::object cube = py::module_::import("numpy").attr("load")(
+              path, py::arg("mmap_mode") = "r");
+          return py::make_tuple(cube, secondAxis, delayAxis);
+        }
+
+        py::array_t<std::int32_t> cube({static_cast<py::ssize_t>(scanPairs.size()),
+                                        static_cast<py::ssize_t>(seconds),
+                                        static_cast<py::ssize_t>(delays)});
+        std::int32_t *data = cube.mutable_data();
+        {
+          py::gil_scoped_release release;
+          scanDelaysPerSecond(
+              scanPairs, first, last, windowPs, startPs, endPs, stepPs,
+              [&](size_t pair, long long second, std::span<const long long> row) {
+                std::int32_t *dst =
+                    data + (pair * seconds + static_cast<size_t>(second - first)) * delays;
+                for (size_t d = 0; d < delays; ++d)
+                  dst[d] = static_cast<std::int32_t>(std::min<long long>(
+                      row[d], std::numeric_limits<std::int32_t>::max()));
+              },
+              block_seconds, threads);
+        }
+        return py::make_tuple(cube, secondAxis, delayAxis);
+      },
+      py::arg("singles"), py::arg("coinc_window_ps"), py::arg("delay_start_ps"),
+      py::arg("delay_end_ps"), py::arg("delay_step_ps"),
+      py::arg("pairs") = py::none(), py::arg("first_second") = py::none(),
+      py::arg("last_second") = py::none(), py::arg("out_path") = py::none(),
+      py::arg("block_seconds") = 64, py::arg("threads") = 0,
+      "Per-second delay scans of many pairs in one parallel call, as the CLI "
+      "runs them. singles maps channel -> Singles (e.g. from read_file_auto); "
+      "pairs defaults to the eight default pairs; the second range defaults "
+      "to the span of the data. Returns (counts, seconds, delays_ps) with "
+      "counts an int32 array of shape (pairs, seconds, delays). With out_path "
+      "the cube is streamed block by block to that .npy file (plus a .json "
+      "with its axes) and returned memory-mapped, so long runs never sit in "
+      "memory; block_seconds bounds how many seconds are in flight.");
+
   m.def(
       "find_best_delay_ps",
-      [](const std::vector<long long> &reference,
-         const std::vector<long long> &target, double coinc_window_ps,
-         double delay_start_ps, double delay_end_ps, double delay_step_ps) {
+      [](const py::object &reference, const py::object &target,
+         double coinc_window_ps, double delay_start_ps, double delay_end_ps,
+         double delay_step_ps, const std::string &method, bool refine) {
+        const TimestampArg ref(reference, "reference");
+        const TimestampArg tgt(target, "target");
+        const DelayScanMethod engine = parseDelayScanMethod(method, true);
+        py::gil_scoped_release release;
         return findBestDelayPicoseconds(
-            std::span<const long long>(reference.data(), reference.size()),
-            std::span<const long long>(target.data(), target.size()),
-            static_cast<long long>(std::llround(coinc_window_ps)),
-            static_cast<long long>(std::llround(delay_start_ps)),
-            static_cast<long long>(std::llround(delay_end_ps)),
-            static_cast<long long>(std::llround(delay_step_ps)));
+            ref.span(), tgt.span(), roundPs(coinc_window_ps),
+            roundPs(delay_start_ps), roundPs(delay_end_ps),
+            roundPs(delay_step_ps), nullptr, engine, refine);
       },
       py::arg("reference"), py::arg("target"), py::arg("coinc_window_ps"),
       py::arg("delay_start_ps"), py::arg("delay_end_ps"),
-      py::arg("delay_step_ps"),
+      py::arg("delay_step_ps"), py::arg("method") = "sweep",
+      py::arg("refine") = true,
       "Return the delay (picoseconds) that maximizes coincidences between two "
-      "channels.");
+      "channels. method is 'sweep' (default, exact), 'fft', 'auto' or "
+      "'hierarchical' (see find_delay_peak_ps); with the FFT engine the coarse peak is re-scanned "
+      "exactly around its position unless refine=False.");
+
+  py::class_<DelayPeak>(m, "DelayPeak")
+      .def_readonly("delay_ps", &DelayPeak::delayPs)
+      .def_readonly("refined_delay_ps", &DelayPeak::refinedDelayPs)
+      .def_readonly("count", &DelayPeak::count)
+      .def_readonly("background", &DelayPeak::background)
+      .def_readonly("snr", &DelayPeak::snr)
+      .def("__repr__", [](const DelayPeak &p) {
+        return "<DelayPeak delay_ps=" + std::to_string(p.delayPs) +
+               " count=" + std::to_string(p.count) +
+               " snr=" + std::to_string(p.snr) + ">";
+      });
+
+  m.def(
+      "find_delay_peak_ps",
+      [](const py::object &reference, const py::object &target,
+         double coinc_window_ps, double delay_start_ps, double delay_end_ps,
+         double delay_step_ps, long long refine_factor, size_t top_k,
+         size_t max_coarse_points, const std::string &coarse_method) {
+        const TimestampArg ref(reference, "reference");
+        const TimestampArg tgt(target, "target");
+        DelaySearchOptions options;
+        options.refineFactor = refine_factor;
+        options.topK = top_k;
+        options.maxCoarsePoints = max_coarse_points;
+        options.coarseMethod = parseDelayScanMethod(coarse_method, false);
+        py::gil_scoped_release release;
+        return findDelayPeak(ref.span(), tgt.span(), roundPs(coinc_window_ps),
+                             roundPs(delay_start_ps), roundPs(delay_end_ps),
+                             roundPs(delay_step_ps), options);
+      },
+      py::arg("reference"), py::arg("target"), py::arg("coinc_window_ps"),
+      py::arg("delay_start_ps"), py::arg("delay_end_ps"),
+      py::arg("delay_step_ps"), py::arg("refine_factor") = 8,
+      py::arg("top_k") = 3, py::arg("max_coarse_points") = 512,
+      py::arg("coarse_method") = "auto",
+      "Coarse-to-fine delay search: scan the range coarsely, then refine the "
+      "top_k peaks by refine_factor per level down to delay_step_ps. Returns "
+      "a DelayPeak (delay, sub-step estimate, count, background, SNR).");
+
+  py::class_<DelayHistogram>(m, "DelayHistogram")
+      .def(py::init([](double coinc_window_ps, double delay_start_ps,
+                       double delay_end_ps, double delay_step_ps,
+                       double decay_seconds, double window_seconds) {
+             if (decay_seconds > 0.0 && window_seconds > 0.0)
+               throw py::value_error(
+                   "use either decay_seconds or window_seconds, not both");
+             auto hist = std::make_unique<DelayHistogram>(
+                 roundPs(coinc_window_ps), roundPs(delay_start_ps),
+                 roundPs(delay_end_ps), roundPs(delay_step_ps));
+             if (decay_seconds > 0.0)
+               hist->setExponentialDecay(decay_seconds);
+             else if (window_seconds > 0.0)
+               hist->setSlidingWindow(window_seconds);
+             return hist;
+           }),
+           py::arg("coinc_window_ps"), py::arg("delay_start_ps"),
+           py::arg("delay_end_ps"), py::arg("delay_step_ps"),
+           py::arg("decay_seconds") = 0.0, py::arg("window_seconds") = 0.0,
+           "Incremental delay histogram. decay_seconds > 0 weights pairs by "
+           "exp(-age/decay); window_seconds > 0 keeps only recent chunks.")
+      .def(
+          "add_chunk",
+          [](DelayHistogram &self, const py::object &ch1,
+             const py::object &ch2) {
+            const TimestampArg a(ch1, "ch1");
+            const TimestampArg b(ch2, "ch2");
+            py::gil_scoped_release release;
+            self.addChunk(a.span(), b.span());
+          },
+          py::arg("ch1"), py::arg("ch2"),
+          "Fold the next chunk of both channels into the histogram.")
+      .def(
+          "counts",
+          [](const DelayHistogram &self) {
+            py::array_t<double> out(static_cast<py::ssize_t>(self.bins()));
+            self.counts(std::span<double>(out.mutable_data(), self.bins()));
+            return out;
+          },
+          "Current counts per delay bin (float64; integral unless decaying).")
+      .def_property_readonly("delays_ps",
+                             [](const DelayHistogram &self) {
+                               const auto delays = self.delaysPs();
+                               return py::array_t<long long>(
+                                   static_cast<py::ssize_t>(delays.size()),
+                                   delays.data());
+                             })
+      .def_property_readonly("elapsed_seconds", &DelayHistogram::elapsedSeconds)
+      .def("__len__", &DelayHistogram::bins)
+      .def("set_cumulative", &DelayHistogram::setCumulative)
+      .def("set_exponential_decay", &DelayHistogram::setExponentialDecay,
+           py::arg("time_constant_seconds"))
+      .def("set_sliding_window", &DelayHistogram::setSlidingWindow,
+           py::arg("seconds"))
+      .def("reset", &DelayHistogram::reset);
+
+  py::class_<DriftUpdate>(m, "DriftUpdate")
+      .def_readonly("delay_ps", &DriftUpdate::delayPs)
+      .def_readonly("shift_ps", &DriftUpdate::shiftPs)
+      .def_readonly("centroid_ps", &DriftUpdate::centroidPs)
+      .def_readonly("uncertainty_ps", &DriftUpdate::uncertaintyPs)
+      .def_readonly("signal", &DriftUpdate::signal)
+      .def_readonly("background", &DriftUpdate::background)
+      .def_readonly("confidence", &DriftUpdate::confidence)
+      .def_readonly("updated", &DriftUpdate::updated)
+      .def("__repr__", [](const DriftUpdate &u) {
+        return "<DriftUpdate delay_ps=" + std::to_string(u.delayPs) +
+               " confidence=" + std::to_string(u.confidence) +
+               (u.updated ? " updated>" : ">");
+      });
+
+  // Held by shared_ptr: trackers registered with RollingSingles.track_pair
+  // are shared with it and outlive untrack_pair.
+  py::class_<DelayDriftTracker, std::shared_ptr<DelayDriftTracker>>(
+      m, "DelayDriftTracker")
+      .def(py::init(&makeDriftTracker), py::arg("coinc_window_ps"),
+           py::arg("initial_delay_ps"), py::arg("half_span_ps"),
+           py::arg("step_ps"), py::arg("memory_seconds") = 5.0,
+           py::arg("gain") = 0.5, py::arg("min_confidence") = 0.5,
+           "Track a pair delay from live chunks with a local histogram of "
+           "+/-half_span_ps around it.")
+      .def(
+          "add_chunk",
+          [](DelayDriftTracker &self, const py::object &ch1,
+             const py::object &ch2) {
+            const TimestampArg a(ch1, "ch1");
+            const TimestampArg b(ch2, "ch2");
+            py::gil_scoped_release release;
+            return self.addChunk(a.span(), b.span());
+          },
+          py::arg("ch1"), py::arg("ch2"),
+          "Fold the next chunk of both channels in; returns a DriftUpdate.")
+      .def_property_readonly("delay_ps", &DelayDriftTracker::delayPs)
+      .def_property_readonly("center_ps", &DelayDriftTracker::centerPs)
+      .def_property_readonly("last_update", &DelayDriftTracker::lastUpdate)
+      .def_property_readonly("histogram",
+                             [](const DelayDriftTracker &self) {
+                               const auto &h = self.histogram();
+                               return py::array_t<double>(
+                                   static_cast<py::ssize_t>(h.size()), h.data());
+                             })
+      .def_property_readonly("offsets_ps",
+                             [](const DelayDriftTracker &self) {
+                               const auto offsets = self.offsetsPs();
+                               return py::array_t<long long>(
+                                   static_cast<py::ssize_t>(offsets.size()),
+                                   offsets.data());
+                             })
+      .def("set_memory_seconds", &DelayDriftTracker::setMemorySeconds,
+           py::arg("seconds"))
+      .def("set_gain", &DelayDriftTracker::setGain, py::arg("gain"))
+      .def("set_min_confidence", &DelayDriftTracker::setMinConfidence,
+           py::arg("confidence"))
+      .def("reset", &DelayDriftTracker::reset, py::arg("delay_ps"));
+
+  py::class_<PairSource>(m, "PairSource")
+      .def(py::init(&makePairSource), py::arg("pair_rate") = 1e6,
+           py::arg("efficiency_a") = 0.25, py::arg("efficiency_b") = 0.25,
+           py::arg("visibility") = 0.97, py::arg("accidental_rate") = 1000.0,
+           py::arg("delays_ps") = 0.0, py::arg("jitter_ps") = 50.0,
+           py::arg("seed") = 1,
+           "Synthetic Phi+ pair source on channels 1-4 (H, V, D, A, side A) "
+           "and 5-8 (side B). Rates are per second; delays_ps and jitter_ps "
+           "take a number or {channel: ps}.")
+      .def(
+          "generate",
+          [](PairSource &self, double seconds) {
+            std::vector<std::vector<long long>> channels;
+            {
+              py::gil_scoped_release release;
+              self.generate(roundPs(seconds * 1e12), channels);
+            }
+            py::dict result;
+            for (size_t c = 0; c < channels.size(); ++c)
+              result[py::int_(c + 1)] = py::array_t<long long>(
+                  static_cast<py::ssize_t>(channels[c].size()),
+                  channels[c].data());
+            return result;
+          },
+          py::arg("seconds"),
+          "Run the source for `seconds` more and return {channel: sorted int64 "
+          "ps array} of the detections that became final; consecutive calls "
+          "continue the same streams.")
+      .def_property_readonly("now_ps", &PairSource::nowPs)
+      .def_property_readonly("pairs_emitted", &PairSource::pairsEmitted);
+
+  py::class_<PairSourceFeed>(m, "PairSourceFeed")
+      .def(py::init<const PairSource &, double, size_t>(), py::arg("source"),
+           py::arg("period_seconds") = 0.1, py::arg("slots") = 4,
+           "Run a copy of `source` in real time on a background thread, "
+           "publishing period_seconds worth of detections per period into a "
+           "ring of `slots` batches.")
+      .def(
+          "take_latest",
+          [](PairSourceFeed &self) -> py::object {
+            if (!self.takeLatest())
+              return py::none();
+            py::dict result;
+            const auto &channels = self.current();
+            for (size_t c = 0; c < channels.size(); ++c)
+              result[py::int_(c + 1)] = py::array_t<long long>(
+                  static_cast<py::ssize_t>(channels[c].size()),
+                  channels[c].data());
+            return result;
+          },
+          "Newest batch published since the last call as {channel: sorted "
+          "int64 ps array}, or None; older unread batches are skipped.")
+      .def("close", &PairSourceFeed::close,
+           py::call_guard<py::gil_scoped_release>(),
+           "Stop the producer thread; published batches stay readable.")
+      .def_property_readonly("running", &PairSourceFeed::running)
+      .def_property_readonly("published", &PairSourceFeed::published,
+                             "Batches handed to the ring.")
+      .def_property_readonly("overruns", &PairSourceFeed::overruns,
+                             "Batches dropped because the ring was full.")
+      .def_property_readonly("skipped", &PairSourceFeed::skipped,
+                             "Batches replaced by a newer one before being "
+                             "taken.");
 
   py::class_<RollingSingles>(m, "RollingSingles")
       .def(py::init<long long>(), py::arg("window_seconds") = 200)
+      // Keeps the GIL: the accessors below hand out references into the
+      // buckets and trackers that appendChunk modifies.
       .def("append_chunk", &RollingSingles::appendChunk, py::arg("chunk"))
       .def(
           "channel_singles",
@@ -189,8 +1549,56 @@ PYBIND11_MODULE(coincfinder, m) {
           [](RollingSingles &self) -> const std::map<int, Singles> & {
             return self.allChannels();
           },
-          py::return_value_policy::reference_internal);
+          py::return_value_policy::reference_internal)
+      .def(
+          "track_pair",
+          [](RollingSingles &self, int channel_a, int channel_b,
+             double coinc_window_ps, double initial_delay_ps,
+             double half_span_ps, double step_ps, double memory_seconds,
+             double gain, double min_confidence) {
+            return self.trackPair(
+                channel_a, channel_b,
+                makeDriftTracker(coinc_window_ps, initial_delay_ps,
+                                 half_span_ps, step_ps, memory_seconds, gain,
+                                 min_confidence));
+          },
+          py::arg("channel_a"), py::arg("channel_b"), py::arg("coinc_window_ps"),
+          py::arg("initial_delay_ps"), py::arg("half_span_ps"),
+          py::arg("step_ps"), py::arg("memory_seconds") = 5.0,
+          py::arg("gain") = 0.5, py::arg("min_confidence") = 0.5,
+          "Track the delay of (channel_a, channel_b) on every append_chunk and "
+          "return the tracker; after untrack_pair it keeps its last state.")
+      .def("untrack_pair", &RollingSingles::untrackPair, py::arg("channel_a"),
+           py::arg("channel_b"))
+      .def(
+          "drift_updates",
+          [](const RollingSingles &self) {
+            std::map<std::pair<int, int>, DriftUpdate> updates;
+            for (const auto &[pair, tracker] : self.driftTrackers())
+              updates.emplace(pair, tracker->lastUpdate());
+            return updates;
+          },
+          "Latest DriftUpdate per tracked (channel_a, channel_b) pair.");
 
   m.def("write_results_to_file", &writeResultsToFile, py::arg("results"),
         py::arg("filename"), "Write coincidence results to CSV");
+  m.def(
+      "write_results_to_file",
+      [](const py::object &delay_ps, const py::object &counts,
+         const std::string &filename) {
+        const TimestampArg delays(delay_ps, "delay_ps");
+        const TimestampArg values(counts, "counts");
+        if (delays.span().size() != values.span().size())
+          throw py::value_error("delay_ps and counts differ in length");
+        std::vector<std::pair<float, int>> results;
+        results.reserve(delays.span().size());
+        for (size_t i = 0; i < delays.span().size(); ++i)
+          results.emplace_back(static_cast<float>(delays.span()[i]) / 1000.0f,
+                               static_cast<int>(values.span()[i]));
+        writeResultsToFile(results, filename);
+      },
+      py::arg("delay_ps"), py::arg("counts"), py::arg("filename"),
+      "Write a (delay_ps, counts) scan to CSV (delay column in ns).");
+
+  bindMetrics(m);
 }
@@ -0,0 +1,69 @@
+#pragma once
+
+#include "qlaib/acquisition/IBackend.h"
+#include "qlaib/data/BatchPool.h"
+#include "qlaib/data/SampleBatch.h"
+#include "SpscRing.h"
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <cstdint>
+#include <memory>
+#include <mutex>
+#include <thread>
+
+namespace qlaib::acquisition {
+
+/**
+ * @brief Drives an IBackend on its own thread, once per exposure period.
+ *
+ * Reading the device, bucketing and pair counting all happen here, so a slow
+ * UI frame no longer delays the next read (and saturates the TDC buffer).
+ * Batches come from a BatchPool (buffers recycled) and go into a lock-free
+ * ring as shared pointers; the UI takes the newest one whenever it repaints,
+ * without copying it. A full ring (UI stalled for several periods) drops
+ * the new batch and counts an overrun.
+ */
+class AcquisitionThread {
+public:
+  struct Stats {
+    std::uint64_t published{0};   ///< Batches handed to the ring.
+    std::uint64_t overruns{0};    ///< Batches dropped: the ring was full.
+    std::uint64_t skipped{0};     ///< Batches replaced by a newer one unseen.
+    std::uint64_t allocations{0}; ///< SampleBatch objects the pool created.
+  };
+
+  explicit AcquisitionThread(std::size_t slots = 4);
+  ~AcquisitionThread();
+
+  AcquisitionThread(const AcquisitionThread &) = delete;
+  AcquisitionThread &operator=(const AcquisitionThread &) = delete;
+
+  /// Start polling `backend` (already started, must outlive stop()) every
+  /// `period`; restarts the thread if it is running.
+  void start(IBackend &backend, std::chrono::duration<double> period);
+
+  /// Stop and join the thread; returns promptly even mid-period.
+  void stop();
+
+  /// True between start() and stop().
+  bool running() const { return thread_.joinable(); }
+
+  /// Newest batch published since the last call, or null (consumer thread
+  /// only). The batch returns to the pool when its last owner drops it.
+  std::shared_ptr<data::SampleBatch> latest();
+
+  Stats stats() const;
+
+private:
+  void run(IBackend &backend, std::chrono::steady_clock::duration period);
+
+  std::shared_ptr<data::BatchPool> pool_{std::make_shared<data::BatchPool>()};
+  SpscRing<std::shared_ptr<data::SampleBatch>> ring_;
+  std::thread thread_;
+  std::mutex stopMutex_; // only for the interruptible sleep, not the data
+  std::condition_variable stopCv_;
+  bool stopRequested_{false};
+};
+
+} // namespace qlaib::acquisition
@@ -2,6 +2,7 @@
 
 #include "qlaib/acquisition/IBackend.h"
 #include <map>
+#include <vector>
 #include "Singles.h"
 
 namespace qlaib::acquisition {
@@ -11,13 +12,16 @@ class BinReplayBackend : public IBackend {
 public:
   bool start(const BackendConfig &config) override;
   void stop() override;
-  std::optional<data::SampleBatch> nextBatch() override;
+  bool fillBatch(data::SampleBatch &batch) override;
 
 private:
   std::map<int, Singles> singles_;
   long long currentSecond_{0};
   long long lastSecond_{-1};
   long long coincWindowPs_{200000};
+  std::vector<long long> sideOffsetsPs_;
+  std::vector<data::LabelId> pairLabels_; // default pairs, interned at start
+  std::vector<long long> mergedScratch_;  // reused by appendNextFirstEvent
 };
 
 } // namespace qlaib::acquisition
@@ -3,6 +3,7 @@
 #include "qlaib/data/SampleBatch.h"
 #include <optional>
 #include <string>
+#include <vector>
 
 namespace qlaib::acquisition {
 
@@ -24,6 +25,15 @@ struct BackendConfig {
   long long coincidenceWindowPs{200000}; // 200 ps default
   /// Maximum timestamp buffer length for streaming (live quTAG).
   int timestampBufferSize{50000000}; // default 50M to avoid saturation
+  /// Offset of the two side windows (±offset from each pair's delay) whose
+  /// counts give the background of a coincidence count; 0 = ten windows.
+  long long backgroundOffsetPs{0};
+
+  std::vector<long long> backgroundSideOffsetsPs() const {
+    const long long offset = backgroundOffsetPs > 0 ? backgroundOffsetPs
+                                                    : 10 * coincidenceWindowPs;
+    return {-offset, offset};
+  }
 };
 
 class IBackend {
@@ -41,10 +51,21 @@ public:
   virtual void stop() = 0;
 
   /**
-   * @brief Retrieve the next batch of samples, if available.
-   * @return A SampleBatch when data is ready; std::nullopt otherwise.
+   * @brief Fill `batch` with the next samples, if available.
+   *
+   * `batch` comes cleared from a data::BatchPool; backends should fill its
+   * vectors in place (assign/resize) so their capacity is reused.
+   * @return true when data was written; false if none is ready.
    */
-  virtual std::optional<data::SampleBatch> nextBatch() = 0;
+  virtual bool fillBatch(data::SampleBatch &batch) = 0;
+
+  /// Convenience wrapper around fillBatch() with a fresh batch.
+  std::optional<data::SampleBatch> nextBatch() {
+    data::SampleBatch batch;
+    if (!fillBatch(batch))
+      return std::nullopt;
+    return batch;
+  }
 };
 
 } // namespace qlaib::acquisition
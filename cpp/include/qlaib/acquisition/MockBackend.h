@@ -1,23 +1,28 @@
 #pragma once
 
 #include "qlaib/acquisition/IBackend.h"
-#include <fstream>
-#include <random>
+#include "PairSource.h"
+#include <optional>
+#include <vector>
 
 namespace qlaib::acquisition {
 
-// Mock backend: generates synthetic singles/coincidences for UI/dev work.
+// Mock backend for UI/dev work: runs coincfinder's synthetic entangled-pair
+// source for one exposure per batch and counts the default pairs like the
+// live backend, so coincidences and metrics carry real correlations.
 class MockBackend : public IBackend {
 public:
   bool start(const BackendConfig &config) override;
   void stop() override;
-  std::optional<data::SampleBatch> nextBatch() override;
+  bool fillBatch(data::SampleBatch &batch) override;
 
 private:
-  std::mt19937 rng_{std::random_device{}()};
-  std::chrono::steady_clock::time_point startTime_;
+  std::optional<PairSource> source_;
   double exposure_{1.0};
   bool running_{false};
+  long long coincWindowPs_{200000};
+  std::vector<long long> sideOffsetsPs_;
+  std::vector<data::LabelId> pairLabels_; // default pairs, interned at start
 };
 
 } // namespace qlaib::acquisition
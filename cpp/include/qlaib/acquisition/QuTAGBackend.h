@@ -2,6 +2,7 @@
 
 #include "qlaib/acquisition/IBackend.h"
 #include "tdcbase.h"
+#include <utility>
 #include <vector>
 
 namespace qlaib::acquisition {
@@ -11,7 +12,7 @@ class QuTAGBackend : public IBackend {
 public:
   bool start(const BackendConfig &config) override;
   void stop() override;
-  std::optional<data::SampleBatch> nextBatch() override;
+  bool fillBatch(data::SampleBatch &batch) override;
 
   // Start writing timestamps to a binary file (compressed=false => FORMAT_BINARY).
   bool startRecording(const std::string &filepath, bool compressed = false);
@@ -24,7 +25,9 @@ private:
   bool recording_{false};
   double exposureMs_{1000.0};
   long long coincWindowPs_{200000};
+  std::vector<long long> sideOffsetsPs_;
   int bufferSize_{200000};
+  std::vector<data::LabelId> pairLabels_; // default pairs, interned at start
 };
 
 } // namespace qlaib::acquisition
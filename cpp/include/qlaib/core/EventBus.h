@@ -2,6 +2,7 @@
 
 #include <functional>
 #include <map>
+#include <memory>
 #include <mutex>
 #include <string>
 #include <vector>
@@ -9,6 +10,9 @@
 namespace qlaib::core {
 
 // Lightweight pub-sub bus used to decouple acquisition threads from the UI.
+// Publish large payloads as shared pointers (e.g.
+// EventBus<std::shared_ptr<const data::SampleBatch>>): every subscriber then
+// shares the one batch instead of receiving a copy.
 template <typename Payload>
 class EventBus {
 public:
@@ -17,22 +21,27 @@ public:
   int subscribe(const std::string &topic, Callback cb) {
     std::scoped_lock lk(mutex_);
     int token = nextToken_++;
-    subscribers_[topic].push_back({token, std::move(cb)});
+    auto &list = subscribers_[topic];
+    auto next = list ? std::make_shared<Subscribers>(*list)
+                     : std::make_shared<Subscribers>();
+    next->push_back({token, std::move(cb)});
+    list = std::move(next);
     return token;
   }
 
   void publish(const std::string &topic, const Payload &payload) {
-    std::vector<Callback> cbs;
+    // Subscriber lists are immutable snapshots (subscribe swaps in a new
+    // one), so publishing only takes a reference under the lock.
+    std::shared_ptr<const Subscribers> subs;
     {
       std::scoped_lock lk(mutex_);
       auto it = subscribers_.find(topic);
       if (it == subscribers_.end())
         return;
-      for (auto &sub : it->second)
-        cbs.push_back(sub.cb);
+      subs = it->second;
     }
-    for (auto &cb : cbs)
-      cb(payload);
+    for (auto &sub : *subs)
+      sub.cb(payload);
   }
 
 private:
@@ -40,7 +49,8 @@ private:
     int token;
     Callback cb;
   };
-  std::map<std::string, std::vector<Subscriber>> subscribers_;
+  using Subscribers = std::vector<Subscriber>;
+  std::map<std::string, std::shared_ptr<const Subscribers>> subscribers_;
   int nextToken_{0};
   std::mutex mutex_;
 };
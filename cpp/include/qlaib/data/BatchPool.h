@@ -0,0 +1,42 @@
+#pragma once
+
+#include "qlaib/data/SampleBatch.h"
+#include <atomic>
+#include <cstdint>
+#include <memory>
+#include <mutex>
+#include <vector>
+
+namespace qlaib::data {
+
+/**
+ * @brief Recycles SampleBatch objects together with their buffers.
+ *
+ * acquire() hands out a shared batch; when the last owner (ring slot, UI,
+ * EventBus subscriber) drops it, it is cleared and returned here with every
+ * per-channel vector's capacity intact, so a steady acquisition loop stops
+ * allocating after the first few batches. Create with std::make_shared:
+ * batches hold a weak reference and are simply freed if the pool is gone.
+ */
+class BatchPool : public std::enable_shared_from_this<BatchPool> {
+public:
+  /// An empty batch, recycled when available.
+  std::shared_ptr<SampleBatch> acquire();
+
+  /// SampleBatch objects allocated so far; stays flat once recycling works.
+  std::uint64_t allocations() const {
+    return allocations_.load(std::memory_order_relaxed);
+  }
+
+  /// Batches waiting in the pool.
+  std::size_t idle() const;
+
+private:
+  void recycle(SampleBatch *batch);
+
+  mutable std::mutex mutex_;
+  std::vector<std::unique_ptr<SampleBatch>> free_;
+  std::atomic<std::uint64_t> allocations_{0};
+};
+
+} // namespace qlaib::data
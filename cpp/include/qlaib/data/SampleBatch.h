@@ -2,23 +2,50 @@
 
 #include <chrono>
 #include <cstdint>
+#include <optional>
 #include <string>
-#include <unordered_map>
+#include <string_view>
 #include <vector>
 
 namespace qlaib::data {
 
+// Interned pair/metric label. Backends and metrics intern their labels once
+// (at start or registration) and batches carry only the ids, so the hot path
+// never builds or compares strings.
+using LabelId = std::uint32_t;
+
+// Id of `name`, added on first use; thread-safe, ids are never reused.
+LabelId internLabel(std::string_view name);
+// Name of an interned label (reference stays valid for the program's life).
+const std::string &labelName(LabelId id);
+// Id of the backends' pair label "a-b".
+LabelId pairLabel(int chA, int chB);
+
 struct Coincidence {
-  std::string label;
+  LabelId label;
   std::uint64_t counts;
+  double background{0.0}; // expected accidentals under `counts`
+};
+
+struct MetricValue {
+  LabelId id;
+  double value;
 };
 
 struct SampleBatch {
   std::chrono::steady_clock::time_point timestamp;
   std::vector<std::uint64_t> singles;               // per-channel counts
   std::vector<Coincidence> coincidences;            // labeled coincidences
-  std::unordered_map<std::string, double> metrics;  // QBER, visibility, etc.
+  std::vector<MetricValue> metrics;                 // QBER, visibility, etc.
   std::vector<std::vector<long long>> timestamps_ps; // raw timestamps per channel
+
+  // Value of metric `id`, if set (a handful of entries: linear lookup).
+  std::optional<double> metric(LabelId id) const;
+  void setMetric(LabelId id, double value);
+
+  // Empties the batch for reuse; every vector, including each channel's
+  // timestamps, keeps its capacity (timestamps_ps keeps its channel count).
+  void clear();
 };
 
 } // namespace qlaib::data
@@ -9,19 +9,27 @@ namespace qlaib::metrics {
 class Registry {
 public:
   void registerMetric(std::unique_ptr<IMetric> metric);
+  // Metrics returning NaN (inputs missing) leave the batch's value alone.
   void computeAll(data::SampleBatch &batch) const;
 
 private:
   std::vector<std::unique_ptr<IMetric>> metrics_;
+  std::vector<data::LabelId> ids_; // interned metric names, same order
 };
 
-class DummyVisibility final : public IMetric {
+// Metrics of the default pairs ("1-5", "2-6", ... as labelled by the
+// backends), net of each coincidence's background, with the formulas of
+// coincfinder's Metrics.h. Batches without those pairs give NaN.
+
+// H/V-basis visibility (C - A) / (C + A).
+class Visibility final : public IMetric {
 public:
   std::string name() const override { return "visibility"; }
   double compute(const data::SampleBatch &batch) override;
 };
 
-class DummyQBER final : public IMetric {
+// Wrong-outcome fraction over both bases.
+class QBER final : public IMetric {
 public:
   std::string name() const override { return "qber"; }
   double compute(const data::SampleBatch &batch) override;
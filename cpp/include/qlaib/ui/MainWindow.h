@@ -1,10 +1,13 @@
 #pragma once
 
+#include "qlaib/acquisition/AcquisitionThread.h"
 #include "qlaib/acquisition/IBackend.h"
 #include "qlaib/core/EventBus.h"
 #include "qlaib/data/SampleBatch.h"
 #include "qlaib/metrics/Registry.h"
+#include "DelayHistogram.h"
 #include <QMainWindow>
+#include <chrono>
 #include <QTimer>
 #include <memory>
 #include <optional>
@@ -43,7 +46,8 @@ struct PairSpec {
  *
  * Responsibilities:
  *  - select and start the desired backend (live quTAG, replay, mock)
- *  - pull batches on a timer and update charts/tables
+ *  - run the backend on an acquisition thread and show its newest batch
+ *    on a timer (charts/tables)
  *  - manage coincidence pairs and calibration shortcuts
  */
 class MainWindow : public QMainWindow {
@@ -86,14 +90,23 @@ private:
 
   acquisition::BackendConfig cfg_;
   std::unique_ptr<acquisition::IBackend> backend_;
+  // Declared after backend_ so its thread is joined before the backend dies.
+  acquisition::AcquisitionThread acquisition_;
+  std::uint64_t reportedOverruns_{0};
   metrics::Registry metrics_;
   QTimer timer_;
-  std::optional<data::SampleBatch> latestBatch_;
+  // Shared with the acquisition pool: never copied, recycled when replaced.
+  std::shared_ptr<const data::SampleBatch> latestBatch_;
   std::vector<PairSpec> pairs_;
   QString mode_{"live"};
   QString replayFile_;
   double histogramWindowPs_{200.0};
   double coincidenceWindowPs_{200.0};
+  // Live delay histogram fed one batch at a time (see computeHistogram).
+  static constexpr double kLiveHistogramSeconds = 10.0;
+  std::unique_ptr<DelayHistogram> liveHistogram_;
+  QString liveHistogramKey_;
+  std::optional<std::chrono::steady_clock::time_point> liveHistogramBatch_;
 
 #ifdef QQL_ENABLE_CHARTS
   QVBoxLayout *mainLayout_{nullptr};
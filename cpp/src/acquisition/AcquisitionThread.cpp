@@ -0,0 +1,76 @@
+#include "qlaib/acquisition/AcquisitionThread.h"
+#include <algorithm>
+#include <functional>
+
+namespace qlaib::acquisition {
+
+AcquisitionThread::AcquisitionThread(std::size_t slots) : ring_(slots) {}
+
+AcquisitionThread::~AcquisitionThread() { stop(); }
+
+void AcquisitionThread::start(IBackend &backend,
+                              std::chrono::duration<double> period) {
+  stop();
+  // Batches of the previous run (other backend or exposure) are stale.
+  std::shared_ptr<data::SampleBatch> stale;
+  while (ring_.tryPop(stale))
+    stale.reset();
+  {
+    std::scoped_lock lk(stopMutex_);
+    stopRequested_ = false;
+  }
+  const auto ticks =
+      std::chrono::duration_cast<std::chrono::steady_clock::duration>(period);
+  thread_ = std::thread(&AcquisitionThread::run, this, std::ref(backend),
+                        std::max(ticks, std::chrono::steady_clock::duration(
+                                            std::chrono::milliseconds(1))));
+}
+
+void AcquisitionThread::stop() {
+  if (!thread_.joinable())
+    return;
+  {
+    std::scoped_lock lk(stopMutex_);
+    stopRequested_ = true;
+  }
+  stopCv_.notify_all();
+  thread_.join();
+}
+
+std::shared_ptr<data::SampleBatch> AcquisitionThread::latest() {
+  std::shared_ptr<data::SampleBatch> batch;
+  ring_.takeLatest(batch);
+  return batch;
+}
+
+AcquisitionThread::Stats AcquisitionThread::stats() const {
+  return {ring_.published(), ring_.overruns(), ring_.skipped(),
+          pool_->allocations()};
+}
+
+void AcquisitionThread::run(IBackend &backend,
+                            std::chrono::steady_clock::duration period) {
+  // Fixed-rate schedule; after a slow read the next one follows at once
+  // instead of piling up missed periods.
+  auto next = std::chrono::steady_clock::now() + period;
+  for (;;) {
+    {
+      std::unique_lock lk(stopMutex_);
+      if (stopCv_.wait_until(lk, next, [this] { return stopRequested_; }))
+        return;
+    }
+    next = std::max(next + period, std::chrono::steady_clock::now());
+
+    auto batch = pool_->acquire();
+    if (!backend.fillBatch(*batch))
+      continue;
+    if (auto *slot = ring_.tryAcquire()) {
+      // Replacing the slot's old pointer (a batch skipped by takeLatest)
+      // hands that batch back to the pool.
+      *slot = std::move(batch);
+      ring_.publish();
+    }
+  }
+}
+
+} // namespace qlaib::acquisition
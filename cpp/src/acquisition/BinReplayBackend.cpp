@@ -3,9 +3,16 @@
 #include "Coincidences.h"
 #include "Singles.h"
 #include <cmath>
+#include <iterator>
 
 namespace qlaib::acquisition {
 
+namespace {
+// Default pairs as in README (H/V/D/A): (1,5), (2,6), (3,7), (4,8)
+constexpr std::pair<int, int> kPairs[] = {{1, 5}, {2, 6}, {3, 7}, {4, 8},
+                                          {1, 6}, {2, 5}, {3, 8}, {4, 7}};
+} // namespace
+
 bool BinReplayBackend::start(const BackendConfig &config) {
   if (config.replayFile.empty())
     return false;
@@ -26,6 +33,10 @@ bool BinReplayBackend::start(const BackendConfig &config) {
   currentSecond_ = earliest;
   lastSecond_ = latest;
   coincWindowPs_ = config.coincidenceWindowPs;
+  sideOffsetsPs_ = config.backgroundSideOffsetsPs();
+  pairLabels_.clear();
+  for (auto [a, b] : kPairs)
+    pairLabels_.push_back(data::pairLabel(a, b));
   return true;
 }
 
@@ -33,11 +44,10 @@ void BinReplayBackend::stop() {
   singles_.clear();
 }
 
-std::optional<data::SampleBatch> BinReplayBackend::nextBatch() {
+bool BinReplayBackend::fillBatch(data::SampleBatch &batch) {
   if (singles_.empty() || currentSecond_ > lastSecond_)
-    return std::nullopt;
+    return false;
 
-  data::SampleBatch batch;
   batch.timestamp = std::chrono::steady_clock::now();
 
   // Build singles vector up to max channel seen
@@ -50,38 +60,32 @@ std::optional<data::SampleBatch> BinReplayBackend::nextBatch() {
   for (auto &[ch, s] : singles_) {
     const auto &bucket = eventsForSecond(s, currentSecond_);
     batch.singles[ch - 1] = static_cast<std::uint64_t>(bucket.size());
-    batch.timestamps_ps[ch - 1] = bucket; // already in ps relative to first ts
+    // assign() reuses the recycled vector's capacity
+    batch.timestamps_ps[ch - 1].assign(bucket.begin(), bucket.end());
   }
 
-  // Default pairs as in README (H/V/D/A): (1,5), (2,6), (3,7), (4,8)
-  const std::pair<int, int> pairs[] = {{1,5},{2,6},{3,7},{4,8},{1,6},{2,5},{3,8},{4,7}};
-
-  std::vector<std::pair<float,int>> scratch;
-  for (auto [a,b] : pairs) {
+  batch.coincidences.clear();
+  for (size_t i = 0; i < std::size(kPairs); ++i) {
+    const auto [a, b] = kPairs[i];
     if (!singles_.count(a) || !singles_.count(b))
       continue;
     const auto &sa = eventsForSecond(singles_.at(a), currentSecond_);
     const auto &sb = eventsForSecond(singles_.at(b), currentSecond_);
     // include first event of next second for cross-boundary
-    std::vector<long long> mergedScratch;
     const auto &sbNext = eventsForSecond(singles_.at(b), currentSecond_ + 1);
     std::span<const long long> sBSpan =
-        appendNextFirstEvent(sb, sbNext, mergedScratch);
+        appendNextFirstEvent(sb, sbNext, mergedScratch_);
     std::span<const long long> sASpan(sa.data(), sa.size());
-    int coincidences = countCoincidencesWithDelay(sASpan, sBSpan, coincWindowPs_, 0);
-    batch.coincidences.push_back({std::to_string(a) + "-" + std::to_string(b),
-                                  static_cast<std::uint64_t>(coincidences)});
-  }
-
-  // Simple metrics (placeholder): visibility approx from first pair
-  if (!batch.coincidences.empty()) {
-    batch.metrics["visibility"] =
-        batch.coincidences.front().counts /
-        std::max<double>(1.0, batch.coincidences.front().counts + 500.0);
+    const CoincidenceBackground result = countCoincidencesWithBackground(
+        sASpan, sBSpan, coincWindowPs_, 0, sideOffsetsPs_);
+    batch.coincidences.push_back({pairLabels_[i],
+                                  static_cast<std::uint64_t>(result.counts),
+                                  result.background});
   }
 
+  // Visibility/QBER come from the metrics registry (background-subtracted).
   ++currentSecond_;
-  return batch;
+  return true;
 }
 
 } // namespace qlaib::acquisition
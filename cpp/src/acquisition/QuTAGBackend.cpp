@@ -1,14 +1,18 @@
 #include "qlaib/acquisition/QuTAGBackend.h"
 #include "Coincidences.h"
+#include "Demux.h"
 #include "tdcbase.h"
 #include <algorithm>
+#include <array>
 #include <iostream>
-#include <map>
+#include <iterator>
 
 namespace qlaib::acquisition {
 
 namespace {
 constexpr int kDefaultChannelMask = 0xFF; // enable channels 1..8
+constexpr std::pair<int, int> kPairs[] = {{1, 5}, {2, 6}, {3, 7}, {4, 8},
+                                          {1, 6}, {2, 5}, {3, 8}, {4, 7}};
 } // namespace
 
 bool QuTAGBackend::start(const BackendConfig &config) {
@@ -42,6 +46,10 @@ bool QuTAGBackend::start(const BackendConfig &config) {
   bufferSize_ = std::max(config.timestampBufferSize, suggested);
   bufferSize_ = std::clamp(bufferSize_, 1000, 50'000'000);
   coincWindowPs_ = config.coincidenceWindowPs;
+  sideOffsetsPs_ = config.backgroundSideOffsetsPs();
+  pairLabels_.clear();
+  for (auto [a, b] : kPairs)
+    pairLabels_.push_back(data::pairLabel(a, b));
   rc = TDC_setTimestampBufferSize(bufferSize_);
   if (rc != TDC_Ok) {
     std::cerr << "TDC_setTimestampBufferSize failed: " << TDC_perror(rc)
@@ -65,68 +73,67 @@ void QuTAGBackend::stop() {
   }
 }
 
-std::optional<data::SampleBatch> QuTAGBackend::nextBatch() {
+bool QuTAGBackend::fillBatch(data::SampleBatch &batch) {
   if (!connected_)
-    return std::nullopt;
+    return false;
 
   Int32 valid = 0;
   if (tsBuffer_.empty())
-    return std::nullopt;
+    return false;
 
   // reset=1 clears buffer after read -> events since last call
   int rc = TDC_getLastTimestamps(1, tsBuffer_.data(), chBuffer_.data(), &valid);
   if (rc != TDC_Ok) {
     std::cerr << "TDC_getLastTimestamps failed: " << TDC_perror(rc) << "\n";
-    return std::nullopt;
+    return false;
   }
   if (valid <= 0)
-    return std::nullopt;
+    return false;
   std::cerr << "[QuTAG] exposureMs=" << exposureMs_ << " valid_ts=" << valid
             << " bufferSize=" << bufferSize_ << "\n";
   if (valid >= bufferSize_)
     std::cerr << "[QuTAG] WARNING: buffer possibly saturated; counts may be clipped\n";
 
-  // Bucket by channel (1-based external)
-  std::map<int, std::vector<long long>> perChannel;
-  for (int i = 0; i < valid; ++i) {
-    int ch = static_cast<int>(chBuffer_[static_cast<size_t>(i)]) + 1;
-    perChannel[ch].push_back(tsBuffer_[static_cast<size_t>(i)]);
-  }
+  // Bucket by channel (1-based external) with one counting-sort pass,
+  // straight into the batch's recycled per-channel vectors.
+  const size_t count = static_cast<size_t>(valid);
+  const std::span<const long long> timestamps(
+      reinterpret_cast<const long long *>(tsBuffer_.data()), count);
+  const std::span<const std::uint8_t> channels(chBuffer_.data(), count);
+  const DemuxCounts perCode = countChannelCodes(channels);
 
-  data::SampleBatch batch;
   batch.timestamp = std::chrono::steady_clock::now();
-
   int maxCh = 0;
-  for (auto &[ch, _] : perChannel)
-    maxCh = std::max(maxCh, ch);
+  for (int code = 0; code < kDemuxChannelCodes; ++code)
+    if (perCode[code] > 0)
+      maxCh = code + 1;
   batch.singles.assign(static_cast<size_t>(maxCh), 0);
   batch.timestamps_ps.resize(static_cast<size_t>(maxCh));
-  for (auto &[ch, vec] : perChannel) {
-    batch.singles[ch - 1] = static_cast<std::uint64_t>(vec.size());
-    batch.timestamps_ps[ch - 1] = vec;
+  std::array<long long *, kDemuxChannelCodes> outputs{};
+  for (int code = 0; code < maxCh; ++code) {
+    auto &vec = batch.timestamps_ps[code];
+    vec.resize(perCode[code]);
+    outputs[code] = vec.data();
+    batch.singles[code] = static_cast<std::uint64_t>(perCode[code]);
   }
+  scatterByChannel(timestamps, channels, {}, outputs);
 
   // Default pairs
-  const std::pair<int, int> pairs[] = {{1, 5}, {2, 6}, {3, 7}, {4, 8},
-                                       {1, 6}, {2, 5}, {3, 8}, {4, 7}};
-  for (auto [a, b] : pairs) {
-    if (!perChannel.count(a) || !perChannel.count(b))
+  batch.coincidences.clear();
+  for (size_t i = 0; i < std::size(kPairs); ++i) {
+    const auto [a, b] = kPairs[i];
+    if (a > maxCh || b > maxCh || batch.singles[a - 1] == 0 ||
+        batch.singles[b - 1] == 0)
       continue;
-    std::span<const long long> sa(perChannel[a].data(), perChannel[a].size());
-    std::span<const long long> sb(perChannel[b].data(), perChannel[b].size());
-    int coincidences =
-        countCoincidencesWithDelay(sa, sb, coincWindowPs_, 0 /*delay*/);
-    batch.coincidences.push_back({std::to_string(a) + "-" + std::to_string(b),
-                                  static_cast<std::uint64_t>(coincidences)});
-  }
-
-  // Quick visibility proxy
-  if (!batch.coincidences.empty()) {
-    batch.metrics["visibility"] =
-        batch.coincidences.front().counts /
-        std::max<double>(1.0, batch.coincidences.front().counts + 500.0);
+    const CoincidenceBackground result = countCoincidencesWithBackground(
+        batch.timestamps_ps[a - 1], batch.timestamps_ps[b - 1], coincWindowPs_,
+        0 /*delay*/, sideOffsetsPs_);
+    batch.coincidences.push_back({pairLabels_[i],
+                                  static_cast<std::uint64_t>(result.counts),
+                                  result.background});
   }
-  return batch;
+  // Visibility/QBER come from the metrics registry (background-subtracted).
+  return true;
 }
 
 bool QuTAGBackend::startRecording(const std::string &filepath,
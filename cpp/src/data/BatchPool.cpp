@@ -0,0 +1,41 @@
+#include "qlaib/data/BatchPool.h"
+
+namespace qlaib::data {
+
+std::shared_ptr<SampleBatch> BatchPool::acquire() {
+  std::unique_ptr<SampleBatch> batch;
+  {
+    std::scoped_lock lk(mutex_);
+    if (!free_.empty()) {
+      batch = std::move(free_.back());
+      free_.pop_back();
+    }
+  }
+  if (!batch) {
+    batch = std::make_unique<SampleBatch>();
+    allocations_.fetch_add(1, std::memory_order_relaxed);
+  }
+  // The last owner may be on any thread; it returns the batch if the pool
+  // still exists and frees it otherwise.
+  std::weak_ptr<BatchPool> pool = weak_from_this();
+  return std::shared_ptr<SampleBatch>(
+      batch.release(), [pool](SampleBatch *b) {
+        if (auto owner = pool.lock())
+          owner->recycle(b);
+        else
+          delete b;
+      });
+}
+
+std::size_t BatchPool::idle() const {
+  std::scoped_lock lk(mutex_);
+  return free_.size();
+}
+
+void BatchPool::recycle(SampleBatch *batch) {
+  batch->clear();
+  std::scoped_lock lk(mutex_);
+  free_.emplace_back(batch);
+}
+
+} // namespace qlaib::data
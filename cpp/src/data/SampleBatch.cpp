@@ -0,0 +1,70 @@
+#include "qlaib/data/SampleBatch.h"
+#include <deque>
+#include <mutex>
+#include <unordered_map>
+
+namespace qlaib::data {
+
+namespace {
+
+// Names live in a deque so references handed out stay valid as it grows.
+struct LabelTable {
+  std::mutex mutex;
+  std::deque<std::string> names;
+  std::unordered_map<std::string_view, LabelId> ids;
+};
+
+LabelTable &labelTable() {
+  static LabelTable table;
+  return table;
+}
+
+} // namespace
+
+LabelId internLabel(std::string_view name) {
+  auto &table = labelTable();
+  std::scoped_lock lk(table.mutex);
+  if (auto it = table.ids.find(name); it != table.ids.end())
+    return it->second;
+  const auto id = static_cast<LabelId>(table.names.size());
+  table.names.emplace_back(name);
+  table.ids.emplace(table.names.back(), id);
+  return id;
+}
+
+const std::string &labelName(LabelId id) {
+  auto &table = labelTable();
+  std::scoped_lock lk(table.mutex);
+  return table.names.at(id);
+}
+
+LabelId pairLabel(int chA, int chB) {
+  return internLabel(std::to_string(chA) + "-" + std::to_string(chB));
+}
+
+std::optional<double> SampleBatch::metric(LabelId id) const {
+  for (const auto &m : metrics)
+    if (m.id == id)
+      return m.value;
+  return std::nullopt;
+}
+
+void SampleBatch::setMetric(LabelId id, double value) {
+  for (auto &m : metrics)
+    if (m.id == id) {
+      m.value = value;
+      return;
+    }
+  metrics.push_back({id, value});
+}
+
+void SampleBatch::clear() {
+  timestamp = {};
+  singles.clear();
+  coincidences.clear();
+  metrics.clear();
+  for (auto &channel : timestamps_ps)
+    channel.clear();
+}
+
+} // namespace qlaib::data
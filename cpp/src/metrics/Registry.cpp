@@ -1,34 +1,75 @@
 #include "qlaib/metrics/Registry.h"
 #include <algorithm>
+#include <array>
+#include <cmath>
+#include <limits>
+#include <string>
+
+#include "Metrics.h" // from coincfinder
 
 namespace qlaib::metrics {
 
 void Registry::registerMetric(std::unique_ptr<IMetric> metric) {
+  ids_.push_back(data::internLabel(metric->name()));
   metrics_.push_back(std::move(metric));
 }
 
 void Registry::computeAll(data::SampleBatch &batch) const {
-  for (const auto &m : metrics_) {
-    batch.metrics[m->name()] = m->compute(batch);
+  for (size_t i = 0; i < metrics_.size(); ++i) {
+    const double value = metrics_[i]->compute(batch);
+    if (!std::isnan(value))
+      batch.setMetric(ids_[i], value);
+  }
+}
+
+namespace {
+
+// Net counts of the default pairs in coincfinder's metrics row order;
+// returns false when the batch carries none of them.
+bool netPairRow(const data::SampleBatch &batch,
+                std::array<double, kDefaultPairCount> &net,
+                std::array<double, kDefaultPairCount> &variance) {
+  static const auto columnLabels = [] {
+    std::array<data::LabelId, kDefaultPairCount> ids{};
+    for (std::size_t col = 0; col < kDefaultPairCount; ++col)
+      ids[col] = data::pairLabel(kDefaultPairs[col].first,
+                                 kDefaultPairs[col].second);
+    return ids;
+  }();
+  net.fill(0.0);
+  variance.fill(0.0);
+  bool found = false;
+  for (const auto &c : batch.coincidences) {
+    for (std::size_t col = 0; col < kDefaultPairCount; ++col) {
+      if (c.label != columnLabels[col])
+        continue;
+      const double counts = static_cast<double>(c.counts);
+      net[col] = std::max(0.0, counts - c.background);
+      variance[col] = counts;
+      found = true;
+    }
   }
+  return found;
+}
+
+double evaluate(PairMetric metric, const data::SampleBatch &batch) {
+  std::array<double, kDefaultPairCount> net;
+  std::array<double, kDefaultPairCount> variance;
+  if (!netPairRow(batch, net, variance))
+    return std::numeric_limits<double>::quiet_NaN();
+  MetricEstimate estimate;
+  computePairMetric(metric, net, variance, std::span<MetricEstimate>(&estimate, 1));
+  return estimate.value;
 }
 
-double DummyVisibility::compute(const data::SampleBatch &batch) {
-  if (batch.coincidences.empty())
-    return 0.0;
-  auto maxCoinc = std::max_element(
-      batch.coincidences.begin(), batch.coincidences.end(),
-      [](auto &a, auto &b) { return a.counts < b.counts; });
-  return static_cast<double>(maxCoinc->counts) /
-         static_cast<double>(maxCoinc->counts + 500.0);
+} // namespace
+
+double Visibility::compute(const data::SampleBatch &batch) {
+  return evaluate(PairMetric::VisibilityHV, batch);
 }
 
-double DummyQBER::compute(const data::SampleBatch &batch) {
-  if (batch.singles.empty())
-    return 0.0;
-  double errors = static_cast<double>(batch.singles.front()) * 0.02;
-  double total = static_cast<double>(batch.singles.front());
-  return errors / total;
+double QBER::compute(const data::SampleBatch &batch) {
+  return evaluate(PairMetric::Qber, batch);
 }
 
 } // namespace qlaib::metrics
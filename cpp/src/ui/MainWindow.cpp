@@ -1,5 +1,7 @@
 #include "qlaib/ui/MainWindow.h"
 #include "Coincidences.h"
+#include "DelayHistogram.h"
+#include "DelaySearch.h"
 #include "ReadCSV.h"
 #include "qlaib/acquisition/BinReplayBackend.h"
 #include "qlaib/acquisition/MockBackend.h"
@@ -8,12 +10,6 @@
 #endif
 #include <vector>
 
-// Forward declare to placate some compilers where the header isn't picked up.
-long long findBestDelayPicoseconds(
-    std::span<const long long> reference, std::span<const long long> target,
-    long long coincWindowPs, long long delayStartPs, long long delayEndPs,
-    long long delayStepPs, std::vector<std::pair<float, int>> *scratchResults);
-
 #ifdef QQL_ENABLE_CHARTS
 #include <QtCharts/QChart>
 #include <QtCharts/QChartView>
@@ -89,8 +85,8 @@ MainWindow::MainWindow(QWidget *parent) : QMainWindow(parent) {
   }
   qDebug("MainWindow: backend selected");
 
-  metrics_.registerMetric(std::make_unique<metrics::DummyVisibility>());
-  metrics_.registerMetric(std::make_unique<metrics::DummyQBER>());
+  metrics_.registerMetric(std::make_unique<metrics::Visibility>());
+  metrics_.registerMetric(std::make_unique<metrics::QBER>());
   qDebug("MainWindow: metrics registered");
 
   connect(&timer_, &QTimer::timeout, this, &MainWindow::tick);
@@ -328,6 +324,9 @@ void MainWindow::start() {
   } else {
     qInfo("MainWindow::start: backend %s started", backendName);
   }
+  acquisition_.start(*backend_,
+                     std::chrono::duration<double>(cfg_.exposureSeconds));
+  reportedOverruns_ = acquisition_.stats().overruns;
   t0_ms_ = QDateTime::currentMSecsSinceEpoch();
   timer_.setInterval(computePollIntervalMs());
   timer_.start();
@@ -346,12 +345,21 @@ void MainWindow::start() {
 
 void MainWindow::stop() {
   timer_.stop();
+  acquisition_.stop();
   backend_->stop();
+  const auto stats = acquisition_.stats();
+  qInfo("MainWindow::stop: batches=%llu dropped=%llu skipped=%llu "
+        "allocated=%llu",
+        static_cast<unsigned long long>(stats.published),
+        static_cast<unsigned long long>(stats.overruns),
+        static_cast<unsigned long long>(stats.skipped),
+        static_cast<unsigned long long>(stats.allocations));
 }
 
 int MainWindow::computePollIntervalMs() const {
-  // Poll at the exposure period (in ms), clamped to sensible UI ranges.
-  int ms = static_cast<int>(std::round(cfg_.exposureSeconds * 1000.0));
+  // The acquisition thread keeps the exposure cadence; polling at half the
+  // period shows each batch within half a period of it being ready.
+  int ms = static_cast<int>(std::round(cfg_.exposureSeconds * 500.0));
   ms = std::max(50, ms); // minimum 50 ms, no upper clamp
   return ms;
 }
@@ -362,14 +370,24 @@ void MainWindow::restartBackend() {
 }
 
 void MainWindow::tick() {
-  auto batch = backend_->nextBatch();
+  const auto stats = acquisition_.stats();
+  if (stats.overruns > reportedOverruns_) {
+    qWarning("MainWindow::tick: UI fell behind, %llu batches dropped",
+             static_cast<unsigned long long>(stats.overruns -
+                                             reportedOverruns_));
+    statusBar()->showMessage(
+        QString("UI fell behind acquisition: %1 batches dropped in total")
+            .arg(stats.overruns));
+    reportedOverruns_ = stats.overruns;
+  }
+  auto batch = acquisition_.latest();
   if (!batch)
     return;
   metrics_.computeAll(*batch);
-  latestBatch_ = batch;
+  latestBatch_ = std::move(batch);
   saveConfig();
-  appendSample(*batch);
-  refreshPairList(*batch);
+  appendSample(*latestBatch_);
+  refreshPairList(*latestBatch_);
   if (tabs_ && histTab_ && tabs_->currentWidget() == histTab_ && latestBatch_) {
     computeHistogram(false);
   }
@@ -447,13 +465,15 @@ void MainWindow::appendSample(const data::SampleBatch &batch) {
   coincAxisX_->setRange(0.0, t + 1.0);
 
   // Metrics (qber, visibility, s_parameter optional)
-  const char *metricNames[] = {"qber", "visibility", "s_parameter"};
-  for (auto key : metricNames) {
-    auto it = batch.metrics.find(key);
-    if (it == batch.metrics.end())
+  static const data::LabelId metricIds[] = {data::internLabel("qber"),
+                                            data::internLabel("visibility"),
+                                            data::internLabel("s_parameter")};
+  for (const auto id : metricIds) {
+    const auto value = batch.metric(id);
+    if (!value)
       continue;
     updateSeries(metricSeries_, metricsChart_, metricsAxisX_, metricsAxisY_,
-                 QString::fromUtf8(key), it->second);
+                 QString::fromStdString(data::labelName(id)), *value);
   }
   metricsAxisX_->setRange(0.0, t + 1.0);
 
@@ -471,9 +491,10 @@ void MainWindow::appendSample(const data::SampleBatch &batch) {
   rescale(metricsChart_, metricsAxisY_);
 #endif
 
-  double qber = batch.metrics.count("qber") ? batch.metrics.at("qber") : 0.0;
-  double vis =
-      batch.metrics.count("visibility") ? batch.metrics.at("visibility") : 0.0;
+  static const data::LabelId qberId = data::internLabel("qber");
+  static const data::LabelId visId = data::internLabel("visibility");
+  double qber = batch.metric(qberId).value_or(0.0);
+  double vis = batch.metric(visId).value_or(0.0);
   statusBar()->showMessage(
       QString("QBER %1 | Vis %2 | Singles ch1 %3")
           .arg(qber, 0, 'f', 3)
@@ -536,17 +557,31 @@ void MainWindow::computeHistogram(bool showStatus) {
     return;
   }
 
-  std::vector<std::pair<float, int>> results;
-  computeCoincidencesForRange(
-      ta, tb, static_cast<long long>(windowSpin_->value()),
-      static_cast<long long>(startSpin_->value()),
-      static_cast<long long>(endSpin_->value()),
-      static_cast<long long>(stepSpin_->value()), results);
+  // Fold each new batch into the live histogram instead of rescanning; it is
+  // rebuilt only when the pair or the binning changes.
+  const auto windowPs = static_cast<long long>(windowSpin_->value());
+  const auto startPs = static_cast<long long>(startSpin_->value());
+  const auto endPs = static_cast<long long>(endSpin_->value());
+  const auto stepPs = static_cast<long long>(stepSpin_->value());
+  const QString histKey =
+      QString("%1|%2|%3|%4|%5").arg(pair).arg(windowPs).arg(startPs).arg(endPs).arg(stepPs);
+  if (!liveHistogram_ || histKey != liveHistogramKey_) {
+    liveHistogram_ = std::make_unique<DelayHistogram>(windowPs, startPs, endPs, stepPs);
+    liveHistogram_->setSlidingWindow(kLiveHistogramSeconds);
+    liveHistogramKey_ = histKey;
+    liveHistogramBatch_.reset();
+  }
+  if (liveHistogramBatch_ != latestBatch_->timestamp) {
+    liveHistogram_->addChunk(ta, tb);
+    liveHistogramBatch_ = latestBatch_->timestamp;
+  }
+  const auto counts = liveHistogram_->counts();
+  const auto delays = liveHistogram_->delaysPs();
 
   // Plot
   auto *series = new QLineSeries(histChart_);
-  for (auto &r : results) {
-    series->append(static_cast<double>(r.first), static_cast<double>(r.second));
+  for (size_t i = 0; i < counts.size(); ++i) {
+    series->append(static_cast<double>(delays[i]) / 1000.0, counts[i]);
   }
   histChart_->removeAllSeries();
   histChart_->addSeries(series);
@@ -555,11 +590,12 @@ void MainWindow::computeHistogram(bool showStatus) {
   histAxisX_->setRange(startSpin_->value(), endSpin_->value());
 
   double maxY = 1.0;
-  for (auto &r : results)
-    maxY = std::max<double>(maxY, r.second);
+  for (const double c : counts)
+    maxY = std::max(maxY, c);
   histAxisY_->setRange(0.0, maxY * 1.2);
-  statusBar()->showMessage(
-      QString("Histogram: %1 bins").arg(static_cast<int>(results.size())));
+  statusBar()->showMessage(QString("Histogram: %1 bins (last %2 s of data)")
+                               .arg(static_cast<int>(counts.size()))
+                               .arg(kLiveHistogramSeconds));
 #endif
 }
 
@@ -599,7 +635,16 @@ void MainWindow::toggleRecording() {
                                               "BIN Files (*.bin)");
   if (path.isEmpty())
     return;
-  if (qtb->startRecording(path.toStdString(), false)) {
+  // The acquisition thread is inside the TDC library (fillBatch) most of the
+  // time; pause it so the two never call into the device concurrently, and
+  // resume only if it was running (a stopped window stays stopped).
+  const bool wasRunning = acquisition_.running();
+  acquisition_.stop();
+  const bool recording = qtb->startRecording(path.toStdString(), false);
+  if (wasRunning)
+    acquisition_.start(*backend_,
+                       std::chrono::duration<double>(cfg_.exposureSeconds));
+  if (recording) {
     statusBar()->showMessage("Recording to " + path);
   } else {
     statusBar()->showMessage("Failed to start recording");
@@ -776,11 +821,13 @@ void MainWindow::calibrateAll() {
     std::span<const long long> tb(latestBatch_->timestamps_ps[p.chB - 1]);
     if (ta.empty() || tb.empty())
       continue;
-    p.delayPs = ::findBestDelayPicoseconds(
-        ta, tb, static_cast<long long>(coincidenceWindowPs_),
-        static_cast<long long>(startSpin_->value()),
-        static_cast<long long>(endSpin_->value()),
-        static_cast<long long>(stepSpin_->value()), nullptr);
+    // Coarse-to-fine: histograms stay small however fine the step is.
+    p.delayPs = findDelayPeak(ta, tb,
+                              static_cast<long long>(coincidenceWindowPs_),
+                              static_cast<long long>(startSpin_->value()),
+                              static_cast<long long>(endSpin_->value()),
+                              static_cast<long long>(stepSpin_->value()))
+                    .delayPs;
   }
   refreshPairsTable();
   saveConfig();
@@ -1,5 +1,6 @@
 #include <QtTest/QtTest>
 #include "qlaib/acquisition/MockBackend.h"
+#include "qlaib/data/BatchPool.h"
 
 class MockBackendTest : public QObject {
   Q_OBJECT
@@ -12,6 +13,40 @@ private slots:
     QVERIFY(batch.has_value());
     QVERIFY(!batch->singles.empty());
   }
+
+  void mock_pairs_are_correlated() {
+    qlaib::acquisition::MockBackend backend;
+    qlaib::acquisition::BackendConfig cfg;
+    QVERIFY(backend.start(cfg));
+    auto batch = backend.nextBatch();
+    QVERIFY(batch.has_value());
+    // Default pairs: H/H (1-5) first, H/V (1-6) fifth; V = 0.95 at the source.
+    QCOMPARE(batch->coincidences[0].label, qlaib::data::pairLabel(1, 5));
+    QCOMPARE(batch->coincidences[4].label, qlaib::data::pairLabel(1, 6));
+    const double hh = static_cast<double>(batch->coincidences[0].counts);
+    const double hv = static_cast<double>(batch->coincidences[4].counts);
+    QVERIFY(hh > 100.0);
+    QVERIFY((hh - hv) / (hh + hv) > 0.8);
+  }
+
+  void pool_recycles_batches() {
+    qlaib::acquisition::MockBackend backend;
+    qlaib::acquisition::BackendConfig cfg;
+    QVERIFY(backend.start(cfg));
+    auto pool = std::make_shared<qlaib::data::BatchPool>();
+    const long long *lastBuffer = nullptr;
+    for (int i = 0; i < 5; ++i) {
+      auto batch = pool->acquire();
+      QVERIFY(backend.fillBatch(*batch));
+      QCOMPARE(batch->coincidences.size(), std::size_t{8});
+      lastBuffer = batch->timestamps_ps[0].data();
+    }
+    // One batch allocated, refilled in place with its channel buffers kept.
+    QCOMPARE(pool->allocations(), std::uint64_t{1});
+    auto batch = pool->acquire();
+    QVERIFY(batch->singles.empty() && batch->timestamps_ps[0].empty());
+    QCOMPARE(batch->timestamps_ps[0].data(), lastBuffer);
+  }
 };
 
 QTEST_MAIN(MockBackendTest)
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# QuTAG_MC.py lives at the repository root; coincfinder is picked up from
+# wherever the extension was built/installed.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
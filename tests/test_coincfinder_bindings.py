@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cf = pytest.importorskip("coincfinder")
+
+
+@pytest.fixture
+def channels():
+    a = np.arange(0, 1_000_000, 1_000, dtype=np.int64)
+    return {1: a, 2: a + 300, 3: a + 300}
+
+
+@pytest.mark.parametrize(
+    "delay", [-300, -300.0, np.int64(-300), np.float64(-300.0), np.int32(-300)]
+)
+def test_pair_delays_accept_scalars(channels, delay):
+    pairs = [(1, 2), (1, 3)]
+    assert list(cf.count_pairs(channels, pairs, 50, delays_ps=delay)) == [1000, 1000]
+    records = cf.count_pairs_with_background(channels, pairs, 50, delays_ps=delay)
+    assert list(records["counts"]) == [1000, 1000]
+
+
+def test_pair_delays_per_pair(channels):
+    counts = cf.count_pairs(channels, [(1, 2), (1, 3)], 50,
+                            delays_ps=np.array([-300, 0]))
+    assert list(counts) == [1000, 0]
+    with pytest.raises(ValueError):
+        cf.count_pairs(channels, [(1, 2), (1, 3)], 50, delays_ps=[0])
+
+
+def test_tracker_outlives_untrack_pair():
+    rolling = cf.RollingSingles(10)
+    tracker = rolling.track_pair(1, 2, 100, 0.0, 1_000, 10)
+    assert (1, 2) in rolling.drift_updates()
+    rolling.untrack_pair(1, 2)
+    del rolling
+    assert tracker.delay_ps == 0.0
+    tracker.reset(250.0)
+    assert tracker.delay_ps == 250.0
+
+
+def test_pair_source_feed_takes_newest_batch():
+    feed = cf.PairSourceFeed(cf.PairSource(pair_rate=1e5, seed=3),
+                             period_seconds=0.002, slots=2)
+    deadline = time.monotonic() + 5.0
+    while feed.overruns == 0 and time.monotonic() < deadline:
+        time.sleep(0.002)
+    assert feed.published == 2 and feed.overruns > 0
+
+    batch = feed.take_latest()
+    assert sorted(batch) == list(range(1, 9))
+    assert all(np.all(np.diff(ts) >= 0) for ts in batch.values())
+    assert feed.skipped == 1
+
+    feed.close()
+    assert not feed.running
+    published = feed.published
+    while feed.take_latest() is not None:
+        pass
+    assert feed.take_latest() is None
+    assert feed.published == published
@@ -0,0 +1,71 @@
+import ctypes
+
+import pytest
+
+pytest.importorskip("numpy")
+import QuTAG_MC  # noqa: E402
+
+
+@pytest.fixture
+def qutag():
+    return QuTAG_MC.QuTAG(backend="sim", seed=1)
+
+
+def test_snapshot_round_trip(qutag):
+    snapshot = qutag.snapshot_config()
+    # Presets the device cannot report come back as None.
+    assert snapshot["channels"][1]["conditioning"] is None
+    assert qutag.apply_config(snapshot) == {}
+    assert qutag.snapshot_config() == snapshot
+
+
+def test_forced_snapshot_round_trip(qutag):
+    snapshot = qutag.snapshot_config()
+    sent = qutag.apply_config(snapshot, force=True)
+    assert sent and set(sent.values()) == {0}
+    assert not any(key[0] == "signalConditioning" for key in sent)
+    assert qutag.snapshot_config() == snapshot
+
+
+def test_apply_sends_only_changes(qutag):
+    config = {
+        "enabledChannels": range(1, 9),
+        "channels": {ch: {"threshold": 0.5, "delay": 100 * ch} for ch in range(1, 9)},
+        "coincidenceWindow": 200,
+        "histogramParams": (10, 500),
+        "histograms": [(1, 5), (2, 6)],
+    }
+    sent = qutag.apply_config(config)
+    assert set(sent.values()) == {0}
+    assert ("signalConditioning", 1) in sent
+    assert qutag.apply_config(config) == {}
+
+    config["channels"] = {3: {"delay": -50}}
+    config["histograms"] = [(1, 5)]
+    assert qutag.apply_config(config) == {("channelDelay", 3): 0, "histograms": 0}
+
+    snapshot = qutag.snapshot_config()
+    assert snapshot["channels"][3]["delay"] == -50
+    assert snapshot["channels"][1]["conditioning"] == qutag.SCOND_MISC
+    assert snapshot["histograms"] == [(1, 5)]
+    assert qutag.apply_config(snapshot) == {}
+
+
+def test_apply_rejects_unknown_keys(qutag):
+    with pytest.raises(ValueError):
+        qutag.apply_config({"exposure": 100})
+
+
+def test_rejected_buffer_size_keeps_buffer(qutag):
+    size = qutag.getBufferSize()
+    assert qutag.setBufferSize(0) != 0
+    assert qutag.getBufferSize() == size
+    timestamps, channels, valid = qutag.getLastTimestamps(True)
+    assert len(timestamps) == valid
+
+
+def test_sim_checks_argtypes_like_the_dll(qutag):
+    with pytest.raises(ctypes.ArgumentError):
+        qutag.qutools_dll.TDC_configureSignalConditioning(1, None, 0, 0.5)
+    with pytest.raises(ctypes.ArgumentError):
+        qutag.qutools_dll.TDC_setExposureTime(1.5)
@@ -0,0 +1,40 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import QuTAG_MC  # noqa: E402
+
+
+def spilling_stream():
+    qutag = QuTAG_MC.QuTAG(backend="sim", seed=1)
+    stream = QuTAG_MC.TimestampStream(qutag, interval=0.01, queueSize=1, policy="spill")
+    stream.start()
+    spillDir = stream.spillDir
+    deadline = time.monotonic() + 5.0
+    while len(os.listdir(spillDir)) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return stream, spillDir
+
+
+def test_spilled_chunks_delivered_in_order():
+    stream, spillDir = spilling_stream()
+    stream.stop()
+    assert os.path.isdir(spillDir)
+
+    chunks = list(stream)
+    assert len(chunks) > 3
+    pollTimes = [chunk.pollTime for chunk in chunks]
+    assert pollTimes == sorted(pollTimes)
+    timestamps = np.concatenate([chunk.timestamps for chunk in chunks])
+    assert np.all(np.diff(timestamps) >= 0)
+    assert not os.path.exists(spillDir)
+    assert stream.spillDir is None
+
+
+def test_spill_directory_removed_on_discard():
+    stream, spillDir = spilling_stream()
+    stream.stop(discard=True)
+    assert not os.path.exists(spillDir)
+    assert stream.get() is None